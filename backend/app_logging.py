@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Journalisation structurée du backend Interface CAH
+
+- un logger par module (get_logger(__name__)), sous l'espace de noms « cah »
+- sortie JSON sur stdout (LOG_FORMAT=text pour une sortie lisible en local)
+- niveau configurable par LOG_LEVEL (INFO par défaut) : les messages sous le
+  niveau ne sont ni formatés ni écrits
+- identifiant de corrélation par requête (en-tête X-Request-ID), ajouté à
+  chaque message émis pendant la requête
+- échantillonnage des messages de débogage par ligne (LOG_SAMPLE_RATE)
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# Configuration
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))
+
+ROOT_LOGGER = "cah"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Identifiant de corrélation de la requête en cours (propagé aux threads du pool)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par message"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Sortie lisible pour le développement local"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        request_id = request_id_var.get()
+        return f"{message} [{request_id}]" if request_id else message
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> logging.Logger:
+    """Configurer le logger racine « cah » (idempotent)"""
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, level, logging.INFO))
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        root.addHandler(handler)
+        # Ne pas dupliquer les messages dans la configuration d'uvicorn
+        root.propagate = False
+    for handler in root.handlers:
+        handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger d'un module, rattaché à la configuration « cah »"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def debug_sampled(logger: logging.Logger, message: str, *args, rate: Optional[float] = None):
+    """
+    Message de débogage émis pour chaque ligne d'un résultat : sans coût si
+    DEBUG est désactivé, et seulement une fraction (LOG_SAMPLE_RATE) sinon
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < (LOG_SAMPLE_RATE if rate is None else rate):
+        logger.debug(message, *args, stacklevel=2)
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Identifiant de corrélation : celui reçu du client, sinon un nouveau"""
+    return incoming or uuid.uuid4().hex
+
+
+configure_logging()
@@ -8,13 +8,16 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from models_auth import Base, Compagnie, Utilisateur, DemandeAcces, Notification
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 # Chemin de la base de données d'authentification
 DATA_DIR = os.environ.get("DATA_DIR", "./data")
 os.makedirs(DATA_DIR, exist_ok=True)
 AUTH_DB_PATH = os.path.join(DATA_DIR, "auth.db")
 
-print(f"📁 Base de données d'authentification : {AUTH_DB_PATH}")
+logger.info(f"📁 Base de données d'authentification : {AUTH_DB_PATH}")
 
 # Créer le moteur SQLAlchemy pour SQLite
 engine = create_engine(
@@ -35,14 +38,14 @@ def init_auth_database():
     try:
         # Créer toutes les tables si elles n'existent pas
         Base.metadata.create_all(bind=engine)
-        print("✅ Tables d'authentification créées/vérifiées")
+        logger.info("✅ Tables d'authentification créées/vérifiées")
         
         # Créer la compagnie par défaut si elle n'existe pas
         create_default_company()
         
         return True
     except Exception as e:
-        print(f"❌ Erreur initialisation DB auth: {e}")
+        logger.error(f"❌ Erreur initialisation DB auth: {e}")
         return False
 
 def create_default_company():
@@ -70,17 +73,17 @@ def create_default_company():
             db.commit()
             db.refresh(default_company)
             company_id = default_company.id_compagnie
-            print(f"✅ Compagnie 'CAH Immobilier' créée (ID: {company_id}, Code: {code_acces})")
+            logger.info(f"✅ Compagnie 'CAH Immobilier' créée (ID: {company_id}, Code: {code_acces})")
         else:
             company_id = existing.id_compagnie
-            print(f"ℹ️ Compagnie 'CAH Immobilier' existe déjà (ID: {company_id})")
+            logger.info(f"ℹ️ Compagnie 'CAH Immobilier' existe déjà (ID: {company_id})")
         
         # Créer l'utilisateur admin Sacha si il n'existe pas
         if company_id:
             create_default_admin_user(db, company_id)
             
     except Exception as e:
-        print(f"❌ Erreur création compagnie par défaut: {e}")
+        logger.error(f"❌ Erreur création compagnie par défaut: {e}")
         db.rollback()
     finally:
         db.close()
@@ -110,12 +113,12 @@ def create_default_admin_user(db: SessionLocal, company_id: int):
             )
             db.add(admin_user)
             db.commit()
-            print(f"✅ Utilisateur admin 'Sacha Heroux' créé pour CAH Immobilier")
+            logger.info(f"✅ Utilisateur admin 'Sacha Heroux' créé pour CAH Immobilier")
         else:
-            print(f"ℹ️ Utilisateur 'sacha.heroux87@gmail.com' existe déjà")
+            logger.info(f"ℹ️ Utilisateur 'sacha.heroux87@gmail.com' existe déjà")
             
     except Exception as e:
-        print(f"❌ Erreur création utilisateur admin: {e}")
+        logger.error(f"❌ Erreur création utilisateur admin: {e}")
         db.rollback()
 
 def get_auth_db():
@@ -149,9 +152,9 @@ def get_company_database_path(company_id: int) -> str:
 from datetime import datetime
 
 if __name__ == "__main__":
-    print("\n" + "="*60)
-    print("🔧 INITIALISATION BASE DE DONNÉES D'AUTHENTIFICATION")
-    print("="*60)
+    logger.info("\n" + "="*60)
+    logger.info("🔧 INITIALISATION BASE DE DONNÉES D'AUTHENTIFICATION")
+    logger.info("="*60)
     init_auth_database()
-    print("="*60 + "\n")
+    logger.info("="*60 + "\n")
 
@@ -15,6 +15,10 @@ import auth_service
 import email_service
 from models_auth import Compagnie, Utilisateur, DemandeAcces, Notification
 from auth_database_service import get_auth_db, get_company_database_path
+from user_cache import user_cache
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 # Router
 router = APIRouter(tags=["Authentication"])
@@ -93,13 +97,16 @@ def get_current_user(authorization: Optional[str] = Header(None), db: Session =
     if not user_id and not email:
         raise HTTPException(status_code=401, detail="Token invalide")
     
-    # Chercher l'utilisateur par ID ou par email
-    if user_id:
-        user = db.query(Utilisateur).filter(Utilisateur.id_utilisateur == user_id).first()
-    else:
-        user = db.query(Utilisateur).filter(Utilisateur.email == email).first()
+    # Chercher l'utilisateur dans le cache, sinon par ID ou par email
+    user = user_cache.get(user_id, db) if user_id else None
     if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        if user_id:
+            user = db.query(Utilisateur).filter(Utilisateur.id_utilisateur == user_id).first()
+        else:
+            user = db.query(Utilisateur).filter(Utilisateur.email == email).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+        user_cache.put(user)
     
     # Vérifier le statut (sauf pour les utilisateurs en attente qui peuvent rejoindre une compagnie)
     if user.statut not in ["actif", "en_attente"]:
@@ -141,6 +148,7 @@ async def register(data: RegisterRequest, db: Session = Depends(get_auth_db)):
             # Si l'utilisateur existe mais n'est pas vérifié, le supprimer pour permettre une nouvelle inscription
             db.delete(existing_user)
             db.commit()
+            user_cache.invalidate(existing_user.id_utilisateur)
         
         # Valider le mot de passe
         is_valid, error_msg = auth_service.is_strong_password(data.mot_de_passe)
@@ -148,7 +156,7 @@ async def register(data: RegisterRequest, db: Session = Depends(get_auth_db)):
             raise HTTPException(status_code=400, detail=error_msg)
         
         # Hasher le mot de passe
-        hashed_password = auth_service.hash_password(data.mot_de_passe)
+        hashed_password = await auth_service.hash_password_async(data.mot_de_passe)
         
         # Générer un code de vérification
         verification_code = auth_service.generate_verification_code()
@@ -201,7 +209,7 @@ async def register(data: RegisterRequest, db: Session = Depends(get_auth_db)):
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur inscription: {e}")
+        logger.error(f"❌ Erreur inscription: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'inscription: {str(e)}")
 
 @router.post("/verify-email")
@@ -232,6 +240,7 @@ async def verify_email(data: VerifyEmailRequest, db: Session = Depends(get_auth_
         user.code_verification_expiration = None
         
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
         # Générer un token pour l'utilisateur vérifié
         access_token = auth_service.create_access_token(data={"sub": user.email})
@@ -247,7 +256,7 @@ async def verify_email(data: VerifyEmailRequest, db: Session = Depends(get_auth_
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur vérification email: {e}")
+        logger.error(f"❌ Erreur vérification email: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la vérification: {str(e)}")
 
 @router.post("/resend-verification")
@@ -290,7 +299,7 @@ async def resend_verification(email: EmailStr, db: Session = Depends(get_auth_db
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur renvoi code: {e}")
+        logger.error(f"❌ Erreur renvoi code: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors du renvoi du code")
 
 # ==========================================
@@ -310,8 +319,11 @@ async def login(data: LoginRequest, db: Session = Depends(get_auth_db)):
         if not user:
             raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
         
-        # Vérifier le mot de passe
-        if not auth_service.verify_password(data.mot_de_passe, user.mot_de_passe_hash):
+        # Vérifier le mot de passe (dans le pool de hachage), sans garder de connexion
+        # à la base pendant le calcul bcrypt : l'utilisateur est relu ensuite
+        mot_de_passe_hash = user.mot_de_passe_hash
+        db.rollback()
+        if not await auth_service.verify_password_async(data.mot_de_passe, mot_de_passe_hash):
             raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
         
         # Vérifier que l'email est vérifié
@@ -332,17 +344,16 @@ async def login(data: LoginRequest, db: Session = Depends(get_auth_db)):
         if user.statut == "inactif":
             raise HTTPException(status_code=403, detail="Votre compte est inactif")
         
+        # Recalculer le hash si le coût bcrypt configuré a changé
+        if auth_service.password_needs_rehash(user.mot_de_passe_hash):
+            user.mot_de_passe_hash = await auth_service.hash_password_async(data.mot_de_passe)
+        
         # Mettre à jour la dernière connexion
         user.derniere_connexion = datetime.utcnow()
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
-        # Générer les notifications pour cet utilisateur
-        try:
-            from notification_service import generate_notifications_for_user
-            generate_notifications_for_user(db, user)
-        except Exception as e:
-            print(f"⚠️ Erreur génération notifications: {e}")
-            # Ne pas bloquer la connexion si les notifications échouent
+        # Les notifications sont recalculées en arrière-plan (notification_service.NotificationWorker)
         
         # Créer le token JWT
         token_data = {
@@ -364,7 +375,7 @@ async def login(data: LoginRequest, db: Session = Depends(get_auth_db)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur connexion: {e}")
+        logger.error(f"❌ Erreur connexion: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la connexion")
 
 @router.get("/me")
@@ -430,7 +441,7 @@ async def change_email(
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
     # Vérifier le mot de passe actuel
-    if not auth_service.verify_password(data.mot_de_passe, user.mot_de_passe_hash):
+    if not await auth_service.verify_password_async(data.mot_de_passe, user.mot_de_passe_hash):
         raise HTTPException(status_code=401, detail="Mot de passe incorrect")
     
     # Vérifier si le nouvel email est déjà utilisé
@@ -449,13 +460,14 @@ async def change_email(
     user.code_verification_email_expiration = datetime.utcnow() + timedelta(hours=24)
     
     db.commit()
+    user_cache.invalidate(user.id_utilisateur)
     db.refresh(user)
     
     # Envoyer le code de vérification par email
     try:
         email_service.send_verification_email(data.nouveau_email, code)
     except Exception as e:
-        print(f"Erreur lors de l'envoi de l'email de vérification: {e}")
+        logger.warning(f"⚠️ Erreur lors de l'envoi de l'email de vérification: {e}")
         # Ne pas bloquer la mise à jour si l'email échoue
     
     return {
@@ -479,7 +491,7 @@ async def change_password(
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
     
     # Vérifier le mot de passe actuel
-    if not auth_service.verify_password(data.mot_de_passe_actuel, user.mot_de_passe_hash):
+    if not await auth_service.verify_password_async(data.mot_de_passe_actuel, user.mot_de_passe_hash):
         raise HTTPException(status_code=401, detail="Mot de passe actuel incorrect")
     
     # Valider le nouveau mot de passe
@@ -488,10 +500,11 @@ async def change_password(
         raise HTTPException(status_code=400, detail=error_msg)
     
     # Mettre à jour le mot de passe
-    user.mot_de_passe_hash = auth_service.hash_password(data.nouveau_mot_de_passe)
+    user.mot_de_passe_hash = await auth_service.hash_password_async(data.nouveau_mot_de_passe)
     user.date_modification = datetime.utcnow()
     
     db.commit()
+    user_cache.invalidate(user.id_utilisateur)
     
     return {
         "success": True,
@@ -546,6 +559,7 @@ async def setup_company(
             current_user.statut = "actif"  # Approuvé automatiquement car créateur
             
             db.commit()
+            user_cache.invalidate(current_user.id_utilisateur)
             db.refresh(new_company)
             
             # TODO: Créer le schéma PostgreSQL et les tables
@@ -590,6 +604,7 @@ async def setup_company(
             
             db.add(demande)
             db.commit()
+            user_cache.invalidate(current_user.id_utilisateur)
             db.refresh(demande)
             
             # Notifier les admins principaux
@@ -631,7 +646,7 @@ async def setup_company(
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur setup compagnie: {e}")
+        logger.error(f"❌ Erreur setup compagnie: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 @router.get("/companies")
@@ -646,7 +661,7 @@ async def list_companies(db: Session = Depends(get_auth_db)):
             "companies": [c.to_dict() for c in companies]
         }
     except Exception as e:
-        print(f"❌ Erreur liste compagnies: {e}")
+        logger.error(f"❌ Erreur liste compagnies: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors du chargement des compagnies")
 
 # ==========================================
@@ -692,7 +707,7 @@ async def forgot_password(data: PasswordResetRequest, db: Session = Depends(get_
         
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur forgot password: {e}")
+        logger.error(f"❌ Erreur forgot password: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de l'envoi du code")
 
 @router.post("/reset-password")
@@ -720,11 +735,12 @@ async def reset_password(data: PasswordResetConfirm, db: Session = Depends(get_a
             raise HTTPException(status_code=400, detail=error_msg)
         
         # Mettre à jour le mot de passe
-        user.mot_de_passe_hash = auth_service.hash_password(data.nouveau_mot_de_passe)
+        user.mot_de_passe_hash = await auth_service.hash_password_async(data.nouveau_mot_de_passe)
         user.code_reset_mdp = None
         user.code_reset_mdp_expiration = None
         
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
         return {
             "success": True,
@@ -735,7 +751,7 @@ async def reset_password(data: PasswordResetConfirm, db: Session = Depends(get_a
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur reset password: {e}")
+        logger.error(f"❌ Erreur reset password: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la réinitialisation")
 
 # ==========================================
@@ -762,7 +778,7 @@ async def get_pending_requests(
         }
         
     except Exception as e:
-        print(f"❌ Erreur récupération demandes: {e}")
+        logger.error(f"❌ Erreur récupération demandes: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors du chargement des demandes")
 
 @router.post("/approve-request")
@@ -795,6 +811,7 @@ async def approve_request(
             user.statut = "actif"
             
             db.commit()
+            user_cache.invalidate(user.id_utilisateur)
             
             # Envoyer email de confirmation
             email_service.send_approval_notification(
@@ -819,6 +836,7 @@ async def approve_request(
             user.statut = "refuse"
             
             db.commit()
+            user_cache.invalidate(user.id_utilisateur)
             
             # Envoyer email de refus
             email_service.send_rejection_notification(
@@ -841,7 +859,7 @@ async def approve_request(
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur traitement demande: {e}")
+        logger.error(f"❌ Erreur traitement demande: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 
@@ -944,6 +962,7 @@ async def approve_request_email(request_id: int, db: Session = Depends(get_auth_
         user.statut = "actif"
         
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
         # Envoyer email de confirmation
         try:
@@ -956,7 +975,7 @@ async def approve_request_email(request_id: int, db: Session = Depends(get_auth_
             email_sent = True
         except Exception as e:
             email_sent = False
-            print(f"Erreur envoi email: {e}")
+            logger.warning(f"⚠️ Erreur envoi email: {e}")
         
         html_content = f"""
         <html>
@@ -1055,6 +1074,7 @@ async def reject_request_email(request_id: int, db: Session = Depends(get_auth_d
         user.statut = "refuse"
         
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
         html_content = f"""
         <html>
@@ -1122,6 +1142,7 @@ async def approve_user_by_email(data: dict, db: Session = Depends(get_auth_db)):
         user.statut = "actif"
         
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
         # Envoyer email de confirmation
         try:
@@ -1134,7 +1155,7 @@ async def approve_user_by_email(data: dict, db: Session = Depends(get_auth_db)):
             email_sent = True
         except Exception as e:
             email_sent = False
-            print(f"Erreur envoi email: {e}")
+            logger.warning(f"⚠️ Erreur envoi email: {e}")
         
         return {
             "success": True,
@@ -1162,6 +1183,13 @@ async def check_env():
         "FROM_NAME": os.getenv("FROM_NAME")
     }
 
+@router.get("/debug/user-cache")
+async def user_cache_stats():
+    """
+    Compteurs du cache des utilisateurs authentifiés (succès, échecs, invalidations)
+    """
+    return user_cache.stats()
+
 @router.post("/debug/send-test-email")
 async def send_test_email(data: dict):
     """
@@ -1211,6 +1239,7 @@ async def cleanup_pending_users(db: Session = Depends(get_auth_db)):
                 deleted_count += 1
         
         db.commit()
+        user_cache.clear()
         
         return {
             "success": True,
@@ -1243,6 +1272,7 @@ async def cleanup_all_users(db: Session = Depends(get_auth_db)):
                 deleted_count += 1
         
         db.commit()
+        user_cache.clear()
         
         return {
             "success": True,
@@ -1274,6 +1304,7 @@ async def delete_user_by_email(data: dict, db: Session = Depends(get_auth_db)):
         # Supprimer l'utilisateur
         db.delete(user)
         db.commit()
+        user_cache.invalidate(user.id_utilisateur)
         
         return {
             "success": True,
@@ -1334,11 +1365,12 @@ async def create_sacha(db: Session = Depends(get_auth_db)):
         existing = db.query(Utilisateur).filter_by(email="sacha.heroux87@gmail.com").first()
         if existing:
             # Mettre à jour son mot de passe avec le nouveau hash
-            existing.mot_de_passe_hash = auth_service.hash_password("Champion2024!")
+            existing.mot_de_passe_hash = await auth_service.hash_password_async("Champion2024!")
             existing.statut = "actif"
             existing.est_admin_principal = True
             existing.email_verifie = True
             db.commit()
+            user_cache.invalidate(existing.id_utilisateur)
             return {
                 "message": "Sacha existe déjà - mot de passe mis à jour",
                 "user_id": existing.id_utilisateur,
@@ -1354,7 +1386,7 @@ async def create_sacha(db: Session = Depends(get_auth_db)):
         sacha = Utilisateur(
             id_compagnie=company.id_compagnie,
             email="sacha.heroux87@gmail.com",
-            mot_de_passe_hash=auth_service.hash_password("Champion2024!"),
+            mot_de_passe_hash=await auth_service.hash_password_async("Champion2024!"),
             nom="Heroux",
             prenom="Sacha",
             role="admin",
@@ -1413,7 +1445,7 @@ async def get_notifications(
             ).count()
         }
     except Exception as e:
-        print(f"❌ Erreur récupération notifications: {e}")
+        logger.error(f"❌ Erreur récupération notifications: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la récupération des notifications")
 
 @router.put("/notifications/{notification_id}/read")
@@ -1443,7 +1475,7 @@ async def mark_notification_read(
         raise
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur marquer notification lue: {e}")
+        logger.error(f"❌ Erreur marquer notification lue: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la mise à jour")
 
 @router.put("/notifications/read-all")
@@ -1466,6 +1498,6 @@ async def mark_all_notifications_read(
         }
     except Exception as e:
         db.rollback()
-        print(f"❌ Erreur marquer toutes notifications lues: {e}")
+        logger.error(f"❌ Erreur marquer toutes notifications lues: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la mise à jour")
 
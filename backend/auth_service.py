@@ -4,19 +4,29 @@ Service d'authentification pour Interface CAH
 Gestion JWT, bcrypt, codes de vérification
 """
 
+import asyncio
 import os
 import secrets
 import string
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production-12345")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30  # Token valide 30 jours (session persistante)
 
+# Coût bcrypt (2^rounds itérations) ; les hashs d'un autre coût sont recalculés à la connexion
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Nombre de hachages bcrypt exécutés en parallèle
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
 
 # ==========================================
 # GESTION DES MOTS DE PASSE
@@ -24,12 +34,12 @@ ACCESS_TOKEN_EXPIRE_DAYS = 30  # Token valide 30 jours (session persistante)
 
 def hash_password(password: str) -> str:
     """
-    Hasher un mot de passe avec bcrypt directement
+    Hasher un mot de passe avec bcrypt directement (coût BCRYPT_ROUNDS)
     Limite à 72 bytes pour compatibilité bcrypt
     """
     # Bcrypt a une limite de 72 bytes
     password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -44,6 +54,34 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Indiquer si un hash a été calculé avec un autre coût que BCRYPT_ROUNDS
+    (format bcrypt : $2b$<coût>$<sel+hash>)
+    """
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+# bcrypt libère le GIL pendant le calcul : un pool de threads borné suffit à
+# paralléliser les hachages sans bloquer la boucle d'événements des routes async
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def hash_password_async(password: str) -> str:
+    """hash_password exécuté dans le pool de hachage"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password exécuté dans le pool de hachage"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
+
 # ==========================================
 # GESTION DES TOKENS JWT
 # ==========================================
@@ -86,7 +124,7 @@ def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError as e:
-        print(f"❌ Erreur décodage JWT: {e}")
+        logger.error(f"❌ Erreur décodage JWT: {e}")
         return None
 
 
@@ -247,31 +285,31 @@ def calculate_age(date_naissance: datetime) -> int:
 
 if __name__ == "__main__":
     # Tests rapides
-    print("🧪 Tests du service d'authentification")
+    logger.info("🧪 Tests du service d'authentification")
     
     # Test hash password
     password = "Champion2024!"
     hashed = hash_password(password)
-    print(f"✅ Hash: {hashed[:50]}...")
-    print(f"✅ Vérification: {verify_password(password, hashed)}")
+    logger.info(f"✅ Hash: {hashed[:50]}...")
+    logger.info(f"✅ Vérification: {verify_password(password, hashed)}")
     
     # Test JWT
     token = create_access_token({"user_id": 1, "company_id": 1, "role": "admin"})
-    print(f"✅ Token: {token[:50]}...")
+    logger.info(f"✅ Token: {token[:50]}...")
     decoded = decode_access_token(token)
-    print(f"✅ Décodé: {decoded}")
+    logger.info(f"✅ Décodé: {decoded}")
     
     # Test codes
     code_email = generate_verification_code()
     code_reset = generate_reset_code()
-    print(f"✅ Code email: {code_email}")
-    print(f"✅ Code reset: {code_reset}")
+    logger.info(f"✅ Code email: {code_email}")
+    logger.info(f"✅ Code reset: {code_reset}")
     
     # Test validation password
     valid, msg = is_strong_password("Champion2024!")
-    print(f"✅ Password valide: {valid} - {msg}")
+    logger.info(f"✅ Password valide: {valid} - {msg}")
     
     # Test schema name
     schema = sanitize_schema_name("CAH Immobilier Inc.")
-    print(f"✅ Schema name: {schema}")
+    logger.info(f"✅ Schema name: {schema}")
 
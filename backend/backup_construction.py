@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 """
 Script de sauvegarde automatique des données construction
+
+La base est copiée en ligne (API de sauvegarde SQLite) puis ajoutée au dépôt
+de sauvegardes incrémentales partagé avec la base principale : seuls les blocs
+modifiés depuis la sauvegarde précédente sont écrits.
 """
 
 import os
-import shutil
 import sqlite3
-from datetime import datetime
+import tempfile
+
+from backup_repository import BackupRepository
 
 def backup_construction_database():
     """Sauvegarder la base de données construction"""
@@ -19,24 +24,30 @@ def backup_construction_database():
     # Créer le dossier de sauvegarde
     os.makedirs(backup_dir, exist_ok=True)
     
-    # Nom du fichier de sauvegarde
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_path = os.path.join(backup_dir, f'construction_backup_{timestamp}.db')
-    
+    fd, snapshot_path = tempfile.mkstemp(dir=backup_dir, prefix='.snapshot_construction_', suffix='.db')
+    os.close(fd)
     try:
-        # Copier la base de données
-        shutil.copy2(db_path, backup_path)
-        print(f"✅ Sauvegarde créée: {backup_path}")
+        # Copie cohérente même pendant des écritures
+        source = sqlite3.connect(db_path)
+        destination = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+        
+        repository = BackupRepository(os.path.join(backup_dir, 'repository'))
+        snapshot = repository.add_snapshot(snapshot_path, 'manual', database='construction')
+        print(f"✅ Sauvegarde créée: {snapshot['id']} ({snapshot['new_chunks']} bloc(s) nouveau(x) sur {snapshot['chunks']})")
         
-        # Garder seulement les 5 dernières sauvegardes
-        backups = sorted([f for f in os.listdir(backup_dir) if f.startswith('construction_backup_')])
-        if len(backups) > 5:
-            for old_backup in backups[:-5]:
-                os.remove(os.path.join(backup_dir, old_backup))
-                print(f"🗑️ Ancienne sauvegarde supprimée: {old_backup}")
+        # Rétention commune aux sauvegardes du dépôt
+        for old_backup in repository.apply_retention():
+            print(f"🗑️ Ancienne sauvegarde supprimée: {old_backup}")
                 
     except Exception as e:
         print(f"❌ Erreur sauvegarde: {e}")
+    finally:
+        os.remove(snapshot_path)
 
 if __name__ == "__main__":
     backup_construction_database()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Dépôt de sauvegardes incrémentales, dédupliquées par contenu
+
+Une copie de la base (snapshot_database) est découpée en blocs de taille fixe,
+alignés sur les pages SQLite. Chaque bloc est compressé et rangé par son
+empreinte SHA-256 : un bloc identique d'une sauvegarde à l'autre n'est stocké
+qu'une fois, et une nouvelle sauvegarde n'écrit que les blocs modifiés.
+
+SQLite modifie les pages en place (une insertion ne décale pas le reste du
+fichier) : des blocs fixes alignés sur les pages suffisent, sans découpage à
+empreinte glissante.
+
+    repository/
+        chunks/ab/abcdef...   blocs compressés (zlib)
+        snapshots/<id>.json   manifeste d'une sauvegarde (liste ordonnée des blocs)
+        index.json            résumé de toutes les sauvegardes (sans les blocs) et
+                              totaux des blocs stockés, tenus à jour à chaque écriture
+
+Les sauvegardes anciennes sont éclaircies selon une politique de rétention
+(horaire, quotidienne, hebdomadaire, mensuelle), puis les blocs qui ne sont
+plus référencés sont supprimés.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+BACKUP_CHUNK_KB = int(os.environ.get("BACKUP_CHUNK_KB", "256"))
+BACKUP_COMPRESSION_LEVEL = int(os.environ.get("BACKUP_COMPRESSION_LEVEL", "6"))
+
+# Rétention : nombre de périodes pour lesquelles la sauvegarde la plus récente est conservée
+BACKUP_RETENTION = {
+    "hourly": int(os.environ.get("BACKUP_KEEP_HOURLY", "24")),
+    "daily": int(os.environ.get("BACKUP_KEEP_DAILY", "7")),
+    "weekly": int(os.environ.get("BACKUP_KEEP_WEEKLY", "4")),
+    "monthly": int(os.environ.get("BACKUP_KEEP_MONTHLY", "6")),
+    # Sauvegardes manuelles et de sécurité (avant restauration) : les N plus récentes
+    "manual": int(os.environ.get("BACKUP_KEEP_MANUAL", "10")),
+}
+
+# Période d'une sauvegarde pour chaque règle de rétention
+RETENTION_PERIODS: Dict[str, Callable[[datetime], Any]] = {
+    "hourly": lambda date: (date.year, date.month, date.day, date.hour),
+    "daily": lambda date: (date.year, date.month, date.day),
+    "weekly": lambda date: tuple(date.isocalendar()[:2]),
+    "monthly": lambda date: (date.year, date.month),
+}
+
+
+def _page_size(path: str) -> int:
+    """Taille de page lue dans l'en-tête SQLite (octets 16-17, 1 signifiant 65536)"""
+    with open(path, "rb") as f:
+        header = f.read(100)
+    if len(header) < 18 or not header.startswith(b"SQLite format 3\x00"):
+        return 4096
+    value = int.from_bytes(header[16:18], "big")
+    return 65536 if value == 1 else value
+
+
+def _write_atomic(path: Path, data: bytes):
+    """Écrire un fichier via un fichier temporaire renommé : jamais de fichier partiel"""
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+class BackupRepository:
+    """Sauvegardes découpées en blocs adressés par contenu, avec index des manifestes"""
+
+    def __init__(self, root: str, chunk_kb: int = BACKUP_CHUNK_KB,
+                 compression_level: int = BACKUP_COMPRESSION_LEVEL):
+        self.root = Path(root)
+        self.chunk_size = chunk_kb * 1024
+        self.compression_level = compression_level
+        self.chunks_dir = self.root / "chunks"
+        self.snapshots_dir = self.root / "snapshots"
+        self.index_path = self.root / "index.json"
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+
+    def _chunk_path(self, sha256: str) -> Path:
+        return self.chunks_dir / sha256[:2] / sha256
+
+    # ------------------------------------------------------------------
+    # Index des sauvegardes
+    # ------------------------------------------------------------------
+
+    def _read_index(self) -> Dict[str, Any]:
+        """Index : {"snapshots", "stored_chunks", "stored_bytes"} (appelé sous verrou)"""
+        if not self.index_path.exists():
+            index = {"snapshots": []}
+        else:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        if "stored_bytes" not in index:
+            # Index sans totaux (version 1) : blocs comptés une fois, puis tenus à jour
+            sizes = [path.stat().st_size for path in self.chunks_dir.glob("*/*") if not path.name.startswith(".tmp_")]
+            index["stored_chunks"], index["stored_bytes"] = len(sizes), sum(sizes)
+            if index["snapshots"]:
+                self._write_index(index)
+        return index
+
+    def _write_index(self, index: Dict[str, Any]):
+        snapshots = sorted(index["snapshots"], key=lambda snapshot: snapshot["created_at"], reverse=True)
+        _write_atomic(self.index_path, json.dumps({
+            "version": 2,
+            "snapshots": snapshots,
+            "stored_chunks": index["stored_chunks"],
+            "stored_bytes": index["stored_bytes"]
+        }, indent=2, ensure_ascii=False).encode("utf-8"))
+
+    def list_snapshots(self, database: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Résumé des sauvegardes, de la plus récente à la plus ancienne (lu dans l'index)"""
+        with self._lock:
+            snapshots = self._read_index()["snapshots"]
+        return [snapshot for snapshot in snapshots if database is None or snapshot["database"] == database]
+
+    def get_manifest(self, snapshot_id: str) -> Optional[Dict[str, Any]]:
+        """Manifeste complet d'une sauvegarde (None si inconnue)"""
+        path = self.snapshots_dir / f"{os.path.basename(snapshot_id)}.json"
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def find_snapshot(self, at: datetime, database: str = "cah") -> Optional[Dict[str, Any]]:
+        """Sauvegarde la plus récente prise au plus tard à la date donnée (restauration à un instant)"""
+        for snapshot in self.list_snapshots(database):
+            if datetime.fromisoformat(snapshot["created_at"]) <= at:
+                return snapshot
+        return None
+
+    # ------------------------------------------------------------------
+    # Écriture et lecture des sauvegardes
+    # ------------------------------------------------------------------
+
+    def add_snapshot(self, snapshot_path: str, backup_type: str, database: str = "cah",
+                     metadata: Optional[Dict[str, Any]] = None, created_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Ajouter une copie de la base au dépôt (seuls les blocs nouveaux sont écrits)
+
+        Args:
+            snapshot_path: Copie cohérente de la base (fichier SQLite)
+            backup_type: Type de sauvegarde ('manual', 'hourly', 'daily', 'before_restore', ...)
+            database: Base sauvegardée (la rétention s'applique par base)
+            metadata: Informations ajoutées au manifeste (statistiques de la copie, ...)
+            created_at: Date de la copie (par défaut : maintenant) ; détermine l'identifiant
+
+        Returns:
+            Résumé de la sauvegarde (entrée de l'index)
+        """
+        created_at = created_at or datetime.now()
+        page_size = _page_size(snapshot_path)
+        # Blocs alignés sur les pages : une page modifiée ne change qu'un bloc
+        chunk_size = max(page_size, self.chunk_size // page_size * page_size)
+
+        digest = hashlib.sha256()
+        chunks, new_chunks, new_bytes, size = [], 0, 0, 0
+        with self._lock, open(snapshot_path, "rb") as f:
+            # Lu avant d'écrire les blocs : totaux d'un index version 1 comptés sans eux
+            index = self._read_index()
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                digest.update(data)
+                size += len(data)
+                sha256 = hashlib.sha256(data).hexdigest()
+                chunks.append(sha256)
+                path = self._chunk_path(sha256)
+                if not path.exists():
+                    compressed = zlib.compress(data, self.compression_level)
+                    path.parent.mkdir(exist_ok=True)
+                    _write_atomic(path, compressed)
+                    new_chunks += 1
+                    new_bytes += len(compressed)
+
+            snapshot_id = f"{database}_{backup_type}_{created_at.strftime('%Y%m%d_%H%M%S_%f')}"
+            summary = {
+                "id": snapshot_id,
+                "database": database,
+                "backup_type": backup_type,
+                "created_at": created_at.isoformat(),
+                "size": size,
+                "sha256": digest.hexdigest(),
+                "chunks": len(chunks),
+                "new_chunks": new_chunks,
+                "stored_bytes": new_bytes,
+            }
+            manifest = {**summary, "page_size": page_size, "chunk_size": chunk_size,
+                        "chunk_list": chunks, "metadata": metadata or {}}
+            _write_atomic(self.snapshots_dir / f"{snapshot_id}.json",
+                          json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+            index["snapshots"].append(summary)
+            index["stored_chunks"] += new_chunks
+            index["stored_bytes"] += new_bytes
+            self._write_index(index)
+
+        logger.info(f"💾 Sauvegarde {snapshot_id} : {len(chunks)} bloc(s), {new_chunks} nouveau(x), "
+                    f"{new_bytes / 1024:.0f} ko écrits pour {size / 1024 / 1024:.1f} Mo")
+        return summary
+
+    def restore_to(self, snapshot_id: str, destination: str) -> Dict[str, Any]:
+        """
+        Reconstruire une sauvegarde dans un fichier (empreinte de chaque bloc et du fichier vérifiée)
+
+        Raises:
+            ValueError si la sauvegarde est inconnue ou si un bloc est absent ou corrompu
+        """
+        manifest = self.get_manifest(snapshot_id)
+        if manifest is None:
+            raise ValueError(f"Sauvegarde inconnue : {snapshot_id}")
+
+        digest = hashlib.sha256()
+        with open(destination, "wb") as out:
+            for sha256 in manifest["chunk_list"]:
+                path = self._chunk_path(sha256)
+                if not path.exists():
+                    raise ValueError(f"Bloc manquant dans la sauvegarde {snapshot_id} : {sha256}")
+                with open(path, "rb") as f:
+                    try:
+                        data = zlib.decompress(f.read())
+                    except zlib.error:
+                        data = None
+                if data is None or hashlib.sha256(data).hexdigest() != sha256:
+                    raise ValueError(f"Bloc corrompu dans la sauvegarde {snapshot_id} : {sha256}")
+                digest.update(data)
+                out.write(data)
+        if digest.hexdigest() != manifest["sha256"]:
+            raise ValueError(f"Empreinte de la sauvegarde {snapshot_id} invalide")
+        return manifest
+
+    # ------------------------------------------------------------------
+    # Rétention et nettoyage
+    # ------------------------------------------------------------------
+
+    def apply_retention(self, retention: Optional[Dict[str, int]] = None, now: Optional[datetime] = None) -> List[str]:
+        """
+        Supprimer les sauvegardes qu'aucune règle de rétention ne conserve, puis les blocs orphelins
+
+        Pour chaque règle (ex. daily=7), la sauvegarde planifiée la plus récente
+        de chacune des N dernières périodes ayant une sauvegarde est conservée ;
+        les sauvegardes d'un autre type (manual, before_restore...) sont conservées
+        selon la règle "manual" (les N plus récentes), et la plus récente de
+        chaque base l'est toujours.
+
+        Returns:
+            Identifiants des sauvegardes supprimées
+        """
+        retention = retention or BACKUP_RETENTION
+        with self._lock:
+            index = self._read_index()
+            snapshots = index["snapshots"]
+            keep = set()
+            for database in {snapshot["database"] for snapshot in snapshots}:
+                ordered = [snapshot for snapshot in snapshots if snapshot["database"] == database]
+                keep.add(ordered[0]["id"])
+                scheduled = [snapshot for snapshot in ordered if snapshot["backup_type"] in RETENTION_PERIODS]
+                others = [snapshot for snapshot in ordered if snapshot["backup_type"] not in RETENTION_PERIODS]
+                keep.update(snapshot["id"] for snapshot in others[:retention.get("manual", 0)])
+                for rule, count in retention.items():
+                    if rule not in RETENTION_PERIODS:
+                        continue
+                    periods = set()
+                    for snapshot in scheduled:
+                        period = RETENTION_PERIODS[rule](datetime.fromisoformat(snapshot["created_at"]))
+                        if period in periods:
+                            continue
+                        if len(periods) >= count:
+                            break
+                        periods.add(period)
+                        keep.add(snapshot["id"])
+
+            removed = [snapshot["id"] for snapshot in snapshots if snapshot["id"] not in keep]
+            if not removed:
+                return []
+            index["snapshots"] = [snapshot for snapshot in snapshots if snapshot["id"] in keep]
+            self._write_index(index)
+            for snapshot_id in removed:
+                (self.snapshots_dir / f"{snapshot_id}.json").unlink(missing_ok=True)
+            freed, freed_bytes = self._collect_garbage()
+            index["stored_chunks"] -= freed
+            index["stored_bytes"] -= freed_bytes
+            self._write_index(index)
+
+        logger.info(f"🗑️ {len(removed)} sauvegarde(s) expirée(s) supprimée(s), {freed} bloc(s) libéré(s)")
+        return removed
+
+    def _collect_garbage(self) -> Tuple[int, int]:
+        """Supprimer les blocs qu'aucun manifeste ne référence (appelé sous verrou) -> (blocs, octets)"""
+        referenced = set()
+        for path in self.snapshots_dir.glob("*.json"):
+            with open(path, "r", encoding="utf-8") as f:
+                referenced.update(json.load(f)["chunk_list"])
+        freed, freed_bytes = 0, 0
+        for path in self.chunks_dir.glob("*/*"):
+            if path.name not in referenced and not path.name.startswith(".tmp_"):
+                freed_bytes += path.stat().st_size
+                path.unlink()
+                freed += 1
+        return freed, freed_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        """Nombre de sauvegardes, taille logique cumulée et taille réellement stockée (lus dans l'index)"""
+        with self._lock:
+            index = self._read_index()
+        logical = sum(snapshot["size"] for snapshot in index["snapshots"])
+        stored = index["stored_bytes"]
+        return {
+            "snapshots": len(index["snapshots"]),
+            "logical_bytes": logical,
+            "stored_chunks": index["stored_chunks"],
+            "stored_bytes": stored,
+            "deduplication_ratio": round(logical / stored, 2) if stored else None
+        }
@@ -1,20 +1,185 @@
 #!/usr/bin/env python3
 """
 Service de sauvegarde automatique pour Interface CAH
+
+Les sauvegardes sont des copies cohérentes de la base ouverte, prises sans
+arrêter l'application :
+- API de sauvegarde en ligne de SQLite (BACKUP_METHOD=backup, par défaut) ou
+  VACUUM INTO (BACKUP_METHOD=vacuum : copie compactée, plus lente) ;
+- copie vérifiée par PRAGMA integrity_check avant d'être conservée ;
+- copie ajoutée au dépôt incrémental (backup_repository.py) dans un thread
+  dédié, une fois la base libérée : seuls les blocs modifiés sont écrits.
+
+Une restauration reconstruit la sauvegarde dans un fichier temporaire, le
+valide contre les modèles, puis le met en place d'un seul renommage et recrée
+le pool de connexions (restore_backup).
 """
 
 import os
 import shutil
 import gzip
 import json
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 import schedule
 import time
 import threading
 from pathlib import Path
 
-from database import db_manager, DATABASE_PATH
+from database import db_manager, connection_gate, DATABASE_PATH
+from backup_repository import BackupRepository
+from schema_cache import schema_cache
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+BACKUP_METHOD = os.environ.get("BACKUP_METHOD", "backup")
+# Pages copiées par étape (hors mode WAL) et pause entre deux étapes
+BACKUP_PAGES_PER_STEP = int(os.environ.get("BACKUP_PAGES_PER_STEP", "1024"))
+BACKUP_STEP_SLEEP = float(os.environ.get("BACKUP_STEP_SLEEP_MS", "5")) / 1000
+# Copie par étapes recommencée trop souvent (écritures continues) : terminée en une étape
+BACKUP_MAX_RESTARTS = int(os.environ.get("BACKUP_MAX_RESTARTS", "3"))
+# Attente maximale des autres connexions avant le remplacement de la base lors d'une restauration
+RESTORE_LOCK_TIMEOUT = float(os.environ.get("RESTORE_LOCK_TIMEOUT", "10"))
+
+
+class _BackupRestarted(Exception):
+    """Interrompt une copie par étapes qui recommence sans cesse"""
+
+
+def snapshot_database(destination: str, source_path: Optional[str] = None, method: str = BACKUP_METHOD,
+                      pages: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Copier une base SQLite en cours d'utilisation dans un fichier cohérent
+
+    Une copie brute du fichier n'inclut pas les transactions encore dans le
+    journal WAL (cah_database.db-wal) et peut capturer une écriture à moitié
+    faite. Ici :
+    - method="backup" : API de sauvegarde en ligne. En mode WAL, la copie se
+      fait dans une seule transaction de lecture, qui ne bloque pas les
+      écritures et ne recommence jamais. Sinon elle avance par lots de
+      `pages` pages et les écritures passent entre deux lots ; une écriture
+      d'une autre connexion fait recommencer la copie ("restarts") et, au-delà
+      de BACKUP_MAX_RESTARTS, la copie est terminée en une seule étape.
+    - method="vacuum" : VACUUM INTO, une transaction de lecture qui produit
+      une copie compactée (sans pages libres).
+
+    Args:
+        destination: Fichier à créer (ne doit pas exister pour VACUUM INTO)
+        source_path: Base à copier (par défaut : DATABASE_PATH)
+        method: "backup" ou "vacuum"
+        pages: Pages par étape (par défaut : tout d'un coup en mode WAL, sinon BACKUP_PAGES_PER_STEP)
+
+    Returns:
+        {"method", "pages_per_step", "steps", "restarts", "duration", "size"}
+    """
+    source_path = source_path or DATABASE_PATH
+    start = time.perf_counter()
+    source = sqlite3.connect(source_path, timeout=30.0)
+    stats = {"method": method, "pages_per_step": None, "steps": 1, "restarts": 0}
+    try:
+        if method == "vacuum":
+            source.execute("VACUUM INTO ?", (destination,))
+        elif method == "backup":
+            if pages is None:
+                journal_mode = source.execute("PRAGMA journal_mode").fetchone()[0]
+                pages = -1 if journal_mode.lower() == "wal" else BACKUP_PAGES_PER_STEP
+            stats["pages_per_step"] = pages
+            last_remaining = [None]
+            
+            def progress(status, remaining, total):
+                stats["steps"] += 1
+                if last_remaining[0] is not None and remaining > last_remaining[0]:
+                    stats["restarts"] += 1
+                    if stats["restarts"] > BACKUP_MAX_RESTARTS:
+                        raise _BackupRestarted()
+                last_remaining[0] = remaining
+            
+            target = sqlite3.connect(destination)
+            try:
+                stats["steps"] = 0
+                try:
+                    source.backup(target, pages=pages, progress=progress, sleep=BACKUP_STEP_SLEEP)
+                except _BackupRestarted:
+                    logger.warning(f"⚠️ Copie recommencée {stats['restarts']} fois : terminée en une étape")
+                    stats["steps"] += 1
+                    source.backup(target, pages=-1)
+            finally:
+                target.close()
+        else:
+            raise ValueError(f"Méthode de sauvegarde inconnue : {method} (backup ou vacuum)")
+    finally:
+        source.close()
+    
+    # La copie hérite du mode WAL : la repasser en fichier unique autonome
+    target = sqlite3.connect(destination)
+    try:
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+    
+    stats["duration"] = round(time.perf_counter() - start, 3)
+    stats["size"] = os.path.getsize(destination)
+    return stats
+
+
+def check_integrity(path: str, quick: bool = False) -> Tuple[bool, str]:
+    """PRAGMA integrity_check (ou quick_check) sur une copie de la base -> (ok, message)"""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check").fetchall()
+    finally:
+        connection.close()
+    message = "; ".join(row[0] for row in rows[:10])
+    return message == "ok", message
+
+
+def validate_database(path: str) -> Tuple[bool, str]:
+    """
+    Vérifier qu'un fichier peut remplacer la base : quick_check, puis tables
+    et colonnes des modèles (partie locative et construction, même fichier)
+    -> (ok, message)
+
+    Une table manquante rend le fichier invalide ; une colonne manquante est
+    seulement signalée (les lectures s'adaptent aux colonnes existantes, voir
+    schema_cache.py).
+    """
+    from models_francais import Base
+    from models_construction import ConstructionBase
+    model_tables = {**Base.metadata.tables, **ConstructionBase.metadata.tables}
+    
+    try:
+        ok, message = check_integrity(path, quick=True)
+    except sqlite3.DatabaseError as e:
+        return False, f"Fichier illisible : {e}"
+    if not ok:
+        return False, f"quick_check en échec : {message}"
+    
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing_columns = {}
+        for name, table in model_tables.items():
+            if name not in tables:
+                continue
+            existing = {row[1] for row in connection.execute(f'PRAGMA table_info("{name}")')}
+            missing = [column.name for column in table.columns if column.name not in existing]
+            if missing:
+                missing_columns[name] = missing
+    finally:
+        connection.close()
+    
+    missing_tables = sorted(set(model_tables) - tables)
+    if missing_tables:
+        return False, f"Tables manquantes : {', '.join(missing_tables)}"
+    if missing_columns:
+        logger.warning(f"⚠️ Colonnes absentes de la sauvegarde : {missing_columns}")
+    return True, f"{len(model_tables)} tables vérifiées"
+
 
 class BackupService:
     """Service de sauvegarde automatique de la base de données"""
@@ -22,262 +187,279 @@ class BackupService:
     def __init__(self, backup_dir: str = "./backups"):
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(exist_ok=True)
-        self.max_backups = 30  # Garder 30 sauvegardes maximum
-        self.compression_enabled = True
+        # Sauvegardes incrémentales (blocs dédupliqués), éclaircies selon BACKUP_RETENTION
+        self.repository = BackupRepository(str(self.backup_dir / "repository"))
         self.running = False
         self.backup_thread = None
+        # Découpage et compression hors du thread appelant, une sauvegarde à la fois
+        self._compression_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup-gzip")
         
-    def create_backup(self, backup_type: str = "manual") -> Optional[str]:
+    def create_backup(self, backup_type: str = "manual", wait: bool = True) -> Optional[str]:
         """
         Créer une sauvegarde de la base de données
         
+        La copie cohérente (snapshot_database) est vérifiée par integrity_check,
+        puis ajoutée au dépôt dans le thread de compression : seuls les blocs
+        modifiés depuis les sauvegardes précédentes sont compressés et écrits.
+        
         Args:
-            backup_type: Type de sauvegarde ('manual', 'scheduled', 'before_migration')
+            backup_type: Type de sauvegarde ('manual', 'hourly', 'daily', 'before_migration', ...)
+            wait: Attendre l'ajout au dépôt (sinon la sauvegarde est listée une fois écrite)
         
         Returns:
-            Chemin vers le fichier de sauvegarde créé, ou None en cas d'erreur
+            Identifiant de la sauvegarde, ou None en cas d'erreur
         """
+        snapshot_path = None
         try:
             # Vérifier que la base de données existe
             if not os.path.exists(DATABASE_PATH):
-                print(f"❌ Base de données non trouvée : {DATABASE_PATH}")
+                logger.error(f"❌ Base de données non trouvée : {DATABASE_PATH}")
                 return None
             
-            # Créer le nom du fichier de sauvegarde
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"cah_backup_{backup_type}_{timestamp}.db"
-            
-            if self.compression_enabled:
-                backup_filename += ".gz"
+            created_at = datetime.now()
+            snapshot_id = f"cah_{backup_type}_{created_at.strftime('%Y%m%d_%H%M%S_%f')}"
             
-            backup_path = self.backup_dir / backup_filename
+            # Copie cohérente de la base ouverte
+            snapshot_path = self.backup_dir / f".snapshot_{snapshot_id}.db"
+            stats = snapshot_database(str(snapshot_path))
             
-            # Créer la sauvegarde
-            if self.compression_enabled:
-                # Sauvegarde compressée
-                with open(DATABASE_PATH, 'rb') as f_in:
-                    with gzip.open(backup_path, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-            else:
-                # Sauvegarde simple
-                shutil.copy2(DATABASE_PATH, backup_path)
-            
-            # Vérifier la sauvegarde
-            if self._verify_backup(backup_path):
-                print(f"✅ Sauvegarde créée : {backup_path}")
-                
-                # Nettoyer les anciennes sauvegardes
-                self._cleanup_old_backups()
-                
-                # Créer un fichier de métadonnées
-                self._create_backup_metadata(backup_path, backup_type)
-                
-                return str(backup_path)
-            else:
-                print(f"❌ Échec de la vérification de la sauvegarde : {backup_path}")
-                if backup_path.exists():
-                    backup_path.unlink()
+            ok, message = check_integrity(str(snapshot_path))
+            if not ok:
+                logger.error(f"❌ Copie de la base corrompue ({message}) : sauvegarde abandonnée")
+                snapshot_path.unlink()
                 return None
+            logger.info(f"📸 Copie de la base : {stats['size'] / 1024 / 1024:.1f} Mo en {stats['duration']} s "
+                        f"({stats['method']}, {stats['steps']} étape(s))")
+            
+            future = self._compression_executor.submit(
+                self._finish_backup, snapshot_path, backup_type, stats, created_at
+            )
+            snapshot_path = None  # Le thread de compression s'en charge
+            if not wait:
+                return snapshot_id
+            return snapshot_id if future.result() else None
                 
         except Exception as e:
-            print(f"❌ Erreur lors de la création de la sauvegarde : {e}")
+            logger.error(f"❌ Erreur lors de la création de la sauvegarde : {e}")
+            if snapshot_path is not None and snapshot_path.exists():
+                snapshot_path.unlink()
             return None
     
-    def _verify_backup(self, backup_path: Path) -> bool:
-        """Vérifier l'intégrité d'une sauvegarde"""
+    def _finish_backup(self, snapshot_path: Path, backup_type: str, stats: Dict[str, Any],
+                       created_at: datetime) -> bool:
+        """Ajouter une copie vérifiée au dépôt, puis appliquer la rétention (thread de compression)"""
         try:
-            if not backup_path.exists():
-                return False
-            
-            # Vérifier la taille du fichier
-            if backup_path.stat().st_size == 0:
-                return False
-            
-            # Si c'est compressé, essayer de le décompresser
-            if backup_path.suffix == '.gz':
-                with gzip.open(backup_path, 'rb') as f:
-                    # Lire quelques octets pour vérifier que c'est valide
-                    f.read(1024)
+            start = time.perf_counter()
+            summary = self.repository.add_snapshot(
+                str(snapshot_path), backup_type, database="cah", created_at=created_at,
+                metadata={"database_path": str(DATABASE_PATH), "integrity_check": "ok", "snapshot": stats}
+            )
+            logger.info(f"✅ Sauvegarde créée : {summary['id']} ({time.perf_counter() - start:.2f} s)")
             
+            # Éclaircir les anciennes sauvegardes
+            self.repository.apply_retention()
             return True
-            
         except Exception as e:
-            print(f"❌ Erreur lors de la vérification : {e}")
+            logger.error(f"❌ Erreur lors de l'écriture de la sauvegarde : {e}")
             return False
+        finally:
+            snapshot_path.unlink(missing_ok=True)
     
-    def _create_backup_metadata(self, backup_path: Path, backup_type: str):
-        """Créer un fichier de métadonnées pour la sauvegarde"""
-        try:
-            metadata = {
-                "backup_type": backup_type,
-                "created_at": datetime.now().isoformat(),
-                "database_path": str(DATABASE_PATH),
-                "backup_size": backup_path.stat().st_size,
-                "compressed": self.compression_enabled,
-                "version": "1.0.0"
-            }
-            
-            metadata_path = backup_path.with_suffix('.json')
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, ensure_ascii=False)
-                
-        except Exception as e:
-            print(f"⚠️ Erreur lors de la création des métadonnées : {e}")
-    
-    def _cleanup_old_backups(self):
-        """Nettoyer les anciennes sauvegardes pour ne garder que les plus récentes"""
+    def _materialize_backup(self, backup_id: Optional[str], at: Optional[datetime]) -> Tuple[str, str]:
+        """
+        Reconstruire une sauvegarde dans un fichier temporaire à côté de la base
+        
+        Accepte un identifiant du dépôt, une date (sauvegarde la plus récente à
+        cette date) ou le chemin d'une ancienne sauvegarde complète (.db, .db.gz).
+        
+        Returns:
+            (chemin du fichier reconstruit, description de la sauvegarde)
+        """
+        if at is not None:
+            snapshot = self.repository.find_snapshot(at)
+            if snapshot is None:
+                raise ValueError(f"Aucune sauvegarde antérieure au {at.isoformat()}")
+            backup_id = snapshot["id"]
+        
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(DATABASE_PATH), prefix=".restore_", suffix=".db")
+        os.close(fd)
         try:
-            # Lister tous les fichiers de sauvegarde
-            backup_files = []
-            for file_path in self.backup_dir.glob("cah_backup_*.db*"):
-                if file_path.is_file():
-                    backup_files.append((file_path.stat().st_mtime, file_path))
+            if self.repository.get_manifest(backup_id) is not None:
+                self.repository.restore_to(backup_id, temp_path)
+                return temp_path, backup_id
             
-            # Trier par date de modification (plus récent en premier)
-            backup_files.sort(key=lambda x: x[0], reverse=True)
-            
-            # Supprimer les anciennes sauvegardes
-            if len(backup_files) > self.max_backups:
-                for _, file_path in backup_files[self.max_backups:]:
-                    try:
-                        file_path.unlink()
-                        # Supprimer aussi le fichier de métadonnées
-                        metadata_path = file_path.with_suffix('.json')
-                        if metadata_path.exists():
-                            metadata_path.unlink()
-                        print(f"🗑️ Ancienne sauvegarde supprimée : {file_path.name}")
-                    except Exception as e:
-                        print(f"⚠️ Erreur lors de la suppression de {file_path.name} : {e}")
-                        
-        except Exception as e:
-            print(f"⚠️ Erreur lors du nettoyage des sauvegardes : {e}")
+            legacy_path = Path(backup_id)
+            if not legacy_path.exists():
+                raise ValueError(f"Sauvegarde non trouvée : {backup_id}")
+            if legacy_path.suffix == '.gz':
+                with gzip.open(legacy_path, 'rb') as f_in:
+                    with open(temp_path, 'wb') as f_out:
+                        shutil.copyfileobj(f_in, f_out)
+            else:
+                shutil.copyfile(legacy_path, temp_path)
+            return temp_path, str(legacy_path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
     
-    def restore_backup(self, backup_path: str) -> bool:
+    def restore_backup(self, backup_path: Optional[str] = None, at: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
         """
-        Restaurer une sauvegarde
+        Restaurer une sauvegarde sans servir de base à moitié écrite
+        
+        1. La sauvegarde est reconstruite dans un fichier temporaire à côté de la base ;
+        2. ce fichier est validé (quick_check, tables et colonnes des modèles) ;
+        3. une sauvegarde de sécurité de la base courante est prise ;
+        4. le fichier remplace la base d'un seul renommage (voir _swap_database),
+           puis le pool de connexions est recréé.
+        La base courante n'est pas modifiée si une étape échoue.
         
         Args:
-            backup_path: Chemin vers le fichier de sauvegarde
+            backup_path: Identifiant d'une sauvegarde du dépôt (ou chemin d'une ancienne sauvegarde complète)
+            at: Restaurer la base telle qu'elle était à cette date (sauvegarde la plus récente à cette date)
         
         Returns:
-            True si la restauration a réussi, False sinon
+            Résumé de la restauration (sauvegarde, durées par étape) ou None en cas d'échec
         """
+        restored_path = None
+        timings = {}
+        start = time.perf_counter()
         try:
-            backup_path = Path(backup_path)
+            if backup_path is None and at is None:
+                logger.error("❌ Aucune sauvegarde à restaurer")
+                return None
+            
+            try:
+                restored_path, description = self._materialize_backup(backup_path, at)
+            except ValueError as e:
+                logger.error(f"❌ {e}")
+                return None
+            timings["materialize"] = time.perf_counter() - start
             
-            if not backup_path.exists():
-                print(f"❌ Fichier de sauvegarde non trouvé : {backup_path}")
-                return False
+            # Valider le fichier avant de toucher à la base courante
+            step = time.perf_counter()
+            ok, message = validate_database(restored_path)
+            timings["validate"] = time.perf_counter() - step
+            if not ok:
+                logger.error(f"❌ Sauvegarde invalide ({description}) : {message}")
+                return None
             
             # Créer une sauvegarde de sécurité avant la restauration
+            step = time.perf_counter()
             safety_backup = self.create_backup("before_restore")
+            timings["safety_backup"] = time.perf_counter() - step
             if not safety_backup:
-                print("❌ Impossible de créer une sauvegarde de sécurité")
-                return False
+                logger.error("❌ Impossible de créer une sauvegarde de sécurité")
+                return None
             
-            print(f"🛡️ Sauvegarde de sécurité créée : {safety_backup}")
+            logger.info(f"🛡️ Sauvegarde de sécurité créée : {safety_backup}")
             
-            # Fermer la connexion à la base de données
-            if db_manager.connection:
-                db_manager.disconnect()
+            step = time.perf_counter()
+            size = os.path.getsize(restored_path)
+            self._swap_database(restored_path)
+            restored_path = None
+            timings["swap"] = time.perf_counter() - step
             
-            # Restaurer la sauvegarde
-            if backup_path.suffix == '.gz':
-                # Décompresser et restaurer
-                with gzip.open(backup_path, 'rb') as f_in:
-                    with open(DATABASE_PATH, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-            else:
-                # Restaurer directement
-                shutil.copy2(backup_path, DATABASE_PATH)
-            
-            # Vérifier la restauration
-            if self._verify_restoration():
-                print(f"✅ Sauvegarde restaurée avec succès : {backup_path}")
-                return True
-            else:
-                print(f"❌ Échec de la vérification de la restauration")
-                return False
+            duration = time.perf_counter() - start
+            logger.info(f"✅ Sauvegarde restaurée avec succès : {description} ({duration:.2f} s, "
+                        f"remplacement {timings['swap'] * 1000:.0f} ms)")
+            return {
+                "backup": description,
+                "safety_backup": safety_backup,
+                "size": size,
+                "duration": round(duration, 3),
+                "timings": {name: round(value, 3) for name, value in timings.items()}
+            }
                 
         except Exception as e:
-            print(f"❌ Erreur lors de la restauration : {e}")
-            return False
+            logger.error(f"❌ Erreur lors de la restauration : {e}")
+            return None
+        finally:
+            if restored_path is not None and os.path.exists(restored_path):
+                os.unlink(restored_path)
     
-    def _verify_restoration(self) -> bool:
-        """Vérifier que la restauration a réussi"""
-        try:
-            # Tenter de se connecter à la base de données restaurée
-            if db_manager.connect():
-                cursor = db_manager.connection.cursor()
-                
-                # Vérifier que les tables existent
-                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-                tables = [row[0] for row in cursor.fetchall()]
-                
-                expected_tables = ['immeubles', 'unites', 'locataires', 'factures', 'baux', 'rapports_immeuble']
-                
-                if all(table in tables for table in expected_tables):
-                    print("✅ Tables de base de données vérifiées")
-                    db_manager.disconnect()
-                    return True
-                else:
-                    print(f"❌ Tables manquantes. Trouvées : {tables}")
-                    db_manager.disconnect()
-                    return False
-            else:
-                print("❌ Impossible de se connecter à la base de données restaurée")
-                return False
-                
-        except Exception as e:
-            print(f"❌ Erreur lors de la vérification de la restauration : {e}")
-            return False
+    def _swap_database(self, restored_path: str):
+        """
+        Remplacer la base par le fichier restauré (renommage atomique)
+        
+        Les connexions ouvertes pointent sur l'ancien fichier : un nouveau pool
+        est créé avant le renommage, et l'ancien est vidé jusqu'à ce qu'aucune
+        de ses connexions ne reste ouverte. L'ancien journal WAL ne
+        doit pas être rejoué sur la base restaurée : la base courante quitte le
+        mode WAL (le journal est reporté dans l'ancien fichier puis supprimé),
+        ce que SQLite refuse tant qu'une autre connexion est ouverte. Un verrou
+        exclusif empêche ensuite toute écriture jusqu'au renommage, et
+        connection_gate retient les nouvelles connexions : elles s'ouvrent
+        sur la base restaurée.
+        
+        Le pool n'est remplacé qu'une fois : une connexion qui attend
+        connection_gate appartient au nouveau pool, qui reste celui du moteur.
+        Le remplacer à nouveau après le renommage laisserait ces connexions
+        ouvertes dans un pool abandonné, ce qui bloquerait la restauration
+        suivante.
+        """
+        # Le fichier restauré est sur disque avant de devenir la base
+        with open(restored_path, "rb+") as f:
+            os.fsync(f.fileno())
+        
+        with connection_gate:
+            # Les connexions empruntées avant engine.dispose() sont rendues à l'ancien pool
+            previous_pool = db_manager.engine.pool
+            db_manager.reset_connections()
+            guard = sqlite3.connect(DATABASE_PATH, timeout=RESTORE_LOCK_TIMEOUT)
+            try:
+                deadline = time.monotonic() + RESTORE_LOCK_TIMEOUT
+                while True:
+                    previous_pool.dispose()
+                    try:
+                        if guard.execute("PRAGMA journal_mode = DELETE").fetchone()[0] == "delete":
+                            break
+                    except sqlite3.OperationalError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("Base de données encore utilisée par une autre connexion, restauration annulée")
+                    time.sleep(0.05)
+                guard.execute("BEGIN EXCLUSIVE")
+                for suffix in ("-wal", "-shm"):
+                    Path(DATABASE_PATH + suffix).unlink(missing_ok=True)
+                os.replace(restored_path, DATABASE_PATH)
+            finally:
+                guard.close()
+                previous_pool.dispose()
+        # Schéma relu sur la base restaurée
+        schema_cache.invalidate()
     
     def list_backups(self) -> List[Dict]:
-        """Lister toutes les sauvegardes disponibles"""
-        backups = []
-        
+        """Lister toutes les sauvegardes disponibles (index du dépôt, plus récente en premier)"""
         try:
-            for file_path in self.backup_dir.glob("cah_backup_*.db*"):
-                if file_path.is_file() and not file_path.name.endswith('.json'):
-                    # Charger les métadonnées si disponibles
-                    metadata_path = file_path.with_suffix('.json')
-                    metadata = {}
-                    
-                    if metadata_path.exists():
-                        try:
-                            with open(metadata_path, 'r', encoding='utf-8') as f:
-                                metadata = json.load(f)
-                        except:
-                            pass
-                    
-                    backup_info = {
-                        "filename": file_path.name,
-                        "path": str(file_path),
-                        "size": file_path.stat().st_size,
-                        "created_at": datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-                        "backup_type": metadata.get("backup_type", "unknown"),
-                        "compressed": file_path.suffix == '.gz'
-                    }
-                    
-                    backups.append(backup_info)
-            
-            # Trier par date de création (plus récent en premier)
-            backups.sort(key=lambda x: x["created_at"], reverse=True)
-            
+            return [
+                {
+                    "id": snapshot["id"],
+                    "filename": snapshot["id"],
+                    "path": snapshot["id"],  # À passer à restore_backup
+                    "size": snapshot["size"],
+                    "stored_bytes": snapshot["stored_bytes"],
+                    "chunks": snapshot["chunks"],
+                    "new_chunks": snapshot["new_chunks"],
+                    "created_at": snapshot["created_at"],
+                    "backup_type": snapshot["backup_type"],
+                    "compressed": True
+                }
+                for snapshot in self.repository.list_snapshots("cah")
+            ]
         except Exception as e:
-            print(f"❌ Erreur lors du listing des sauvegardes : {e}")
-        
-        return backups
+            logger.error(f"❌ Erreur lors du listing des sauvegardes : {e}")
+            return []
     
     def start_automatic_backups(self):
         """Démarrer les sauvegardes automatiques"""
         if self.running:
-            print("⚠️ Les sauvegardes automatiques sont déjà en cours")
+            logger.warning("⚠️ Les sauvegardes automatiques sont déjà en cours")
             return
         
-        print("🔄 Démarrage des sauvegardes automatiques...")
+        logger.info("🔄 Démarrage des sauvegardes automatiques...")
         
-        # Programmer les sauvegardes
+        # Programmer les sauvegardes (incrémentales : une sauvegarde horaire n'écrit que les blocs modifiés)
+        schedule.every().hour.at(":00").do(self._scheduled_backup, "hourly")
         schedule.every().day.at("02:00").do(self._scheduled_backup, "daily")
         schedule.every().sunday.at("03:00").do(self._scheduled_backup, "weekly")
         schedule.every().monday.at("04:00").do(self._scheduled_backup, "monthly")
@@ -287,15 +469,16 @@ class BackupService:
         self.backup_thread = threading.Thread(target=self._backup_worker, daemon=True)
         self.backup_thread.start()
         
-        print("✅ Sauvegardes automatiques démarrées")
-        print("   - Quotidienne : 02:00")
-        print("   - Hebdomadaire : Dimanche 03:00")
-        print("   - Mensuelle : Lundi 04:00")
+        logger.info("✅ Sauvegardes automatiques démarrées")
+        logger.info("   - Horaire : chaque heure")
+        logger.info("   - Quotidienne : 02:00")
+        logger.info("   - Hebdomadaire : Dimanche 03:00")
+        logger.info("   - Mensuelle : Lundi 04:00")
     
     def stop_automatic_backups(self):
         """Arrêter les sauvegardes automatiques"""
         if not self.running:
-            print("⚠️ Les sauvegardes automatiques ne sont pas en cours")
+            logger.warning("⚠️ Les sauvegardes automatiques ne sont pas en cours")
             return
         
         self.running = False
@@ -304,16 +487,16 @@ class BackupService:
         if self.backup_thread and self.backup_thread.is_alive():
             self.backup_thread.join(timeout=5)
         
-        print("🛑 Sauvegardes automatiques arrêtées")
+        logger.info("🛑 Sauvegardes automatiques arrêtées")
     
     def _scheduled_backup(self, backup_type: str):
         """Effectuer une sauvegarde programmée"""
-        print(f"🔄 Sauvegarde {backup_type} programmée...")
+        logger.info(f"🔄 Sauvegarde {backup_type} programmée...")
         backup_path = self.create_backup(backup_type)
         if backup_path:
-            print(f"✅ Sauvegarde {backup_type} terminée : {backup_path}")
+            logger.info(f"✅ Sauvegarde {backup_type} terminée : {backup_path}")
         else:
-            print(f"❌ Échec de la sauvegarde {backup_type}")
+            logger.error(f"❌ Échec de la sauvegarde {backup_type}")
     
     def _backup_worker(self):
         """Worker thread pour les sauvegardes automatiques"""
@@ -322,7 +505,7 @@ class BackupService:
                 schedule.run_pending()
                 time.sleep(60)  # Vérifier toutes les minutes
             except Exception as e:
-                print(f"❌ Erreur dans le worker de sauvegarde : {e}")
+                logger.error(f"❌ Erreur dans le worker de sauvegarde : {e}")
                 time.sleep(60)
 
 # Instance globale du service de sauvegarde
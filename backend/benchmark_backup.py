@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la latence des écritures pendant une sauvegarde de la base
+
+Crée une base SQLite temporaire de TAILLE_MO Mo (mode WAL, comme l'application),
+puis, pendant qu'un thread écrit en continu (une petite transaction à la fois),
+compare :
+- l'ancienne méthode : copie brute du fichier compressée en gzip ;
+- l'API de sauvegarde en ligne en une étape (mode WAL) ;
+- l'API de sauvegarde par lots de pages ;
+- VACUUM INTO.
+
+Pour chaque méthode : latence des écritures (médiane, p99, max), durée de la
+copie et cohérence (les lignes validées avant la copie sont-elles présentes ?
+la copie passe-t-elle integrity_check ?). La copie brute ignore le journal WAL :
+les transactions non encore reportées dans le fichier principal sont perdues.
+
+Usage:
+    python benchmark_backup.py [taille_mo]
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Base temporaire : doit être configurée avant l'import de database.py
+os.environ.pop("DATABASE_URL", None)
+os.environ["ENVIRONMENT"] = "development"
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="cah_bench_backup_")
+
+from backup_service import snapshot_database, check_integrity
+
+TAILLE_MO = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+REPERTOIRE = os.environ["DATA_DIR"]
+BASE = os.path.join(REPERTOIRE, "bench.db")
+
+
+def connexion():
+    """Connexion configurée comme celles de l'application (WAL, synchronous NORMAL)"""
+    connection = sqlite3.connect(BASE, timeout=30.0, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def creer_base(taille_mo):
+    """Remplir une table de documents de 4 ko jusqu'à environ taille_mo Mo"""
+    connection = connexion()
+    connection.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, contenu BLOB)")
+    connection.execute("CREATE TABLE ecritures (id INTEGER PRIMARY KEY, valeur TEXT, date REAL)")
+    lignes = taille_mo * 1024 // 4
+    connection.execute(
+        "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+        "INSERT INTO documents (contenu) SELECT randomblob(4000) FROM n", (lignes,)
+    )
+    connection.commit()
+    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    connection.close()
+
+
+class Ecrivain(threading.Thread):
+    """Écrit une ligne par transaction jusqu'à l'arrêt et mesure chaque validation"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.arret = threading.Event()
+        self.latences = []
+        self.validees = 0
+
+    def run(self):
+        connection = connexion()
+        # Pas de report automatique du WAL : reproduit des transactions récentes encore dans le journal
+        connection.execute("PRAGMA wal_autocheckpoint = 0")
+        while not self.arret.is_set():
+            debut = time.perf_counter()
+            connection.execute("INSERT INTO ecritures (valeur, date) VALUES (?, ?)", ("x" * 100, time.time()))
+            connection.commit()
+            self.latences.append(time.perf_counter() - debut)
+            self.validees += 1
+            time.sleep(0.002)
+        connection.close()
+
+
+def copie_brute(destination):
+    """Ancienne méthode : le fichier principal copié octet par octet dans un gzip"""
+    with open(BASE, 'rb') as f_in:
+        with gzip.open(destination + ".gz", 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+    with gzip.open(destination + ".gz", 'rb') as f_in:
+        with open(destination, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+
+
+def mesurer(nom, copie):
+    """Lancer l'écrivain, faire la copie pendant les écritures, puis vérifier la copie"""
+    destination = os.path.join(REPERTOIRE, f"copie_{nom}.db")
+    ecrivain = Ecrivain()
+    ecrivain.start()
+    time.sleep(0.5)
+    validees_avant = ecrivain.validees
+
+    debut = time.perf_counter()
+    if copie is not None:
+        copie(destination)
+    else:
+        time.sleep(2)
+    duree = time.perf_counter() - debut
+
+    time.sleep(0.2)
+    ecrivain.arret.set()
+    ecrivain.join()
+
+    resultat = {"duree": duree, "latences": ecrivain.latences}
+    if copie is not None:
+        try:
+            resultat["integrite"] = check_integrity(destination)[0]
+            copie_connexion = sqlite3.connect(destination)
+            resultat["lignes"] = copie_connexion.execute("SELECT COUNT(*) FROM ecritures").fetchone()[0]
+            copie_connexion.close()
+        except sqlite3.DatabaseError as e:
+            resultat["integrite"], resultat["lignes"] = False, 0
+            print(f"   ⚠️ Copie illisible : {e}")
+        resultat["total_avant"] = total_avant + validees_avant
+        os.remove(destination)
+    return resultat
+
+
+def afficher(nom, resultat):
+    latences = sorted(resultat["latences"])
+    p99 = latences[int(len(latences) * 0.99) - 1] if latences else 0
+    ligne = (f"⏱️ {nom:<34} copie {resultat['duree']:6.2f} s | écritures : médiane "
+             f"{statistics.median(latences) * 1000:6.2f} ms, p99 {p99 * 1000:7.2f} ms, "
+             f"max {latences[-1] * 1000:7.2f} ms")
+    print(ligne)
+    if "lignes" in resultat:
+        complete = resultat["lignes"] >= resultat["total_avant"]
+        print(f"   {'✅' if complete and resultat['integrite'] else '❌'} "
+              f"{resultat['lignes']} ligne(s) dans la copie, {resultat['total_avant']} validée(s) avant la copie, "
+              f"integrity_check {'ok' if resultat['integrite'] else 'en échec'}")
+        return complete and resultat["integrite"]
+    return True
+
+
+def benchmark_backup():
+    """Comparer les méthodes de sauvegarde pendant des écritures continues"""
+    global total_avant
+    print("🔍 BENCHMARK DES SAUVEGARDES PENDANT LES ÉCRITURES")
+    print("=" * 50)
+    print(f"📝 Création d'une base de {TAILLE_MO} Mo...")
+    creer_base(TAILLE_MO)
+    print(f"📦 Base : {os.path.getsize(BASE) / 1024 / 1024:.0f} Mo")
+
+    methodes = [
+        ("Sans sauvegarde", None),
+        ("Copie brute gzip (ancienne)", copie_brute),
+        ("API de sauvegarde, une étape (WAL)", lambda d: snapshot_database(d, BASE, "backup")),
+        ("API de sauvegarde, lots de 1024 pages", lambda d: snapshot_database(d, BASE, "backup", pages=1024)),
+        ("VACUUM INTO", lambda d: snapshot_database(d, BASE, "vacuum")),
+    ]
+    resultats = []
+    for nom, copie in methodes:
+        connection = sqlite3.connect(BASE)
+        total_avant = connection.execute("SELECT COUNT(*) FROM ecritures").fetchone()[0]
+        connection.close()
+        resultat = mesurer(nom.split(" ")[0], copie)
+        coherente = afficher(nom, resultat)
+        if copie is not None and copie is not copie_brute:
+            resultats.append(coherente)
+
+    succes = all(resultats)
+    print(f"{'✅' if succes else '❌'} Copies en ligne cohérentes")
+    return succes
+
+
+total_avant = 0
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_backup() else 1)
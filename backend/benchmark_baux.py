@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la lecture des baux (get_leases)
+
+Crée une base SQLite temporaire avec NB_BAUX baux, puis compare :
+- l'ancienne méthode : PRAGMA table_info à chaque appel, objets ORM chargés
+  par joinedload et dictionnaires imbriqués construits bail par bail ;
+- la nouvelle méthode : une seule requête jointe et projetée + un sérialiseur.
+
+Usage:
+    python benchmark_baux.py [nb_baux]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import statistics
+from datetime import date
+
+# Base temporaire : doit être configurée avant l'import de database.py
+os.environ.pop("DATABASE_URL", None)
+os.environ["ENVIRONMENT"] = "development"
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="cah_bench_baux_")
+
+from sqlalchemy import text, event
+from sqlalchemy.orm import joinedload
+
+from database import engine, init_database, SessionLocal
+from database_service_francais import db_service_francais
+from schema_cache import schema_cache
+from models_francais import Immeuble, Unite, Locataire, Bail
+
+NB_BAUX = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+REPETITIONS = 5
+
+
+def inserer_donnees(nb_baux):
+    """Insérer nb_baux baux répartis sur des immeubles de 10 unités"""
+    session = SessionLocal()
+    try:
+        for debut in range(0, nb_baux, 10):
+            immeuble = Immeuble(nom_immeuble=f"Immeuble {debut // 10}", adresse=f"{debut} rue Test",
+                                ville="Trois-Rivières", province="QC", code_postal="G9A 1A1", nbr_unite=10)
+            session.add(immeuble)
+            session.flush()
+            for i in range(debut, min(debut + 10, nb_baux)):
+                unite = Unite(id_immeuble=immeuble.id_immeuble, adresse_unite=f"{i} rue Test")
+                locataire = Locataire(nom=f"Locataire {i}", prenom="Test", email=f"locataire{i}@test.ca")
+                session.add_all([unite, locataire])
+                session.flush()
+                session.add(Bail(id_locataire=locataire.id_locataire, id_unite=unite.id_unite,
+                                 date_debut=date(2024, 7, 1), date_fin=date(2025, 6, 30), prix_loyer=1000 + i))
+        session.commit()
+    finally:
+        session.close()
+
+
+def anciens_baux():
+    """Reproduction de l'ancienne lecture des baux (avant la requête projetée)"""
+    with SessionLocal() as session:
+        columns = [row[1] for row in session.execute(text("PRAGMA table_info(baux)"))]
+        assert "id_unite" in columns
+        leases = session.query(Bail).options(
+            joinedload(Bail.locataire),
+            joinedload(Bail.unite).joinedload(Unite.immeuble)
+        ).order_by(Bail.id_bail).all()
+
+        result = []
+        for lease in leases:
+            lease_dict = lease.to_dict()
+            if lease.locataire:
+                locataire_data = {
+                    'id_locataire': lease.locataire.id_locataire,
+                    'nom': lease.locataire.nom,
+                    'prenom': lease.locataire.prenom,
+                    'email': lease.locataire.email,
+                    'telephone': lease.locataire.telephone,
+                    'statut': lease.locataire.statut
+                }
+                if lease.unite:
+                    unite_data = {
+                        'id_unite': lease.unite.id_unite,
+                        'adresse_unite': lease.unite.adresse_unite,
+                        'type': lease.unite.type,
+                        'nbr_chambre': lease.unite.nbr_chambre,
+                        'nbr_salle_de_bain': lease.unite.nbr_salle_de_bain,
+                        'id_immeuble': lease.unite.id_immeuble
+                    }
+                    if lease.unite.immeuble:
+                        unite_data['immeuble'] = {
+                            'id_immeuble': lease.unite.immeuble.id_immeuble,
+                            'nom_immeuble': lease.unite.immeuble.nom_immeuble,
+                            'adresse': lease.unite.immeuble.adresse
+                        }
+                    locataire_data['unite'] = unite_data
+                lease_dict['locataire'] = locataire_data
+            result.append(lease_dict)
+        return result
+
+
+def mesurer(fonction):
+    """Retourner (résultat, durée médiane en secondes, nombre de requêtes SQL du dernier appel)"""
+    durees = []
+    resultat = None
+    compteur = {"n": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        compteur["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for _ in range(REPETITIONS):
+            compteur["n"] = 0
+            debut = time.perf_counter()
+            resultat = fonction()
+            durees.append(time.perf_counter() - debut)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return resultat, statistics.median(durees), compteur["n"]
+
+
+def benchmark_baux():
+    """Comparer l'ancienne et la nouvelle lecture des baux"""
+    print("🔍 BENCHMARK DE LA LECTURE DES BAUX")
+    print("=" * 50)
+
+    init_database()
+    print(f"📝 Insertion de {NB_BAUX} baux...")
+    inserer_donnees(NB_BAUX)
+    schema_cache.load()
+
+    anciens, duree_ancienne, requetes_anciennes = mesurer(anciens_baux)
+    nouveaux, duree_nouvelle, requetes_nouvelles = mesurer(db_service_francais.get_leases)
+
+    # Le nouveau format expose aussi l'unité au premier niveau du bail
+    identiques = [{k: v for k, v in bail.items() if k != "unite"} for bail in nouveaux] == anciens
+
+    print(f"⏱️ Ancienne méthode: {duree_ancienne * 1000:.1f} ms ({requetes_anciennes} requêtes)")
+    print(f"⏱️ Nouvelle méthode: {duree_nouvelle * 1000:.1f} ms ({requetes_nouvelles} requêtes)")
+    print(f"🚀 Accélération: x{duree_ancienne / duree_nouvelle:.1f}")
+    print(f"{'✅' if identiques else '❌'} Résultats identiques ({len(nouveaux)} baux)")
+
+    return identiques
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_baux() else 1)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark du débit de connexion (/api/auth/login) avec des utilisateurs concurrents
+
+Crée une base d'authentification temporaire avec NB_UTILISATEURS comptes, puis
+lance toutes les connexions en même temps et compare :
+- l'ancienne méthode : bcrypt exécuté directement dans la route async ;
+- la nouvelle méthode : bcrypt exécuté dans le pool de hachage.
+
+Pendant les connexions, une tâche se réveille toutes les 5 ms : son retard
+maximal mesure le blocage de la boucle d'événements (ce que subissent toutes
+les autres requêtes async servies par le même processus).
+
+Au-delà de 15 connexions simultanées (taille du pool SQLAlchemy de la base
+d'authentification), l'ancienne méthode attend le délai du pool (30 s) : la
+requête qui attend une connexion bloque la boucle qui devrait libérer les autres.
+
+Usage:
+    python benchmark_login.py [nb_utilisateurs]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Base temporaire : doit être configurée avant l'import de auth_database_service.py
+os.environ["ENVIRONMENT"] = "development"
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="cah_bench_login_")
+
+import httpx
+from fastapi import FastAPI
+
+import auth_service
+from auth_database_service import init_auth_database, SessionLocal
+from auth_routes import router
+from models_auth import Utilisateur
+
+NB_UTILISATEURS = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+MOT_DE_PASSE = "Benchmark2024!"
+
+app = FastAPI()
+app.include_router(router, prefix="/api/auth")
+
+
+def inserer_utilisateurs(nb_utilisateurs):
+    """Créer nb_utilisateurs comptes actifs (même mot de passe, un seul hachage)"""
+    hashed = auth_service.hash_password(MOT_DE_PASSE)
+    session = SessionLocal()
+    try:
+        for i in range(nb_utilisateurs):
+            session.add(Utilisateur(id_compagnie=1, email=f"bench{i}@test.ca", mot_de_passe_hash=hashed,
+                                    nom=f"Bench {i}", prenom="Test", role="employe", statut="actif",
+                                    email_verifie=True))
+        session.commit()
+    finally:
+        session.close()
+
+
+async def verify_password_inline(plain_password, hashed_password):
+    """Reproduction de l'ancienne vérification : bcrypt dans la boucle d'événements"""
+    return auth_service.verify_password(plain_password, hashed_password)
+
+
+async def mesurer_connexions(nb_utilisateurs):
+    """Retourner (durée totale, nb de connexions réussies, retard max de la boucle d'événements)"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        termine = asyncio.Event()
+        retards = [0.0]
+
+        async def temoin():
+            while not termine.is_set():
+                debut = time.perf_counter()
+                await asyncio.sleep(0.005)
+                retards.append(time.perf_counter() - debut - 0.005)
+
+        async def connexion(i):
+            response = await client.post("/api/auth/login",
+                                         json={"email": f"bench{i}@test.ca", "mot_de_passe": MOT_DE_PASSE})
+            return response.status_code == 200
+
+        tache_temoin = asyncio.create_task(temoin())
+        await asyncio.sleep(0.05)
+        debut = time.perf_counter()
+        resultats = await asyncio.gather(*[connexion(i) for i in range(nb_utilisateurs)])
+        duree = time.perf_counter() - debut
+        termine.set()
+        await tache_temoin
+
+    return duree, sum(resultats), max(retards)
+
+
+def benchmark_login():
+    """Comparer le débit de connexion avec bcrypt en ligne et dans le pool"""
+    print("🔍 BENCHMARK DU DÉBIT DE CONNEXION")
+    print("=" * 50)
+    print(f"🔐 Coût bcrypt: {auth_service.BCRYPT_ROUNDS}, pool de hachage: {auth_service.PASSWORD_HASH_WORKERS} threads")
+
+    init_auth_database()
+    print(f"📝 Création de {NB_UTILISATEURS} utilisateurs...")
+    inserer_utilisateurs(NB_UTILISATEURS)
+
+    verify_pool = auth_service.verify_password_async
+    auth_service.verify_password_async = verify_password_inline
+    try:
+        duree_ancienne, ok_anciens, temoin_ancien = asyncio.run(mesurer_connexions(NB_UTILISATEURS))
+    finally:
+        auth_service.verify_password_async = verify_pool
+    duree_nouvelle, ok_nouveaux, temoin_nouveau = asyncio.run(mesurer_connexions(NB_UTILISATEURS))
+
+    print(f"⏱️ Ancienne méthode: {duree_ancienne * 1000:.0f} ms, {ok_anciens / duree_ancienne:.1f} connexions/s, "
+          f"boucle bloquée jusqu'à {temoin_ancien * 1000:.0f} ms")
+    print(f"⏱️ Nouvelle méthode: {duree_nouvelle * 1000:.0f} ms, {ok_nouveaux / duree_nouvelle:.1f} connexions/s, "
+          f"boucle bloquée jusqu'à {temoin_nouveau * 1000:.0f} ms")
+    print(f"🚀 Accélération: x{duree_ancienne / duree_nouvelle:.1f}")
+
+    succes = ok_anciens == ok_nouveaux == NB_UTILISATEURS
+    print(f"{'✅' if succes else '❌'} {ok_nouveaux}/{NB_UTILISATEURS} connexions réussies")
+    return succes
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_login() else 1)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Configuration pytest des tests du backend
+
+database.py lie son moteur au chemin lu à l'import : la base SQLite de test
+est donc configurée dans pytest_configure, avant la collecte des modules de
+test. Tous les tests partagent ce fichier ; la fixture `base` le remet à zéro
+avant chaque test qui l'utilise.
+
+Usage:
+    python -m pytest test_nombre_requetes.py test_restauration.py ...
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config):
+    """Base SQLite temporaire (jamais la base PostgreSQL de DATABASE_URL)"""
+    os.environ.pop("DATABASE_URL", None)
+    os.environ["ENVIRONMENT"] = "development"
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="cah_tests_")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(os.environ["DATA_DIR"], ignore_errors=True)
+
+
+@pytest.fixture
+def base():
+    """Base de test vide : tables locatives et construction recréées, schéma rechargé"""
+    from database import engine
+    from models_francais import Base
+    from models_construction import ConstructionBase
+    from schema_cache import schema_cache
+
+    engine.dispose()
+    for metadata in (ConstructionBase.metadata, Base.metadata):
+        metadata.drop_all(bind=engine)
+    for metadata in (Base.metadata, ConstructionBase.metadata):
+        metadata.create_all(bind=engine)
+    schema_cache.invalidate()
+    yield engine
+    engine.dispose()
@@ -5,10 +5,11 @@ Configuration de la base de données SQLite pour Interface CAH
 
 import os
 import sqlite3
+import threading
 from datetime import datetime
 from typing import Optional
 import json
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 # Configuration du chemin de la base de données
@@ -18,13 +19,26 @@ RENDER_DATABASE_URL = os.environ.get("DATABASE_URL")
 # Initialiser DATABASE_PATH par défaut (pour compatibilité)
 DATABASE_PATH = None
 
+# Taille du pool de threads qui exécute les routes synchrones (SQLAlchemy est bloquant)
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", "40"))
+
+# Pool de connexions : assez de connexions pour chaque thread de requête
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", str(max(THREADPOOL_SIZE - DB_POOL_SIZE, 0))))
+
+# Tenu pendant le remplacement du fichier de la base (restauration) : aucune
+# nouvelle connexion ne s'ouvre sur l'ancien fichier pendant ce temps
+connection_gate = threading.Lock()
+
 if RENDER_DATABASE_URL:
     # Sur Render avec base de données PostgreSQL
     print(f"🗄️ Base de données Render PostgreSQL détectée")
     engine = create_engine(
         RENDER_DATABASE_URL,
         echo=False,
-        pool_pre_ping=True
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW
     )
     DATABASE_PATH = None  # Pas utilisé avec PostgreSQL
 else:
@@ -48,12 +62,28 @@ else:
         f"sqlite:///{DATABASE_PATH}",
         echo=False,  # Mettre à True pour voir les requêtes SQL
         pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
         connect_args={
             "check_same_thread": False,
             "timeout": 30.0
         }
     )
 
+    @event.listens_for(engine, "do_connect")
+    def _ouvrir_connexion_sqlite(dialect, conn_rec, cargs, cparams):
+        """Ouvrir le fichier hors d'un remplacement de la base (voir connection_gate)"""
+        with connection_gate:
+            return dialect.connect(*cargs, **cparams)
+
+    @event.listens_for(engine, "connect")
+    def _configurer_connexion_sqlite(dbapi_connection, connection_record):
+        """Mode WAL : les lectures concurrentes ne bloquent pas les écritures"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.close()
+
 # Créer la session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -78,11 +108,12 @@ class DatabaseManager:
             return False
             
         try:
-            self.connection = sqlite3.connect(
-                self.db_path,
-                check_same_thread=False,  # Permet l'utilisation multi-thread
-                timeout=30.0  # Timeout de 30 secondes
-            )
+            with connection_gate:
+                self.connection = sqlite3.connect(
+                    self.db_path,
+                    check_same_thread=False,  # Permet l'utilisation multi-thread
+                    timeout=30.0  # Timeout de 30 secondes
+                )
             # Activer les contraintes de clés étrangères
             self.connection.execute("PRAGMA foreign_keys = ON")
             # Optimiser les performances
@@ -105,6 +136,19 @@ class DatabaseManager:
             print("🔌 Connexion à la base de données fermée")
     
     
+    def reset_connections(self):
+        """
+        Fermer toutes les connexions à la base (connexion directe et pool SQLAlchemy)
+
+        engine.dispose() ferme les connexions inactives du pool et le remplace
+        par un pool neuf : les sessions suivantes ouvrent de nouvelles
+        connexions, sur le fichier présent à DATABASE_PATH (après une
+        restauration, par exemple). Le moteur lui-même est conservé : les
+        modules qui l'ont importé restent valides.
+        """
+        self.disconnect()
+        self.engine.dispose()
+    
     def get_connection(self):
         """Obtenir la connexion actuelle"""
         if not self.connection:
@@ -133,16 +177,10 @@ class DatabaseManager:
         os.makedirs(os.path.dirname(backup_path), exist_ok=True)
         
         try:
-            # Fermer la connexion actuelle
-            if self.connection:
-                self.connection.close()
-            
-            # Copier le fichier de base de données
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
-            
-            # Rétablir la connexion
-            self.connect()
+            # Copie cohérente de la base ouverte (API de sauvegarde en ligne de SQLite) :
+            # inclut le journal WAL, sans fermer la connexion ni bloquer les écritures
+            from backup_service import snapshot_database
+            snapshot_database(backup_path, source_path=self.db_path, method="backup")
             
             print(f"✅ Sauvegarde créée : {backup_path}")
             return backup_path
@@ -5,15 +5,22 @@ Utilise les nouveaux modèles français
 """
 
 from sqlalchemy.orm import sessionmaker, joinedload
-from sqlalchemy import create_engine, text, or_, and_
+from sqlalchemy import create_engine, text, or_, and_, func, extract, select, insert, literal, case
+from sqlalchemy.dialects import postgresql, sqlite
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date
+from decimal import Decimal
 import json
 import os
 import platform
 
 from database import db_manager
-from models_francais import Immeuble, Locataire, Unite, Bail, Transaction, PaiementLoyer
+from pagination import paginate
+from schema_cache import schema_cache
+from models_francais import Immeuble, Locataire, Unite, Bail, Transaction, PaiementLoyer, CashflowMensuel, Document
+from app_logging import get_logger, debug_sampled
+
+logger = get_logger(__name__)
 
 class DatabaseServiceFrancais:
     """Service principal pour les opérations de base de données en français"""
@@ -32,12 +39,20 @@ class DatabaseServiceFrancais:
     
     def get_buildings(self) -> List[Dict[str, Any]]:
         """Récupérer tous les immeubles"""
+        return self.get_buildings_page()[0]
+    
+    def get_buildings_page(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                           ville: Optional[str] = None) -> tuple:
+        """Récupérer une page d'immeubles (keyset sur id_immeuble) -> (immeubles, next_cursor)"""
         try:
             with self.get_session() as session:
-                buildings = session.query(Immeuble).all()
-                return [building.to_dict() for building in buildings]
+                query = session.query(Immeuble)
+                if ville:
+                    query = query.filter(Immeuble.ville == ville)
+                buildings, next_cursor = paginate(query, [(Immeuble.id_immeuble, False)], cursor, limit)
+                return [building.to_dict() for building in buildings], next_cursor
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des immeubles: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des immeubles: {e}")
             raise e
     
     def get_building(self, building_id: int) -> Optional[Dict[str, Any]]:
@@ -47,7 +62,7 @@ class DatabaseServiceFrancais:
                 building = session.query(Immeuble).filter(Immeuble.id_immeuble == building_id).first()
                 return building.to_dict() if building else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération de l'immeuble {building_id}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération de l'immeuble {building_id}: {e}")
             raise e
     
     def create_building(self, building_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -78,10 +93,10 @@ class DatabaseServiceFrancais:
                 session.commit()
                 session.refresh(building)
                 
-                print(f"✅ Immeuble créé: {building.nom_immeuble} (ID: {building.id_immeuble})")
+                logger.info(f"✅ Immeuble créé: {building.nom_immeuble} (ID: {building.id_immeuble})")
                 return building.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création de l'immeuble: {e}")
+            logger.error(f"❌ Erreur lors de la création de l'immeuble: {e}")
             raise e
     
     def update_building(self, building_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -131,10 +146,10 @@ class DatabaseServiceFrancais:
                 building.date_modification = datetime.utcnow()
                 session.commit()
                 
-                print(f"✅ Immeuble mis à jour: {building.nom_immeuble} (ID: {building.id_immeuble})")
+                logger.info(f"✅ Immeuble mis à jour: {building.nom_immeuble} (ID: {building.id_immeuble})")
                 return building.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour de l'immeuble {building_id}: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour de l'immeuble {building_id}: {e}")
             raise e
     
     def delete_building(self, building_id: int) -> bool:
@@ -150,16 +165,16 @@ class DatabaseServiceFrancais:
                 transactions_count = session.query(Transaction).filter(Transaction.id_immeuble == building_id).count()
                 
                 if units_count > 0 or transactions_count > 0:
-                    print(f"⚠️ Impossible de supprimer l'immeuble {building.nom_immeuble}: {units_count} unités et {transactions_count} transactions associées")
+                    logger.warning(f"⚠️ Impossible de supprimer l'immeuble {building.nom_immeuble}: {units_count} unités et {transactions_count} transactions associées")
                     return False
                 
                 session.delete(building)
                 session.commit()
                 
-                print(f"✅ Immeuble supprimé: {building.nom_immeuble} (ID: {building.id_immeuble})")
+                logger.info(f"✅ Immeuble supprimé: {building.nom_immeuble} (ID: {building.id_immeuble})")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression de l'immeuble {building_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression de l'immeuble {building_id}: {e}")
             raise e
     
     # ========================================
@@ -168,12 +183,34 @@ class DatabaseServiceFrancais:
     
     def get_units(self, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
         """Récupérer toutes les unités avec les informations des locataires via les baux actifs"""
+        return self.get_units_page(skip=skip, limit=limit)[0]
+    
+    def get_units_page(self, cursor: Optional[str] = None, limit: Optional[int] = 100, skip: int = 0,
+                       building_id: Optional[int] = None) -> tuple:
+        """Récupérer une page d'unités (keyset sur id_unite, ou offset skip) -> (unités, next_cursor)"""
         try:
             with self.get_session() as session:
-                units = session.query(Unite).offset(skip).limit(limit).all()
-                
-                # Récupérer la date actuelle pour trouver les baux actifs
-                today = date.today()
+                query = session.query(Unite).options(joinedload(Unite.immeuble))
+                if building_id is not None:
+                    query = query.filter(Unite.id_immeuble == building_id)
+                units, next_cursor = paginate(query, [(Unite.id_unite, False)], cursor, limit, offset=skip)
+                
+                # Baux actifs de toute la page en une seule requête (IN sur les unités)
+                # Un bail est actif si date_debut <= today <= date_fin (ou date_fin est NULL)
+                locataires_par_unite = {unit.id_unite: [] for unit in units}
+                if units:
+                    for lease in self._query_active_leases(session).filter(
+                        Bail.id_unite.in_(list(locataires_par_unite))
+                    ).options(joinedload(Bail.locataire)):
+                        if lease.locataire:
+                            locataires_par_unite[lease.id_unite].append({
+                                'id_locataire': lease.locataire.id_locataire,
+                                'nom': lease.locataire.nom,
+                                'prenom': lease.locataire.prenom,
+                                'email': lease.locataire.email,
+                                'telephone': lease.locataire.telephone,
+                                'statut': lease.locataire.statut
+                            })
                 
                 result = []
                 for unit in units:
@@ -187,34 +224,22 @@ class DatabaseServiceFrancais:
                             'adresse': unit.immeuble.adresse
                         }
                     
-                    # Trouver les locataires via les baux actifs pour cette unité
-                    # Un bail est actif si date_debut <= today <= date_fin (ou date_fin est NULL)
-                    active_leases = session.query(Bail).filter(
-                        Bail.id_unite == unit.id_unite,
-                        Bail.date_debut <= today,
-                        or_(Bail.date_fin >= today, Bail.date_fin.is_(None))
-                    ).options(joinedload(Bail.locataire)).all()
-                    
-                    unit_dict['locataires'] = []
-                    for lease in active_leases:
-                        if lease.locataire:
-                            locataire_info = {
-                                'id_locataire': lease.locataire.id_locataire,
-                                'nom': lease.locataire.nom,
-                                'prenom': lease.locataire.prenom,
-                                'email': lease.locataire.email,
-                                'telephone': lease.locataire.telephone,
-                                'statut': lease.locataire.statut
-                            }
-                            unit_dict['locataires'].append(locataire_info)
-                    
+                    unit_dict['locataires'] = locataires_par_unite[unit.id_unite]
                     result.append(unit_dict)
                 
-                return result
+                return result, next_cursor
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des unités: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des unités: {e}")
             raise e
     
+    def _query_active_leases(self, session):
+        """Requête des baux actifs aujourd'hui (date_debut <= today <= date_fin ou date_fin NULL)"""
+        today = date.today()
+        return session.query(Bail).filter(
+            Bail.date_debut <= today,
+            or_(Bail.date_fin >= today, Bail.date_fin.is_(None))
+        ).order_by(Bail.id_bail)
+    
     def get_unit(self, unit_id: int) -> Optional[Dict[str, Any]]:
         """Récupérer une unité par ID"""
         try:
@@ -222,7 +247,7 @@ class DatabaseServiceFrancais:
                 unit = session.query(Unite).filter(Unite.id_unite == unit_id).first()
                 return unit.to_dict() if unit else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération de l'unité {unit_id}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération de l'unité {unit_id}: {e}")
             raise e
     
     def get_units_by_building(self, building_id: int) -> List[Dict[str, Any]]:
@@ -232,7 +257,7 @@ class DatabaseServiceFrancais:
                 units = session.query(Unite).filter(Unite.id_immeuble == building_id).all()
                 return [unit.to_dict() for unit in units]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des unités de l'immeuble {building_id}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des unités de l'immeuble {building_id}: {e}")
             raise e
     
     def create_unit(self, unit_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -251,10 +276,10 @@ class DatabaseServiceFrancais:
                 session.commit()
                 session.refresh(unit)
                 
-                print(f"✅ Unité créée: {unit.adresse_unite} (ID: {unit.id_unite})")
+                logger.info(f"✅ Unité créée: {unit.adresse_unite} (ID: {unit.id_unite})")
                 return unit.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création de l'unité: {e}")
+            logger.error(f"❌ Erreur lors de la création de l'unité: {e}")
             raise e
     
     def update_unit(self, unit_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -275,15 +300,19 @@ class DatabaseServiceFrancais:
                 if 'nbr_salle_de_bain' in update_data:
                     unit.nbr_salle_de_bain = update_data['nbr_salle_de_bain']
                 if 'id_immeuble' in update_data:
+                    # Les loyers des baux de l'unité suivent l'unité dans le cashflow mensuel
+                    self._appliquer_cashflow(session, *self._cashflow_loyers_deplaces(
+                        session, Bail.id_unite == unit.id_unite, unit.id_immeuble, update_data['id_immeuble']
+                    ))
                     unit.id_immeuble = update_data['id_immeuble']
                 
                 unit.date_modification = datetime.utcnow()
                 session.commit()
                 
-                print(f"✅ Unité mise à jour: {unit.adresse_unite} (ID: {unit.id_unite})")
+                logger.info(f"✅ Unité mise à jour: {unit.adresse_unite} (ID: {unit.id_unite})")
                 return unit.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour de l'unité {unit_id}: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour de l'unité {unit_id}: {e}")
             raise e
     
     def delete_unit(self, unit_id: int) -> bool:
@@ -297,10 +326,10 @@ class DatabaseServiceFrancais:
                 session.delete(unit)
                 session.commit()
                 
-                print(f"✅ Unité supprimée: {unit.adresse_unite} (ID: {unit.id_unite})")
+                logger.info(f"✅ Unité supprimée: {unit.adresse_unite} (ID: {unit.id_unite})")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression de l'unité {unit_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression de l'unité {unit_id}: {e}")
             raise e
     
     # ========================================
@@ -309,21 +338,35 @@ class DatabaseServiceFrancais:
     
     def get_tenants(self) -> List[Dict[str, Any]]:
         """Récupérer tous les locataires avec leurs unités via les baux actifs"""
+        return self.get_tenants_page()[0]
+    
+    def get_tenants_page(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                         statut: Optional[str] = None) -> tuple:
+        """Récupérer une page de locataires (keyset sur id_locataire) -> (locataires, next_cursor)"""
         try:
             with self.get_session() as session:
-                tenants = session.query(Locataire).all()
-                today = date.today()
+                query = session.query(Locataire)
+                if statut:
+                    query = query.filter(Locataire.statut == statut)
+                tenants, next_cursor = paginate(query, [(Locataire.id_locataire, False)], cursor, limit)
+                
+                # Baux actifs en une seule requête (limitée à la page si paginée) ;
+                # on garde le premier par locataire
+                leases_query = self._query_active_leases(session).options(
+                    joinedload(Bail.unite).joinedload(Unite.immeuble)
+                )
+                if limit or statut:
+                    leases_query = leases_query.filter(
+                        Bail.id_locataire.in_([tenant.id_locataire for tenant in tenants])
+                    )
+                active_lease_par_locataire = {}
+                for lease in leases_query:
+                    active_lease_par_locataire.setdefault(lease.id_locataire, lease)
                 
                 result = []
                 for tenant in tenants:
                     tenant_dict = tenant.to_dict()
-                    
-                    # Trouver le bail actif pour ce locataire
-                    active_lease = session.query(Bail).filter(
-                        Bail.id_locataire == tenant.id_locataire,
-                        Bail.date_debut <= today,
-                        or_(Bail.date_fin >= today, Bail.date_fin.is_(None))
-                    ).options(joinedload(Bail.unite).joinedload(Unite.immeuble)).first()
+                    active_lease = active_lease_par_locataire.get(tenant.id_locataire)
                     
                     # Ajouter les informations de l'unité et de l'immeuble si un bail actif existe
                     if active_lease and active_lease.unite:
@@ -334,9 +377,9 @@ class DatabaseServiceFrancais:
                     
                     result.append(tenant_dict)
                 
-                return result
+                return result, next_cursor
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des locataires: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des locataires: {e}")
             raise e
     
     def get_tenant(self, tenant_id: int) -> Optional[Dict[str, Any]]:
@@ -346,7 +389,7 @@ class DatabaseServiceFrancais:
                 tenant = session.query(Locataire).filter(Locataire.id_locataire == tenant_id).first()
                 return tenant.to_dict() if tenant else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération du locataire {tenant_id}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération du locataire {tenant_id}: {e}")
             raise e
     
     def create_tenant(self, tenant_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -368,10 +411,10 @@ class DatabaseServiceFrancais:
                 session.commit()
                 session.refresh(tenant)
                 
-                print(f"✅ Locataire créé: {tenant.nom} {tenant.prenom} (ID: {tenant.id_locataire})")
+                logger.info(f"✅ Locataire créé: {tenant.nom} {tenant.prenom} (ID: {tenant.id_locataire})")
                 return tenant.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création du locataire: {e}")
+            logger.error(f"❌ Erreur lors de la création du locataire: {e}")
             raise e
     
     def update_tenant(self, tenant_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -400,10 +443,10 @@ class DatabaseServiceFrancais:
                 tenant.date_modification = datetime.utcnow()
                 session.commit()
                 
-                print(f"✅ Locataire mis à jour: {tenant.nom} {tenant.prenom} (ID: {tenant.id_locataire})")
+                logger.info(f"✅ Locataire mis à jour: {tenant.nom} {tenant.prenom} (ID: {tenant.id_locataire})")
                 return tenant.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour du locataire {tenant_id}: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour du locataire {tenant_id}: {e}")
             raise e
     
     def delete_tenant(self, tenant_id: int) -> bool:
@@ -417,10 +460,10 @@ class DatabaseServiceFrancais:
                 session.delete(tenant)
                 session.commit()
                 
-                print(f"✅ Locataire supprimé: {tenant.nom} {tenant.prenom} (ID: {tenant.id_locataire})")
+                logger.info(f"✅ Locataire supprimé: {tenant.nom} {tenant.prenom} (ID: {tenant.id_locataire})")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression du locataire {tenant_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression du locataire {tenant_id}: {e}")
             raise e
     
     # ========================================
@@ -429,17 +472,37 @@ class DatabaseServiceFrancais:
     
     def get_transactions(self) -> List[Dict[str, Any]]:
         """Récupérer toutes les transactions"""
+        return self.get_transactions_page()[0]
+    
+    def get_transactions_page(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                              building_id: Optional[int] = None, date_debut: Optional[date] = None,
+                              date_fin: Optional[date] = None, type: Optional[str] = None,
+                              categorie: Optional[str] = None) -> tuple:
+        """
+        Récupérer une page de transactions, de la plus récente à la plus ancienne
+        (keyset sur date_de_transaction, id_transaction) -> (transactions, next_cursor)
+        """
         try:
-            print("🔍 [DB] Début de get_transactions()")
             with self.get_session() as session:
-                print("🔍 [DB] Session créée, requête en cours...")
-                transactions = session.query(Transaction).all()
-                print(f"🔍 [DB] {len(transactions)} transactions trouvées")
-                result = [transaction.to_dict() for transaction in transactions]
-                print(f"✅ [DB] Transactions converties: {len(result)}")
-                return result
+                query = session.query(Transaction)
+                if building_id is not None:
+                    query = query.filter(Transaction.id_immeuble == building_id)
+                if date_debut:
+                    query = query.filter(Transaction.date_de_transaction >= date_debut)
+                if date_fin:
+                    query = query.filter(Transaction.date_de_transaction <= date_fin)
+                if type:
+                    query = query.filter(func.lower(Transaction.type) == type.lower())
+                if categorie:
+                    query = query.filter(Transaction.categorie == categorie)
+                transactions, next_cursor = paginate(
+                    query,
+                    [(Transaction.date_de_transaction, True), (Transaction.id_transaction, True)],
+                    cursor, limit
+                )
+                return [transaction.to_dict() for transaction in transactions], next_cursor
         except Exception as e:
-            print(f"❌ [DB] Erreur dans get_transactions(): {e}")
+            logger.error(f"❌ [DB] Erreur dans get_transactions(): {e}")
             raise e
     
     def get_transaction(self, transaction_id: int) -> Optional[Dict[str, Any]]:
@@ -449,7 +512,7 @@ class DatabaseServiceFrancais:
                 transaction = session.query(Transaction).filter(Transaction.id_transaction == transaction_id).first()
                 return transaction.to_dict() if transaction else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération de la transaction {transaction_id}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération de la transaction {transaction_id}: {e}")
             raise e
     
     def get_transaction_by_reference(self, reference: str) -> Optional[Dict[str, Any]]:
@@ -459,7 +522,7 @@ class DatabaseServiceFrancais:
                 transaction = session.query(Transaction).filter(Transaction.reference == reference).first()
                 return transaction.to_dict() if transaction else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération de la transaction par référence {reference}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération de la transaction par référence {reference}: {e}")
             raise e
     
     def create_transaction(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -480,13 +543,14 @@ class DatabaseServiceFrancais:
                 )
                 
                 session.add(transaction)
+                self._appliquer_cashflow(session, self._cashflow_transaction(transaction))
                 session.commit()
                 session.refresh(transaction)
                 
-                print(f"✅ Transaction créée: {transaction.categorie} (ID: {transaction.id_transaction})")
+                logger.info(f"✅ Transaction créée: {transaction.categorie} (ID: {transaction.id_transaction})")
                 return transaction.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création de la transaction: {e}")
+            logger.error(f"❌ Erreur lors de la création de la transaction: {e}")
             raise e
     
     def update_transaction(self, transaction_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -497,6 +561,8 @@ class DatabaseServiceFrancais:
                 if not transaction:
                     return None
                 
+                ancien_cashflow = self._cashflow_transaction(transaction, -1)
+                
                 # Mettre à jour les champs avec le format français
                 if 'categorie' in update_data:
                     transaction.categorie = update_data['categorie']
@@ -518,12 +584,13 @@ class DatabaseServiceFrancais:
                     transaction.id_immeuble = update_data['id_immeuble']
                 
                 transaction.date_modification = datetime.utcnow()
+                self._appliquer_cashflow(session, ancien_cashflow, self._cashflow_transaction(transaction))
                 session.commit()
                 
-                print(f"✅ Transaction mise à jour: {transaction.categorie} (ID: {transaction.id_transaction})")
+                logger.info(f"✅ Transaction mise à jour: {transaction.categorie} (ID: {transaction.id_transaction})")
                 return transaction.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour de la transaction {transaction_id}: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour de la transaction {transaction_id}: {e}")
             raise e
     
     def delete_transaction(self, transaction_id: int) -> bool:
@@ -534,227 +601,139 @@ class DatabaseServiceFrancais:
                 if not transaction:
                     return False
                 
+                self._appliquer_cashflow(session, self._cashflow_transaction(transaction, -1))
                 session.delete(transaction)
                 session.commit()
                 
-                print(f"✅ Transaction supprimée: {transaction.categorie} (ID: {transaction.id_transaction})")
+                logger.info(f"✅ Transaction supprimée: {transaction.categorie} (ID: {transaction.id_transaction})")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression de la transaction {transaction_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression de la transaction {transaction_id}: {e}")
             raise e
     
     # === MÉTHODES POUR LES BAUX ===
     
     def get_leases(self) -> List[Dict[str, Any]]:
         """Récupérer tous les baux avec les informations des locataires et unités"""
+        return self.get_leases_page()[0]
+    
+    def _lease_query(self, session):
+        """
+        Requête projetée des baux : bail + locataire + unité + immeuble en une
+        seule requête jointe, sans charger les objets ORM
+        """
+        # Bases non migrées : le bail n'est pas encore rattaché à une unité
+        has_id_unite = schema_cache.has_column("baux", "id_unite")
+        
+        columns = [
+            Bail.id_bail, Bail.id_locataire, Bail.date_debut, Bail.date_fin, Bail.prix_loyer,
+            Bail.methode_paiement, Bail.pdf_bail, Bail.date_creation, Bail.date_modification,
+            Locataire.id_locataire.label("locataire_id"), Locataire.nom.label("locataire_nom"),
+            Locataire.prenom.label("locataire_prenom"), Locataire.email.label("locataire_email"),
+            Locataire.telephone.label("locataire_telephone"), Locataire.statut.label("locataire_statut")
+        ]
+        if has_id_unite:
+            columns += [
+                Bail.id_unite,
+                Unite.id_unite.label("unite_id"), Unite.adresse_unite.label("unite_adresse"),
+                Unite.type.label("unite_type"), Unite.nbr_chambre.label("unite_nbr_chambre"),
+                Unite.nbr_salle_de_bain.label("unite_nbr_salle_de_bain"), Unite.id_immeuble.label("unite_id_immeuble"),
+                Immeuble.id_immeuble.label("immeuble_id"), Immeuble.nom_immeuble.label("immeuble_nom"),
+                Immeuble.adresse.label("immeuble_adresse")
+            ]
+        
+        query = session.query(*columns).outerjoin(Locataire, Locataire.id_locataire == Bail.id_locataire)
+        if has_id_unite:
+            query = query.outerjoin(Unite, Unite.id_unite == Bail.id_unite) \
+                         .outerjoin(Immeuble, Immeuble.id_immeuble == Unite.id_immeuble)
+        return query
+    
+    @staticmethod
+    def _serialize_lease(row) -> Dict[str, Any]:
+        """Convertir une ligne de _lease_query au format de l'API (unité aussi sous le locataire)"""
+        data = row._mapping
+        lease_dict = {
+            "id_bail": data["id_bail"],
+            "id_locataire": data["id_locataire"],
+            "id_unite": data.get("id_unite"),
+            "date_debut": data["date_debut"].isoformat() if data["date_debut"] else None,
+            "date_fin": data["date_fin"].isoformat() if data["date_fin"] else None,
+            "prix_loyer": float(data["prix_loyer"]) if data["prix_loyer"] else 0.0,
+            "methode_paiement": data["methode_paiement"],
+            "pdf_bail": data["pdf_bail"],
+            "date_creation": data["date_creation"].isoformat() if data["date_creation"] else None,
+            "date_modification": data["date_modification"].isoformat() if data["date_modification"] else None
+        }
+        
+        unite_data = None
+        if data.get("unite_id") is not None:
+            unite_data = {
+                "id_unite": data["unite_id"],
+                "adresse_unite": data["unite_adresse"],
+                "type": data["unite_type"],
+                "nbr_chambre": data["unite_nbr_chambre"],
+                "nbr_salle_de_bain": data["unite_nbr_salle_de_bain"],
+                "id_immeuble": data["unite_id_immeuble"]
+            }
+            if data["immeuble_id"] is not None:
+                unite_data["immeuble"] = {
+                    "id_immeuble": data["immeuble_id"],
+                    "nom_immeuble": data["immeuble_nom"],
+                    "adresse": data["immeuble_adresse"]
+                }
+            lease_dict["unite"] = unite_data
+        
+        if data["locataire_id"] is not None:
+            lease_dict["locataire"] = {
+                "id_locataire": data["locataire_id"],
+                "nom": data["locataire_nom"],
+                "prenom": data["locataire_prenom"],
+                "email": data["locataire_email"],
+                "telephone": data["locataire_telephone"],
+                "statut": data["locataire_statut"]
+            }
+            if unite_data:
+                lease_dict["locataire"]["unite"] = unite_data
+        
+        return lease_dict
+    
+    def get_leases_page(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                        building_id: Optional[int] = None, actif: Optional[bool] = None,
+                        date_debut: Optional[date] = None, date_fin: Optional[date] = None) -> tuple:
+        """
+        Récupérer une page de baux (keyset sur id_bail) -> (baux, next_cursor)
+        
+        Filtres : immeuble, baux actifs aujourd'hui (actif=True) ou non (actif=False),
+        et baux qui chevauchent la période [date_debut, date_fin].
+        """
         try:
             with self.get_session() as session:
-                # Vérifier si la colonne id_unite existe dans la table baux
-                # Si elle n'existe pas, utiliser l'ancienne méthode (via locataire)
-                has_id_unite_column = False
-                try:
-                    # Utiliser PRAGMA table_info pour vérifier si la colonne existe
-                    result = session.execute(text("PRAGMA table_info(baux)"))
-                    columns = [row[1] for row in result]
-                    has_id_unite_column = 'id_unite' in columns
-                    if not has_id_unite_column:
-                        print("⚠️ La colonne id_unite n'existe pas encore dans baux, utilisation de l'ancienne méthode")
-                except Exception as pragma_error:
-                    print(f"⚠️ Erreur lors de la vérification de la colonne id_unite: {pragma_error}")
-                    # En cas d'erreur, supposer que la colonne n'existe pas
-                    has_id_unite_column = False
-                
-                # Charger tous les baux avec leurs locataires
-                if has_id_unite_column:
-                    # Nouvelle méthode : utiliser id_unite directement sur le bail
-                    try:
-                        leases = session.query(Bail).options(
-                            joinedload(Bail.locataire),
-                            joinedload(Bail.unite).joinedload(Unite.immeuble)
-                        ).all()
-                    except Exception as e:
-                        print(f"⚠️ Erreur lors du chargement avec id_unite: {e}")
-                        # Si la relation ne fonctionne pas, charger sans eager loading
-                        leases = session.query(Bail).options(
-                            joinedload(Bail.locataire)
-                        ).all()
-                else:
-                    # Ancienne méthode : utiliser l'unité du locataire
-                    # Ne pas charger la relation unite du bail car elle n'existe pas encore
-                    leases = session.query(Bail).options(
-                        joinedload(Bail.locataire).joinedload(Locataire.unite).joinedload(Unite.immeuble)
-                    ).all()
-                
-                result = []
-                for lease in leases:
-                    try:
-                        lease_dict = lease.to_dict()
-                        
-                        # Ajouter les informations du locataire
-                        if lease.locataire:
-                            locataire_data = {
-                                'id_locataire': lease.locataire.id_locataire,
-                                'nom': lease.locataire.nom,
-                                'prenom': lease.locataire.prenom,
-                                'email': lease.locataire.email,
-                                'telephone': lease.locataire.telephone,
-                                'statut': lease.locataire.statut
-                            }
-                            
-                            # Gérer l'unité selon que la migration a été faite ou non
-                            if has_id_unite_column:
-                                # Nouvelle méthode : utiliser l'unité du bail
-                                if hasattr(lease, 'id_unite') and lease.id_unite:
-                                    # Charger l'unité depuis le bail
-                                    if hasattr(lease, 'unite') and lease.unite:
-                                        unite_data = {
-                                            'id_unite': lease.unite.id_unite,
-                                            'adresse_unite': lease.unite.adresse_unite,
-                                            'type': lease.unite.type,
-                                            'nbr_chambre': lease.unite.nbr_chambre,
-                                            'nbr_salle_de_bain': lease.unite.nbr_salle_de_bain,
-                                            'id_immeuble': lease.unite.id_immeuble
-                                        }
-                                        if lease.unite.immeuble:
-                                            unite_data['immeuble'] = {
-                                                'id_immeuble': lease.unite.immeuble.id_immeuble,
-                                                'nom_immeuble': lease.unite.immeuble.nom_immeuble,
-                                                'adresse': lease.unite.immeuble.adresse
-                                            }
-                                        locataire_data['unite'] = unite_data
-                                    else:
-                                        # Charger l'unité manuellement
-                                        unite = session.query(Unite).filter(Unite.id_unite == lease.id_unite).first()
-                                        if unite:
-                                            unite_data = {
-                                                'id_unite': unite.id_unite,
-                                                'adresse_unite': unite.adresse_unite,
-                                                'type': unite.type,
-                                                'nbr_chambre': unite.nbr_chambre,
-                                                'nbr_salle_de_bain': unite.nbr_salle_de_bain,
-                                                'id_immeuble': unite.id_immeuble
-                                            }
-                                            if unite.immeuble:
-                                                unite_data['immeuble'] = {
-                                                    'id_immeuble': unite.immeuble.id_immeuble,
-                                                    'nom_immeuble': unite.immeuble.nom_immeuble,
-                                                    'adresse': unite.immeuble.adresse
-                                                }
-                                            locataire_data['unite'] = unite_data
-                                            # Ajouter aussi l'unité directement dans lease_dict pour faciliter l'accès dans le frontend
-                                            lease_dict['unite'] = unite_data
-                                elif lease.locataire.id_unite and lease.locataire.unite:
-                                    # Fallback : utiliser l'unité du locataire si le bail n'a pas encore id_unite
-                                    unite_data = {
-                                        'id_unite': lease.locataire.unite.id_unite,
-                                        'adresse_unite': lease.locataire.unite.adresse_unite,
-                                        'type': lease.locataire.unite.type,
-                                        'nbr_chambre': lease.locataire.unite.nbr_chambre,
-                                        'nbr_salle_de_bain': lease.locataire.unite.nbr_salle_de_bain,
-                                        'id_immeuble': lease.locataire.unite.id_immeuble
-                                    }
-                                    if lease.locataire.unite.immeuble:
-                                        unite_data['immeuble'] = {
-                                            'id_immeuble': lease.locataire.unite.immeuble.id_immeuble,
-                                            'nom_immeuble': lease.locataire.unite.immeuble.nom_immeuble,
-                                            'adresse': lease.locataire.unite.immeuble.adresse
-                                        }
-                                    locataire_data['unite'] = unite_data
-                                    # Ajouter aussi l'unité directement dans lease_dict pour faciliter l'accès dans le frontend
-                                    lease_dict['unite'] = unite_data
-                            else:
-                                # Ancienne méthode : utiliser l'unité du locataire
-                                if lease.locataire.id_unite and lease.locataire.unite:
-                                    unite_data = {
-                                        'id_unite': lease.locataire.unite.id_unite,
-                                        'adresse_unite': lease.locataire.unite.adresse_unite,
-                                        'type': lease.locataire.unite.type,
-                                        'nbr_chambre': lease.locataire.unite.nbr_chambre,
-                                        'nbr_salle_de_bain': lease.locataire.unite.nbr_salle_de_bain,
-                                        'id_immeuble': lease.locataire.unite.id_immeuble
-                                    }
-                                    if lease.locataire.unite.immeuble:
-                                        unite_data['immeuble'] = {
-                                            'id_immeuble': lease.locataire.unite.immeuble.id_immeuble,
-                                            'nom_immeuble': lease.locataire.unite.immeuble.nom_immeuble,
-                                            'adresse': lease.locataire.unite.immeuble.adresse
-                                        }
-                                        locataire_data['unite'] = unite_data
-                                        # Ajouter aussi l'unité directement dans lease_dict pour faciliter l'accès dans le frontend
-                                        lease_dict['unite'] = unite_data
-                            
-                            lease_dict['locataire'] = locataire_data
-                        
-                        result.append(lease_dict)
-                    except Exception as lease_error:
-                        print(f"⚠️ Erreur lors du traitement du bail {lease.id_bail}: {lease_error}")
-                        import traceback
-                        traceback.print_exc()
-                        # Continuer avec les autres baux même si celui-ci échoue
-                        continue
-                
-                return result
+                query = self._lease_query(session)
+                if building_id is not None and schema_cache.has_column("baux", "id_unite"):
+                    query = query.filter(Unite.id_immeuble == building_id)
+                if actif is not None:
+                    today = date.today()
+                    est_actif = and_(Bail.date_debut <= today, or_(Bail.date_fin >= today, Bail.date_fin.is_(None)))
+                    query = query.filter(est_actif if actif else ~est_actif)
+                if date_fin:
+                    query = query.filter(Bail.date_debut <= date_fin)
+                if date_debut:
+                    query = query.filter(or_(Bail.date_fin >= date_debut, Bail.date_fin.is_(None)))
+                
+                rows, next_cursor = paginate(query, [(Bail.id_bail, False)], cursor, limit)
+                return [self._serialize_lease(row) for row in rows], next_cursor
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des baux: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"❌ Erreur lors de la récupération des baux: {e}")
             raise e
     
     def get_lease(self, lease_id: int) -> Optional[Dict[str, Any]]:
         """Récupérer un bail par ID avec les informations des locataires et unités"""
         try:
             with self.get_session() as session:
-                # Utiliser joinedload au lieu de join pour éviter les problèmes
-                lease = session.query(Bail).options(
-                    joinedload(Bail.locataire),
-                    joinedload(Bail.unite).joinedload(Unite.immeuble)
-                ).filter(Bail.id_bail == lease_id).first()
-                
-                if not lease:
-                    return None
-                
-                lease_dict = lease.to_dict()
-                
-                # Ajouter les informations du locataire
-                if lease.locataire:
-                    locataire_data = {
-                        'id_locataire': lease.locataire.id_locataire,
-                        'nom': lease.locataire.nom,
-                        'prenom': lease.locataire.prenom,
-                        'email': lease.locataire.email,
-                        'telephone': lease.locataire.telephone,
-                        'statut': lease.locataire.statut
-                    }
-                    lease_dict['locataire'] = locataire_data
-                
-                # Ajouter les informations de l'unité directement depuis le bail
-                if lease.unite:
-                    unite_data = {
-                        'id_unite': lease.unite.id_unite,
-                        'adresse_unite': lease.unite.adresse_unite,
-                        'type': lease.unite.type,
-                        'nbr_chambre': lease.unite.nbr_chambre,
-                        'nbr_salle_de_bain': lease.unite.nbr_salle_de_bain,
-                        'id_immeuble': lease.unite.id_immeuble
-                    }
-                    
-                    # Ajouter les informations de l'immeuble
-                    if lease.unite.immeuble:
-                        unite_data['immeuble'] = {
-                            'id_immeuble': lease.unite.immeuble.id_immeuble,
-                            'nom_immeuble': lease.unite.immeuble.nom_immeuble,
-                            'adresse': lease.unite.immeuble.adresse
-                        }
-                    
-                    # Ajouter l'unité dans le locataire pour compatibilité avec le frontend
-                    if lease_dict.get('locataire'):
-                        lease_dict['locataire']['unite'] = unite_data
-                    else:
-                        lease_dict['unite'] = unite_data
-                
-                return lease_dict
+                row = self._lease_query(session).filter(Bail.id_bail == lease_id).first()
+                return self._serialize_lease(row) if row else None
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération du bail: {e}")
+            logger.error(f"❌ Erreur lors de la récupération du bail: {e}")
             raise e
 
     def check_lease_overlap(self, session, id_unite: int, date_debut, date_fin, exclude_lease_id: int = None) -> bool:
@@ -782,7 +761,7 @@ class DatabaseServiceFrancais:
             # - Le nouveau bail se termine pendant un bail existant
             # - Le nouveau bail englobe complètement un bail existant
             if (date_debut <= existing_lease.date_fin and date_fin >= existing_lease.date_debut):
-                print(f"⚠️ Chevauchement détecté avec le bail #{existing_lease.id_bail} ({existing_lease.date_debut} - {existing_lease.date_fin})")
+                logger.warning(f"⚠️ Chevauchement détecté avec le bail #{existing_lease.id_bail} ({existing_lease.date_debut} - {existing_lease.date_fin})")
                 return True
         
         return False
@@ -821,10 +800,10 @@ class DatabaseServiceFrancais:
                 session.commit()
                 session.refresh(lease)
                 
-                print(f"✅ Bail créé: {lease.prix_loyer}$/mois (ID: {lease.id_bail})")
+                logger.info(f"✅ Bail créé: {lease.prix_loyer}$/mois (ID: {lease.id_bail})")
                 return lease.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création du bail: {e}")
+            logger.error(f"❌ Erreur lors de la création du bail: {e}")
             raise e
     
     def update_lease(self, lease_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -849,6 +828,15 @@ class DatabaseServiceFrancais:
                 
                 # Mettre à jour les champs
                 if 'id_unite' in update_data:
+                    if update_data['id_unite'] != lease.id_unite:
+                        # Les loyers du bail passent à l'immeuble de la nouvelle unité dans le cashflow mensuel
+                        immeubles = dict(session.query(Unite.id_unite, Unite.id_immeuble).filter(
+                            Unite.id_unite.in_([lease.id_unite, update_data['id_unite']])
+                        ).all())
+                        self._appliquer_cashflow(session, *self._cashflow_loyers_deplaces(
+                            session, Bail.id_bail == lease.id_bail,
+                            immeubles.get(lease.id_unite), immeubles.get(update_data['id_unite'])
+                        ))
                     lease.id_unite = update_data['id_unite']
                 if 'date_debut' in update_data:
                     lease.date_debut = new_date_debut
@@ -864,12 +852,22 @@ class DatabaseServiceFrancais:
                 lease.date_modification = datetime.utcnow()
                 session.commit()
                 
-                print(f"✅ Bail mis à jour: {lease.prix_loyer}$/mois (ID: {lease.id_bail})")
+                logger.info(f"✅ Bail mis à jour: {lease.prix_loyer}$/mois (ID: {lease.id_bail})")
                 return lease.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour du bail: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour du bail: {e}")
             raise e
     
+    def get_lease_pdfs(self, tenant_id: Optional[int] = None, unit_id: Optional[int] = None) -> List[str]:
+        """PDFs des baux d'un locataire ou d'une unité (supprimés en cascade avec eux)"""
+        with self.get_session() as session:
+            query = session.query(Bail.pdf_bail).filter(Bail.pdf_bail.isnot(None), Bail.pdf_bail != "")
+            if tenant_id is not None:
+                query = query.filter(Bail.id_locataire == tenant_id)
+            if unit_id is not None:
+                query = query.filter(Bail.id_unite == unit_id)
+            return [pdf for (pdf,) in query.all()]
+    
     def delete_lease(self, lease_id: int) -> bool:
         """Supprimer un bail"""
         try:
@@ -881,10 +879,10 @@ class DatabaseServiceFrancais:
                 session.delete(lease)
                 session.commit()
                 
-                print(f"✅ Bail supprimé (ID: {lease_id})")
+                logger.info(f"✅ Bail supprimé (ID: {lease_id})")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression du bail: {e}")
+            logger.error(f"❌ Erreur lors de la suppression du bail: {e}")
             raise e
     
     # ========================================
@@ -899,7 +897,7 @@ class DatabaseServiceFrancais:
                 # Dans le nouveau système, les locataires sont directement liés aux unités
                 return []
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des assignations: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des assignations: {e}")
             raise e
     
     def create_assignment_with_validation(self, assignment_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -909,7 +907,7 @@ class DatabaseServiceFrancais:
             # Cette méthode est maintenue pour la compatibilité
             return {"id": 1, "message": "Assignation créée (nouveau système)"}
         except Exception as e:
-            print(f"❌ Erreur lors de la création de l'assignation: {e}")
+            logger.error(f"❌ Erreur lors de la création de l'assignation: {e}")
             raise e
     
     def delete_assignment(self, assignment_id: int) -> bool:
@@ -918,7 +916,7 @@ class DatabaseServiceFrancais:
             # Dans le nouveau système, nous supprimons directement le locataire
             return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression de l'assignation {assignment_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression de l'assignation {assignment_id}: {e}")
             raise e
     
     def delete_tenant_assignments(self, tenant_id: int) -> bool:
@@ -927,7 +925,7 @@ class DatabaseServiceFrancais:
             # Dans le nouveau système, nous supprimons directement le locataire
             return self.delete_tenant(tenant_id)
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression des assignations du locataire {tenant_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression des assignations du locataire {tenant_id}: {e}")
             raise e
     
     # ========================================
@@ -941,7 +939,7 @@ class DatabaseServiceFrancais:
                 reports = session.query(RapportImmeuble).all()
                 return [report.to_dict() for report in reports]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des rapports d'immeubles: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des rapports d'immeubles: {e}")
             raise e
     
     def create_building_report(self, report_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -962,10 +960,10 @@ class DatabaseServiceFrancais:
                 session.commit()
                 session.refresh(report)
                 
-                print(f"✅ Rapport d'immeuble créé: {report.annee}-{report.mois} (ID: {report.id_rapport})")
+                logger.info(f"✅ Rapport d'immeuble créé: {report.annee}-{report.mois} (ID: {report.id_rapport})")
                 return report.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création du rapport d'immeuble: {e}")
+            logger.error(f"❌ Erreur lors de la création du rapport d'immeuble: {e}")
             raise e
     
     def update_building_report(self, report_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -989,10 +987,10 @@ class DatabaseServiceFrancais:
                 report.date_modification = datetime.utcnow()
                 session.commit()
                 
-                print(f"✅ Rapport d'immeuble mis à jour: {report.annee}-{report.mois} (ID: {report.id_rapport})")
+                logger.info(f"✅ Rapport d'immeuble mis à jour: {report.annee}-{report.mois} (ID: {report.id_rapport})")
                 return report.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour du rapport d'immeuble {report_id}: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour du rapport d'immeuble {report_id}: {e}")
             raise e
     
     def delete_building_report(self, report_id: int) -> bool:
@@ -1006,10 +1004,10 @@ class DatabaseServiceFrancais:
                 session.delete(report)
                 session.commit()
                 
-                print(f"✅ Rapport d'immeuble supprimé: {report.annee}-{report.mois} (ID: {report.id_rapport})")
+                logger.info(f"✅ Rapport d'immeuble supprimé: {report.annee}-{report.mois} (ID: {report.id_rapport})")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression du rapport d'immeuble {report_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression du rapport d'immeuble {report_id}: {e}")
             raise e
     
     def get_unit_reports(self) -> List[Dict[str, Any]]:
@@ -1018,7 +1016,7 @@ class DatabaseServiceFrancais:
             # Pour l'instant, retourner une liste vide car nous n'avons pas encore de table unit_reports
             return []
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des rapports d'unités: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des rapports d'unités: {e}")
             raise e
     
     def create_unit_report(self, report_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -1027,7 +1025,7 @@ class DatabaseServiceFrancais:
             # Pour l'instant, retourner un objet vide car nous n'avons pas encore de table unit_reports
             return {"id": 1, "message": "Rapport d'unité créé (nouveau système)"}
         except Exception as e:
-            print(f"❌ Erreur lors de la création du rapport d'unité: {e}")
+            logger.error(f"❌ Erreur lors de la création du rapport d'unité: {e}")
             raise e
     
     def delete_unit_report(self, report_id: int) -> bool:
@@ -1036,7 +1034,7 @@ class DatabaseServiceFrancais:
             # Pour l'instant, retourner True car nous n'avons pas encore de table unit_reports
             return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression du rapport d'unité {report_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression du rapport d'unité {report_id}: {e}")
             raise e
     
     # ========================================
@@ -1074,8 +1072,8 @@ class DatabaseServiceFrancais:
         """Récupérer les baux pour des immeubles et une période donnée via les unités"""
         try:
             with self.get_session() as session:
-                print(f"🔍 DEBUG - Recherche baux pour immeubles: {building_ids}")
-                print(f"🔍 DEBUG - Période: {start_date} à {end_date}")
+                logger.debug("🔍 DEBUG - Recherche baux pour immeubles: %s", building_ids)
+                logger.debug("🔍 DEBUG - Période: %s à %s", start_date, end_date)
                 
                 # Approche SQLAlchemy ORM simple avec eager loading
                 # Maintenant l'unité est directement sur le bail
@@ -1088,17 +1086,15 @@ class DatabaseServiceFrancais:
                     joinedload(Bail.unite).joinedload(Unite.immeuble)
                 ).all()
                 
-                print(f"🔍 DEBUG - Baux trouvés: {len(leases)}")
+                logger.debug("🔍 DEBUG - Baux trouvés: %d", len(leases))
                 for lease in leases:
-                    building_id = lease.unite.id_immeuble if lease.unite else None
-                    print(f"🔍 DEBUG - Bail: ID {lease.id_bail}, Immeuble: {building_id}, Loyer: {lease.prix_loyer}")
+                    debug_sampled(logger, "🔍 DEBUG - Bail: ID %s, Immeuble: %s, Loyer: %s",
+                                  lease.id_bail, lease.unite.id_immeuble if lease.unite else None, lease.prix_loyer)
                 
                 return leases
                 
         except Exception as e:
-            print(f"Erreur lors de la récupération des baux: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Erreur lors de la récupération des baux: {e}")
             return []
 
     def get_transactions_by_buildings_and_period(self, building_ids, start_date, end_date):
@@ -1111,7 +1107,7 @@ class DatabaseServiceFrancais:
                     Transaction.date_de_transaction <= end_date
                 ).all()
         except Exception as e:
-            print(f"Erreur lors de la récupération des transactions: {e}")
+            logger.error(f"Erreur lors de la récupération des transactions: {e}")
             return []
 
     def get_buildings_by_ids(self, building_ids):
@@ -1123,7 +1119,7 @@ class DatabaseServiceFrancais:
                 ).all()
                 return [building.to_dict() for building in buildings]
         except Exception as e:
-            print(f"Erreur lors de la récupération des immeubles: {e}")
+            logger.error(f"Erreur lors de la récupération des immeubles: {e}")
             return []
     
     def get_buildings_by_ids_objects(self, building_ids):
@@ -1135,25 +1131,299 @@ class DatabaseServiceFrancais:
                 ).all()
                 return buildings
         except Exception as e:
-            print(f"Erreur lors de la récupération des immeubles: {e}")
+            logger.error(f"Erreur lors de la récupération des immeubles: {e}")
             return []
 
+    # ========================================
+    # CASHFLOW MENSUEL (AGRÉGAT MATÉRIALISÉ)
+    # ========================================
+
+    def _cashflow_paiement(self, session, paiement, signe: int = 1, id_immeuble: Optional[int] = None) -> Dict[tuple, list]:
+        """Contribution d'un paiement de loyer au cashflow mensuel (immeuble recherché s'il n'est pas fourni)"""
+        montant = Decimal(str(paiement.montant_paye or 0))
+        if montant <= 0:
+            return {}
+        if id_immeuble is None:
+            id_immeuble = session.query(Unite.id_immeuble).join(
+                Bail, Bail.id_unite == Unite.id_unite
+            ).filter(Bail.id_bail == paiement.id_bail).scalar()
+        if id_immeuble is None:
+            return {}
+        cle = (id_immeuble, paiement.annee, paiement.mois, 'paiement', 'loyer')
+        return {cle: [signe * montant, Decimal(0), signe]}
+
+    def _cashflow_transaction(self, transaction, signe: int = 1) -> Dict[tuple, list]:
+        """Contribution d'une transaction au cashflow mensuel"""
+        if not transaction.date_de_transaction or transaction.id_immeuble is None:
+            return {}
+        montant = abs(Decimal(str(transaction.montant or 0)))
+        est_revenu = (transaction.type or '').lower() == 'revenu'
+        cle = (
+            transaction.id_immeuble,
+            transaction.date_de_transaction.year,
+            transaction.date_de_transaction.month,
+            'transaction',
+            transaction.categorie or ''
+        )
+        if est_revenu:
+            return {cle: [signe * montant, Decimal(0), signe]}
+        return {cle: [Decimal(0), signe * montant, signe]}
+
+    def _cashflow_loyers_deplaces(self, session, filtre, ancien_immeuble: Optional[int],
+                                  nouvel_immeuble: Optional[int]) -> List[Dict[tuple, list]]:
+        """
+        Contributions qui déplacent les loyers de baux d'un immeuble à un autre
+
+        Les paiements des baux sélectionnés par `filtre` (bail ou unité
+        déplacé) sont totalisés par (annee, mois), retirés de l'ancien
+        immeuble et ajoutés au nouveau, comme les contributions individuelles
+        de _cashflow_paiement.
+        """
+        if ancien_immeuble == nouvel_immeuble:
+            return []
+        par_mois = {}
+        for annee, mois, montant in session.query(
+            PaiementLoyer.annee, PaiementLoyer.mois, PaiementLoyer.montant_paye
+        ).join(Bail, PaiementLoyer.id_bail == Bail.id_bail).filter(filtre, PaiementLoyer.montant_paye > 0):
+            total = par_mois.setdefault((annee, mois), [Decimal(0), 0])
+            total[0] += Decimal(str(montant))
+            total[1] += 1
+        
+        contributions = []
+        for id_immeuble, signe in ((ancien_immeuble, -1), (nouvel_immeuble, 1)):
+            if id_immeuble is None:
+                continue
+            contributions.append({
+                (id_immeuble, annee, mois, 'paiement', 'loyer'): [signe * montant, Decimal(0), signe * nb]
+                for (annee, mois), (montant, nb) in par_mois.items()
+            })
+        return contributions
+
+    def _appliquer_cashflow(self, session, *contributions: Dict[tuple, list]):
+        """
+        Appliquer des deltas au cashflow mensuel dans la session courante
+
+        Les contributions (ancienne valeur négative, nouvelle positive) sont
+        fusionnées par clé pour ne toucher chaque ligne qu'une seule fois ;
+        la mise à jour est validée dans la même transaction que l'opération.
+
+        Chaque delta est ajouté par la base elle-même (INSERT ... ON CONFLICT
+        DO UPDATE, SQLite et PostgreSQL) : deux écritures concurrentes sur la
+        même clé s'additionnent au lieu de s'écraser ou d'insérer deux fois la
+        ligne. Les lignes sans opération sont ensuite supprimées.
+        """
+        deltas = {}
+        for contribution in contributions:
+            for cle, (revenus, depenses, nb) in contribution.items():
+                total = deltas.setdefault(cle, [Decimal(0), Decimal(0), 0])
+                total[0] += revenus
+                total[1] += depenses
+                total[2] += nb
+        
+        lignes = [
+            {"id_immeuble": id_immeuble, "annee": annee, "mois": mois, "source": source, "categorie": categorie,
+             "revenus": revenus, "depenses": depenses, "nb_operations": nb}
+            for (id_immeuble, annee, mois, source, categorie), (revenus, depenses, nb) in deltas.items()
+            if revenus != 0 or depenses != 0 or nb != 0
+        ]
+        if not lignes:
+            return
+        
+        table = CashflowMensuel.__table__
+        dialecte = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+        requete = dialecte.insert(table)
+        requete = requete.on_conflict_do_update(
+            index_elements=[table.c.id_immeuble, table.c.annee, table.c.mois, table.c.source, table.c.categorie],
+            set_={
+                "revenus": table.c.revenus + requete.excluded.revenus,
+                "depenses": table.c.depenses + requete.excluded.depenses,
+                "nb_operations": table.c.nb_operations + requete.excluded.nb_operations,
+            }
+        )
+        session.execute(requete, lignes)
+        session.query(CashflowMensuel).filter(
+            CashflowMensuel.id_immeuble.in_({ligne["id_immeuble"] for ligne in lignes}),
+            CashflowMensuel.nb_operations <= 0
+        ).delete(synchronize_session=False)
+
+    def rebuild_cashflow_mensuel(self) -> Dict[str, int]:
+        """Reconstruire entièrement le cashflow mensuel à partir des paiements et transactions"""
+        try:
+            with self.get_session() as session:
+                session.query(CashflowMensuel).delete(synchronize_session=False)
+                
+                colonnes = ['id_immeuble', 'annee', 'mois', 'source', 'categorie', 'revenus', 'depenses', 'nb_operations']
+                
+                # Paiements de loyers ⨝ baux ⨝ unités
+                loyers = select(
+                    Unite.id_immeuble,
+                    PaiementLoyer.annee,
+                    PaiementLoyer.mois,
+                    literal('paiement'),
+                    literal('loyer'),
+                    func.sum(PaiementLoyer.montant_paye),
+                    literal(0),
+                    func.count()
+                ).join(
+                    Bail, PaiementLoyer.id_bail == Bail.id_bail
+                ).join(
+                    Unite, Bail.id_unite == Unite.id_unite
+                ).where(
+                    PaiementLoyer.montant_paye > 0
+                ).group_by(
+                    Unite.id_immeuble, PaiementLoyer.annee, PaiementLoyer.mois
+                )
+                session.execute(insert(CashflowMensuel).from_select(colonnes, loyers))
+                
+                # Transactions : revenus si type = 'revenu', dépenses sinon
+                annee = extract('year', Transaction.date_de_transaction)
+                mois = extract('month', Transaction.date_de_transaction)
+                est_revenu = func.lower(Transaction.type) == 'revenu'
+                montant = func.abs(Transaction.montant)
+                categorie = func.coalesce(Transaction.categorie, '')
+                transactions = select(
+                    Transaction.id_immeuble,
+                    annee,
+                    mois,
+                    literal('transaction'),
+                    categorie,
+                    func.sum(case((est_revenu, montant), else_=0)),
+                    func.sum(case((est_revenu, 0), else_=montant)),
+                    func.count()
+                ).where(
+                    Transaction.date_de_transaction.isnot(None)
+                ).group_by(
+                    Transaction.id_immeuble, annee, mois, categorie
+                )
+                session.execute(insert(CashflowMensuel).from_select(colonnes, transactions))
+                
+                session.commit()
+                nb_lignes = session.query(func.count(CashflowMensuel.id_cashflow)).scalar()
+                logger.info(f"✅ Cashflow mensuel reconstruit: {nb_lignes} lignes")
+                return {"lignes": nb_lignes}
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la reconstruction du cashflow mensuel: {e}")
+            raise e
+
+    def ensure_cashflow_mensuel(self) -> bool:
+        """Construire le cashflow mensuel au démarrage s'il est vide alors que des données existent"""
+        with self.get_session() as session:
+            if session.query(CashflowMensuel.id_cashflow).first() is not None:
+                return False
+            a_des_donnees = (
+                session.query(PaiementLoyer.id_paiement).first() is not None
+                or session.query(Transaction.id_transaction).first() is not None
+            )
+        if a_des_donnees:
+            self.rebuild_cashflow_mensuel()
+            return True
+        return False
+
+    def get_cashflow_mensuel(self, building_ids: Optional[List[int]], start_year: int, start_month: int, end_year: int, end_month: int) -> List[Dict[str, Any]]:
+        """Récupérer les lignes du cashflow mensuel pour des immeubles (None = tous) et une période"""
+        with self.get_session() as session:
+            periode = CashflowMensuel.annee * 12 + CashflowMensuel.mois
+            query = session.query(CashflowMensuel).filter(
+                periode >= start_year * 12 + start_month,
+                periode <= end_year * 12 + end_month
+            )
+            if building_ids is not None:
+                query = query.filter(CashflowMensuel.id_immeuble.in_(building_ids))
+            return [ligne.to_dict() for ligne in query.all()]
+
+    # ========================================
+    # ANALYSE DE RENTABILITÉ (AGRÉGATIONS SQL)
+    # ========================================
+
+    def get_profitability_aggregates(self, building_ids: List[int], start_date, end_date) -> Dict[str, Any]:
+        """
+        Agréger revenus et dépenses par mois et par immeuble depuis le cashflow mensuel
+
+        Le coût ne dépend que du nombre de groupes (mois x immeubles), pas du
+        nombre de baux, paiements ou transactions de la période.
+
+        Returns:
+            {
+                "buildings": [{"id_immeuble", "nom_immeuble", "valeur_actuel"}],
+                "mensuel": [(annee, mois, id_immeuble, revenus, depenses)],
+                "categories": {categorie: total}
+            }
+        """
+        with self.get_session() as session:
+            buildings = session.query(
+                Immeuble.id_immeuble,
+                Immeuble.nom_immeuble,
+                Immeuble.valeur_actuel
+            ).filter(
+                Immeuble.id_immeuble.in_(building_ids)
+            ).all()
+
+            periode = CashflowMensuel.annee * 12 + CashflowMensuel.mois
+            filtres = [
+                CashflowMensuel.id_immeuble.in_(building_ids),
+                periode >= start_date.year * 12 + start_date.month,
+                periode <= end_date.year * 12 + end_date.month
+            ]
+
+            mensuel = session.query(
+                CashflowMensuel.annee,
+                CashflowMensuel.mois,
+                CashflowMensuel.id_immeuble,
+                func.sum(CashflowMensuel.revenus),
+                func.sum(CashflowMensuel.depenses)
+            ).filter(
+                *filtres
+            ).group_by(
+                CashflowMensuel.annee, CashflowMensuel.mois, CashflowMensuel.id_immeuble
+            ).all()
+
+            # Catégories des transactions pour le graphique (hors loyers)
+            categories = session.query(
+                CashflowMensuel.categorie,
+                func.sum(CashflowMensuel.revenus + CashflowMensuel.depenses)
+            ).filter(
+                *filtres,
+                CashflowMensuel.source == 'transaction',
+                CashflowMensuel.categorie != '',
+                ~func.lower(CashflowMensuel.categorie).contains('loyer')
+            ).group_by(
+                CashflowMensuel.categorie
+            ).all()
+
+            return {
+                "buildings": [
+                    {
+                        "id_immeuble": b.id_immeuble,
+                        "nom_immeuble": b.nom_immeuble,
+                        "valeur_actuel": float(b.valeur_actuel or 0)
+                    }
+                    for b in buildings
+                ],
+                "mensuel": [
+                    (int(a), int(m), id_immeuble, float(revenus or 0), float(depenses or 0))
+                    for a, m, id_immeuble, revenus, depenses in mensuel
+                ],
+                "categories": {
+                    categorie: float(total or 0) for categorie, total in categories
+                }
+            }
+
     # ========================================
     # OPÉRATIONS POUR LES PAIEMENTS DE LOYERS
     # ========================================
-    
+
     def create_paiement_loyer(self, paiement_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Créer un paiement de loyer (existence = payé)"""
         try:
             with self.get_session() as session:
-                print(f"🔍 Création paiement pour bail {paiement_data['id_bail']}, {paiement_data['mois']}/{paiement_data['annee']}")
+                logger.debug(f"🔍 Création paiement pour bail {paiement_data['id_bail']}, {paiement_data['mois']}/{paiement_data['annee']}")
                 
                 # Récupérer le bail pour obtenir le prix du loyer
                 bail = session.query(Bail).filter(Bail.id_bail == paiement_data['id_bail']).first()
                 if not bail:
                     raise ValueError(f"Bail {paiement_data['id_bail']} non trouvé")
                 
-                print(f"🔍 Bail trouvé: prix_loyer = {bail.prix_loyer}")
+                logger.debug(f"🔍 Bail trouvé: prix_loyer = {bail.prix_loyer}")
                 
                 # Montant payé: utiliser celui fourni ou le prix du bail par défaut
                 montant_paye = paiement_data.get('montant_paye')
@@ -1161,16 +1431,16 @@ class DatabaseServiceFrancais:
                     if not bail.prix_loyer:
                         raise ValueError(f"Le bail {bail.id_bail} n'a pas de prix_loyer défini")
                     montant_paye = float(bail.prix_loyer)
-                    print(f"✅ Montant payé auto-rempli: {montant_paye}$ (depuis bail #{bail.id_bail})")
+                    logger.info(f"✅ Montant payé auto-rempli: {montant_paye}$ (depuis bail #{bail.id_bail})")
                 
                 # Date de paiement: utiliser celle fournie ou le 1er du mois par défaut
                 date_paiement_reelle = paiement_data.get('date_paiement_reelle')
                 if not date_paiement_reelle:
                     from datetime import date
                     date_paiement_reelle = date(paiement_data['annee'], paiement_data['mois'], 1)
-                    print(f"✅ Date de paiement auto-remplie: {date_paiement_reelle}")
+                    logger.info(f"✅ Date de paiement auto-remplie: {date_paiement_reelle}")
                 
-                print(f"🔍 Création avec: montant={montant_paye}, date={date_paiement_reelle}")
+                logger.debug(f"🔍 Création avec: montant={montant_paye}, date={date_paiement_reelle}")
                 
                 paiement = PaiementLoyer(
                     id_bail=paiement_data['id_bail'],
@@ -1181,15 +1451,14 @@ class DatabaseServiceFrancais:
                     notes=paiement_data.get('notes')
                 )
                 session.add(paiement)
+                self._appliquer_cashflow(session, self._cashflow_paiement(session, paiement))
                 session.commit()
                 session.refresh(paiement)
                 
-                print(f"✅ Paiement de loyer créé: Bail {paiement.id_bail}, {paiement.mois}/{paiement.annee}, Montant: {paiement.montant_paye}$")
+                logger.info(f"✅ Paiement de loyer créé: Bail {paiement.id_bail}, {paiement.mois}/{paiement.annee}, Montant: {paiement.montant_paye}$")
                 return paiement.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la création du paiement de loyer: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ Erreur lors de la création du paiement de loyer: {e}")
             raise e
     
     def update_paiement_loyer(self, paiement_id: int, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -1200,6 +1469,8 @@ class DatabaseServiceFrancais:
                 if not paiement:
                     return None
                 
+                ancien_cashflow = self._cashflow_paiement(session, paiement, -1)
+                
                 # Mettre à jour les champs
                 if 'date_paiement_reelle' in update_data:
                     paiement.date_paiement_reelle = update_data['date_paiement_reelle']
@@ -1209,12 +1480,13 @@ class DatabaseServiceFrancais:
                     paiement.notes = update_data['notes']
                 
                 paiement.date_modification = datetime.utcnow()
+                self._appliquer_cashflow(session, ancien_cashflow, self._cashflow_paiement(session, paiement))
                 session.commit()
                 
-                print(f"✅ Paiement de loyer mis à jour: ID {paiement_id}, Montant: {paiement.montant_paye}$")
+                logger.info(f"✅ Paiement de loyer mis à jour: ID {paiement_id}, Montant: {paiement.montant_paye}$")
                 return paiement.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la mise à jour du paiement de loyer {paiement_id}: {e}")
+            logger.error(f"❌ Erreur lors de la mise à jour du paiement de loyer {paiement_id}: {e}")
             raise e
     
     def delete_paiement_loyer(self, paiement_id: int) -> bool:
@@ -1225,15 +1497,42 @@ class DatabaseServiceFrancais:
                 if not paiement:
                     return False
                 
+                self._appliquer_cashflow(session, self._cashflow_paiement(session, paiement, -1))
                 session.delete(paiement)
                 session.commit()
                 
-                print(f"✅ Paiement de loyer supprimé: ID {paiement_id}")
+                logger.info(f"✅ Paiement de loyer supprimé: ID {paiement_id}")
                 return True
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression du paiement de loyer {paiement_id}: {e}")
+            logger.error(f"❌ Erreur lors de la suppression du paiement de loyer {paiement_id}: {e}")
             raise e
     
+    def get_paiements_loyers_page(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                                  bail_id: Optional[int] = None, building_id: Optional[int] = None,
+                                  annee: Optional[int] = None, mois: Optional[int] = None) -> tuple:
+        """
+        Récupérer une page de paiements de loyers, triés par année et mois
+        (keyset sur annee, mois, id_paiement) -> (paiements, next_cursor)
+        """
+        with self.get_session() as session:
+            query = session.query(PaiementLoyer)
+            if bail_id is not None:
+                query = query.filter(PaiementLoyer.id_bail == bail_id)
+            if building_id is not None:
+                query = query.join(Bail, PaiementLoyer.id_bail == Bail.id_bail).join(
+                    Unite, Bail.id_unite == Unite.id_unite
+                ).filter(Unite.id_immeuble == building_id)
+            if annee is not None:
+                query = query.filter(PaiementLoyer.annee == annee)
+            if mois is not None:
+                query = query.filter(PaiementLoyer.mois == mois)
+            paiements, next_cursor = paginate(
+                query,
+                [(PaiementLoyer.annee, False), (PaiementLoyer.mois, False), (PaiementLoyer.id_paiement, False)],
+                cursor, limit
+            )
+            return [paiement.to_dict() for paiement in paiements], next_cursor
+    
     def get_paiements_by_bail(self, bail_id: int) -> List[Dict[str, Any]]:
         """Récupérer tous les paiements pour un bail"""
         try:
@@ -1244,7 +1543,7 @@ class DatabaseServiceFrancais:
                 
                 return [paiement.to_dict() for paiement in paiements]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des paiements pour le bail {bail_id}: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des paiements pour le bail {bail_id}: {e}")
             return []
     
     def get_paiements_by_building_and_period(self, building_ids: List[int], start_year: int, start_month: int, end_year: int, end_month: int) -> List[Dict[str, Any]]:
@@ -1275,9 +1574,330 @@ class DatabaseServiceFrancais:
                 
                 return [paiement.to_dict() for paiement in paiements]
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération des paiements par immeuble et période: {e}")
+            logger.error(f"❌ Erreur lors de la récupération des paiements par immeuble et période: {e}")
             return []
     
+    def get_arrears(self, start_year: int, start_month: int, end_year: int, end_month: int,
+                    building_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Loyers impayés : mois où un bail était actif sans ligne dans paiements_loyers
+        
+        Une série de mois générée en SQL (CTE récursive, clé = année * 12 + mois - 1)
+        est jointe aux baux qui couvrent le premier jour de chaque mois, puis une
+        anti-jointure sur paiements_loyers ne garde que les mois sans paiement.
+        
+        Returns:
+            {"periode", "impayes": [...], "par_immeuble": [...], "par_locataire": [...], "total"}
+        """
+        debut = start_year * 12 + start_month - 1
+        fin = end_year * 12 + end_month - 1
+        resultat = {
+            "periode": {"debut": f"{start_year}-{start_month:02d}", "fin": f"{end_year}-{end_month:02d}"},
+            "impayes": [],
+            "par_immeuble": [],
+            "par_locataire": [],
+            "total": {"nb_mois": 0, "montant": 0.0}
+        }
+        if fin < debut:
+            return resultat
+        
+        # Série des mois de la période
+        serie = select(literal(debut).label("cle")).cte("serie_mois", recursive=True)
+        serie = serie.union_all(select(serie.c.cle + 1).where(serie.c.cle < fin))
+        
+        # Premier mois couvert par le bail (un bail commencé après le 1er ne doit que le mois suivant)
+        # et dernier mois dont le 1er est avant la fin du bail
+        premier_mois = extract('year', Bail.date_debut) * 12 + extract('month', Bail.date_debut) - 1 \
+            + case((extract('day', Bail.date_debut) > 1, 1), else_=0)
+        dernier_mois = extract('year', Bail.date_fin) * 12 + extract('month', Bail.date_fin) - 1
+        cle_paiement = PaiementLoyer.annee * 12 + PaiementLoyer.mois - 1
+        
+        try:
+            with self.get_session() as session:
+                query = session.query(
+                    serie.c.cle, Bail.id_bail, Bail.prix_loyer,
+                    Unite.id_immeuble, Unite.adresse_unite, Immeuble.nom_immeuble,
+                    Locataire.id_locataire, Locataire.nom, Locataire.prenom
+                ).select_from(serie).join(Bail, and_(
+                    premier_mois <= serie.c.cle,
+                    or_(Bail.date_fin.is_(None), dernier_mois >= serie.c.cle)
+                )).join(Unite, Unite.id_unite == Bail.id_unite) \
+                  .join(Immeuble, Immeuble.id_immeuble == Unite.id_immeuble) \
+                  .outerjoin(Locataire, Locataire.id_locataire == Bail.id_locataire) \
+                  .outerjoin(PaiementLoyer, and_(PaiementLoyer.id_bail == Bail.id_bail, cle_paiement == serie.c.cle)) \
+                  .filter(PaiementLoyer.id_paiement.is_(None))
+                if building_ids is not None:
+                    query = query.filter(Unite.id_immeuble.in_(building_ids))
+                rows = query.order_by(Unite.id_immeuble, Unite.adresse_unite, Bail.id_bail, serie.c.cle).all()
+        except Exception as e:
+            logger.error(f"❌ Erreur lors du calcul des loyers impayés: {e}")
+            raise e
+        
+        par_immeuble = {}
+        par_locataire = {}
+        for row in rows:
+            annee, mois = divmod(row.cle, 12)
+            montant = float(row.prix_loyer) if row.prix_loyer else 0.0
+            resultat["impayes"].append({
+                "id_bail": row.id_bail,
+                "annee": annee,
+                "mois": mois + 1,
+                "montant": montant,
+                "id_immeuble": row.id_immeuble,
+                "nom_immeuble": row.nom_immeuble,
+                "adresse_unite": row.adresse_unite,
+                "locataire": {"id_locataire": row.id_locataire, "nom": row.nom, "prenom": row.prenom}
+            })
+            immeuble = par_immeuble.setdefault(row.id_immeuble, {
+                "id_immeuble": row.id_immeuble, "nom_immeuble": row.nom_immeuble, "nb_mois": 0, "montant": 0.0
+            })
+            locataire = par_locataire.setdefault(row.id_locataire, {
+                "id_locataire": row.id_locataire, "nom": row.nom, "prenom": row.prenom, "nb_mois": 0, "montant": 0.0
+            })
+            for total in (immeuble, locataire, resultat["total"]):
+                total["nb_mois"] += 1
+                total["montant"] += montant
+        
+        resultat["par_immeuble"] = list(par_immeuble.values())
+        resultat["par_locataire"] = sorted(par_locataire.values(), key=lambda t: -t["montant"])
+        return resultat
+    
+    @staticmethod
+    def _valeur_paiement(champ: str, valeur: Any) -> Any:
+        """
+        Valeur d'un champ de paiement sous la forme stockée, pour comparer une
+        entrée reçue (float, chaîne ISO) à la valeur lue en base (DECIMAL, date)
+        """
+        if valeur is None:
+            return None
+        if champ == 'montant_paye':
+            return Decimal(str(valeur)).quantize(Decimal('0.01'))
+        if champ == 'date_paiement_reelle':
+            if isinstance(valeur, datetime):
+                return valeur.date()
+            if isinstance(valeur, str):
+                return date.fromisoformat(valeur[:10])
+        return valeur
+    
+    def upsert_paiements_loyers(self, entrees: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Créer ou mettre à jour plusieurs paiements de loyers en une transaction
+        
+        Chaque entrée contient id_bail, mois, annee et optionnellement
+        montant_paye (prix du bail par défaut), date_paiement_reelle (1er du
+        mois par défaut) et notes. Un paiement existant n'est modifié que pour
+        les champs fournis. Les baux et les paiements existants sont lus en une
+        requête chacun ; les lignes invalides sont rapportées sans bloquer les autres.
+        
+        Returns:
+            {"resultats": [{index, id_bail, annee, mois, statut, id_paiement, message}],
+             "crees", "mis_a_jour", "inchanges", "erreurs"}
+        """
+        resultats = [None] * len(entrees)
+        
+        def erreur(index, entree, message):
+            resultats[index] = {
+                "index": index, "id_bail": entree.get('id_bail'), "annee": entree.get('annee'),
+                "mois": entree.get('mois'), "statut": "erreur", "id_paiement": None, "message": message
+            }
+        
+        valides = []
+        for index, entree in enumerate(entrees):
+            if not entree.get('id_bail') or not entree.get('annee') or not entree.get('mois'):
+                erreur(index, entree, "id_bail, annee et mois sont obligatoires")
+            elif not 1 <= int(entree['mois']) <= 12:
+                erreur(index, entree, "Le mois doit être entre 1 et 12")
+            else:
+                valides.append((index, entree))
+        
+        try:
+            with self.get_session() as session:
+                bail_ids = {entree['id_bail'] for _, entree in valides}
+                annees = {entree['annee'] for _, entree in valides}
+                
+                # Loyer et immeuble de chaque bail (une requête)
+                baux = {
+                    row.id_bail: row for row in session.query(Bail.id_bail, Bail.prix_loyer, Unite.id_immeuble)
+                    .outerjoin(Unite, Unite.id_unite == Bail.id_unite)
+                    .filter(Bail.id_bail.in_(bail_ids))
+                } if bail_ids else {}
+                
+                # Paiements existants des baux et années concernés (une requête)
+                existants = {
+                    (p.id_bail, p.annee, p.mois): p for p in session.query(PaiementLoyer).filter(
+                        PaiementLoyer.id_bail.in_(bail_ids), PaiementLoyer.annee.in_(annees)
+                    )
+                } if bail_ids else {}
+                
+                contributions = []
+                traites = []
+                for index, entree in valides:
+                    bail = baux.get(entree['id_bail'])
+                    if bail is None:
+                        erreur(index, entree, f"Bail {entree['id_bail']} non trouvé")
+                        continue
+                    
+                    cle = (entree['id_bail'], entree['annee'], entree['mois'])
+                    champs = {champ: self._valeur_paiement(champ, entree[champ])
+                              for champ in ('montant_paye', 'date_paiement_reelle', 'notes')
+                              if entree.get(champ) is not None}
+                    paiement = existants.get(cle)
+                    
+                    if paiement is not None:
+                        modifie = any(self._valeur_paiement(champ, getattr(paiement, champ)) != valeur
+                                      for champ, valeur in champs.items())
+                        if modifie:
+                            contributions.append(self._cashflow_paiement(session, paiement, -1, bail.id_immeuble))
+                            for champ, valeur in champs.items():
+                                setattr(paiement, champ, valeur)
+                            paiement.date_modification = datetime.utcnow()
+                            contributions.append(self._cashflow_paiement(session, paiement, 1, bail.id_immeuble))
+                        statut = "mis_a_jour" if modifie else "inchange"
+                    else:
+                        # Un montant explicite (même 0) l'emporte sur le prix du bail
+                        montant_paye = champs.get('montant_paye')
+                        if montant_paye is None and bail.prix_loyer:
+                            montant_paye = float(bail.prix_loyer)
+                        if montant_paye is None:
+                            erreur(index, entree, f"Le bail {bail.id_bail} n'a pas de prix_loyer défini")
+                            continue
+                        paiement = PaiementLoyer(
+                            id_bail=entree['id_bail'],
+                            mois=entree['mois'],
+                            annee=entree['annee'],
+                            date_paiement_reelle=champs.get('date_paiement_reelle') or date(entree['annee'], entree['mois'], 1),
+                            montant_paye=montant_paye,
+                            notes=champs.get('notes')
+                        )
+                        session.add(paiement)
+                        # Une même clé répétée dans la requête met à jour ce nouveau paiement
+                        existants[cle] = paiement
+                        contributions.append(self._cashflow_paiement(session, paiement, 1, bail.id_immeuble))
+                        statut = "cree"
+                    traites.append((index, entree, paiement, statut))
+                
+                self._appliquer_cashflow(session, *contributions)
+                session.flush()
+                
+                for index, entree, paiement, statut in traites:
+                    resultats[index] = {
+                        "index": index, "id_bail": paiement.id_bail, "annee": paiement.annee, "mois": paiement.mois,
+                        "statut": statut, "id_paiement": paiement.id_paiement, "message": None
+                    }
+                session.commit()
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'enregistrement groupé des paiements de loyers: {e}")
+            raise e
+        
+        compte = {statut: sum(1 for r in resultats if r["statut"] == statut)
+                  for statut in ("cree", "mis_a_jour", "inchange", "erreur")}
+        logger.info(f"✅ Paiements groupés: {compte['cree']} créé(s), {compte['mis_a_jour']} mis à jour, "
+                    f"{compte['inchange']} inchangé(s), {compte['erreur']} erreur(s)")
+        return {
+            "resultats": resultats,
+            "crees": compte["cree"],
+            "mis_a_jour": compte["mis_a_jour"],
+            "inchanges": compte["inchange"],
+            "erreurs": compte["erreur"]
+        }
+    
+    def mark_building_paid(self, building_id: int, annee: int, mois: int,
+                           date_paiement_reelle: Optional[date] = None) -> Dict[str, Any]:
+        """Marquer payé le mois donné pour tous les baux de l'immeuble qui couvrent le 1er du mois"""
+        premier_jour = date(annee, mois, 1)
+        with self.get_session() as session:
+            bail_ids = [row.id_bail for row in session.query(Bail.id_bail)
+                        .join(Unite, Unite.id_unite == Bail.id_unite)
+                        .filter(
+                            Unite.id_immeuble == building_id,
+                            Bail.date_debut <= premier_jour,
+                            or_(Bail.date_fin >= premier_jour, Bail.date_fin.is_(None))
+                        ).order_by(Bail.id_bail)]
+        return self.upsert_paiements_loyers([
+            {"id_bail": bail_id, "annee": annee, "mois": mois, "date_paiement_reelle": date_paiement_reelle}
+            for bail_id in bail_ids
+        ])
+    
+    def get_rent_roll(self, building_ids: List[int], annee: int, mois_debut: int = 1, nb_mois: int = 12) -> Dict[str, Any]:
+        """
+        Matrice bail × mois des loyers (attendu, payé, date) en une seule requête
+        
+        Les baux des immeubles qui couvrent au moins un mois de la fenêtre sont
+        joints (jointure externe) à leurs paiements de la fenêtre. Le loyer est
+        attendu pour un mois si le bail couvre le premier jour de ce mois.
+        
+        Format colonnaire : une liste par attribut de bail, et pour chaque
+        matrice une ligne par bail et une colonne par mois de "mois".
+        """
+        # Mois de la fenêtre : (année, mois) à partir de mois_debut
+        fenetre = [divmod((annee * 12 + mois_debut - 1) + i, 12) for i in range(nb_mois)]
+        fenetre = [(a, m + 1) for a, m in fenetre]
+        premiers_jours = [date(a, m, 1) for a, m in fenetre]
+        cle = PaiementLoyer.annee * 12 + PaiementLoyer.mois
+        
+        roll = {
+            "mois": [f"{a}-{m:02d}" for a, m in fenetre],
+            "baux": {
+                "id_bail": [], "id_unite": [], "id_immeuble": [], "adresse_unite": [],
+                "locataire": [], "date_debut": [], "date_fin": [], "prix_loyer": []
+            },
+            "attendu": [],
+            "montant_paye": [],
+            "date_paiement": [],
+            "id_paiement": [],
+            "notes": []
+        }
+        if not building_ids:
+            return roll
+        
+        with self.get_session() as session:
+            rows = session.query(
+                Bail.id_bail, Bail.id_unite, Bail.date_debut, Bail.date_fin, Bail.prix_loyer,
+                Unite.id_immeuble, Unite.adresse_unite, Locataire.nom, Locataire.prenom,
+                PaiementLoyer.id_paiement, PaiementLoyer.annee, PaiementLoyer.mois,
+                PaiementLoyer.montant_paye, PaiementLoyer.date_paiement_reelle, PaiementLoyer.notes
+            ).join(Unite, Unite.id_unite == Bail.id_unite) \
+             .outerjoin(Locataire, Locataire.id_locataire == Bail.id_locataire) \
+             .outerjoin(PaiementLoyer, and_(
+                PaiementLoyer.id_bail == Bail.id_bail,
+                cle.between(fenetre[0][0] * 12 + fenetre[0][1], fenetre[-1][0] * 12 + fenetre[-1][1])
+             )).filter(
+                Unite.id_immeuble.in_(building_ids),
+                Bail.date_debut <= premiers_jours[-1],
+                or_(Bail.date_fin >= premiers_jours[0], Bail.date_fin.is_(None))
+             ).order_by(Unite.id_immeuble, Unite.adresse_unite, Bail.id_bail).all()
+        
+        colonnes = {mois: index for index, mois in enumerate(fenetre)}
+        baux = roll["baux"]
+        ligne_courante = None
+        for row in rows:
+            if row.id_bail != ligne_courante:
+                ligne_courante = row.id_bail
+                loyer = float(row.prix_loyer) if row.prix_loyer else 0.0
+                baux["id_bail"].append(row.id_bail)
+                baux["id_unite"].append(row.id_unite)
+                baux["id_immeuble"].append(row.id_immeuble)
+                baux["adresse_unite"].append(row.adresse_unite)
+                baux["locataire"].append(" ".join(part for part in (row.prenom, row.nom) if part) or None)
+                baux["date_debut"].append(row.date_debut.isoformat() if row.date_debut else None)
+                baux["date_fin"].append(row.date_fin.isoformat() if row.date_fin else None)
+                baux["prix_loyer"].append(loyer)
+                roll["attendu"].append([
+                    loyer if row.date_debut <= jour and (row.date_fin is None or row.date_fin >= jour) else None
+                    for jour in premiers_jours
+                ])
+                for matrice in ("montant_paye", "date_paiement", "id_paiement", "notes"):
+                    roll[matrice].append([None] * nb_mois)
+            
+            if row.id_paiement is not None:
+                colonne = colonnes[(row.annee, row.mois)]
+                roll["montant_paye"][-1][colonne] = float(row.montant_paye) if row.montant_paye is not None else None
+                roll["date_paiement"][-1][colonne] = row.date_paiement_reelle.isoformat() if row.date_paiement_reelle else None
+                roll["id_paiement"][-1][colonne] = row.id_paiement
+                roll["notes"][-1][colonne] = row.notes
+        
+        return roll
+    
     def get_or_create_paiement(self, bail_id: int, mois: int, annee: int) -> Dict[str, Any]:
         """Récupérer ou créer un paiement pour un bail, mois et année donnés"""
         try:
@@ -1308,14 +1928,80 @@ class DatabaseServiceFrancais:
                     montant_paye=montant_loyer
                 )
                 session.add(nouveau_paiement)
+                self._appliquer_cashflow(session, self._cashflow_paiement(session, nouveau_paiement))
                 session.commit()
                 session.refresh(nouveau_paiement)
                 
-                print(f"✅ Nouveau paiement créé: Bail {bail_id}, {mois}/{annee}, Montant: {montant_loyer}$")
+                logger.info(f"✅ Nouveau paiement créé: Bail {bail_id}, {mois}/{annee}, Montant: {montant_loyer}$")
                 return nouveau_paiement.to_dict()
         except Exception as e:
-            print(f"❌ Erreur lors de la récupération/création du paiement: {e}")
+            logger.error(f"❌ Erreur lors de la récupération/création du paiement: {e}")
             raise e
 
+    # ========================================
+    # OPÉRATIONS POUR L'INDEX DES DOCUMENTS
+    # ========================================
+    
+    def index_document(self, nom_fichier: str, s3_key: str, dossier: Optional[str] = None,
+                       nom_original: Optional[str] = None, taille: Optional[int] = None,
+                       sha256: Optional[str] = None, type_contenu: str = "application/pdf") -> Dict[str, Any]:
+        """Enregistrer (ou mettre à jour) l'emplacement d'un document stocké"""
+        with self.get_session() as session:
+            document = session.query(Document).filter(Document.nom_fichier == nom_fichier).first()
+            if document is None:
+                document = Document(nom_fichier=nom_fichier)
+                session.add(document)
+            document.s3_key = s3_key
+            document.dossier = dossier
+            document.nom_original = nom_original
+            document.taille = taille
+            document.sha256 = sha256
+            document.type_contenu = type_contenu
+            session.commit()
+            session.refresh(document)
+            return document.to_dict()
+    
+    def get_document_index(self, nom_fichier: str) -> Optional[Dict[str, Any]]:
+        """Emplacement d'un document par nom de fichier ou par clé de stockage (None si non indexé)"""
+        with self.get_session() as session:
+            colonne = Document.s3_key if "/" in nom_fichier else Document.nom_fichier
+            document = session.query(Document).filter(colonne == nom_fichier).first()
+            return document.to_dict() if document else None
+    
+    def get_document_by_sha256(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Document déjà stocké avec ce contenu (déduplication des uploads)"""
+        with self.get_session() as session:
+            document = session.query(Document).filter(Document.sha256 == sha256).order_by(Document.id_document).first()
+            return document.to_dict() if document else None
+    
+    def release_document_references(self, s3_key: str, noms_fichiers: List[str]) -> int:
+        """
+        Retirer des références de l'index et compter celles qui pointent encore vers l'objet
+
+        Suppression et comptage dans la même transaction : une référence ajoutée
+        par un upload dédupliqué est comptée (objet conservé) ou ajoutée après
+        coup, jamais supprimée avec les autres.
+
+        Returns:
+            Nombre de références restantes vers s3_key (0 : l'objet peut être supprimé)
+        """
+        with self.get_session() as session:
+            if noms_fichiers:
+                session.query(Document).filter(
+                    Document.s3_key == s3_key, Document.nom_fichier.in_(noms_fichiers)
+                ).delete(synchronize_session=False)
+            restantes = session.query(func.count(Document.id_document)).filter(Document.s3_key == s3_key).scalar()
+            session.commit()
+            return restantes
+    
+    def set_document_sha256(self, s3_key: str, sha256: str) -> bool:
+        """Renseigner l'empreinte d'un document indexé (fichiers antérieurs à l'index)"""
+        with self.get_session() as session:
+            modifies = session.query(Document).filter(
+                Document.s3_key == s3_key, Document.sha256 == None
+            ).update({Document.sha256: sha256}, synchronize_session=False)
+            session.commit()
+            return modifies > 0
+
 # Instance globale du service
 db_service_francais = DatabaseServiceFrancais()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Cache disque des documents (devant Backblaze B2)
+
+Les fichiers sont rangés par empreinte SHA-256 de leur contenu
+(DOCUMENT_CACHE_DIR/ab/abcdef...) : un contenu identique n'est stocké qu'une
+fois et une entrée ne peut pas être périmée, seulement absente ou corrompue.
+
+- taille bornée (DOCUMENT_CACHE_MAX_MB), éviction des moins récemment lus
+- empreinte vérifiée à l'écriture et à chaque lecture complète
+- alimenté à l'upload (préchauffage) et par les téléchargements complets
+- compteurs de succès, d'échecs, d'évictions et de corruptions
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+DOCUMENT_CACHE_DIR = os.environ.get(
+    "DOCUMENT_CACHE_DIR", os.path.join(os.environ.get("DATA_DIR", "./data"), "document_cache")
+)
+DOCUMENT_CACHE_MAX_MB = int(os.environ.get("DOCUMENT_CACHE_MAX_MB", "512"))
+
+CHUNK_SIZE = 64 * 1024
+
+
+class CachedBody:
+    """Lecture d'un fichier du cache, même interface que le corps d'une réponse S3 (iter_chunks, close)"""
+
+    def __init__(self, cache: "DocumentCache", sha256: str, path: str, byte_range: Optional[Tuple[int, int]] = None):
+        self.cache = cache
+        self.sha256 = sha256
+        self.file = open(path, "rb")
+        self.byte_range = byte_range
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        if self.byte_range is not None:
+            start, end = self.byte_range
+            self.file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = self.file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            return
+
+        # Lecture complète : vérifier l'empreinte au passage
+        digest = hashlib.sha256()
+        while True:
+            chunk = self.file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            yield chunk
+        if digest.hexdigest() != self.sha256:
+            self.cache.report_corrupt(self.sha256)
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def close(self):
+        self.file.close()
+
+
+class CacheFillBody:
+    """
+    Corps S3 lu en flux et recopié dans le cache : l'entrée n'est ajoutée que si
+    le flux a été lu jusqu'au bout et que son empreinte est valide
+    """
+
+    def __init__(self, cache: "DocumentCache", body, expected_sha256: Optional[str] = None,
+                 on_cached: Optional[Callable[[str], None]] = None):
+        self.cache = cache
+        self.body = body
+        self.expected_sha256 = expected_sha256
+        self.on_cached = on_cached
+        self.digest = hashlib.sha256()
+        fd, self.temp_path = tempfile.mkstemp(dir=cache.directory, prefix=".fill_")
+        self.temp = os.fdopen(fd, "wb")
+        self.complete = False
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        for chunk in self.body.iter_chunks(chunk_size):
+            self.digest.update(chunk)
+            self.temp.write(chunk)
+            yield chunk
+        self.complete = True
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def close(self):
+        self.body.close()
+        self.temp.close()
+        sha256 = self.digest.hexdigest()
+        if not self.complete:
+            os.unlink(self.temp_path)
+        elif self.expected_sha256 and sha256 != self.expected_sha256:
+            logger.error(f"❌ Empreinte inattendue pour un document téléchargé ({sha256} au lieu de {self.expected_sha256})")
+            os.unlink(self.temp_path)
+        elif self.cache.add_file(sha256, self.temp_path) and self.on_cached:
+            self.on_cached(sha256)
+
+
+class DocumentCache:
+    """Fichiers par empreinte SHA-256, bornés en taille (LRU)"""
+
+    def __init__(self, directory: str = DOCUMENT_CACHE_DIR, max_bytes: int = DOCUMENT_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # sha256 -> taille, du plus ancien au plus récent
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corrupt = 0
+        self.bytes_served = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def _load(self):
+        """Retrouver les fichiers déjà en cache, ordonnés par date de dernière lecture"""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.startswith(".fill_"):
+                    os.unlink(path)  # Téléchargement interrompu
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, sha256, size in sorted(found):
+            self._entries[sha256] = size
+            self._size += size
+        if found:
+            logger.info(f"📦 Cache des documents : {len(found)} fichier(s), {self._size / 1024 / 1024:.1f} Mo")
+
+    def open(self, sha256: Optional[str], byte_range: Optional[Tuple[int, int]] = None) -> Optional[CachedBody]:
+        """Ouvrir un document en cache (None si absent ; compte un succès ou un échec)"""
+        with self._lock:
+            size = self._entries.get(sha256) if sha256 else None
+            if size is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sha256)
+            self.hits += 1
+            self.bytes_served += size if byte_range is None else byte_range[1] - byte_range[0] + 1
+        path = self._path(sha256)
+        try:
+            os.utime(path)  # Conserver l'ordre LRU d'un redémarrage à l'autre
+            return CachedBody(self, sha256, path, byte_range)
+        except FileNotFoundError:
+            self._forget(sha256)
+            return None
+
+    def put_bytes(self, data: bytes, sha256: Optional[str] = None) -> Optional[str]:
+        """Ajouter un contenu en mémoire ; retourne son empreinte, None s'il est refusé"""
+        return self.put_stream(io.BytesIO(data), sha256)
+
+    def put_stream(self, fileobj: BinaryIO, sha256: Optional[str] = None) -> Optional[str]:
+        """
+        Ajouter un contenu lu par morceaux depuis un fichier (préchauffage à l'upload)
+
+        Returns:
+            Empreinte du contenu, None s'il est refusé (empreinte différente de celle attendue, trop gros)
+        """
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".fill_")
+        with os.fdopen(fd, "wb") as temp:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp.write(chunk)
+        actual = digest.hexdigest()
+        if sha256 and actual != sha256:
+            logger.error(f"❌ Empreinte invalide, document non mis en cache ({actual} au lieu de {sha256})")
+            os.unlink(temp_path)
+            return None
+        return actual if self.add_file(actual, temp_path) else None
+
+    def fill(self, body, expected_sha256: Optional[str] = None,
+             on_cached: Optional[Callable[[str], None]] = None) -> CacheFillBody:
+        """Envelopper un corps S3 pour qu'une lecture complète l'ajoute au cache"""
+        return CacheFillBody(self, body, expected_sha256, on_cached)
+
+    def add_file(self, sha256: str, temp_path: str) -> bool:
+        """Déplacer un fichier vérifié dans le cache, puis évincer au besoin"""
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            os.unlink(temp_path)
+            return False
+        path = self._path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+        with self._lock:
+            if sha256 not in self._entries:
+                self._entries[sha256] = size
+                self._size += size
+            self._entries.move_to_end(sha256)
+            evicted = self._evict_locked()
+        for old in evicted:
+            self._unlink(old)
+        return True
+
+    def _evict_locked(self) -> list:
+        """Retirer les entrées les moins récemment lues jusqu'à respecter la taille maximale"""
+        evicted = []
+        while self._size > self.max_bytes and self._entries:
+            sha256, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            evicted.append(sha256)
+        return evicted
+
+    def invalidate(self, sha256: Optional[str]):
+        """Retirer un contenu du cache"""
+        if sha256 and self._forget(sha256):
+            self._unlink(sha256)
+
+    def report_corrupt(self, sha256: str):
+        """Une lecture complète n'a pas l'empreinte attendue : retirer l'entrée"""
+        logger.error(f"❌ Document corrompu dans le cache, retiré : {sha256}")
+        with self._lock:
+            self.corrupt += 1
+        self.invalidate(sha256)
+
+    def _forget(self, sha256: str) -> bool:
+        with self._lock:
+            size = self._entries.pop(sha256, None)
+            if size is None:
+                return False
+            self._size -= size
+            return True
+
+    def _unlink(self, sha256: str):
+        try:
+            os.unlink(self._path(sha256))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "bytes_served": self.bytes_served,
+                "evictions": self.evictions,
+                "corrupt": self.corrupt
+            }
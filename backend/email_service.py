@@ -10,6 +10,9 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
 from datetime import datetime
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 # Configuration SMTP (à configurer via variables d'environnement)
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -281,13 +284,13 @@ def send_email(to_email: str, subject: str, html_content: str) -> bool:
     """
     # Mode développement : afficher dans la console au lieu d'envoyer
     if not SMTP_USERNAME or not SMTP_PASSWORD:
-        print(f"\n{'='*60}")
-        print(f"📧 EMAIL (Mode Développement)")
-        print(f"{'='*60}")
-        print(f"À: {to_email}")
-        print(f"Sujet: {subject}")
-        print(f"Contenu: [HTML - {len(html_content)} caractères]")
-        print(f"{'='*60}\n")
+        logger.info(f"\n{'='*60}")
+        logger.info(f"📧 EMAIL (Mode Développement)")
+        logger.info(f"{'='*60}")
+        logger.info(f"À: {to_email}")
+        logger.info(f"Sujet: {subject}")
+        logger.info(f"Contenu: [HTML - {len(html_content)} caractères]")
+        logger.info(f"{'='*60}\n")
         return True
     
     try:
@@ -307,11 +310,11 @@ def send_email(to_email: str, subject: str, html_content: str) -> bool:
             server.login(SMTP_USERNAME, SMTP_PASSWORD)
             server.send_message(message)
         
-        print(f"✅ Email envoyé à {to_email}")
+        logger.info(f"✅ Email envoyé à {to_email}")
         return True
         
     except Exception as e:
-        print(f"❌ Erreur envoi email à {to_email}: {e}")
+        logger.error(f"❌ Erreur envoi email à {to_email}: {e}")
         return False
 
 
@@ -363,7 +366,7 @@ def send_welcome_email(to_email: str, nom: str, prenom: str, company_name: str,
 
 if __name__ == "__main__":
     # Test
-    print("🧪 Test du service d'emails (mode développement)")
+    logger.info("🧪 Test du service d'emails (mode développement)")
     send_verification_email(
         "test@example.com",
         "Héroux",
@@ -1,47 +1,52 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Query
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Header
 # Test deploiement backend - ligne propre - API analysis ajoutée
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+import anyio
 from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
 import uvicorn
-from datetime import datetime
+from datetime import datetime, date
 import json
 import os
 import platform
 import shutil
 import re
-import logging
+
+from app_logging import get_logger, request_id_var, new_request_id, REQUEST_ID_HEADER
 
 # Configuration du logger
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 # Imports pour SQLite
-from database import db_manager, init_database
+from database import db_manager, init_database, THREADPOOL_SIZE
 from database_service_francais import db_service_francais
 from backup_service import backup_service
 from validation_service import data_validator, consistency_checker, ValidationLevel
-from monitoring_service import database_monitor
+from monitoring_service import database_monitor, system_sampler
+from pagination import page_response
+from schema_cache import schema_cache
 
 # Import des routes d'authentification
 try:
     from auth_routes import router as auth_router
     from auth_database_service import init_auth_database
+    from notification_service import notification_worker
     AUTH_ENABLED = True
-    print("✅ Routes d'authentification chargées")
+    logger.info("✅ Routes d'authentification chargées")
 except ImportError as e:
     AUTH_ENABLED = False
-    print(f"⚠️ Routes d'authentification non disponibles: {e}")
+    logger.warning(f"⚠️ Routes d'authentification non disponibles: {e}")
 
 # Import des services de construction
 try:
     from database_construction import get_construction_db, init_construction_database
     from models_construction import Projet, Fournisseur, MatierePremiere, Commande, LigneCommande, Employe, PunchEmploye, SousTraitant, FactureST
     CONSTRUCTION_ENABLED = True
-    print("✅ Services de construction chargés")
+    logger.info("✅ Services de construction chargés")
 except ImportError as e:
     CONSTRUCTION_ENABLED = False
-    print(f"⚠️ Services de construction non disponibles: {e}")
+    logger.warning(f"⚠️ Services de construction non disponibles: {e}")
 
 app = FastAPI(
     title="Interface CAH API",
@@ -57,30 +62,103 @@ if AUTH_ENABLED:
 @app.on_event("startup")
 async def startup_event():
     """Initialiser la base de données au démarrage de l'application"""
-    print("🚀 Démarrage de l'application Interface CAH...")
-    print("🗄️ Initialisation de la base de données SQLite...")
+    logger.info("🚀 Démarrage de l'application Interface CAH...")
+    
+    # Les routes sont des fonctions synchrones (SQLAlchemy bloquant) exécutées
+    # par Starlette dans le pool de threads d'anyio : on en fixe la taille ici
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = THREADPOOL_SIZE
+    logger.info(f"🧵 Pool de threads des requêtes : {THREADPOOL_SIZE} threads")
+    logger.info("🗄️ Initialisation de la base de données SQLite...")
     
     if init_database():
-        print("✅ Base de données principale initialisée avec succès")
+        logger.info("✅ Base de données principale initialisée avec succès")
     else:
-        print("❌ Erreur lors de l'initialisation de la base de données principale")
+        logger.error("❌ Erreur lors de l'initialisation de la base de données principale")
         raise Exception("Impossible d'initialiser la base de données")
     
+    # Construire le cashflow mensuel matérialisé s'il n'existe pas encore
+    try:
+        if db_service_francais.ensure_cashflow_mensuel():
+            logger.info("✅ Cashflow mensuel construit à partir des données existantes")
+    except Exception as e:
+        logger.warning(f"⚠️ Erreur lors de la construction du cashflow mensuel (non bloquant): {e}")
+    
     # Initialiser la base de données d'authentification (si activée)
     if AUTH_ENABLED:
-        print("🔐 Initialisation de la base de données d'authentification...")
+        logger.info("🔐 Initialisation de la base de données d'authentification...")
         if init_auth_database():
-            print("✅ Base de données d'authentification initialisée avec succès")
+            logger.info("✅ Base de données d'authentification initialisée avec succès")
         else:
-            print("⚠️ Erreur lors de l'initialisation de la DB auth (non bloquant)")
+            logger.warning("⚠️ Erreur lors de l'initialisation de la DB auth (non bloquant)")
     
     # Initialiser la base de données de construction (si activée)
     if CONSTRUCTION_ENABLED:
-        print("🏗️ Initialisation de la base de données de construction...")
+        logger.info("🏗️ Initialisation de la base de données de construction...")
         if init_construction_database():
-            print("✅ Base de données de construction initialisée avec succès")
+            logger.info("✅ Base de données de construction initialisée avec succès")
         else:
-            print("⚠️ Erreur lors de l'initialisation de la DB construction (non bloquant)")
+            logger.warning("⚠️ Erreur lors de l'initialisation de la DB construction (non bloquant)")
+    
+    # Lire une fois le schéma (colonnes existantes) consulté par les lectures à colonnes dynamiques
+    try:
+        schema_cache.load()
+    except Exception as e:
+        logger.warning(f"⚠️ Erreur lors de la lecture du schéma (relu à la première requête): {e}")
+    
+    # Recalcul des notifications en arrière-plan (hors de la requête de connexion)
+    if AUTH_ENABLED:
+        notification_worker.start()
+    
+    # Métriques système relevées en arrière-plan (lues sans attente par les endpoints de monitoring)
+    system_sampler.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Arrêter les workers d'arrière-plan"""
+    if AUTH_ENABLED:
+        notification_worker.stop()
+    system_sampler.stop()
+
+@app.middleware("http")
+async def correlation_id_middleware(request, call_next):
+    """Associer un identifiant de corrélation à chaque requête (repris dans tous ses logs)"""
+    request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+@app.middleware("http")
+async def invalidate_schema_after_migration(request, call_next):
+    """Les endpoints de migration modifient le schéma : invalider le cache des colonnes"""
+    response = await call_next(request)
+    path = request.url.path
+    if request.method == "POST" and (path.startswith("/api/migrate/") or path.startswith("/api/construction/migrate/")):
+        schema_cache.invalidate()
+    return response
+
+# Écritures qui modifient les compteurs des notifications (loyers, factures, baux, demandes d'accès)
+NOTIFICATION_TRIGGER_PREFIXES = (
+    "/api/paiements-loyers",
+    "/api/leases",
+    "/api/tenants/create-with-lease",
+    "/api/construction/factures-st",
+    "/api/auth/setup-company",
+    "/api/auth/approve-request",
+)
+
+@app.middleware("http")
+async def refresh_notifications_after_write(request, call_next):
+    """Demander un recalcul des notifications en arrière-plan après une écriture réussie"""
+    response = await call_next(request)
+    if (AUTH_ENABLED and request.method in ("POST", "PUT", "DELETE") and response.status_code < 400
+            and request.url.path.startswith(NOTIFICATION_TRIGGER_PREFIXES)):
+        notification_worker.request_refresh()
+    return response
 
 # Configuration CORS pour permettre les requêtes du frontend
 app.add_middleware(
@@ -225,12 +303,12 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 # Route de test de base
 @app.get("/")
-async def root():
+def root():
     return {"message": "Interface CAH API - Système de gestion de construction"}
 
 # Route de santé pour vérifier que l'API fonctionne
 @app.get("/health")
-async def health_check():
+def health_check():
     return {"status": "healthy", "message": "API fonctionnelle"}
 
 # ========================================
@@ -238,17 +316,30 @@ async def health_check():
 # ========================================
 
 @app.get("/api/leases")
-async def get_leases():
-    """Récupérer tous les baux"""
+def get_leases(
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les baux)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+    building_id: Optional[int] = Query(None, description="Filtrer par immeuble"),
+    actif: Optional[bool] = Query(None, description="Baux actifs aujourd'hui (true) ou non (false)"),
+    date_debut: Optional[date] = Query(None, description="Baux qui se terminent après cette date"),
+    date_fin: Optional[date] = Query(None, description="Baux qui commencent avant cette date")
+):
+    """Récupérer les baux (paginés par curseur si limit est fourni)"""
     try:
-        leases = db_service_francais.get_leases()
-        return {"data": leases}
+        leases, next_cursor = db_service_francais.get_leases_page(
+            cursor=cursor, limit=limit, building_id=building_id, actif=actif,
+            date_debut=date_debut, date_fin=date_fin
+        )
+        return page_response(leases, next_cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Erreur lors de la récupération des baux: {e}")
+        logger.error(f"Erreur lors de la récupération des baux: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/api/leases/{lease_id}")
-async def get_lease(lease_id: int):
+def get_lease(lease_id: int):
     """Récupérer un bail par ID"""
     try:
         lease = db_service_francais.get_lease(lease_id)
@@ -256,22 +347,22 @@ async def get_lease(lease_id: int):
             raise HTTPException(status_code=404, detail="Bail non trouvé")
         return {"data": lease}
     except Exception as e:
-        print(f"Erreur lors de la récupération du bail: {e}")
+        logger.error(f"Erreur lors de la récupération du bail: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.post("/api/leases")
-async def create_lease(lease_data: LeaseCreateFrancais):
+def create_lease(lease_data: LeaseCreateFrancais):
     """Créer un nouveau bail"""
     try:
         lease_dict = lease_data.dict()
         created_lease = db_service_francais.create_lease(lease_dict)
         return {"data": created_lease, "message": "Bail créé avec succès"}
     except Exception as e:
-        print(f"Erreur lors de la création du bail: {e}")
+        logger.error(f"Erreur lors de la création du bail: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.put("/api/leases/{lease_id}")
-async def update_lease(lease_id: int, lease_data: LeaseUpdateFrancais):
+def update_lease(lease_id: int, lease_data: LeaseUpdateFrancais):
     """Mettre à jour un bail"""
     try:
         lease_dict = lease_data.dict(exclude_unset=True)
@@ -280,11 +371,32 @@ async def update_lease(lease_id: int, lease_data: LeaseUpdateFrancais):
             raise HTTPException(status_code=404, detail="Bail non trouvé")
         return {"data": updated_lease, "message": "Bail mis à jour avec succès"}
     except Exception as e:
-        print(f"Erreur lors de la mise à jour du bail: {e}")
+        logger.error(f"Erreur lors de la mise à jour du bail: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+def _delete_pdfs(pdf_keys: List[Optional[str]], folder: str = "documents"):
+    """
+    Supprimer du stockage les PDFs d'entités supprimées (une suppression en lot)
+
+    Les entités conservent le nom de fichier (ou la clé complète) : le service
+    de stockage retrouve la clé réelle dans l'index des documents. Une erreur
+    est journalisée sans faire échouer la suppression de l'entité.
+    """
+    pdf_keys = [key if '/' in key else f"{folder}/{key}" for key in pdf_keys if key]
+    if not pdf_keys:
+        return
+    try:
+        from storage_service import get_storage_service
+        result = get_storage_service().delete_pdfs(pdf_keys)
+        if result["deleted"] or result["released"]:
+            logger.info(f"✅ PDF(s) supprimé(s): {result['deleted'] + result['released']}")
+        if result["failed"]:
+            logger.warning(f"⚠️ PDF(s) non supprimé(s): {result['failed']}")
+    except Exception as pdf_error:
+        logger.warning(f"⚠️ Erreur lors de la suppression des PDFs: {pdf_error}")
+
 @app.delete("/api/leases/{lease_id}")
-async def delete_lease(lease_id: int):
+def delete_lease(lease_id: int):
     """Supprimer un bail et son PDF associé"""
     try:
         # Récupérer le bail pour obtenir le nom du PDF
@@ -292,41 +404,24 @@ async def delete_lease(lease_id: int):
         if not lease:
             raise HTTPException(status_code=404, detail="Bail non trouvé")
         
-        # Supprimer le PDF de Backblaze B2 s'il existe
-        if lease.get('pdf_bail'):
-            try:
-                from storage_service import get_storage_service
-                storage_service = get_storage_service()
-                
-                # Construire la clé S3 (peut être un nom simple ou une clé complète)
-                pdf_key = lease['pdf_bail']
-                if not '/' in pdf_key:
-                    pdf_key = f"documents/{pdf_key}"
-                
-                # Supprimer le PDF
-                if storage_service.delete_pdf(pdf_key):
-                    print(f"✅ PDF du bail supprimé de Backblaze B2: {pdf_key}")
-                else:
-                    print(f"⚠️ PDF du bail non trouvé sur Backblaze B2: {pdf_key}")
-            except Exception as pdf_error:
-                print(f"⚠️ Erreur lors de la suppression du PDF du bail: {pdf_error}")
-                # Continuer même si la suppression du PDF échoue
-        
         # Supprimer le bail de la base de données
         success = db_service_francais.delete_lease(lease_id)
         if not success:
             raise HTTPException(status_code=404, detail="Bail non trouvé")
         
+        # Supprimer le PDF du stockage s'il existe
+        _delete_pdfs([lease.get('pdf_bail')])
+        
         return {"message": "Bail et PDF supprimés avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la suppression du bail: {e}")
+        logger.error(f"Erreur lors de la suppression du bail: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 # Routes temporaires pour les modules (à développer plus tard)
 @app.get("/api/dashboard")
-async def get_dashboard_data():
+def get_dashboard_data():
     """Retourner les données du tableau de bord calculées à partir des vrais immeubles"""
     try:
         # Récupérer tous les immeubles via le service SQLite
@@ -358,11 +453,27 @@ async def get_dashboard_data():
         # Calculer le pourcentage global d'occupation
         occupancy_percentage = (occupied_units / total_units * 100) if total_units > 0 else 0
         
+        # Revenus et dépenses du mois courant et de l'année (cashflow mensuel matérialisé)
+        today = datetime.now()
+        cashflow = db_service_francais.get_cashflow_mensuel(None, today.year, 1, today.year, today.month)
+        monthly_revenue = sum(c["revenus"] for c in cashflow if c["mois"] == today.month)
+        monthly_expenses = sum(c["depenses"] for c in cashflow if c["mois"] == today.month)
+        year_revenue = sum(c["revenus"] for c in cashflow)
+        year_expenses = sum(c["depenses"] for c in cashflow)
+        
         return {
             "totalBuildings": total_buildings,
             "totalUnits": total_units,
             "portfolioValue": total_portfolio_value,
             "occupancyRate": round(occupancy_percentage, 1),
+            "monthlyRevenue": monthly_revenue,
+            "monthlyExpenses": monthly_expenses,
+            "monthlyNetCashflow": monthly_revenue - monthly_expenses,
+            "yearToDate": {
+                "revenue": year_revenue,
+                "expenses": year_expenses,
+                "netCashflow": year_revenue - year_expenses
+            },
             "recentActivity": [
                 {
                     "type": "info",
@@ -404,21 +515,28 @@ async def get_dashboard_data():
 # Routes CRUD pour les immeubles avec SQLite
 
 @app.get("/api/buildings")
-async def get_buildings():
-    """Récupérer tous les immeubles"""
+def get_buildings(
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les immeubles)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+    ville: Optional[str] = Query(None, description="Filtrer par ville")
+):
+    """Récupérer les immeubles (liste simple, ou page {data, pagination} si limit est fourni)"""
     try:
-        print("📍 GET /api/buildings - Début")
-        buildings = db_service_francais.get_buildings()
-        print(f"📍 GET /api/buildings - {len(buildings)} immeubles récupérés")
-        return buildings
+        logger.debug("📍 GET /api/buildings - Début")
+        buildings, next_cursor = db_service_francais.get_buildings_page(cursor=cursor, limit=limit, ville=ville)
+        logger.debug("📍 GET /api/buildings - %d immeubles récupérés", len(buildings))
+        response = page_response(buildings, next_cursor, limit, fields)
+        # Sans pagination, conserver le format historique (liste simple)
+        return response if limit else response["data"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"❌ Erreur lors du chargement des immeubles: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Erreur lors du chargement des immeubles: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des immeubles: {str(e)}")
 
 @app.get("/api/buildings/{building_id}")
-async def get_building(building_id: int):
+def get_building(building_id: int):
     """Récupérer un immeuble spécifique par ID"""
     try:
         building = db_service_francais.get_building(building_id)
@@ -431,30 +549,28 @@ async def get_building(building_id: int):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de l'immeuble: {str(e)}")
 
 @app.post("/api/buildings")
-async def create_building(building_data: BuildingCreateFrancais):
+def create_building(building_data: BuildingCreateFrancais):
     """Créer un nouvel immeuble avec le format français"""
     try:
         # Debug: Afficher les données reçues
-        print(f"🔍 DEBUG - Données reçues: {building_data}")
-        print(f"🔍 DEBUG - Type: {type(building_data)}")
+        logger.debug("🔍 DEBUG - Données reçues: %s", building_data)
+        logger.debug("🔍 DEBUG - Type: %s", type(building_data))
         
         # Convertir en dictionnaire pour le service
         building_dict = building_data.dict()
-        print(f"🔍 DEBUG - Dictionnaire: {building_dict}")
+        logger.debug("🔍 DEBUG - Dictionnaire: %s", building_dict)
         
         # Créer l'immeuble via le service SQLite
         new_building = db_service_francais.create_building(building_dict)
         
         return new_building
     except Exception as e:
-        print(f"❌ Erreur lors de la création de l'immeuble: {e}")
-        print(f"❌ Type d'erreur: {type(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"❌ Erreur lors de la création de l'immeuble: {e}")
+        logger.exception(f"❌ Type d'erreur: {type(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de l'immeuble: {str(e)}")
 
 @app.put("/api/buildings/{building_id}")
-async def update_building(building_id: int, building_data: BuildingUpdate_transactionFrancais):
+def update_building(building_id: int, building_data: BuildingUpdate_transactionFrancais):
     """Mettre à jour un immeuble existant avec le format français"""
     try:
         # Convertir en dictionnaire pour le service
@@ -473,7 +589,7 @@ async def update_building(building_id: int, building_data: BuildingUpdate_transa
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de l'immeuble: {str(e)}")
 
 @app.delete("/api/buildings/{building_id}")
-async def delete_building(building_id: int):
+def delete_building(building_id: int):
     """Supprimer un immeuble"""
     try:
         # Supprimer l'immeuble via le service SQLite
@@ -490,19 +606,26 @@ async def delete_building(building_id: int):
 
 # Routes CRUD pour les locataires avec persistance
 @app.get("/api/tenants")
-async def get_tenants():
-    """Récupérer tous les locataires"""
+def get_tenants(
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les locataires)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+    statut: Optional[str] = Query(None, description="Filtrer par statut (actif, inactif, ...)")
+):
+    """Récupérer les locataires (paginés par curseur si limit est fourni)"""
     try:
-        print("📍 GET /api/tenants - Début")
-        tenants = db_service_francais.get_tenants()
-        print(f"📍 GET /api/tenants - {len(tenants)} locataires récupérés")
-        return {"data": tenants}
+        logger.info("📍 GET /api/tenants - Début")
+        tenants, next_cursor = db_service_francais.get_tenants_page(cursor=cursor, limit=limit, statut=statut)
+        logger.info(f"📍 GET /api/tenants - {len(tenants)} locataires récupérés")
+        return page_response(tenants, next_cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Erreur lors du chargement des locataires: {e}")
+        logger.error(f"Erreur lors du chargement des locataires: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/api/tenants/{tenant_id}")
-async def get_tenant(tenant_id: int):
+def get_tenant(tenant_id: int):
     """Récupérer un locataire spécifique par ID"""
     try:
         tenant = db_service_francais.get_tenant(tenant_id)
@@ -515,7 +638,7 @@ async def get_tenant(tenant_id: int):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du locataire: {str(e)}")
 
 @app.post("/api/tenants")
-async def create_tenant(tenant_data: TenantCreateFrancais):
+def create_tenant(tenant_data: TenantCreateFrancais):
     """Créer un nouveau locataire avec le format français"""
     try:
         # Convertir en dictionnaire pour le service
@@ -526,11 +649,11 @@ async def create_tenant(tenant_data: TenantCreateFrancais):
         
         return {"data": new_tenant}
     except Exception as e:
-        print(f"Erreur lors de la création du locataire: {e}")
+        logger.error(f"Erreur lors de la création du locataire: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création du locataire: {str(e)}")
 
 @app.put("/api/tenants/{tenant_id}")
-async def update_tenant(tenant_id: int, tenant_data: TenantUpdate_transactionFrancais):
+def update_tenant(tenant_id: int, tenant_data: TenantUpdate_transactionFrancais):
     """Mettre à jour un locataire existant avec le format français"""
     try:
         # Convertir en dictionnaire pour le service
@@ -542,33 +665,37 @@ async def update_tenant(tenant_id: int, tenant_data: TenantUpdate_transactionFra
         if not updated_tenant:
             raise HTTPException(status_code=404, detail="Locataire non trouvé")
         
-        print(f"Locataire mis à jour: {tenant_id}")
+        logger.info(f"Locataire mis à jour: {tenant_id}")
         return {"data": updated_tenant}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la mise à jour du locataire: {e}")
+        logger.error(f"Erreur lors de la mise à jour du locataire: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.delete("/api/tenants/{tenant_id}")
-async def delete_tenant(tenant_id: int):
-    """Supprimer un locataire"""
+def delete_tenant(tenant_id: int):
+    """Supprimer un locataire (ses baux sont supprimés en cascade, avec leurs PDFs)"""
     try:
+        pdf_baux = db_service_francais.get_lease_pdfs(tenant_id=tenant_id)
+        
         # Supprimer le locataire via le service SQLite
         success = db_service_francais.delete_tenant(tenant_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Locataire non trouvé")
         
+        _delete_pdfs(pdf_baux)
+        
         return {"message": "Locataire supprimé avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la suppression du locataire: {e}")
+        logger.error(f"Erreur lors de la suppression du locataire: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/api/maintenance")
-async def get_maintenance():
+def get_maintenance():
     """Liste des entretiens"""
     return [
         {"id": 1, "building": "Immeuble A", "type": "Plomberie", "status": "pending", "priority": "high"},
@@ -577,7 +704,7 @@ async def get_maintenance():
     ]
 
 @app.get("/api/employees")
-async def get_employees():
+def get_employees():
     """Liste des employés"""
     return [
         {"id": 1, "name": "Marc Ouvrier", "role": "Contremaître", "status": "active"},
@@ -587,10 +714,10 @@ async def get_employees():
 
 # Routes CRUD pour les assignations locataires-unités avec persistance
 @app.post("/api/tenants/create-with-lease")
-async def create_tenant_with_lease(data: dict):
+def create_tenant_with_lease(data: dict):
     """Créer un locataire avec son bail - LOGIQUE SIMPLE ET FIABLE"""
     try:
-        print(f"🔍 DEBUG - create_tenant_with_lease reçu: {data}")
+        logger.debug("🔍 DEBUG - create_tenant_with_lease reçu: %s", data)
         
         # NOUVEAU FORMAT : data contient {tenant: {...}, lease: {...}}
         tenant_data = data.get("tenant", {})
@@ -621,14 +748,14 @@ async def create_tenant_with_lease(data: dict):
         prenom = tenant_data.get("prenom", "").strip()
         name = tenant_data.get("name", "").strip()
         
-        print(f"🔍 DEBUG - Validation: nom='{nom}', prenom='{prenom}', name='{name}'")
+        logger.debug("🔍 DEBUG - Validation: nom=%r, prenom=%r, name=%r", nom, prenom, name)
         
         # Si on a nom et prenom, les combiner en name
         if nom and prenom:
             tenant_data["name"] = f"{nom} {prenom}"
-            print(f"✅ Nom combiné: {tenant_data['name']}")
+            logger.info(f"✅ Nom combiné: {tenant_data['name']}")
         elif not name and not (nom and prenom):
-            print(f"❌ Validation échouée: nom='{nom}', prenom='{prenom}', name='{name}'")
+            logger.error(f"❌ Validation échouée: nom='{nom}', prenom='{prenom}', name='{name}'")
             raise HTTPException(status_code=400, detail="Le nom et prénom du locataire sont obligatoires")
         
         if not lease_data.get("unitId"):
@@ -645,33 +772,33 @@ async def create_tenant_with_lease(data: dict):
             "statut": tenant_data.get("statut", "actif"),
             "notes": tenant_data.get("notes", "")
         }
-        print(f"📝 Création du locataire: {tenant_data_francais['nom']} {tenant_data_francais['prenom']}")
+        logger.info(f"📝 Création du locataire: {tenant_data_francais['nom']} {tenant_data_francais['prenom']}")
         created_tenant = db_service_francais.create_tenant(tenant_data_francais)
         tenant_id = created_tenant["id_locataire"]
-        print(f"✅ Locataire créé avec ID: {tenant_id}")
+        logger.info(f"✅ Locataire créé avec ID: {tenant_id}")
         
         # 2. CRÉER LE BAIL avec les données de bail
-        print(f"🏠 Création du bail pour l'unité: {lease_data['unitId']}")
+        logger.info(f"🏠 Création du bail pour l'unité: {lease_data['unitId']}")
         lease_data["tenantId"] = tenant_id
         
         # Debug des données avant nettoyage
-        print(f"🔍 DEBUG - lease_data avant nettoyage: {lease_data}")
-        print(f"🔍 DEBUG - leaseStartDate: {lease_data.get('leaseStartDate')}")
-        print(f"🔍 DEBUG - leaseEndDate: {lease_data.get('leaseEndDate')}")
+        logger.debug("🔍 DEBUG - lease_data avant nettoyage: %s", lease_data)
+        logger.debug("🔍 DEBUG - leaseStartDate: %s", lease_data.get('leaseStartDate'))
+        logger.debug("🔍 DEBUG - leaseEndDate: %s", lease_data.get('leaseEndDate'))
         
         # Supprimer les valeurs None/vides SAUF pour les date_transactions obligatoires
         lease_data_cleaned = {k: v for k, v in lease_data.items() if v is not None and v != ""}
         
         # Debug des données après nettoyage
-        print(f"🔍 DEBUG - lease_data après nettoyage: {lease_data_cleaned}")
+        logger.debug("🔍 DEBUG - lease_data après nettoyage: %s", lease_data_cleaned)
         
         # Vérifier que les date_transactions obligatoires sont présentes
         if not lease_data_cleaned.get('leaseStartDate'):
-            print(f"❌ ERREUR: leaseStartDate manquant dans lease_data")
+            logger.error(f"❌ ERREUR: leaseStartDate manquant dans lease_data")
             raise HTTPException(status_code=400, detail="La date_transaction de début du bail est obligatoire")
         
         if not lease_data_cleaned.get('leaseEndDate'):
-            print(f"❌ ERREUR: leaseEndDate manquant dans lease_data")
+            logger.error(f"❌ ERREUR: leaseEndDate manquant dans lease_data")
             raise HTTPException(status_code=400, detail="La date_transaction de fin du bail est obligatoire")
         
         # Créer le bail via le service
@@ -691,12 +818,12 @@ async def create_tenant_with_lease(data: dict):
             "pdf_bail": lease_data_cleaned.get("pdfLease", "")
         }
         
-        print(f"🔍 DEBUG - Données envoyées au service create_lease: {lease_data_francais}")
+        logger.debug("🔍 DEBUG - Données envoyées au service create_lease: %s", lease_data_francais)
         created_lease = db_service_francais.create_lease(lease_data_francais)
-        print(f"🔍 DEBUG - Type de created_lease: {type(created_lease)}")
-        print(f"🔍 DEBUG - Contenu de created_lease: {created_lease}")
-        print(f"✅ Bail créé avec ID: {created_lease['id_bail']}")
-        print(f"🔍 DEBUG - Bail créé complet: {created_lease}")
+        logger.debug("🔍 DEBUG - Type de created_lease: %s", type(created_lease))
+        logger.debug("🔍 DEBUG - Contenu de created_lease: %s", created_lease)
+        logger.info(f"✅ Bail créé avec ID: {created_lease['id_bail']}")
+        logger.debug("🔍 DEBUG - Bail créé complet: %s", created_lease)
         
         return {
             "data": {
@@ -709,13 +836,11 @@ async def create_tenant_with_lease(data: dict):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur lors de la création: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Erreur lors de la création: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création: {str(e)}")
 
 @app.get("/api/projects")
-async def get_projects():
+def get_projects():
     """Liste des projets de construction"""
     return [
         {"id": 1, "name": "Nouveau Complexe D", "status": "planning", "progress": 10},
@@ -728,7 +853,7 @@ async def get_projects():
 # ========================================
 
 @app.post("/api/building-reports")
-async def create_building_report(report_data: dict):
+def create_building_report(report_data: dict):
     """Créer ou mettre à jour un rapport d'immeuble"""
     try:
         building_id = report_data.get("buildingId")
@@ -745,14 +870,14 @@ async def create_building_report(report_data: dict):
             # Créer un nouveau rapport via SQLite
             update_transactiond_report = db_service_francais.create_building_report(report_data)
         
-        print(f"Rapport immeuble sauvegardé: {building_id} - {year}")
+        logger.info(f"Rapport immeuble sauvegardé: {building_id} - {year}")
         return {"data": update_transactiond_report}
     except Exception as e:
-        print(f"Erreur lors de la sauvegarde du rapport d'immeuble: {e}")
+        logger.error(f"Erreur lors de la sauvegarde du rapport d'immeuble: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la sauvegarde du rapport d'immeuble: {str(e)}")
 
 @app.delete("/api/building-reports/{report_id}")
-async def delete_building_report(report_id: int):
+def delete_building_report(report_id: int):
     """Supprimer un rapport d'immeuble"""
     try:
         # Supprimer via le service SQLite
@@ -761,12 +886,12 @@ async def delete_building_report(report_id: int):
         if not success:
             raise HTTPException(status_code=404, detail="Rapport non trouvé")
         
-        print(f"Rapport immeuble supprimé: {report_id}")
+        logger.info(f"Rapport immeuble supprimé: {report_id}")
         return {"message": "Rapport supprimé avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la suppression du rapport d'immeuble: {e}")
+        logger.error(f"Erreur lors de la suppression du rapport d'immeuble: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 # ========================================
@@ -774,20 +899,20 @@ async def delete_building_report(report_id: int):
 # ========================================
 
 @app.post("/api/unit-reports")
-async def create_unit_report(report_data: dict):
+def create_unit_report(report_data: dict):
     """Créer un nouveau rapport d'unité mensuel"""
     try:
         # Créer le rapport via le service SQLite
         new_report = db_service_francais.create_unit_report(report_data)
         
-        print(f"Rapport unité créé: {report_data.get('unitId')} - {report_data.get('year')}/{report_data.get('month')}")
+        logger.info(f"Rapport unité créé: {report_data.get('unitId')} - {report_data.get('year')}/{report_data.get('month')}")
         return {"data": new_report}
     except Exception as e:
-        print(f"Erreur lors de la création du rapport d'unité: {e}")
+        logger.error(f"Erreur lors de la création du rapport d'unité: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création du rapport d'unité: {str(e)}")
 
 @app.delete("/api/unit-reports/{report_id}")
-async def delete_unit_report(report_id: int):
+def delete_unit_report(report_id: int):
     """Supprimer un rapport d'unité"""
     try:
         # Supprimer via le service SQLite
@@ -796,12 +921,12 @@ async def delete_unit_report(report_id: int):
         if not success:
             raise HTTPException(status_code=404, detail="Rapport non trouvé")
         
-        print(f"Rapport d'unité supprimé: {report_id}")
+        logger.info(f"Rapport d'unité supprimé: {report_id}")
         return {"message": "Rapport d'unité supprimé avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la suppression du rapport d'unité: {e}")
+        logger.error(f"Erreur lors de la suppression du rapport d'unité: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 # ========================================
@@ -811,7 +936,7 @@ async def delete_unit_report(report_id: int):
 # Endpoint supprimé - doublon avec celui ci-dessous
 
 @app.get("/api/units/{unit_id}")
-async def get_unit(unit_id: int):
+def get_unit(unit_id: int):
     """Récupérer une unité par ID"""
     try:
         unit = db_service_francais.get_unit(unit_id)
@@ -821,158 +946,260 @@ async def get_unit(unit_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors du chargement de l'unité: {e}")
+        logger.error(f"Erreur lors du chargement de l'unité: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.delete("/api/units/{unit_id}")
-async def delete_unit(unit_id: int):
-    """Supprimer une unité"""
+def delete_unit(unit_id: int):
+    """Supprimer une unité (ses baux sont supprimés en cascade, avec leurs PDFs)"""
     try:
+        pdf_baux = db_service_francais.get_lease_pdfs(unit_id=unit_id)
+        
         # Supprimer via le service SQLite
         success = db_service_francais.delete_unit(unit_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Unité non trouvée")
         
-        print(f"Unité supprimée: {unit_id}")
+        _delete_pdfs(pdf_baux)
+        
+        logger.info(f"Unité supprimée: {unit_id}")
         return {"message": "Unité supprimée avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la suppression de l'unité: {e}")
+        logger.error(f"Erreur lors de la suppression de l'unité: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+# Nombre maximal de fichiers envoyés en parallèle vers Backblaze B2 par requête
+UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", "4"))
+
+def _upload_storage_service():
+    """Service de stockage pour un upload (erreur 500 si le backend n'est pas configuré)"""
+    from storage_service import get_storage_service
+    try:
+        storage_service = get_storage_service()
+    except ValueError as e:
+        logger.error(f"❌ {e}")
+        raise HTTPException(status_code=500, detail="Configuration Backblaze B2 manquante")
+    logger.info(f"📦 Stockage des documents: {storage_service.backend.name}")
+    return storage_service
+
+async def _upload_file(storage_service, file: UploadFile, context: str) -> Dict[str, Any]:
+    """
+    Envoyer un fichier reçu vers le stockage sans le charger en mémoire
+
+    Starlette conserve le fichier dans un SpooledTemporaryFile (sur disque
+    au-delà de 1 Mo) : il est lu par morceaux dans le pool de stockage.
+    """
+    from storage_service import CONTEXT_FOLDERS
+    
+    if not file.filename or not file.filename.lower().endswith('.pdf'):
+        logger.error(f"❌ Type de fichier non supporté: {file.filename}")
+        return {"success": False, "original_filename": file.filename, "error": "Seuls les fichiers PDF sont acceptés"}
+    
+    result = await storage_service.upload_pdf_stream_async(
+        fileobj=file.file,
+        original_filename=file.filename,
+        folder=CONTEXT_FOLDERS.get(context, "documents"),
+        context=context
+    )
+    logger.info(f"📊 Résultat upload: {result}")
+    return result
+
+def _upload_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs d'un document uploadé renvoyés au frontend"""
+    return {
+        "filename": result["filename"],
+        "original_filename": result["original_filename"],
+        "s3_key": result["s3_key"],
+        "file_url": result["file_url"],
+        "size": result["size"],
+        "sha256": result["sha256"],
+        "deduplicated": result["deduplicated"]
+    }
+
 @app.post("/api/documents/upload")
 async def upload_document(file: UploadFile = File(...), context: str = "document"):
-    """Uploader un document (PDF, image, etc.) vers Backblaze B2"""
+    """Uploader un document PDF vers Backblaze B2 (en flux, dédupliqué par contenu)"""
     try:
-        print(f"📤 Upload PDF reçu: {file.filename} ({file.size} bytes)")
+        logger.info(f"📤 Upload PDF reçu: {file.filename} ({file.size} bytes)")
         
         # Vérifier le type de fichier
         if not file.filename.lower().endswith('.pdf'):
-            print(f"❌ Type de fichier non supporté: {file.filename}")
+            logger.error(f"❌ Type de fichier non supporté: {file.filename}")
             raise HTTPException(status_code=400, detail="Seuls les fichiers PDF sont acceptés")
         
-        # Lire le contenu du fichier
-        file_content = await file.read()
-        print(f"📄 Contenu lu: {len(file_content)} bytes")
-        
-        # Vérifier les variables d'environnement Backblaze B2
-        import os
-        b2_key_id = os.getenv('B2_APPLICATION_KEY_ID')
-        b2_key = os.getenv('B2_APPLICATION_KEY')
-        b2_bucket = os.getenv('B2_BUCKET_NAME')
-        
-        print(f"🔑 B2 Key ID: {b2_key_id[:8] if b2_key_id else 'MANQUANT'}...")
-        print(f"🔑 B2 Key: {b2_key[:8] if b2_key else 'MANQUANT'}...")
-        print(f"📦 B2 Bucket: {b2_bucket}")
+        storage_service = _upload_storage_service()
         
-        if not b2_key_id or not b2_key:
-            print("❌ Variables d'environnement Backblaze B2 manquantes")
-            raise HTTPException(status_code=500, detail="Configuration Backblaze B2 manquante")
+        logger.info("🚀 Tentative d'upload vers Backblaze B2...")
+        logger.info(f"📝 Contexte: {context}")
         
-        # Upload vers Backblaze B2
-        from storage_service import get_storage_service
-        storage_service = get_storage_service()
-        
-        print("🚀 Tentative d'upload vers Backblaze B2...")
-        print(f"📝 Contexte: {context}")
-        
-        # Déterminer le dossier selon le contexte
-        folder_map = {
-            "bail": "bails",
-            "transaction": "transactions",
-            "facture": "factures",
-            "commande": "commandes",
-            "document": "documents"
-        }
-        folder = folder_map.get(context, "documents")
-        
-        result = storage_service.upload_pdf(
-            file_content=file_content,
-            original_filename=file.filename,
-            folder=folder,
-            context=context
-        )
-        
-        print(f"📊 Résultat upload: {result}")
+        result = await _upload_file(storage_service, file, context)
         
         if result["success"]:
-            print(f"✅ Document uploadé vers Backblaze B2: {result['filename']}")
-            return {
-                "message": "Document uploadé avec succès",
-                "filename": result["filename"],
-                "original_filename": result["original_filename"],
-                "s3_key": result["s3_key"],
-                "file_url": result["file_url"],
-                "size": result["size"]
-            }
+            logger.info(f"✅ Document uploadé vers Backblaze B2: {result['filename']}")
+            return {"message": "Document uploadé avec succès", **_upload_response(result)}
         else:
-            print(f"❌ Erreur upload Backblaze B2: {result['error']}")
+            logger.error(f"❌ Erreur upload Backblaze B2: {result['error']}")
             raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload vers Backblaze B2: {result['error']}")
             
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Erreur inattendue lors de l'upload: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ Erreur inattendue lors de l'upload: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload: {str(e)}")
+
+@app.post("/api/documents/upload-multiple")
+async def upload_documents(files: List[UploadFile] = File(...), context: str = "document"):
+    """
+    Uploader plusieurs documents PDF en parallèle (UPLOAD_CONCURRENCY à la fois)
+
+    Chaque fichier a son propre résultat : un échec n'annule pas les autres.
+    """
+    try:
+        logger.info(f"📤 Upload de {len(files)} PDF(s) reçu (contexte: {context})")
+        storage_service = _upload_storage_service()
+        limiter = anyio.CapacityLimiter(UPLOAD_CONCURRENCY)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        
+        async def upload(index: int, file: UploadFile):
+            async with limiter:
+                try:
+                    results[index] = await _upload_file(storage_service, file, context)
+                except Exception as e:
+                    logger.exception(f"❌ Erreur inattendue lors de l'upload de {file.filename}: {e}")
+                    results[index] = {"success": False, "original_filename": file.filename, "error": str(e)}
+        
+        async with anyio.create_task_group() as task_group:
+            for index, file in enumerate(files):
+                task_group.start_soon(upload, index, file)
+        
+        documents = [
+            {"success": True, **_upload_response(result)} if result["success"]
+            else {"success": False, "original_filename": result.get("original_filename"), "error": result["error"]}
+            for result in results
+        ]
+        uploaded = sum(1 for document in documents if document["success"])
+        logger.info(f"✅ {uploaded}/{len(files)} document(s) uploadé(s) vers Backblaze B2")
+        return {
+            "message": f"{uploaded}/{len(files)} document(s) uploadé(s)",
+            "documents": documents
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"❌ Erreur inattendue lors de l'upload: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'upload: {str(e)}")
 
 @app.get("/api/documents")
-async def list_documents():
-    """Lister tous les documents disponibles depuis Backblaze B2"""
+async def list_documents(
+    cursor: Optional[str] = Query(None, description="Jeton de la page suivante"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les documents)")
+):
+    """Lister les documents disponibles dans le stockage (pagination par jeton de continuation)"""
     try:
         from storage_service import get_storage_service
         storage_service = get_storage_service()
         
-        # Lister les fichiers depuis Backblaze B2
-        files = storage_service.list_pdfs(folder="documents")
+        if limit is None:
+            files = await storage_service.list_pdfs_async(folder="documents")
+            return {"documents": files}
         
-        return {"documents": files}
+        files, next_token = await storage_service.list_pdfs_page_async(
+            folder="documents", limit=limit, continuation_token=cursor
+        )
+        response = page_response(files, next_token, limit)
+        return {"documents": response.pop("data"), **response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des documents: {str(e)}")
 
+def _parse_byte_range(range_header: str, size: int):
+    """
+    Interpréter un en-tête Range d'un seul intervalle (bytes=debut-fin, debut-, -suffixe)
+
+    Returns:
+        (debut, fin) inclusifs, None si l'en-tête est ignoré (autre unité, plusieurs intervalles)
+    Raises:
+        ValueError si l'intervalle ne peut pas être satisfait
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    start_text, _, end_text = ranges.strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        else:
+            start, end = max(size - int(end_text), 0), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError("Intervalle non satisfaisable")
+    return start, end
+
 @app.get("/api/documents/{filename}")
-async def get_document(filename: str):
-    """Servir un document (PDF, image, etc.) depuis Backblaze B2"""
+def get_document(
+    filename: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Servir un document depuis Backblaze B2, en flux (mémoire constante)
+
+    Supporte les requêtes partielles (Range → 206) et la revalidation
+    (If-None-Match sur l'ETag → 304).
+    """
     try:
         from storage_service import get_storage_service
         storage_service = get_storage_service()
         
-        # Si c'est une clé S3 complète (contient '/'), l'utiliser directement
-        if '/' in filename:
-            s3_key = filename
-            file_content = storage_service.download_pdf(s3_key)
-        else:
-            # Chercher dans tous les dossiers possibles
-            folders = ['documents', 'bails', 'transactions', 'factures', 'commandes']
-            file_content = None
-            s3_key = None
-            
-            for folder in folders:
-                test_key = f"{folder}/{filename}"
-                file_content = storage_service.download_pdf(test_key)
-                if file_content is not None:
-                    s3_key = test_key
-                    print(f"✅ PDF trouvé dans: {s3_key}")
-                    break
-        
-        if file_content is None:
+        # Index des documents (une requête), sinon recherche dans les dossiers
+        document = storage_service.locate_pdf(filename)
+        if document is None:
             raise HTTPException(
                 status_code=404, 
                 detail=f"Document non trouvé: {filename}"
             )
         
-        # Retourner le fichier en mémoire
-        from fastapi.responses import Response
-        return Response(
-            content=file_content,
-            media_type='application/pdf',
-            headers={
-                "Content-Disposition": f"inline; filename={filename}",
-                "Content-Length": str(len(file_content))
-            }
+        size = document["size"]
+        headers = {
+            "Content-Disposition": f"inline; filename={os.path.basename(filename)}",
+            "Accept-Ranges": "bytes"
+        }
+        if document["etag"]:
+            headers["ETag"] = document["etag"]
+            if if_none_match and (if_none_match.strip() == "*" or
+                                  document["etag"] in [tag.strip() for tag in if_none_match.split(",")]):
+                return Response(status_code=304, headers=headers)
+        
+        byte_range = None
+        if range_header:
+            try:
+                byte_range = _parse_byte_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        
+        body = storage_service.open_pdf(document["s3_key"], byte_range, document["sha256"])
+        if body is None:
+            raise HTTPException(status_code=404, detail=f"Document non trouvé: {filename}")
+        
+        if byte_range is None:
+            headers["Content-Length"] = str(size)
+            status_code = 200
+        else:
+            start, end = byte_range
+            headers["Content-Length"] = str(end - start + 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            status_code = 206
+        
+        return StreamingResponse(
+            storage_service.iter_pdf(body),
+            status_code=status_code,
+            media_type=document["content_type"],
+            headers=headers
         )
         
     except HTTPException:
@@ -981,16 +1208,26 @@ async def get_document(filename: str):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du document: {str(e)}")
 
 @app.get("/api/units")
-async def get_units(skip: int = 0, limit: int = 100):
-    """Récupérer toutes les unités"""
+def get_units(
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000, description="Taille de page"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (remplace skip)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+    building_id: Optional[int] = Query(None, description="Filtrer par immeuble")
+):
+    """Récupérer les unités (pagination par curseur, ou par offset avec skip)"""
     try:
-        units = db_service_francais.get_units(skip=skip, limit=limit)
-        return {"data": units}
+        units, next_cursor = db_service_francais.get_units_page(
+            cursor=cursor, limit=limit, skip=skip, building_id=building_id
+        )
+        return page_response(units, next_cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des unités: {str(e)}")
 
 @app.get("/api/units/{unit_id}")
-async def get_unit(unit_id: int):
+def get_unit(unit_id: int):
     """Récupérer une unité par ID"""
     try:
         unit = db_service_francais.get_unit(unit_id)
@@ -1003,7 +1240,7 @@ async def get_unit(unit_id: int):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de l'unité: {str(e)}")
 
 @app.get("/api/buildings/{building_id}/units")
-async def get_units_by_building(building_id: int):
+def get_units_by_building(building_id: int):
     """Récupérer toutes les unités d'un immeuble"""
     try:
         units = db_service_francais.get_units_by_building(building_id)
@@ -1012,7 +1249,7 @@ async def get_units_by_building(building_id: int):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des unités: {str(e)}")
 
 @app.post("/api/units")
-async def create_unit(unit_data: UnitCreateFrancais):
+def create_unit(unit_data: UnitCreateFrancais):
     """Créer une nouvelle unité avec le format français"""
     try:
         unit_dict = unit_data.dict()
@@ -1024,7 +1261,7 @@ async def create_unit(unit_data: UnitCreateFrancais):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de l'unité: {str(e)}")
 
 @app.put("/api/units/{unit_id}")
-async def update_unit(unit_id: int, unit_data: UnitUpdate_transactionFrancais):
+def update_unit(unit_id: int, unit_data: UnitUpdate_transactionFrancais):
     """Mettre à jour une unité avec le format français"""
     try:
         unit_dict = unit_data.dict(exclude_unset=True)
@@ -1040,7 +1277,7 @@ async def update_unit(unit_id: int, unit_data: UnitUpdate_transactionFrancais):
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de l'unité: {str(e)}")
 
 @app.delete("/api/units/{unit_id}")
-async def delete_unit(unit_id: int):
+def delete_unit(unit_id: int):
     """Supprimer une unité"""
     try:
         success = db_service_francais.delete_unit(unit_id)
@@ -1057,17 +1294,31 @@ async def delete_unit(unit_id: int):
 # ========================================
 
 @app.get("/api/transactions")
-async def get_transactions():
-    """Récupérer toutes les transactions"""
+def get_transactions(
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : toutes les transactions)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+    building_id: Optional[int] = Query(None, description="Filtrer par immeuble"),
+    date_debut: Optional[date] = Query(None, description="Date de transaction minimale"),
+    date_fin: Optional[date] = Query(None, description="Date de transaction maximale"),
+    type: Optional[str] = Query(None, description="revenu ou depense"),
+    categorie: Optional[str] = Query(None, description="Filtrer par catégorie")
+):
+    """Récupérer les transactions, des plus récentes aux plus anciennes (paginées si limit est fourni)"""
     try:
-        transactions = db_service_francais.get_transactions()
-        return {"data": transactions}
+        transactions, next_cursor = db_service_francais.get_transactions_page(
+            cursor=cursor, limit=limit, building_id=building_id, date_debut=date_debut,
+            date_fin=date_fin, type=type, categorie=categorie
+        )
+        return page_response(transactions, next_cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Erreur lors du chargement des transactions: {e}")
+        logger.error(f"Erreur lors du chargement des transactions: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des transactions: {str(e)}")
 
 @app.get("/api/transactions/{transaction_id}")
-async def get_transaction(transaction_id: int):
+def get_transaction(transaction_id: int):
     """Récupérer une transaction spécifique par ID"""
     try:
         transaction = db_service_francais.get_transaction(transaction_id)
@@ -1077,11 +1328,11 @@ async def get_transaction(transaction_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la récupération de la transaction: {e}")
+        logger.error(f"Erreur lors de la récupération de la transaction: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la transaction: {str(e)}")
 
 @app.post("/api/transactions")
-async def create_transaction(transaction_data: TransactionCreateFrancais):
+def create_transaction(transaction_data: TransactionCreateFrancais):
     """Créer une nouvelle transaction avec le format français"""
     try:
         # Convertir en dictionnaire pour le service
@@ -1094,11 +1345,11 @@ async def create_transaction(transaction_data: TransactionCreateFrancais):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la création de la transaction: {e}")
+        logger.error(f"Erreur lors de la création de la transaction: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la transaction: {str(e)}")
 
 @app.put("/api/transactions/{transaction_id}")
-async def update_transaction(transaction_id: int, transaction_data: TransactionUpdateFrancais):
+def update_transaction(transaction_id: int, transaction_data: TransactionUpdateFrancais):
     """Mettre à jour une transaction existante avec le format français"""
     try:
         # Convertir en dictionnaire pour le service
@@ -1110,16 +1361,16 @@ async def update_transaction(transaction_id: int, transaction_data: TransactionU
         if not updated_transaction:
             raise HTTPException(status_code=404, detail="Transaction non trouvée")
         
-        print(f"✅ Transaction mise à jour: {transaction_id}")
+        logger.info(f"✅ Transaction mise à jour: {transaction_id}")
         return {"data": updated_transaction, "message": "Transaction mise à jour avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la mise à jour de la transaction: {e}")
+        logger.error(f"Erreur lors de la mise à jour de la transaction: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de la transaction: {str(e)}")
 
 @app.delete("/api/transactions/{transaction_id}")
-async def delete_transaction(transaction_id: int):
+def delete_transaction(transaction_id: int):
     """Supprimer une transaction et son PDF associé"""
     try:
         # Récupérer la transaction pour obtenir le nom du PDF
@@ -1127,37 +1378,20 @@ async def delete_transaction(transaction_id: int):
         if not transaction:
             raise HTTPException(status_code=404, detail="Transaction non trouvée")
         
-        # Supprimer le PDF de Backblaze B2 s'il existe
-        if transaction.get('pdf_transaction'):
-            try:
-                from storage_service import get_storage_service
-                storage_service = get_storage_service()
-                
-                # Construire la clé S3 (peut être un nom simple ou une clé complète)
-                pdf_key = transaction['pdf_transaction']
-                if not '/' in pdf_key:
-                    pdf_key = f"documents/{pdf_key}"
-                
-                # Supprimer le PDF
-                if storage_service.delete_pdf(pdf_key):
-                    print(f"✅ PDF supprimé de Backblaze B2: {pdf_key}")
-                else:
-                    print(f"⚠️ PDF non trouvé sur Backblaze B2: {pdf_key}")
-            except Exception as pdf_error:
-                print(f"⚠️ Erreur lors de la suppression du PDF: {pdf_error}")
-                # Continuer même si la suppression du PDF échoue
-        
         # Supprimer la transaction de la base de données
         success = db_service_francais.delete_transaction(transaction_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Transaction non trouvée")
         
+        # Supprimer le PDF du stockage s'il existe
+        _delete_pdfs([transaction.get('pdf_transaction')])
+        
         return {"message": "Transaction et PDF supprimés avec succès"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors de la suppression de la transaction: {e}")
+        logger.error(f"Erreur lors de la suppression de la transaction: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 
@@ -1166,54 +1400,61 @@ async def delete_transaction(transaction_id: int):
 # ========================================
 
 @app.post("/api/backup/create")
-async def create_backup():
-    """Créer une sauvegarde manuelle de la base de données"""
+def create_backup(wait: bool = Query(True, description="Attendre l'ajout de la copie au dépôt de sauvegardes")):
+    """Créer une sauvegarde manuelle de la base de données (copie en ligne, sans interrompre l'application)"""
     try:
-        backup_path = backup_service.create_backup("manual")
+        backup_path = backup_service.create_backup("manual", wait=wait)
         if backup_path:
             return {
                 "success": True,
-                "message": "Sauvegarde créée avec succès",
+                "message": "Sauvegarde créée avec succès" if wait else "Copie créée, compression en cours",
                 "backup_path": backup_path
             }
         else:
             raise HTTPException(status_code=500, detail="Échec de la création de la sauvegarde")
     except Exception as e:
-        print(f"Erreur lors de la création de la sauvegarde: {e}")
+        logger.error(f"Erreur lors de la création de la sauvegarde: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la sauvegarde: {str(e)}")
 
 @app.get("/api/backup/list")
-async def list_backups():
+def list_backups():
     """Lister toutes les sauvegardes disponibles"""
     try:
         backups = backup_service.list_backups()
         return {
             "success": True,
             "backups": backups,
-            "count": len(backups)
+            "count": len(backups),
+            "storage": backup_service.repository.stats()
         }
     except Exception as e:
-        print(f"Erreur lors du listing des sauvegardes: {e}")
+        logger.error(f"Erreur lors du listing des sauvegardes: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du listing des sauvegardes: {str(e)}")
 
 @app.post("/api/backup/restore")
-async def restore_backup(backup_path: str):
-    """Restaurer une sauvegarde"""
+def restore_backup(
+    backup_path: Optional[str] = Query(None, description="Identifiant de la sauvegarde (voir /api/backup/list)"),
+    at: Optional[datetime] = Query(None, description="Restaurer la base telle qu'elle était à cette date")
+):
+    """Restaurer une sauvegarde, ou l'état de la base à une date donnée"""
+    if backup_path is None and at is None:
+        raise HTTPException(status_code=400, detail="backup_path ou at est requis")
     try:
-        success = backup_service.restore_backup(backup_path)
-        if success:
+        restore = backup_service.restore_backup(backup_path, at=at)
+        if restore:
             return {
                 "success": True,
-                "message": "Sauvegarde restaurée avec succès"
+                "message": "Sauvegarde restaurée avec succès",
+                "restore": restore
             }
         else:
             raise HTTPException(status_code=500, detail="Échec de la restauration de la sauvegarde")
     except Exception as e:
-        print(f"Erreur lors de la restauration: {e}")
+        logger.error(f"Erreur lors de la restauration: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la restauration: {str(e)}")
 
 @app.post("/api/backup/start-automatic")
-async def start_automatic_backups():
+def start_automatic_backups():
     """Démarrer les sauvegardes automatiques"""
     try:
         backup_service.start_automatic_backups()
@@ -1222,11 +1463,11 @@ async def start_automatic_backups():
             "message": "Sauvegardes automatiques démarrées"
         }
     except Exception as e:
-        print(f"Erreur lors du démarrage des sauvegardes automatiques: {e}")
+        logger.error(f"Erreur lors du démarrage des sauvegardes automatiques: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du démarrage des sauvegardes automatiques: {str(e)}")
 
 @app.post("/api/backup/stop-automatic")
-async def stop_automatic_backups():
+def stop_automatic_backups():
     """Arrêter les sauvegardes automatiques"""
     try:
         backup_service.stop_automatic_backups()
@@ -1235,7 +1476,7 @@ async def stop_automatic_backups():
             "message": "Sauvegardes automatiques arrêtées"
         }
     except Exception as e:
-        print(f"Erreur lors de l'arrêt des sauvegardes automatiques: {e}")
+        logger.error(f"Erreur lors de l'arrêt des sauvegardes automatiques: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'arrêt des sauvegardes automatiques: {str(e)}")
 
 # ========================================
@@ -1243,7 +1484,7 @@ async def stop_automatic_backups():
 # ========================================
 
 @app.get("/api/validation/run")
-async def run_validation():
+def run_validation():
     """Exécuter une validation complète des données"""
     try:
         results = data_validator.validate_transaction_all()
@@ -1279,11 +1520,11 @@ async def run_validation():
             ]
         }
     except Exception as e:
-        print(f"Erreur lors de la validation: {e}")
+        logger.error(f"Erreur lors de la validation: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la validation: {str(e)}")
 
 @app.get("/api/validation/consistency")
-async def check_consistency():
+def check_consistency():
     """Vérifier la cohérence des données"""
     try:
         issues = consistency_checker.check_orphaned_records()
@@ -1295,11 +1536,11 @@ async def check_consistency():
             "count": len(issues)
         }
     except Exception as e:
-        print(f"Erreur lors de la vérification de cohérence: {e}")
+        logger.error(f"Erreur lors de la vérification de cohérence: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la vérification de cohérence: {str(e)}")
 
 @app.get("/api/validation/health")
-async def get_validation_health():
+def get_validation_health():
     """Obtenir un résumé de la santé des données"""
     try:
         # Validation rapide
@@ -1332,7 +1573,7 @@ async def get_validation_health():
             "message": f"Données {'saines' if status == 'healthy' else 'problématiques'}"
         }
     except Exception as e:
-        print(f"Erreur lors de l'évaluation de la santé: {e}")
+        logger.error(f"Erreur lors de l'évaluation de la santé: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'évaluation de la santé: {str(e)}")
 
 # ========================================
@@ -1340,7 +1581,7 @@ async def get_validation_health():
 # ========================================
 
 @app.get("/api/monitoring/health")
-async def get_database_health():
+def get_database_health():
     """Obtenir un résumé complet de la santé de la base de données"""
     try:
         health_summary = database_monitor.get_health_summary()
@@ -1349,11 +1590,11 @@ async def get_database_health():
             "data": health_summary
         }
     except Exception as e:
-        print(f"Erreur lors de la récupération de la santé: {e}")
+        logger.error(f"Erreur lors de la récupération de la santé: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la santé: {str(e)}")
 
 @app.get("/api/monitoring/metrics")
-async def get_database_metrics():
+def get_database_metrics():
     """Obtenir les métriques actuelles de la base de données"""
     try:
         db_metrics = database_monitor.get_database_metrics()
@@ -1369,7 +1610,8 @@ async def get_database_metrics():
                 "file_size_mb": round(db_metrics.file_size / (1024 * 1024), 2),
                 "response_time": round(db_metrics.response_time, 3),
                 "record_counts": db_metrics.record_counts,
-                "total_records": sum(db_metrics.record_counts.values())
+                "total_records": sum(db_metrics.record_counts.values()),
+                "query_timings_ms": db_metrics.query_timings
             },
             "system": {
                 "timestamp": system_metrics.timestamp.isoformat(),
@@ -1377,15 +1619,18 @@ async def get_database_metrics():
                 "memory_percent": round(system_metrics.memory_percent, 1),
                 "disk_percent": round(system_metrics.disk_percent, 1),
                 "available_memory_gb": round(system_metrics.available_memory / (1024**3), 2),
-                "available_disk_gb": round(system_metrics.available_disk / (1024**3), 2)
+                "available_disk_gb": round(system_metrics.available_disk / (1024**3), 2),
+                "process_rss_mb": round(system_metrics.process_rss / (1024 * 1024), 1),
+                "open_fds": system_metrics.open_fds,
+                "event_loop_lag_ms": system_metrics.event_loop_lag_ms
             }
         }
     except Exception as e:
-        print(f"Erreur lors de la récupération des métriques: {e}")
+        logger.error(f"Erreur lors de la récupération des métriques: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des métriques: {str(e)}")
 
 @app.get("/api/monitoring/history")
-async def get_metrics_history(hours: int = 24):
+def get_metrics_history(hours: int = 24):
     """Obtenir l'historique des métriques"""
     try:
         history = database_monitor.get_metrics_history(hours)
@@ -1394,11 +1639,26 @@ async def get_metrics_history(hours: int = 24):
             "data": history
         }
     except Exception as e:
-        print(f"Erreur lors de la récupération de l'historique: {e}")
+        logger.error(f"Erreur lors de la récupération de l'historique: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de l'historique: {str(e)}")
 
+@app.get("/api/monitoring/document-cache")
+def get_document_cache_stats():
+    """Compteurs du cache disque des documents (succès, échecs, évictions, corruptions)"""
+    try:
+        from storage_service import get_storage_service
+        storage_service = get_storage_service()
+        stats = storage_service.cache.stats() if storage_service.cache is not None else None
+        return {
+            "success": True,
+            "data": {"enabled": stats is not None, **(stats or {})}
+        }
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture du cache des documents: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la lecture du cache des documents: {str(e)}")
+
 @app.post("/api/monitoring/start")
-async def start_monitoring(interval: int = 60):
+def start_monitoring(interval: int = 60):
     """Démarrer le monitoring automatique"""
     try:
         database_monitor.start_monitoring(interval)
@@ -1407,11 +1667,11 @@ async def start_monitoring(interval: int = 60):
             "message": f"Monitoring démarré avec un intervalle de {interval} secondes"
         }
     except Exception as e:
-        print(f"Erreur lors du démarrage du monitoring: {e}")
+        logger.error(f"Erreur lors du démarrage du monitoring: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du démarrage du monitoring: {str(e)}")
 
 @app.post("/api/monitoring/stop")
-async def stop_monitoring():
+def stop_monitoring():
     """Arrêter le monitoring automatique"""
     try:
         database_monitor.stop_monitoring()
@@ -1420,11 +1680,11 @@ async def stop_monitoring():
             "message": "Monitoring arrêté"
         }
     except Exception as e:
-        print(f"Erreur lors de l'arrêt du monitoring: {e}")
+        logger.error(f"Erreur lors de l'arrêt du monitoring: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'arrêt du monitoring: {str(e)}")
 
 @app.get("/api/monitoring/status")
-async def get_monitoring_status():
+def get_monitoring_status():
     """Obtenir le statut du monitoring"""
     try:
         return {
@@ -1434,7 +1694,7 @@ async def get_monitoring_status():
             "system_metrics_count": len(database_monitor.system_history)
         }
     except Exception as e:
-        print(f"Erreur lors de la récupération du statut: {e}")
+        logger.error(f"Erreur lors de la récupération du statut: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du statut: {str(e)}")
 
 
@@ -1443,7 +1703,7 @@ async def get_monitoring_status():
 # ========================================
 
 @app.post("/api/migrate/transactions")
-async def migrate_transactions_table():
+def migrate_transactions_table():
     """Migrer la table transactions vers la nouvelle structure"""
     try:
         from sqlalchemy import text
@@ -1454,18 +1714,18 @@ async def migrate_transactions_table():
             columns = [row[1] for row in result.fetchall()]
             
             if 'type' not in columns or 'categorie' not in columns:
-                print("🔄 Migration de la table transactions...")
+                logger.info("🔄 Migration de la table transactions...")
                 
                 # Sauvegarder les données existantes
                 existing_data = []
                 if 'id_transaction' in columns:
                     result = session.execute(text("SELECT * FROM transactions"))
                     existing_data = [dict(row._mapping) for row in result.fetchall()]
-                    print(f"📦 Sauvegarde de {len(existing_data)} transactions existantes")
+                    logger.info(f"📦 Sauvegarde de {len(existing_data)} transactions existantes")
                 
                 # Supprimer l'ancienne table
                 session.execute(text("DROP TABLE IF EXISTS transactions"))
-                print("🗑️ Ancienne table supprimée")
+                logger.info("🗑️ Ancienne table supprimée")
                 
                 # Créer la nouvelle table avec la bonne structure
                 session.execute(text("""
@@ -1486,7 +1746,7 @@ async def migrate_transactions_table():
                         FOREIGN KEY (id_immeuble) REFERENCES immeubles (id_immeuble) ON DELETE CASCADE
                 )
                 """))
-                print("✅ Nouvelle table créée")
+                logger.info("✅ Nouvelle table créée")
                 
                 # Réinsérer les données existantes avec des valeurs par défaut
                 for data in existing_data:
@@ -1512,18 +1772,18 @@ async def migrate_transactions_table():
                     ))
                 
                 session.commit()
-                print(f"✅ {len(existing_data)} transactions migrées")
+                logger.info(f"✅ {len(existing_data)} transactions migrées")
                 
                 return {"message": f"Table transactions migrée avec succès. {len(existing_data)} transactions migrées."}
             else:
                 return {"message": "Table transactions déjà à jour."}
                 
     except Exception as e:
-        print(f"❌ Erreur lors de la migration: {str(e)}")
+        logger.error(f"❌ Erreur lors de la migration: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la migration: {str(e)}")
 
 @app.get("/api/transactions-constants")
-async def get_transaction_constants():
+def get_transaction_constants():
     """Récupérer les constantes pour les transactions"""
     try:
         return {
@@ -1555,7 +1815,7 @@ async def get_transaction_constants():
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des constantes: {str(e)}")
 
 @app.get("/api/analysis/profitability")
-async def get_profitability_analysis(
+def get_profitability_analysis(
     building_ids: str = Query(..., description="IDs des immeubles séparés par des virgules"),
     start_year: int = Query(..., description="Année de début"),
     start_month: int = Query(..., description="Mois de début (1-12)"),
@@ -1565,308 +1825,127 @@ async def get_profitability_analysis(
 ):
     """Récupérer l'analyse de rentabilité avec les vraies données"""
     try:
-        print(f"🔍 DEBUG - Début de l'analyse de rentabilité")
-        print(f"🔍 DEBUG - Paramètres reçus: building_ids={building_ids}, start_year={start_year}, start_month={start_month}, end_year={end_year}, end_month={end_month}")
-        
         # Convertir les IDs des immeubles
         building_id_list = [int(id.strip()) for id in building_ids.split(',') if id.strip()]
-        print(f"🔍 DEBUG - IDs des immeubles convertis: {building_id_list}")
         
         # Créer les dates de début et fin
         start_date = datetime(start_year, start_month, 1)
         end_date = datetime(end_year, end_month, 1)
-        print(f"🔍 DEBUG - Dates créées: {start_date} à {end_date}")
         
-        # Récupérer les données des baux pour les revenus
-        print(f"🔍 DEBUG - Récupération des baux...")
-        leases = db_service_francais.get_leases_by_buildings_and_period(building_id_list, start_date, end_date)
-        print(f"🔍 DEBUG - Baux récupérés: {len(leases)}")
+        # Lecture du cashflow mensuel matérialisé : coût indépendant du nombre de baux et paiements
+        aggregates = db_service_francais.get_profitability_aggregates(building_id_list, start_date.date(), end_date.date())
         
-        # Récupérer les données des transactions
-        print(f"🔍 DEBUG - Récupération des transactions...")
-        transactions = db_service_francais.get_transactions_by_buildings_and_period(building_id_list, start_date, end_date)
-        print(f"🔍 DEBUG - Transactions récupérées: {len(transactions)}")
-        
-        # Récupérer les immeubles
-        print(f"🔍 DEBUG - Récupération des immeubles...")
-        buildings = db_service_francais.get_buildings_by_ids_objects(building_id_list)
-        print(f"🔍 DEBUG - Immeubles récupérés: {len(buildings)}")
-        
-        # Debug: Afficher les données récupérées
-        if transactions:
-            print(f"🔍 DEBUG - Première transaction: {transactions[0].__dict__ if hasattr(transactions[0], '__dict__') else transactions[0]}")
-        if leases:
-            print(f"🔍 DEBUG - Premier bail: {leases[0].__dict__ if hasattr(leases[0], '__dict__') else leases[0]}")
-        
-        # Calculer les données d'analyse
-        print(f"🔍 DEBUG - Début du calcul de l'analyse...")
-        analysis_data = calculate_profitability_analysis(buildings, leases, transactions, start_date, end_date, confirmed_payments_only)
-        print(f"🔍 DEBUG - Analyse calculée avec succès")
+        analysis_data = calculate_profitability_analysis(aggregates, start_date, end_date, confirmed_payments_only)
+        logger.info(f"✅ Analyse de rentabilité: {len(building_id_list)} immeuble(s), {analysis_data['period']['start']} à {analysis_data['period']['end']}")
         
         return analysis_data
         
     except Exception as e:
-        print(f"❌ ERREUR dans l'analyse de rentabilité: {str(e)}")
-        import traceback
-        print(f"❌ TRACEBACK: {traceback.format_exc()}")
-        logger.error(f"Erreur lors de l'analyse de rentabilité: {str(e)}")
+        logger.exception(f"❌ ERREUR dans l'analyse de rentabilité: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse de rentabilité: {str(e)}")
 
-def calculate_profitability_analysis(buildings, leases, transactions, start_date, end_date, confirmed_payments_only=False):
-    """Calculer l'analyse de rentabilité avec les vraies données"""
-    try:
-        print(f"🔍 DEBUG - calculate_profitability_analysis: Début")
-        print(f"🔍 DEBUG - Paramètres: {len(buildings)} immeubles, {len(leases)} baux, {len(transactions)} transactions")
-        
-        # Debug: Vérifier le type des objets
-        print(f"🔍 DEBUG - Type de buildings: {type(buildings)}")
-        if buildings:
-            print(f"🔍 DEBUG - Type du premier building: {type(buildings[0])}")
-            print(f"🔍 DEBUG - Premier building: {buildings[0]}")
-            print(f"🔍 DEBUG - Premier building __dict__: {buildings[0].__dict__ if hasattr(buildings[0], '__dict__') else 'Pas de __dict__'}")
-        
-        print(f"🔍 DEBUG - Type de leases: {type(leases)}")
-        if leases:
-            print(f"🔍 DEBUG - Type du premier lease: {type(leases[0])}")
-        
-        print(f"🔍 DEBUG - Type de transactions: {type(transactions)}")
-        if transactions:
-            print(f"🔍 DEBUG - Type de la première transaction: {type(transactions[0])}")
-        
-        from collections import defaultdict
-        import calendar
-        
-        # Initialiser les données
-        analysis_data = {
-            "buildings": [],
-            "monthlyTotals": [],
-            "period": {
-                "start": start_date.strftime("%Y-%m"),
-                "end": end_date.strftime("%Y-%m")
-            }
+def calculate_profitability_analysis(aggregates, start_date, end_date, confirmed_payments_only=False):
+    """
+    Construire l'analyse de rentabilité à partir des totaux agrégés en SQL
+    
+    Args:
+        aggregates: Résultat de db_service_francais.get_profitability_aggregates
+            (lu depuis la table cashflow_mensuel)
+        start_date, end_date: Premier jour du mois de début et de fin
+        confirmed_payments_only: Conservé pour compatibilité (tous les paiements
+            enregistrés dans paiements_loyers sont confirmés)
+    """
+    from collections import defaultdict
+    import calendar
+    
+    # Initialiser les données
+    analysis_data = {
+        "buildings": [],
+        "monthlyTotals": [],
+        "period": {
+            "start": start_date.strftime("%Y-%m"),
+            "end": end_date.strftime("%Y-%m")
         }
-        
-        # Créer des dictionnaires pour les données mensuelles et par immeuble
-        monthly_data = defaultdict(lambda: {"revenue": 0, "expenses": 0, "netCashflow": 0})
-        building_data = defaultdict(lambda: {"revenue": 0, "expenses": 0, "netCashflow": 0})
-        
-        # Traiter les paiements de loyers comme revenus
-        print(f"🔍 Récupération des paiements de loyers...")
-        try:
-            building_ids_list = [building.id_immeuble for building in buildings]
-            
-            payments_response = db_service_francais.get_paiements_by_building_and_period(
-                building_ids_list, 
-                start_date.year, start_date.month, 
-                end_date.year, end_date.month
-            )
-            
-            print(f"✅ {len(payments_response)} paiements récupérés")
-            
-            # Traiter chaque paiement comme un revenu
-            for payment_dict in payments_response:
-                try:
-                    montant = float(payment_dict.get('montant_paye', 0))
-                    annee = payment_dict.get('annee')
-                    mois = payment_dict.get('mois')
-                    id_bail = payment_dict.get('id_bail')
-                    
-                    # Trouver le bail correspondant pour obtenir l'immeuble
-                    lease = next((l for l in leases if l.id_bail == id_bail), None)
-                    if lease:
-                        # Utiliser l'unité directement depuis le bail (nouvelle structure)
-                        building_id = None
-                        if hasattr(lease, 'unite') and lease.unite:
-                            building_id = lease.unite.id_immeuble
-                        elif hasattr(lease, 'id_unite') and lease.id_unite:
-                            # Fallback : chercher l'unité si la relation n'est pas chargée
-                            # Utiliser la session du service pour chercher l'unité
-                            try:
-                                from database_service_francais import DatabaseServiceFrancais
-                                temp_service = DatabaseServiceFrancais()
-                                with temp_service.get_session() as session:
-                                    from models_francais import Unite
-                                    unite = session.query(Unite).filter(Unite.id_unite == lease.id_unite).first()
-                                    if unite:
-                                        building_id = unite.id_immeuble
-                            except Exception as e:
-                                print(f"⚠️ Erreur lors de la récupération de l'unité: {e}")
-                                building_id = None
-                        
-                        if building_id and montant > 0:
-                            month_key = f"{annee}-{mois:02d}"
-                            
-                            # Ajouter le revenu (tous les paiements dans la table sont confirmés)
-                            monthly_data[month_key]["revenue"] += montant
-                            monthly_data[month_key]["netCashflow"] += montant
-                            building_data[building_id]["revenue"] += montant
-                            building_data[building_id]["netCashflow"] += montant
-                            
-                            print(f"✅ Revenu ajouté: {month_key}, Immeuble {building_id}, Montant: {montant}$")
-                    else:
-                        print(f"⚠️ Paiement ignoré - bail {id_bail} non trouvé")
-                        
-                except Exception as e:
-                    print(f"❌ Erreur traitement paiement: {e}")
-                    
-        except Exception as e:
-            print(f"❌ ERREUR récupération paiements: {e}")
-            import traceback
-            traceback.print_exc()
-        
-        # Traiter les transactions
-        print(f"🔍 DEBUG - Traitement des transactions...")
-        for transaction in transactions:
-            building_id = transaction.id_immeuble
-            montant = float(transaction.montant or 0)
-            type_transaction = transaction.type  # Utiliser le type (revenu/depense) au lieu de la catégorie
-            
-            print(f"🔍 DEBUG - Transaction: Immeuble {building_id}, Montant: {montant}, Type: {type_transaction}")
-            
-            # Déterminer le mois de la transaction
-            transaction_date = transaction.date_de_transaction
-            if transaction_date:
-                month_key = transaction_date.strftime("%Y-%m")
-                
-                # Déterminer si c'est un revenu ou une dépense basé sur le type
-                if type_transaction and type_transaction.lower() == "revenu":
-                    # Revenu : montant positif
-                    monthly_data[month_key]["revenue"] += abs(montant)
-                    monthly_data[month_key]["netCashflow"] += abs(montant)
-                    building_data[building_id]["revenue"] += abs(montant)
-                    building_data[building_id]["netCashflow"] += abs(montant)
-                    print(f"✅ Revenu transaction ajouté: {month_key}, Immeuble {building_id}, Montant: {abs(montant)}$")
-                else:
-                    # Dépense : montant négatif
-                    monthly_data[month_key]["expenses"] += abs(montant)
-                    monthly_data[month_key]["netCashflow"] -= abs(montant)
-                    building_data[building_id]["expenses"] += abs(montant)
-                    building_data[building_id]["netCashflow"] -= abs(montant)
-                    print(f"✅ Dépense transaction ajoutée: {month_key}, Immeuble {building_id}, Montant: {abs(montant)}$")
-        
-        # Construire les données des immeubles
-        print(f"🔍 DEBUG - Données finales par immeuble:")
-        print(f"🔍 DEBUG - Nombre d'immeubles à traiter: {len(buildings)}")
-        for i, building in enumerate(buildings):
-            print(f"🔍 DEBUG - Traitement immeuble {i}: type={type(building)}")
-            print(f"🔍 DEBUG - Building {i}: {building}")
-            
-            try:
-                building_id = building.id_immeuble
-                print(f"🔍 DEBUG - building_id récupéré: {building_id}")
-            except Exception as e:
-                print(f"❌ ERREUR lors de l'accès à building.id_immeuble: {e}")
-                print(f"❌ Building type: {type(building)}")
-                print(f"❌ Building content: {building}")
-                raise e
-            
-            data = building_data[building_id]
-            
-            try:
-                building_name = building.nom_immeuble
-                print(f"🔍 DEBUG - building_name récupéré: {building_name}")
-            except Exception as e:
-                print(f"❌ ERREUR lors de l'accès à building.nom_immeuble: {e}")
-                print(f"❌ Building type: {type(building)}")
-                print(f"❌ Building content: {building}")
-                raise e
-            
-            print(f"🔍 DEBUG - Immeuble {building_id} ({building_name}): Revenus: ${data['revenue']}, Dépenses: ${data['expenses']}, Cashflow: ${data['netCashflow']}")
-            
-            analysis_data["buildings"].append({
-                "id": building_id,
-                "name": building_name,
-                "summary": {
-                    "totalRevenue": data["revenue"],
-                    "totalExpenses": data["expenses"],
-                    "netCashflow": data["netCashflow"]
-                }
-            })
-        
-        # Construire les données mensuelles
-        current_date = start_date
-        while current_date <= end_date:
-            month_key = current_date.strftime("%Y-%m")
-            month_name = calendar.month_name[current_date.month][:3].lower() + f". {current_date.year}"
-            
-            data = monthly_data[month_key]
-            analysis_data["monthlyTotals"].append({
-                "month": month_name,
-                "revenue": data["revenue"],
-                "expenses": data["expenses"],
+    }
+    
+    # Dictionnaires pour les données mensuelles et par immeuble
+    monthly_data = defaultdict(lambda: {"revenue": 0, "expenses": 0, "netCashflow": 0})
+    building_data = defaultdict(lambda: {"revenue": 0, "expenses": 0, "netCashflow": 0})
+    
+    def add_amount(month_key, building_id, montant, is_revenue):
+        key = "revenue" if is_revenue else "expenses"
+        signed = montant if is_revenue else -montant
+        monthly_data[month_key][key] += montant
+        monthly_data[month_key]["netCashflow"] += signed
+        building_data[building_id][key] += montant
+        building_data[building_id]["netCashflow"] += signed
+    
+    # Cashflow mensuel : loyers payés (tous confirmés) et transactions par type
+    for annee, mois, building_id, revenus, depenses in aggregates["mensuel"]:
+        month_key = f"{annee}-{mois:02d}"
+        add_amount(month_key, building_id, revenus, True)
+        add_amount(month_key, building_id, depenses, False)
+    
+    # Construire les données des immeubles
+    for building in aggregates["buildings"]:
+        building_id = building["id_immeuble"]
+        data = building_data[building_id]
+        analysis_data["buildings"].append({
+            "id": building_id,
+            "name": building["nom_immeuble"],
+            "summary": {
+                "totalRevenue": data["revenue"],
+                "totalExpenses": data["expenses"],
                 "netCashflow": data["netCashflow"]
-            })
-            
-            if current_date.month == 12:
-                current_date = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                current_date = current_date.replace(month=current_date.month + 1)
-        
-        # Calculer le résumé global
-        total_revenue = sum(data["revenue"] for data in monthly_data.values())
-        total_expenses = sum(data["expenses"] for data in monthly_data.values())
-        total_net_cashflow = sum(data["netCashflow"] for data in monthly_data.values())
-        
-        # Calculer la valeur totale des immeubles pour le ROI
-        print(f"🔍 DEBUG - Calcul de la valeur totale des immeubles...")
-        print(f"🔍 DEBUG - Nombre d'immeubles pour le calcul: {len(buildings)}")
-        total_property_value = 0
-        for i, building in enumerate(buildings):
-            print(f"🔍 DEBUG - Calcul valeur immeuble {i}: type={type(building)}")
-            try:
-                valeur = building.valeur_actuel or 0
-                print(f"🔍 DEBUG - Valeur immeuble {i}: {valeur}")
-                total_property_value += valeur
-            except Exception as e:
-                print(f"❌ ERREUR lors de l'accès à building.valeur_actuel: {e}")
-                print(f"❌ Building type: {type(building)}")
-                print(f"❌ Building content: {building}")
-                raise e
-        print(f"🔍 DEBUG - Valeur totale calculée: {total_property_value}")
-        
-        # Calculer le ROI (Return on Investment)
-        # ROI = (Cashflow net / Valeur totale des immeubles) * 100
-        roi_percentage = (total_net_cashflow / float(total_property_value) * 100) if total_property_value > 0 else 0
-        
-        analysis_data["summary"] = {
-            "totalRevenue": total_revenue,
-            "totalExpenses": total_expenses,
-            "netCashflow": total_net_cashflow,
-            "roi": round(roi_percentage, 2),
-            "totalPropertyValue": total_property_value
-        }
-        
-        # Calculer les catégories de dépenses pour le pie chart
-        expense_categories = defaultdict(float)
-        for transaction in transactions:
-            if transaction.categorie and not ("loyer" in transaction.categorie.lower()):
-                expense_categories[transaction.categorie] += abs(float(transaction.montant or 0))
-        
-        analysis_data["categories"] = dict(expense_categories)
-        
-        print(f"🔍 DEBUG - calculate_profitability_analysis: Succès")
-        print(f"🔍 DEBUG - Résumé: Revenus: ${total_revenue}, Dépenses: ${total_expenses}, Cashflow: ${total_net_cashflow}")
-        print(f"🔍 DEBUG - Catégories: {analysis_data['categories']}")
-        return analysis_data
-        
-    except Exception as e:
-        print(f"❌ ERREUR dans calculate_profitability_analysis: {str(e)}")
-        import traceback
-        print(f"❌ TRACEBACK: {traceback.format_exc()}")
-        raise e
-
-@app.get("/api/transactions")
-async def get_transactions():
-    """Récupérer toutes les transactions"""
-    try:
-        transactions = db_service_francais.get_transactions()
-        return {"data": transactions}
-    except Exception as e:
-        print(f"Erreur lors du chargement des transactions: {e}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors du chargement des transactions: {str(e)}")
+            }
+        })
+    
+    # Construire les données mensuelles
+    current_date = start_date
+    while current_date <= end_date:
+        month_key = current_date.strftime("%Y-%m")
+        month_name = calendar.month_name[current_date.month][:3].lower() + f". {current_date.year}"
+        
+        data = monthly_data[month_key]
+        analysis_data["monthlyTotals"].append({
+            "month": month_name,
+            "revenue": data["revenue"],
+            "expenses": data["expenses"],
+            "netCashflow": data["netCashflow"]
+        })
+        
+        if current_date.month == 12:
+            current_date = current_date.replace(year=current_date.year + 1, month=1)
+        else:
+            current_date = current_date.replace(month=current_date.month + 1)
+    
+    # Calculer le résumé global
+    total_revenue = sum(data["revenue"] for data in monthly_data.values())
+    total_expenses = sum(data["expenses"] for data in monthly_data.values())
+    total_net_cashflow = sum(data["netCashflow"] for data in monthly_data.values())
+    
+    # Valeur totale des immeubles pour le ROI
+    total_property_value = sum(building["valeur_actuel"] for building in aggregates["buildings"])
+    
+    # Calculer le ROI (Return on Investment)
+    # ROI = (Cashflow net / Valeur totale des immeubles) * 100
+    roi_percentage = (total_net_cashflow / float(total_property_value) * 100) if total_property_value > 0 else 0
+    
+    analysis_data["summary"] = {
+        "totalRevenue": total_revenue,
+        "totalExpenses": total_expenses,
+        "netCashflow": total_net_cashflow,
+        "roi": round(roi_percentage, 2),
+        "totalPropertyValue": total_property_value
+    }
+    
+    # Catégories de dépenses pour le pie chart (déjà agrégées en SQL, hors loyers)
+    analysis_data["categories"] = dict(aggregates["categories"])
+    
+    return analysis_data
 
 @app.get("/api/transactions/{transaction_id}")
-async def get_transaction(transaction_id: int):
+def get_transaction(transaction_id: int):
     """Récupérer une transaction par ID"""
     try:
         transaction = db_service_francais.get_transaction(transaction_id)
@@ -1876,21 +1955,21 @@ async def get_transaction(transaction_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Erreur lors du chargement de la transaction: {e}")
+        logger.error(f"Erreur lors du chargement de la transaction: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du chargement de la transaction: {str(e)}")
 
 @app.post("/api/transactions")
-async def create_transaction(transaction_data: dict):
+def create_transaction(transaction_data: dict):
     """Créer une nouvelle transaction"""
     try:
         created_transaction = db_service_francais.create_transaction(transaction_data)
         return {"data": created_transaction, "message": "Transaction créée avec succès"}
     except Exception as e:
-        print(f"Erreur lors de la création de la transaction: {e}")
+        logger.error(f"Erreur lors de la création de la transaction: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la transaction: {str(e)}")
 
 @app.get("/api/transactions/check-reference/{reference}")
-async def check_transaction_reference(reference: str):
+def check_transaction_reference(reference: str):
     """Vérifier si une référence de transaction existe déjà"""
     try:
         existing_transaction = db_service_francais.get_transaction_by_reference(reference)
@@ -1899,11 +1978,44 @@ async def check_transaction_reference(reference: str):
             "transaction": existing_transaction
         }
     except Exception as e:
-        print(f"Erreur lors de la vérification de la référence: {e}")
+        logger.error(f"Erreur lors de la vérification de la référence: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la vérification de la référence: {str(e)}")
 
+@app.get("/api/analysis/arrears")
+def get_arrears_analysis(
+    start_year: Optional[int] = Query(None, description="Année de début (mois dernier par défaut)"),
+    start_month: Optional[int] = Query(None, ge=1, le=12, description="Mois de début (1-12)"),
+    end_year: Optional[int] = Query(None, description="Année de fin (mois de début par défaut)"),
+    end_month: Optional[int] = Query(None, ge=1, le=12, description="Mois de fin (1-12)"),
+    building_ids: Optional[str] = Query(None, description="IDs des immeubles séparés par des virgules (tous par défaut)")
+):
+    """Loyers impayés par bail et par mois, avec totaux par immeuble et par locataire"""
+    try:
+        if start_year is None or start_month is None:
+            today = date.today()
+            start_year, start_month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+        if end_year is None or end_month is None:
+            end_year, end_month = start_year, start_month
+        
+        building_id_list = None
+        if building_ids:
+            try:
+                building_id_list = [int(id.strip()) for id in building_ids.split(',') if id.strip()]
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Format d'IDs d'immeubles invalide")
+        
+        if (end_year * 12 + end_month) - (start_year * 12 + start_month) >= 120:
+            raise HTTPException(status_code=400, detail="La période ne peut pas dépasser 120 mois")
+        
+        return db_service_francais.get_arrears(start_year, start_month, end_year, end_month, building_id_list)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors du calcul des loyers impayés: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors du calcul des loyers impayés: {str(e)}")
+
 @app.get("/api/analysis/mortgage")
-async def get_mortgage_analysis(
+def get_mortgage_analysis(
     building_ids: str = Query(..., description="IDs des immeubles séparés par des virgules")
 ):
     """Analyser la dette hypothécaire pour les immeubles sélectionnés"""
@@ -1950,11 +2062,11 @@ async def get_mortgage_analysis(
             }
         }
     except Exception as e:
-        print(f"Erreur lors de l'analyse de dette hypothécaire: {e}")
+        logger.error(f"Erreur lors de l'analyse de dette hypothécaire: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse de dette hypothécaire: {str(e)}")
 
 @app.post("/api/migrate/dette-restante")
-async def migrate_dette_restante():
+def migrate_dette_restante():
     """Migration pour ajouter la colonne dette_restante à la table immeubles"""
     try:
         from sqlalchemy import text
@@ -2006,12 +2118,12 @@ async def migrate_dette_restante():
             return {"message": "Colonne 'dette_restante' ajoutée avec succès", "success": True}
             
     except Exception as e:
-        print(f"Erreur lors de la migration: {e}")
+        logger.error(f"Erreur lors de la migration: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la migration: {str(e)}")
 
 
 @app.get("/api/test-endpoint")
-async def test_endpoint():
+def test_endpoint():
     """Endpoint de test pour vérifier le déploiement"""
     return {"message": "Test endpoint fonctionne", "timestamp": datetime.now().isoformat()}
 
@@ -2032,8 +2144,16 @@ class PaiementLoyerUpdate(BaseModel):
     montant_paye: Optional[float] = None
     notes: Optional[str] = None
 
+class PaiementsLoyersBulk(BaseModel):
+    # Soit une liste de paiements, soit « tous les baux actifs de l'immeuble pour le mois »
+    paiements: Optional[List[PaiementLoyerCreate]] = None
+    id_immeuble: Optional[int] = None
+    annee: Optional[int] = None
+    mois: Optional[int] = None
+    date_paiement_reelle: Optional[str] = None
+
 @app.post("/api/paiements-loyers")
-async def create_paiement_loyer(paiement_data: PaiementLoyerCreate):
+def create_paiement_loyer(paiement_data: PaiementLoyerCreate):
     """Créer un paiement de loyer"""
     try:
         paiement_dict = paiement_data.dict()
@@ -2043,11 +2163,39 @@ async def create_paiement_loyer(paiement_data: PaiementLoyerCreate):
         result = db_service_francais.create_paiement_loyer(paiement_dict)
         return result
     except Exception as e:
-        print(f"Erreur lors de la création du paiement de loyer: {e}")
+        logger.error(f"Erreur lors de la création du paiement de loyer: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création du paiement de loyer: {str(e)}")
 
+@app.post("/api/paiements-loyers/bulk")
+def bulk_paiements_loyers(data: PaiementsLoyersBulk):
+    """Créer ou mettre à jour plusieurs paiements en une transaction (résultat par ligne)"""
+    try:
+        if data.paiements is not None:
+            entrees = []
+            for paiement in data.paiements:
+                entree = paiement.dict()
+                if entree.get('date_paiement_reelle'):
+                    entree['date_paiement_reelle'] = datetime.fromisoformat(entree['date_paiement_reelle']).date()
+                entrees.append(entree)
+            result = db_service_francais.upsert_paiements_loyers(entrees)
+        elif data.id_immeuble is not None and data.annee and data.mois:
+            if not 1 <= data.mois <= 12:
+                raise HTTPException(status_code=400, detail="Le mois doit être entre 1 et 12")
+            date_paiement = datetime.fromisoformat(data.date_paiement_reelle).date() if data.date_paiement_reelle else None
+            result = db_service_francais.mark_building_paid(data.id_immeuble, data.annee, data.mois, date_paiement)
+        else:
+            raise HTTPException(status_code=400, detail="Fournir 'paiements' ou 'id_immeuble', 'annee' et 'mois'")
+        return {"success": True, "data": result}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erreur lors de l'enregistrement groupé des paiements de loyers: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'enregistrement des paiements: {str(e)}")
+
 @app.put("/api/paiements-loyers/{paiement_id}")
-async def update_paiement_loyer(paiement_id: int, update_data: PaiementLoyerUpdate):
+def update_paiement_loyer(paiement_id: int, update_data: PaiementLoyerUpdate):
     """Mettre à jour un paiement de loyer"""
     try:
         update_dict = update_data.dict(exclude_unset=True)
@@ -2059,11 +2207,11 @@ async def update_paiement_loyer(paiement_id: int, update_data: PaiementLoyerUpda
             raise HTTPException(status_code=404, detail="Paiement de loyer non trouvé")
         return result
     except Exception as e:
-        print(f"Erreur lors de la mise à jour du paiement de loyer: {e}")
+        logger.error(f"Erreur lors de la mise à jour du paiement de loyer: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du paiement de loyer: {str(e)}")
 
 @app.delete("/api/paiements-loyers/{paiement_id}")
-async def delete_paiement_loyer(paiement_id: int):
+def delete_paiement_loyer(paiement_id: int):
     """Supprimer un paiement de loyer"""
     try:
         result = db_service_francais.delete_paiement_loyer(paiement_id)
@@ -2071,39 +2219,43 @@ async def delete_paiement_loyer(paiement_id: int):
             raise HTTPException(status_code=404, detail="Paiement de loyer non trouvé")
         return {"success": True, "message": "Paiement supprimé avec succès"}
     except Exception as e:
-        print(f"Erreur lors de la suppression du paiement de loyer: {e}")
+        logger.error(f"Erreur lors de la suppression du paiement de loyer: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression du paiement de loyer: {str(e)}")
 
 @app.get("/api/paiements-loyers")
-async def get_all_paiements():
-    """Récupérer tous les paiements de loyers (optimisé)"""
+def get_all_paiements(
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les paiements)"),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+    bail_id: Optional[int] = Query(None, description="Filtrer par bail"),
+    building_id: Optional[int] = Query(None, description="Filtrer par immeuble"),
+    annee: Optional[int] = Query(None, description="Filtrer par année"),
+    mois: Optional[int] = Query(None, ge=1, le=12, description="Filtrer par mois")
+):
+    """Récupérer les paiements de loyers triés par année et mois (paginés si limit est fourni)"""
     try:
-        from models_francais import PaiementLoyer
-        from sqlalchemy.orm import Session
-        from database import SessionLocal
-        
-        db = SessionLocal()
-        try:
-            paiements = db.query(PaiementLoyer).order_by(PaiementLoyer.annee, PaiementLoyer.mois).all()
-            return {"data": [p.to_dict() for p in paiements]}
-        finally:
-            db.close()
+        paiements, next_cursor = db_service_francais.get_paiements_loyers_page(
+            cursor=cursor, limit=limit, bail_id=bail_id, building_id=building_id, annee=annee, mois=mois
+        )
+        return page_response(paiements, next_cursor, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Erreur lors de la récupération de tous les paiements: {e}")
+        logger.error(f"Erreur lors de la récupération de tous les paiements: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des paiements: {str(e)}")
 
 @app.get("/api/paiements-loyers/bail/{bail_id}")
-async def get_paiements_by_bail(bail_id: int):
+def get_paiements_by_bail(bail_id: int):
     """Récupérer tous les paiements pour un bail"""
     try:
         paiements = db_service_francais.get_paiements_by_bail(bail_id)
         return {"data": paiements}
     except Exception as e:
-        print(f"Erreur lors de la récupération des paiements pour le bail {bail_id}: {e}")
+        logger.error(f"Erreur lors de la récupération des paiements pour le bail {bail_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des paiements: {str(e)}")
 
 @app.get("/api/paiements-loyers/building/{building_id}")
-async def get_paiements_by_building(
+def get_paiements_by_building(
     building_id: int,
     start_year: int = Query(..., description="Année de début"),
     start_month: int = Query(..., description="Mois de début (1-12)"),
@@ -2117,11 +2269,30 @@ async def get_paiements_by_building(
         )
         return {"data": paiements}
     except Exception as e:
-        print(f"Erreur lors de la récupération des paiements pour l'immeuble {building_id}: {e}")
+        logger.error(f"Erreur lors de la récupération des paiements pour l'immeuble {building_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des paiements: {str(e)}")
+
+@app.get("/api/paiements-loyers/rent-roll")
+def get_rent_roll(
+    building_ids: str = Query(..., description="IDs des immeubles séparés par des virgules"),
+    annee: int = Query(..., description="Année du premier mois"),
+    mois_debut: int = Query(1, ge=1, le=12, description="Premier mois (1-12)"),
+    nb_mois: int = Query(12, ge=1, le=36, description="Nombre de mois affichés")
+):
+    """Matrice bail × mois des loyers attendus et payés (une seule requête, format colonnaire)"""
+    try:
+        building_id_list = [int(id.strip()) for id in building_ids.split(',') if id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format d'IDs d'immeubles invalide")
+    try:
+        roll = db_service_francais.get_rent_roll(building_id_list, annee, mois_debut, nb_mois)
+        return {"success": True, "data": roll}
+    except Exception as e:
+        logger.error(f"Erreur lors de la construction du rent roll: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des paiements: {str(e)}")
 
 @app.get("/api/paiements-loyers/get-or-create")
-async def get_or_create_paiement(
+def get_or_create_paiement(
     bail_id: int = Query(..., description="ID du bail"),
     mois: int = Query(..., description="Mois (1-12)"),
     annee: int = Query(..., description="Année")
@@ -2131,11 +2302,11 @@ async def get_or_create_paiement(
         paiement = db_service_francais.get_or_create_paiement(bail_id, mois, annee)
         return paiement
     except Exception as e:
-        print(f"Erreur lors de la récupération/création du paiement: {e}")
+        logger.error(f"Erreur lors de la récupération/création du paiement: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération/création du paiement: {str(e)}")
 
 @app.delete("/api/paiements-loyers/clear-all")
-async def clear_all_paiements_loyers():
+def clear_all_paiements_loyers():
     """DANGER: Supprimer TOUTES les données de la table paiements_loyers"""
     try:
         from sqlalchemy import text
@@ -2145,17 +2316,20 @@ async def clear_all_paiements_loyers():
             result = session.execute(text("SELECT COUNT(*) FROM paiements_loyers"))
             count_before = result.scalar()
             
-            print(f"⚠️  Suppression de {count_before} paiements de loyers...")
+            logger.warning(f"⚠️  Suppression de {count_before} paiements de loyers...")
             
             # Supprimer toutes les données
             session.execute(text("DELETE FROM paiements_loyers"))
             session.commit()
             
+            # Resynchroniser le cashflow mensuel
+            db_service_francais.rebuild_cashflow_mensuel()
+            
             # Vérifier après suppression
             result = session.execute(text("SELECT COUNT(*) FROM paiements_loyers"))
             count_after = result.scalar()
             
-            print(f"✅ Table paiements_loyers vidée. {count_before} enregistrements supprimés, {count_after} restants")
+            logger.info(f"✅ Table paiements_loyers vidée. {count_before} enregistrements supprimés, {count_after} restants")
             
             return {
                 "message": f"Table paiements_loyers vidée avec succès",
@@ -2165,11 +2339,25 @@ async def clear_all_paiements_loyers():
             }
             
     except Exception as e:
-        print(f"❌ Erreur lors de la suppression: {e}")
+        logger.error(f"❌ Erreur lors de la suppression: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression: {str(e)}")
 
+@app.post("/api/migrate/rebuild-cashflow")
+def migrate_rebuild_cashflow():
+    """Reconstruire la table cashflow_mensuel à partir des paiements de loyers et des transactions"""
+    try:
+        result = db_service_francais.rebuild_cashflow_mensuel()
+        return {
+            "success": True,
+            "message": f"Cashflow mensuel reconstruit ({result['lignes']} lignes)",
+            "details": result
+        }
+    except Exception as e:
+        logger.error(f"❌ Erreur lors de la reconstruction du cashflow mensuel: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la reconstruction du cashflow mensuel: {str(e)}")
+
 @app.post("/api/migrate/remove-paye-column")
-async def migrate_remove_paye_column():
+def migrate_remove_paye_column():
     """Migration pour supprimer la colonne 'paye' de paiements_loyers"""
     try:
         from sqlalchemy import text
@@ -2191,7 +2379,7 @@ async def migrate_remove_paye_column():
                     drop_query = text("ALTER TABLE paiements_loyers DROP COLUMN paye")
                     session.execute(drop_query)
                     session.commit()
-                    print("✅ Colonne 'paye' supprimée de paiements_loyers sur PostgreSQL")
+                    logger.info("✅ Colonne 'paye' supprimée de paiements_loyers sur PostgreSQL")
                     return {"message": "Colonne 'paye' supprimée avec succès", "success": True}
                 else:
                     return {"message": "La colonne 'paye' n'existe pas", "success": True}
@@ -2203,7 +2391,7 @@ async def migrate_remove_paye_column():
                 
                 if 'paye' in columns:
                     # SQLite ne supporte pas DROP COLUMN facilement, on doit recréer la table
-                    print("⚠️  SQLite: Recréation de la table sans la colonne 'paye'")
+                    logger.warning("⚠️  SQLite: Recréation de la table sans la colonne 'paye'")
                     
                     # 1. Créer une nouvelle table temporaire sans 'paye'
                     session.execute(text("""
@@ -2237,17 +2425,17 @@ async def migrate_remove_paye_column():
                     session.execute(text("ALTER TABLE paiements_loyers_new RENAME TO paiements_loyers"))
                     
                     session.commit()
-                    print("✅ Colonne 'paye' supprimée de paiements_loyers sur SQLite")
+                    logger.info("✅ Colonne 'paye' supprimée de paiements_loyers sur SQLite")
                     return {"message": "Colonne 'paye' supprimée avec succès (SQLite)", "success": True}
                 else:
                     return {"message": "La colonne 'paye' n'existe pas", "success": True}
                     
     except Exception as e:
-        print(f"❌ Erreur lors de la migration: {e}")
+        logger.error(f"❌ Erreur lors de la migration: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la migration: {str(e)}")
 
 @app.post("/api/migrate/paiements-loyers")
-async def migrate_paiements_loyers():
+def migrate_paiements_loyers():
     """Migration pour créer la table paiements_loyers"""
     try:
         from sqlalchemy import text
@@ -2324,11 +2512,11 @@ async def migrate_paiements_loyers():
             return {"message": "Table 'paiements_loyers' créée avec succès", "success": True}
             
     except Exception as e:
-        print(f"Erreur lors de la migration paiements_loyers: {e}")
+        logger.error(f"Erreur lors de la migration paiements_loyers: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la migration: {str(e)}")
 
 @app.post("/api/migrate/dette-restante")
-async def migrate_dette_restante():
+def migrate_dette_restante():
     """Migration pour ajouter la colonne dette_restante à la table immeubles"""
     try:
         from sqlalchemy import text
@@ -2346,17 +2534,17 @@ async def migrate_dette_restante():
                 column_exists = result.fetchone() is not None
                 
                 if not column_exists:
-                    print("📝 Ajout de la colonne dette_restante à la table immeubles (PostgreSQL)...")
+                    logger.info("📝 Ajout de la colonne dette_restante à la table immeubles (PostgreSQL)...")
                     alter_query = text("""
                         ALTER TABLE immeubles 
                         ADD COLUMN dette_restante DECIMAL(12, 2) DEFAULT 0
                     """)
                     session.execute(alter_query)
                     session.commit()
-                    print("✅ Colonne dette_restante ajoutée avec succès!")
+                    logger.info("✅ Colonne dette_restante ajoutée avec succès!")
                     return {"message": "Colonne 'dette_restante' ajoutée avec succès", "success": True}
                 else:
-                    print("ℹ️ La colonne dette_restante existe déjà")
+                    logger.info("ℹ️ La colonne dette_restante existe déjà")
                     return {"message": "La colonne 'dette_restante' existe déjà", "success": True}
             else:
                 # SQLite local
@@ -2365,21 +2553,21 @@ async def migrate_dette_restante():
                 columns = [row[1] for row in result]
                 
                 if 'dette_restante' not in columns:
-                    print("📝 Ajout de la colonne dette_restante à la table immeubles (SQLite)...")
+                    logger.info("📝 Ajout de la colonne dette_restante à la table immeubles (SQLite)...")
                     alter_query = text("""
                         ALTER TABLE immeubles 
                         ADD COLUMN dette_restante DECIMAL(12, 2) DEFAULT 0
                     """)
                     session.execute(alter_query)
                     session.commit()
-                    print("✅ Colonne dette_restante ajoutée avec succès!")
+                    logger.info("✅ Colonne dette_restante ajoutée avec succès!")
                     return {"message": "Colonne 'dette_restante' ajoutée avec succès", "success": True}
                 else:
-                    print("ℹ️ La colonne dette_restante existe déjà")
+                    logger.info("ℹ️ La colonne dette_restante existe déjà")
                     return {"message": "La colonne 'dette_restante' existe déjà", "success": True}
             
     except Exception as e:
-        print(f"Erreur lors de la migration dette_restante: {e}")
+        logger.error(f"Erreur lors de la migration dette_restante: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la migration: {str(e)}")
 
 # ==========================================
@@ -2387,7 +2575,7 @@ async def migrate_dette_restante():
 # ==========================================
 
 @app.post("/api/migrate/remove-locataire-id-unite")
-async def migrate_remove_locataire_id_unite_endpoint():
+def migrate_remove_locataire_id_unite_endpoint():
     """
     Endpoint pour exécuter la migration : supprimer id_unite de la table locataires
     Après la migration bail-add-id-unite, les baux ont maintenant id_unite directement.
@@ -2396,9 +2584,9 @@ async def migrate_remove_locataire_id_unite_endpoint():
     try:
         from migrate_remove_locataire_id_unite import migrate_remove_locataire_id_unite
         
-        print("\n" + "="*70)
-        print("🚀 DÉMARRAGE DE LA MIGRATION : Supprimer id_unite de locataires")
-        print("="*70)
+        logger.info("\n" + "="*70)
+        logger.info("🚀 DÉMARRAGE DE LA MIGRATION : Supprimer id_unite de locataires")
+        logger.info("="*70)
         
         success = migrate_remove_locataire_id_unite()
         
@@ -2418,8 +2606,8 @@ async def migrate_remove_locataire_id_unite_endpoint():
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        print(f"❌ Erreur lors de la migration: {e}")
-        print(error_details)
+        logger.error(f"❌ Erreur lors de la migration: {e}")
+        logger.info(error_details)
         return {
             "success": False,
             "message": f"Erreur lors de la migration: {str(e)}",
@@ -2427,7 +2615,7 @@ async def migrate_remove_locataire_id_unite_endpoint():
         }
 
 @app.post("/api/migrate/bail-add-id-unite")
-async def migrate_bail_add_id_unite_endpoint():
+def migrate_bail_add_id_unite_endpoint():
     """
     Endpoint pour exécuter la migration : ajouter id_unite à la table baux
     Cette migration migre les données depuis locataires.id_unite vers baux.id_unite
@@ -2439,9 +2627,9 @@ async def migrate_bail_add_id_unite_endpoint():
     try:
         from migrate_bail_add_id_unite import migrate_bail_add_id_unite
         
-        print("\n" + "="*70)
-        print("🚀 DÉMARRAGE DE LA MIGRATION BAIL ID_UNITE VIA API")
-        print("="*70)
+        logger.info("\n" + "="*70)
+        logger.info("🚀 DÉMARRAGE DE LA MIGRATION BAIL ID_UNITE VIA API")
+        logger.info("="*70)
         
         success = migrate_bail_add_id_unite()
         
@@ -2461,8 +2649,8 @@ async def migrate_bail_add_id_unite_endpoint():
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
-        print(f"❌ Erreur lors de la migration: {e}")
-        print(error_details)
+        logger.error(f"❌ Erreur lors de la migration: {e}")
+        logger.info(error_details)
         return {
             "success": False,
             "message": f"Erreur lors de la migration: {str(e)}",
@@ -2474,7 +2662,7 @@ async def migrate_bail_add_id_unite_endpoint():
 # ============================================================================
 
 @app.post("/api/setup-authentication")
-async def setup_authentication():
+def setup_authentication():
     """
     Endpoint temporaire pour initialiser le système d'authentification
     Crée les tables, la compagnie de Sacha, son compte admin, et migre les données
@@ -2486,22 +2674,22 @@ async def setup_authentication():
         import bcrypt
         from datetime import datetime
         
-        print("\n" + "="*70)
-        print("🚀 DÉBUT DU SETUP D'AUTHENTIFICATION SUR RENDER")
-        print("="*70)
+        logger.info("\n" + "="*70)
+        logger.info("🚀 DÉBUT DU SETUP D'AUTHENTIFICATION SUR RENDER")
+        logger.info("="*70)
         
         # Récupérer l'URL de la base de données
         database_url = os.environ.get("DATABASE_URL")
         if not database_url:
             raise Exception("DATABASE_URL non configurée")
         
-        print(f"📊 Connexion à la base de données...")
+        logger.info(f"📊 Connexion à la base de données...")
         engine = create_engine(database_url)
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
         
         with SessionLocal() as session:
             # ÉTAPE 1: Créer les tables d'authentification dans le schéma public
-            print("\n1️⃣ Création des tables d'authentification (schéma public)...")
+            logger.info("\n1️⃣ Création des tables d'authentification (schéma public)...")
             
             # Table compagnies
             session.execute(text("""
@@ -2560,10 +2748,10 @@ async def setup_authentication():
             """))
             
             session.commit()
-            print("✅ Tables d'authentification créées")
+            logger.info("✅ Tables d'authentification créées")
             
             # ÉTAPE 2: Créer la compagnie de Sacha
-            print("\n2️⃣ Création de la compagnie 'CAH Immobilier'...")
+            logger.info("\n2️⃣ Création de la compagnie 'CAH Immobilier'...")
             
             # Vérifier si la compagnie existe déjà
             check_company = session.execute(text("""
@@ -2572,7 +2760,7 @@ async def setup_authentication():
             
             if check_company:
                 company_id = check_company[0]
-                print(f"ℹ️ Compagnie existe déjà (ID: {company_id})")
+                logger.info(f"ℹ️ Compagnie existe déjà (ID: {company_id})")
             else:
                 session.execute(text("""
                     INSERT INTO public.compagnies 
@@ -2585,10 +2773,10 @@ async def setup_authentication():
                     SELECT id_compagnie FROM public.compagnies WHERE nom_compagnie = 'CAH Immobilier'
                 """)).fetchone()[0]
                 
-                print(f"✅ Compagnie 'CAH Immobilier' créée (ID: {company_id})")
+                logger.info(f"✅ Compagnie 'CAH Immobilier' créée (ID: {company_id})")
             
             # ÉTAPE 3: Créer le compte admin de Sacha
-            print("\n3️⃣ Création du compte admin pour Sacha...")
+            logger.info("\n3️⃣ Création du compte admin pour Sacha...")
             
             # Vérifier si l'utilisateur existe déjà
             check_user = session.execute(text("""
@@ -2596,7 +2784,7 @@ async def setup_authentication():
             """)).fetchone()
             
             if check_user:
-                print(f"ℹ️ Utilisateur existe déjà (ID: {check_user[0]})")
+                logger.info(f"ℹ️ Utilisateur existe déjà (ID: {check_user[0]})")
             else:
                 # Hasher le mot de passe
                 password = "Champion2024!"
@@ -2609,17 +2797,17 @@ async def setup_authentication():
                 """), {"company_id": company_id, "password_hash": password_hash})
                 session.commit()
                 
-                print("✅ Compte admin créé pour sacha.heroux87@gmail.com")
+                logger.info("✅ Compte admin créé pour sacha.heroux87@gmail.com")
             
             # ÉTAPE 4: Créer le schéma dédié pour CAH Immobilier
-            print("\n4️⃣ Création du schéma 'cah_immobilier'...")
+            logger.info("\n4️⃣ Création du schéma 'cah_immobilier'...")
             
             session.execute(text("CREATE SCHEMA IF NOT EXISTS cah_immobilier"))
             session.commit()
-            print("✅ Schéma 'cah_immobilier' créé")
+            logger.info("✅ Schéma 'cah_immobilier' créé")
             
             # ÉTAPE 5: Créer les tables dans le nouveau schéma
-            print("\n5️⃣ Création des tables de données dans 'cah_immobilier'...")
+            logger.info("\n5️⃣ Création des tables de données dans 'cah_immobilier'...")
             
             session.execute(text("SET search_path TO cah_immobilier, public"))
             
@@ -2740,17 +2928,17 @@ async def setup_authentication():
             """))
             
             session.commit()
-            print("✅ Tables de données créées dans 'cah_immobilier'")
+            logger.info("✅ Tables de données créées dans 'cah_immobilier'")
             
             # ÉTAPE 6: Migrer les données existantes depuis public vers cah_immobilier
-            print("\n6️⃣ Migration des données existantes...")
+            logger.info("\n6️⃣ Migration des données existantes...")
             
             # Compter les données à migrer
             counts = {}
             for table in ['immeubles', 'unites', 'locataires', 'baux', 'transactions', 'paiements_loyers']:
                 count = session.execute(text(f"SELECT COUNT(*) FROM public.{table}")).scalar()
                 counts[table] = count
-                print(f"   📊 {table}: {count} entrées")
+                logger.info(f"   📊 {table}: {count} entrées")
             
             # Migrer les données
             if counts['immeubles'] > 0:
@@ -2796,15 +2984,15 @@ async def setup_authentication():
                 """))
             
             session.commit()
-            print("✅ Données migrées avec succès")
+            logger.info("✅ Données migrées avec succès")
             
             # Réinitialiser le search_path
             session.execute(text("SET search_path TO public"))
             session.commit()
         
-        print("\n" + "="*70)
-        print("✅ SETUP D'AUTHENTIFICATION TERMINÉ AVEC SUCCÈS !")
-        print("="*70)
+        logger.info("\n" + "="*70)
+        logger.info("✅ SETUP D'AUTHENTIFICATION TERMINÉ AVEC SUCCÈS !")
+        logger.info("="*70)
         
         return {
             "success": True,
@@ -2818,9 +3006,7 @@ async def setup_authentication():
         }
         
     except Exception as e:
-        print(f"\n❌ ERREUR DURANT LE SETUP: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"\n❌ ERREUR DURANT LE SETUP: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur durant le setup: {str(e)}")
 
 # ==========================================
@@ -2828,9 +3014,10 @@ async def setup_authentication():
 # ==========================================
 
 if CONSTRUCTION_ENABLED:
-    from sqlalchemy.orm import Session
+    from sqlalchemy.orm import Session, selectinload
     from sqlalchemy import desc
     from fastapi import Depends
+    from pagination import paginate
     
     # ==========================================
     # MODÈLES PYDANTIC POUR CONSTRUCTION
@@ -3009,7 +3196,7 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.post("/api/construction/migrate/add-projet-columns")
-    async def migrate_add_projet_columns(db: Session = Depends(get_construction_db)):
+    def migrate_add_projet_columns(db: Session = Depends(get_construction_db)):
         """Ajouter les colonnes manquantes à la table projets"""
         try:
             from sqlalchemy import text
@@ -3035,12 +3222,12 @@ if CONSTRUCTION_ENABLED:
                     try:
                         db.execute(text(f"ALTER TABLE projets ADD COLUMN {col_name} {col_type}"))
                         added_columns.append(col_name)
-                        print(f"✅ Colonne '{col_name}' ajoutée")
+                        logger.info(f"✅ Colonne '{col_name}' ajoutée")
                     except Exception as e:
-                        print(f"❌ Erreur lors de l'ajout de '{col_name}': {e}")
+                        logger.error(f"❌ Erreur lors de l'ajout de '{col_name}': {e}")
                 else:
                     skipped_columns.append(col_name)
-                    print(f"ℹ️ Colonne '{col_name}' existe déjà")
+                    logger.info(f"ℹ️ Colonne '{col_name}' existe déjà")
             
             db.commit()
             
@@ -3056,7 +3243,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur migration: {e}")
     
     @app.post("/api/construction/migrate/add-taux-horaire")
-    async def migrate_add_taux_horaire(db: Session = Depends(get_construction_db)):
+    def migrate_add_taux_horaire(db: Session = Depends(get_construction_db)):
         """Migration : Ajouter la colonne taux_horaire à la table employes"""
         try:
             from sqlalchemy import text
@@ -3079,7 +3266,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur migration: {e}")
     
     @app.get("/api/construction/debug/employes-structure")
-    async def debug_employes_structure(db: Session = Depends(get_construction_db)):
+    def debug_employes_structure(db: Session = Depends(get_construction_db)):
         """Debug : Vérifier la structure de la table employes"""
         try:
             from sqlalchemy import text
@@ -3111,30 +3298,25 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/projets")
-    async def get_projets(db: Session = Depends(get_construction_db)):
-        """Récupérer tous les projets"""
+    def get_projets(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les projets)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les projets, du plus récent au plus ancien (paginés si limit est fourni)"""
         try:
-            from sqlalchemy import text
-            
-            # Vérifier quelles colonnes existent dans la table
-            result = db.execute(text("PRAGMA table_info(projets)"))
-            existing_columns = [col[1] for col in result.fetchall()]
-            
             # Colonnes de base qui doivent exister
             base_columns = ['id_projet', 'nom', 'date_debut', 'date_fin_prevue', 'date_fin_reelle', 'notes', 'date_creation', 'date_modification']
             # Colonnes optionnelles à ajouter
             optional_columns = ['adresse', 'ville', 'province', 'code_postal', 'budget_total']
             
-            # Construire la liste des colonnes à sélectionner
-            columns_to_select = [col for col in base_columns if col in existing_columns]
-            columns_to_select.extend([col for col in optional_columns if col in existing_columns])
-            
-            # Construire la requête SQL
-            columns_str = ', '.join(columns_to_select)
-            query = f"SELECT {columns_str} FROM projets ORDER BY date_creation DESC"
+            # Ne sélectionner que les colonnes qui existent dans la table (schéma en cache)
+            columns_to_select = schema_cache.select_columns('projets', base_columns + optional_columns)
             
-            result = db.execute(text(query))
-            rows = result.fetchall()
+            # Requête projetée sur les colonnes existantes, triée par ordre de création
+            query = db.query(*[getattr(Projet, col) for col in columns_to_select])
+            rows, next_cursor = paginate(query, [(Projet.id_projet, True)], cursor, limit)
             
             # Convertir les résultats en dictionnaires
             projets_data = []
@@ -3152,12 +3334,14 @@ if CONSTRUCTION_ENABLED:
                         projet_dict[col_name] = value
                 projets_data.append(projet_dict)
             
-            return {"success": True, "data": projets_data}
+            return page_response(projets_data, next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des projets: {e}")
     
     @app.post("/api/construction/projets")
-    async def create_projet(projet_data: ProjetCreate, db: Session = Depends(get_construction_db)):
+    def create_projet(projet_data: ProjetCreate, db: Session = Depends(get_construction_db)):
         """Créer un nouveau projet"""
         try:
             # Convertir les dates string en objets datetime
@@ -3210,7 +3394,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création du projet: {e}")
     
     @app.get("/api/construction/projets/{projet_id}")
-    async def get_projet(projet_id: int, db: Session = Depends(get_construction_db)):
+    def get_projet(projet_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer un projet par ID"""
         try:
             projet = db.query(Projet).filter(Projet.id_projet == projet_id).first()
@@ -3222,8 +3406,96 @@ if CONSTRUCTION_ENABLED:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du projet: {e}")
     
+    def analyser_depenses_projets(db: Session, projet_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Dépenses par section de plusieurs projets, agrégées en SQL (SUM ... GROUP BY)
+        
+        Trois requêtes au total, quel que soit le nombre de projets ou de lignes :
+        factures ST, lignes de commande (jointes à leur commande) et punchs
+        (joints à l'employé pour heures * taux horaire).
+        
+        Returns:
+            {id_projet: {"depenses_par_section": [...], "totaux": {...}}}
+        """
+        from collections import defaultdict
+        from sqlalchemy import func
+        
+        def section_de(colonne):
+            # Section vide ou absente regroupée sous « Non spécifié »
+            return func.coalesce(func.nullif(colonne, ''), 'Non spécifié').label('section')
+        
+        def filtrer(query, colonne_projet):
+            return query.filter(colonne_projet.in_(projet_ids)) if projet_ids is not None else query
+        
+        depenses = defaultdict(lambda: defaultdict(lambda: {
+            "sous_traitants": 0.0,
+            "commandes": 0.0,
+            "employes": 0.0,
+            "heures_travaillees": 0.0,  # Nombre d'heures travaillées
+            "total": 0.0
+        }))
+        
+        # 1. Dépenses des factures ST (sous-traitants) par section
+        section = section_de(FactureST.section)
+        factures = filtrer(db.query(
+            FactureST.id_projet, section, func.coalesce(func.sum(FactureST.montant), 0.0)
+        ), FactureST.id_projet).group_by(FactureST.id_projet, section)
+        for id_projet, nom_section, montant in factures:
+            depenses[id_projet][nom_section]["sous_traitants"] += montant
+            depenses[id_projet][nom_section]["total"] += montant
+        
+        # 2. Dépenses des lignes de commande par section
+        section = section_de(LigneCommande.section)
+        lignes = filtrer(db.query(
+            Commande.id_projet, section, func.coalesce(func.sum(LigneCommande.montant), 0.0)
+        ).join(Commande, Commande.id_commande == LigneCommande.id_commande), Commande.id_projet) \
+            .group_by(Commande.id_projet, section)
+        for id_projet, nom_section, montant in lignes:
+            depenses[id_projet][nom_section]["commandes"] += montant
+            depenses[id_projet][nom_section]["total"] += montant
+        
+        # 3. Dépenses des punchs employés (heures * taux horaire de l'employé) par section
+        section = section_de(PunchEmploye.section)
+        heures = func.coalesce(PunchEmploye.heure_travaillee, 0.0)
+        punchs = filtrer(db.query(
+            PunchEmploye.id_projet, section,
+            func.coalesce(func.sum(heures), 0.0),
+            func.coalesce(func.sum(heures * func.coalesce(Employe.taux_horaire, 0.0)), 0.0)
+        ).outerjoin(Employe, Employe.id_employe == PunchEmploye.id_employe), PunchEmploye.id_projet) \
+            .group_by(PunchEmploye.id_projet, section)
+        for id_projet, nom_section, nb_heures, cout in punchs:
+            depenses[id_projet][nom_section]["heures_travaillees"] += nb_heures
+            depenses[id_projet][nom_section]["employes"] += cout
+            depenses[id_projet][nom_section]["total"] += cout
+        
+        resultats = {}
+        for id_projet in (projet_ids if projet_ids is not None else list(depenses)):
+            sections = depenses.get(id_projet, {})
+            # Liste triée par total décroissant
+            analyse = [
+                {
+                    "section": nom_section,
+                    "sous_traitants": round(valeurs["sous_traitants"], 2),
+                    "commandes": round(valeurs["commandes"], 2),
+                    "employes": round(valeurs["employes"], 2),
+                    "heures_travaillees": round(valeurs["heures_travaillees"], 2),
+                    "total": round(valeurs["total"], 2)
+                }
+                for nom_section, valeurs in sorted(sections.items(), key=lambda x: (-x[1]["total"], x[0]))
+            ]
+            resultats[id_projet] = {
+                "depenses_par_section": analyse,
+                "totaux": {
+                    "sous_traitants": round(sum(d["sous_traitants"] for d in sections.values()), 2),
+                    "commandes": round(sum(d["commandes"] for d in sections.values()), 2),
+                    "employes": round(sum(d["employes"] for d in sections.values()), 2),
+                    "total": round(sum(d["total"] for d in sections.values()), 2)
+                }
+            }
+        return resultats
+    
     @app.get("/api/construction/projets/{projet_id}/analyse-depenses")
-    async def get_analyse_depenses(projet_id: int, db: Session = Depends(get_construction_db)):
+    def get_analyse_depenses(projet_id: int, db: Session = Depends(get_construction_db)):
         """Analyser les dépenses d'un projet par section/catégorie"""
         try:
             # Vérifier que le projet existe
@@ -3231,74 +3503,12 @@ if CONSTRUCTION_ENABLED:
             if not projet:
                 raise HTTPException(status_code=404, detail="Projet non trouvé")
             
-            from collections import defaultdict
-            from sqlalchemy import func
-            
-            # Dictionnaire pour regrouper les dépenses par section
-            depenses_par_section = defaultdict(lambda: {
-                "sous_traitants": 0.0,
-                "commandes": 0.0,
-                "employes": 0.0,
-                "heures_travaillees": 0.0,  # Nombre d'heures travaillées
-                "total": 0.0
-            })
-            
-            # 1. Dépenses des factures ST (sous-traitants) par section
-            factures_st = db.query(FactureST).filter(FactureST.id_projet == projet_id).all()
-            for facture in factures_st:
-                section = facture.section or "Non spécifié"
-                depenses_par_section[section]["sous_traitants"] += facture.montant or 0.0
-                depenses_par_section[section]["total"] += facture.montant or 0.0
-            
-            # 2. Dépenses des lignes de commande par section
-            commandes = db.query(Commande).filter(Commande.id_projet == projet_id).all()
-            for commande in commandes:
-                for ligne in commande.lignes_commande:
-                    section = ligne.section or "Non spécifié"
-                    depenses_par_section[section]["commandes"] += ligne.montant or 0.0
-                    depenses_par_section[section]["total"] += ligne.montant or 0.0
-            
-            # 3. Dépenses des punchs employés (heures * taux horaire) par section
-            punchs = db.query(PunchEmploye).filter(PunchEmploye.id_projet == projet_id).all()
-            for punch in punchs:
-                section = punch.section or "Non spécifié"
-                heures = punch.heure_travaillee or 0.0
-                depenses_par_section[section]["heures_travaillees"] += heures
-                # Calculer le coût : heures travaillées * taux horaire de l'employé
-                if punch.employe and punch.employe.taux_horaire:
-                    cout = heures * (punch.employe.taux_horaire or 0.0)
-                    depenses_par_section[section]["employes"] += cout
-                    depenses_par_section[section]["total"] += cout
-            
-            # Convertir en liste triée par total décroissant
-            analyse = []
-            for section, depenses in sorted(depenses_par_section.items(), key=lambda x: x[1]["total"], reverse=True):
-                analyse.append({
-                    "section": section,
-                    "sous_traitants": round(depenses["sous_traitants"], 2),
-                    "commandes": round(depenses["commandes"], 2),
-                    "employes": round(depenses["employes"], 2),
-                    "heures_travaillees": round(depenses["heures_travaillees"], 2),
-                    "total": round(depenses["total"], 2)
-                })
-            
-            # Calculer les totaux généraux
-            total_sous_traitants = sum(d["sous_traitants"] for d in depenses_par_section.values())
-            total_commandes = sum(d["commandes"] for d in depenses_par_section.values())
-            total_employes = sum(d["employes"] for d in depenses_par_section.values())
-            total_general = sum(d["total"] for d in depenses_par_section.values())
-            
+            analyse = analyser_depenses_projets(db, [projet_id])[projet_id]
             return {
                 "success": True,
                 "data": {
                     "projet": projet.to_dict(),
-                    "depenses_par_section": analyse,
-                    "totaux": {
-                        "sous_traitants": round(total_sous_traitants, 2),
-                        "commandes": round(total_commandes, 2),
-                        "employes": round(total_employes, 2),
-                        "total": round(total_general, 2)
-                    }
+                    **analyse
                 }
             }
         except HTTPException:
@@ -3306,8 +3516,37 @@ if CONSTRUCTION_ENABLED:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse des dépenses: {e}")
     
+    @app.get("/api/construction/analyse-depenses")
+    def get_analyse_depenses_projets(
+        projet_ids: Optional[str] = Query(None, description="IDs des projets séparés par des virgules (tous les projets par défaut)"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Analyser les dépenses par section de plusieurs projets en un seul appel"""
+        try:
+            query = db.query(Projet)
+            if projet_ids:
+                try:
+                    id_list = [int(id.strip()) for id in projet_ids.split(',') if id.strip()]
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Format d'IDs de projets invalide")
+                query = query.filter(Projet.id_projet.in_(id_list))
+            projets = query.order_by(Projet.id_projet).all()
+            
+            analyses = analyser_depenses_projets(db, [projet.id_projet for projet in projets])
+            return {
+                "success": True,
+                "data": [
+                    {"projet": projet.to_dict(), **analyses[projet.id_projet]}
+                    for projet in projets
+                ]
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erreur lors de l'analyse des dépenses: {e}")
+    
     @app.put("/api/construction/projets/{projet_id}")
-    async def update_projet(projet_id: int, projet_data: ProjetUpdate, db: Session = Depends(get_construction_db)):
+    def update_projet(projet_id: int, projet_data: ProjetUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour un projet"""
         try:
             projet = db.query(Projet).filter(Projet.id_projet == projet_id).first()
@@ -3378,7 +3617,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du projet: {e}")
     
     @app.delete("/api/construction/projets/{projet_id}")
-    async def delete_projet(projet_id: int, db: Session = Depends(get_construction_db)):
+    def delete_projet(projet_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer un projet (avec vérification des dépendances)"""
         try:
             projet = db.query(Projet).filter(Projet.id_projet == projet_id).first()
@@ -3411,16 +3650,27 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/fournisseurs")
-    async def get_fournisseurs(db: Session = Depends(get_construction_db)):
-        """Récupérer tous les fournisseurs"""
+    def get_fournisseurs(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les fournisseurs)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les fournisseurs triés par nom (paginés si limit est fourni)"""
         try:
-            fournisseurs = db.query(Fournisseur).order_by(Fournisseur.nom).all()
-            return {"success": True, "data": [fournisseur.to_dict() for fournisseur in fournisseurs]}
+            fournisseurs, next_cursor = paginate(
+                db.query(Fournisseur),
+                [(Fournisseur.nom, False), (Fournisseur.id_fournisseur, False)],
+                cursor, limit
+            )
+            return page_response([fournisseur.to_dict() for fournisseur in fournisseurs], next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des fournisseurs: {e}")
     
     @app.get("/api/construction/fournisseurs/{fournisseur_id}")
-    async def get_fournisseur(fournisseur_id: int, db: Session = Depends(get_construction_db)):
+    def get_fournisseur(fournisseur_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer un fournisseur par ID"""
         try:
             fournisseur = db.query(Fournisseur).filter(Fournisseur.id_fournisseur == fournisseur_id).first()
@@ -3433,7 +3683,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du fournisseur: {e}")
     
     @app.post("/api/construction/fournisseurs")
-    async def create_fournisseur(fournisseur_data: FournisseurCreate, db: Session = Depends(get_construction_db)):
+    def create_fournisseur(fournisseur_data: FournisseurCreate, db: Session = Depends(get_construction_db)):
         """Créer un nouveau fournisseur"""
         try:
             nouveau_fournisseur = Fournisseur(**fournisseur_data.dict())
@@ -3446,7 +3696,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création du fournisseur: {e}")
     
     @app.put("/api/construction/fournisseurs/{fournisseur_id}")
-    async def update_fournisseur(fournisseur_id: int, fournisseur_data: FournisseurUpdate, db: Session = Depends(get_construction_db)):
+    def update_fournisseur(fournisseur_id: int, fournisseur_data: FournisseurUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour un fournisseur"""
         try:
             fournisseur = db.query(Fournisseur).filter(Fournisseur.id_fournisseur == fournisseur_id).first()
@@ -3480,7 +3730,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du fournisseur: {e}")
     
     @app.delete("/api/construction/fournisseurs/{fournisseur_id}")
-    async def delete_fournisseur(fournisseur_id: int, db: Session = Depends(get_construction_db)):
+    def delete_fournisseur(fournisseur_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer un fournisseur (avec vérification des dépendances)"""
         try:
             fournisseur = db.query(Fournisseur).filter(Fournisseur.id_fournisseur == fournisseur_id).first()
@@ -3510,16 +3760,27 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/matieres-premieres")
-    async def get_matieres_premieres(db: Session = Depends(get_construction_db)):
-        """Récupérer toutes les matières premières"""
+    def get_matieres_premieres(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : toutes les matières)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les matières premières triées par nom (paginées si limit est fourni)"""
         try:
-            matieres = db.query(MatierePremiere).order_by(MatierePremiere.nom).all()
-            return {"success": True, "data": [matiere.to_dict() for matiere in matieres]}
+            matieres, next_cursor = paginate(
+                db.query(MatierePremiere),
+                [(MatierePremiere.nom, False), (MatierePremiere.id_matiere_premiere, False)],
+                cursor, limit
+            )
+            return page_response([matiere.to_dict() for matiere in matieres], next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des matières premières: {e}")
     
     @app.get("/api/construction/matieres-premieres/{matiere_id}")
-    async def get_matiere_premiere(matiere_id: int, db: Session = Depends(get_construction_db)):
+    def get_matiere_premiere(matiere_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer une matière première par ID"""
         try:
             matiere = db.query(MatierePremiere).filter(MatierePremiere.id_matiere_premiere == matiere_id).first()
@@ -3532,7 +3793,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la matière première: {e}")
     
     @app.post("/api/construction/matieres-premieres")
-    async def create_matiere_premiere(matiere_data: MatierePremiereCreate, db: Session = Depends(get_construction_db)):
+    def create_matiere_premiere(matiere_data: MatierePremiereCreate, db: Session = Depends(get_construction_db)):
         """Créer une nouvelle matière première"""
         try:
             nouvelle_matiere = MatierePremiere(**matiere_data.dict())
@@ -3545,7 +3806,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la matière première: {e}")
     
     @app.put("/api/construction/matieres-premieres/{matiere_id}")
-    async def update_matiere_premiere(matiere_id: int, matiere_data: MatierePremiereUpdate, db: Session = Depends(get_construction_db)):
+    def update_matiere_premiere(matiere_id: int, matiere_data: MatierePremiereUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour une matière première"""
         try:
             matiere = db.query(MatierePremiere).filter(MatierePremiere.id_matiere_premiere == matiere_id).first()
@@ -3569,7 +3830,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de la matière première: {e}")
     
     @app.delete("/api/construction/matieres-premieres/{matiere_id}")
-    async def delete_matiere_premiere(matiere_id: int, db: Session = Depends(get_construction_db)):
+    def delete_matiere_premiere(matiere_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer une matière première (avec vérification des dépendances)"""
         try:
             matiere = db.query(MatierePremiere).filter(MatierePremiere.id_matiere_premiere == matiere_id).first()
@@ -3599,16 +3860,31 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/employes")
-    async def get_employes(db: Session = Depends(get_construction_db)):
-        """Récupérer tous les employés"""
+    def get_employes(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les employés)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        poste: Optional[str] = Query(None, description="Filtrer par poste"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les employés triés par nom et prénom (paginés si limit est fourni)"""
         try:
-            employes = db.query(Employe).order_by(Employe.nom, Employe.prenom).all()
-            return {"success": True, "data": [employe.to_dict() for employe in employes]}
+            query = db.query(Employe)
+            if poste:
+                query = query.filter(Employe.poste == poste)
+            employes, next_cursor = paginate(
+                query,
+                [(Employe.nom, False), (Employe.prenom, False), (Employe.id_employe, False)],
+                cursor, limit
+            )
+            return page_response([employe.to_dict() for employe in employes], next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des employés: {e}")
     
     @app.post("/api/construction/employes")
-    async def create_employe(employe_data: EmployeCreate, db: Session = Depends(get_construction_db)):
+    def create_employe(employe_data: EmployeCreate, db: Session = Depends(get_construction_db)):
         """Créer un nouvel employé"""
         try:
             nouvel_employe = Employe(**employe_data.dict())
@@ -3621,7 +3897,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création de l'employé: {e}")
     
     @app.get("/api/construction/employes/{employe_id}")
-    async def get_employe(employe_id: int, db: Session = Depends(get_construction_db)):
+    def get_employe(employe_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer un employé par ID"""
         try:
             employe = db.query(Employe).filter(Employe.id_employe == employe_id).first()
@@ -3634,7 +3910,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de l'employé: {e}")
     
     @app.put("/api/construction/employes/{employe_id}")
-    async def update_employe(employe_id: int, employe_data: EmployeUpdate, db: Session = Depends(get_construction_db)):
+    def update_employe(employe_id: int, employe_data: EmployeUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour un employé"""
         try:
             employe = db.query(Employe).filter(Employe.id_employe == employe_id).first()
@@ -3654,7 +3930,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de l'employé: {e}")
     
     @app.delete("/api/construction/employes/{employe_id}")
-    async def delete_employe(employe_id: int, db: Session = Depends(get_construction_db)):
+    def delete_employe(employe_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer un employé"""
         try:
             employe = db.query(Employe).filter(Employe.id_employe == employe_id).first()
@@ -3675,16 +3951,43 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/punchs-employes")
-    async def get_punchs_employes(db: Session = Depends(get_construction_db)):
-        """Récupérer tous les pointages d'employés"""
+    def get_punchs_employes(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les pointages)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        id_employe: Optional[int] = Query(None, description="Filtrer par employé"),
+        id_projet: Optional[int] = Query(None, description="Filtrer par projet"),
+        date_debut: Optional[date] = Query(None, description="Date de pointage minimale"),
+        date_fin: Optional[date] = Query(None, description="Date de pointage maximale (incluse)"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les pointages d'employés, du plus récent au plus ancien (paginés si limit est fourni)"""
         try:
-            punchs = db.query(PunchEmploye).order_by(desc(PunchEmploye.date)).all()
-            return {"success": True, "data": [punch.to_dict() for punch in punchs]}
+            query = db.query(PunchEmploye).options(
+                selectinload(PunchEmploye.employe),
+                selectinload(PunchEmploye.projet)
+            )
+            if id_employe is not None:
+                query = query.filter(PunchEmploye.id_employe == id_employe)
+            if id_projet is not None:
+                query = query.filter(PunchEmploye.id_projet == id_projet)
+            if date_debut:
+                query = query.filter(PunchEmploye.date >= datetime.combine(date_debut, datetime.min.time()))
+            if date_fin:
+                query = query.filter(PunchEmploye.date <= datetime.combine(date_fin, datetime.max.time()))
+            punchs, next_cursor = paginate(
+                query,
+                [(PunchEmploye.date, True), (PunchEmploye.id_punch, True)],
+                cursor, limit
+            )
+            return page_response([punch.to_dict() for punch in punchs], next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des pointages: {e}")
     
     @app.get("/api/construction/punchs-employes/employe/{employe_id}")
-    async def get_punchs_by_employe(employe_id: int, db: Session = Depends(get_construction_db)):
+    def get_punchs_by_employe(employe_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer les pointages d'un employé spécifique"""
         try:
             punchs = db.query(PunchEmploye).filter(PunchEmploye.id_employe == employe_id).order_by(desc(PunchEmploye.date)).all()
@@ -3693,7 +3996,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des pointages: {e}")
     
     @app.post("/api/construction/punchs-employes")
-    async def create_punch_employe(punch_data: PunchEmployeCreate, db: Session = Depends(get_construction_db)):
+    def create_punch_employe(punch_data: PunchEmployeCreate, db: Session = Depends(get_construction_db)):
         """Créer un nouveau pointage d'employé"""
         try:
             # Convertir la date string en objet Date
@@ -3716,7 +4019,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création du pointage: {e}")
     
     @app.put("/api/construction/punchs-employes/{punch_id}")
-    async def update_punch_employe(punch_id: int, punch_data: PunchEmployeUpdate, db: Session = Depends(get_construction_db)):
+    def update_punch_employe(punch_id: int, punch_data: PunchEmployeUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour un pointage d'employé"""
         try:
             punch = db.query(PunchEmploye).filter(PunchEmploye.id_punch == punch_id).first()
@@ -3753,7 +4056,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du pointage: {e}")
     
     @app.delete("/api/construction/punchs-employes/{punch_id}")
-    async def delete_punch_employe(punch_id: int, db: Session = Depends(get_construction_db)):
+    def delete_punch_employe(punch_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer un pointage d'employé"""
         try:
             punch = db.query(PunchEmploye).filter(PunchEmploye.id_punch == punch_id).first()
@@ -3774,16 +4077,27 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/sous-traitants")
-    async def get_sous_traitants(db: Session = Depends(get_construction_db)):
-        """Récupérer tous les sous-traitants"""
+    def get_sous_traitants(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : tous les sous-traitants)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les sous-traitants triés par nom (paginés si limit est fourni)"""
         try:
-            sous_traitants = db.query(SousTraitant).order_by(SousTraitant.nom).all()
-            return {"success": True, "data": [st.to_dict() for st in sous_traitants]}
+            sous_traitants, next_cursor = paginate(
+                db.query(SousTraitant),
+                [(SousTraitant.nom, False), (SousTraitant.id_st, False)],
+                cursor, limit
+            )
+            return page_response([st.to_dict() for st in sous_traitants], next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des sous-traitants: {e}")
     
     @app.post("/api/construction/sous-traitants")
-    async def create_sous_traitant(st_data: SousTraitantCreate, db: Session = Depends(get_construction_db)):
+    def create_sous_traitant(st_data: SousTraitantCreate, db: Session = Depends(get_construction_db)):
         """Créer un nouveau sous-traitant"""
         try:
             nouveau_st = SousTraitant(**st_data.dict())
@@ -3796,7 +4110,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création du sous-traitant: {e}")
     
     @app.get("/api/construction/sous-traitants/{st_id}")
-    async def get_sous_traitant(st_id: int, db: Session = Depends(get_construction_db)):
+    def get_sous_traitant(st_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer un sous-traitant par ID"""
         try:
             st = db.query(SousTraitant).filter(SousTraitant.id_st == st_id).first()
@@ -3809,7 +4123,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du sous-traitant: {e}")
     
     @app.put("/api/construction/sous-traitants/{st_id}")
-    async def update_sous_traitant(st_id: int, st_data: SousTraitantUpdate, db: Session = Depends(get_construction_db)):
+    def update_sous_traitant(st_id: int, st_data: SousTraitantUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour un sous-traitant"""
         try:
             st = db.query(SousTraitant).filter(SousTraitant.id_st == st_id).first()
@@ -3843,7 +4157,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du sous-traitant: {e}")
     
     @app.delete("/api/construction/sous-traitants/{st_id}")
-    async def delete_sous_traitant(st_id: int, db: Session = Depends(get_construction_db)):
+    def delete_sous_traitant(st_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer un sous-traitant (avec vérification des dépendances)"""
         try:
             st = db.query(SousTraitant).filter(SousTraitant.id_st == st_id).first()
@@ -3873,30 +4187,42 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/factures-st")
-    async def get_factures_st(db: Session = Depends(get_construction_db)):
-        """Récupérer toutes les factures de sous-traitants"""
+    def get_factures_st(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : toutes les factures)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        id_projet: Optional[int] = Query(None, description="Filtrer par projet"),
+        id_st: Optional[int] = Query(None, description="Filtrer par sous-traitant"),
+        paye: Optional[bool] = Query(None, description="Factures payées (true) ou à payer (false)"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les factures de sous-traitants, de la plus récente à la plus ancienne (paginées si limit est fourni)"""
         try:
-            from sqlalchemy import text, desc
-            
-            # Vérifier quelles colonnes existent dans la table
-            result = db.execute(text("PRAGMA table_info(factures_st)"))
-            existing_columns = [col[1] for col in result.fetchall()]
-            
             # Colonnes de base qui doivent exister
             base_columns = ['id_facture', 'id_projet', 'id_st', 'montant', 'section', 'notes', 'date_creation', 'date_modification']
             # Colonnes optionnelles à ajouter
             optional_columns = ['reference', 'date_de_paiement', 'pdf_facture']
             
-            # Construire la liste des colonnes à sélectionner
-            columns_to_select = [col for col in base_columns if col in existing_columns]
-            columns_to_select.extend([col for col in optional_columns if col in existing_columns])
+            # Ne sélectionner que les colonnes qui existent dans la table (schéma en cache)
+            columns_to_select = schema_cache.select_columns('factures_st', base_columns + optional_columns)
+            
+            # Projet et sous-traitant chargés dans la même requête (jointures externes),
+            # seulement si leurs tables sont à jour pour que les entités puissent être lues
+            with_relations = schema_cache.supports(Projet) and schema_cache.supports(SousTraitant)
+            query = db.query(*[getattr(FactureST, col) for col in columns_to_select])
+            if with_relations:
+                query = query.add_entity(Projet).add_entity(SousTraitant) \
+                             .outerjoin(Projet, Projet.id_projet == FactureST.id_projet) \
+                             .outerjoin(SousTraitant, SousTraitant.id_st == FactureST.id_st)
             
-            # Construire la requête SQL
-            columns_str = ', '.join(columns_to_select)
-            query = f"SELECT {columns_str} FROM factures_st ORDER BY date_creation DESC"
+            if id_projet is not None:
+                query = query.filter(FactureST.id_projet == id_projet)
+            if id_st is not None:
+                query = query.filter(FactureST.id_st == id_st)
+            if paye is not None and 'date_de_paiement' in columns_to_select:
+                query = query.filter(FactureST.date_de_paiement.isnot(None) if paye else FactureST.date_de_paiement.is_(None))
             
-            result = db.execute(text(query))
-            rows = result.fetchall()
+            rows, next_cursor = paginate(query, [(FactureST.id_facture, True)], cursor, limit)
             
             # Convertir les résultats en dictionnaires
             factures_data = []
@@ -3913,23 +4239,21 @@ if CONSTRUCTION_ENABLED:
                     else:
                         facture_dict[col_name] = value
                 
-                # Ajouter les relations si possible
-                try:
-                    facture_obj = db.query(FactureST).filter(FactureST.id_facture == facture_dict['id_facture']).first()
-                    if facture_obj:
-                        facture_dict['projet'] = facture_obj.projet.to_dict() if facture_obj.projet else None
-                        facture_dict['sous_traitant'] = facture_obj.sous_traitant.to_dict() if facture_obj.sous_traitant else None
-                except:
-                    pass
+                if with_relations:
+                    projet, sous_traitant = row.Projet, row.SousTraitant
+                    facture_dict['projet'] = projet.to_dict() if projet else None
+                    facture_dict['sous_traitant'] = sous_traitant.to_dict() if sous_traitant else None
                 
                 factures_data.append(facture_dict)
             
-            return {"success": True, "data": factures_data}
+            return page_response(factures_data, next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des factures: {e}")
     
     @app.get("/api/construction/factures-st/{facture_id}")
-    async def get_facture_st(facture_id: int, db: Session = Depends(get_construction_db)):
+    def get_facture_st(facture_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer une facture par ID"""
         try:
             facture = db.query(FactureST).filter(FactureST.id_facture == facture_id).first()
@@ -3942,7 +4266,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la facture: {e}")
     
     @app.post("/api/construction/factures-st")
-    async def create_facture_st(facture_data: FactureSTCreate, db: Session = Depends(get_construction_db)):
+    def create_facture_st(facture_data: FactureSTCreate, db: Session = Depends(get_construction_db)):
         """Créer une nouvelle facture de sous-traitant"""
         try:
             # Convertir la date de paiement si fournie
@@ -3974,7 +4298,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la facture: {e}")
     
     @app.put("/api/construction/factures-st/{facture_id}")
-    async def update_facture_st(facture_id: int, facture_data: FactureSTUpdate, db: Session = Depends(get_construction_db)):
+    def update_facture_st(facture_id: int, facture_data: FactureSTUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour une facture de sous-traitant"""
         try:
             facture = db.query(FactureST).filter(FactureST.id_facture == facture_id).first()
@@ -4018,26 +4342,19 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de la facture: {e}")
     
     @app.delete("/api/construction/factures-st/{facture_id}")
-    async def delete_facture_st(facture_id: int, db: Session = Depends(get_construction_db)):
+    def delete_facture_st(facture_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer une facture de sous-traitant"""
         try:
             facture = db.query(FactureST).filter(FactureST.id_facture == facture_id).first()
             if not facture:
                 raise HTTPException(status_code=404, detail="Facture non trouvée")
             
-            # Supprimer le PDF de Backblaze si présent
-            if facture.pdf_facture:
-                try:
-                    from storage_service import get_storage_service
-                    storage_service = get_storage_service()
-                    # Le pdf_facture contient le nom du fichier, on doit construire le s3_key
-                    s3_key = f"factures/{facture.pdf_facture}"
-                    storage_service.delete_pdf(s3_key)
-                except Exception as e:
-                    print(f"⚠️ Erreur lors de la suppression du PDF: {e}")
-            
+            pdf_facture = facture.pdf_facture
             db.delete(facture)
             db.commit()
+            
+            # Supprimer le PDF du stockage si présent
+            _delete_pdfs([pdf_facture], folder="factures")
             return {"success": True, "message": "Facture supprimée avec succès"}
         except HTTPException:
             raise
@@ -4050,22 +4367,43 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/commandes")
-    async def get_commandes(db: Session = Depends(get_construction_db)):
-        """Récupérer toutes les commandes"""
+    def get_commandes(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : toutes les commandes)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        id_projet: Optional[int] = Query(None, description="Filtrer par projet"),
+        id_fournisseur: Optional[int] = Query(None, description="Filtrer par fournisseur"),
+        statut: Optional[str] = Query(None, description="Filtrer par statut"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les commandes, de la plus récente à la plus ancienne (paginées si limit est fourni)"""
         try:
-            commandes = db.query(Commande).order_by(Commande.date_creation.desc()).all()
+            query = db.query(Commande).options(
+                selectinload(Commande.lignes_commande).selectinload(LigneCommande.matiere_premiere),
+                selectinload(Commande.projet),
+                selectinload(Commande.fournisseur)
+            )
+            if id_projet is not None:
+                query = query.filter(Commande.id_projet == id_projet)
+            if id_fournisseur is not None:
+                query = query.filter(Commande.id_fournisseur == id_fournisseur)
+            if statut:
+                query = query.filter(Commande.statut == statut)
+            commandes, next_cursor = paginate(query, [(Commande.id_commande, True)], cursor, limit)
             result = []
             for commande in commandes:
                 cmd_dict = commande.to_dict()
                 # Ajouter les lignes de commande
                 cmd_dict['lignes_commande'] = [ligne.to_dict() for ligne in commande.lignes_commande]
                 result.append(cmd_dict)
-            return {"success": True, "data": result}
+            return page_response(result, next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des commandes: {e}")
     
     @app.get("/api/construction/commandes/{commande_id}")
-    async def get_commande(commande_id: int, db: Session = Depends(get_construction_db)):
+    def get_commande(commande_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer une commande par ID avec ses lignes"""
         try:
             commande = db.query(Commande).filter(Commande.id_commande == commande_id).first()
@@ -4080,7 +4418,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de la commande: {e}")
     
     @app.post("/api/construction/commandes")
-    async def create_commande(commande_data: CommandeCreate, db: Session = Depends(get_construction_db)):
+    def create_commande(commande_data: CommandeCreate, db: Session = Depends(get_construction_db)):
         """Créer une nouvelle commande avec ses lignes"""
         try:
             # Calculer le montant total depuis les lignes
@@ -4123,7 +4461,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la commande: {e}")
     
     @app.put("/api/construction/commandes/{commande_id}")
-    async def update_commande(commande_id: int, commande_data: CommandeUpdate, db: Session = Depends(get_construction_db)):
+    def update_commande(commande_id: int, commande_data: CommandeUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour une commande"""
         try:
             commande = db.query(Commande).filter(Commande.id_commande == commande_id).first()
@@ -4159,7 +4497,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de la commande: {e}")
     
     @app.delete("/api/construction/commandes/{commande_id}")
-    async def delete_commande(commande_id: int, db: Session = Depends(get_construction_db)):
+    def delete_commande(commande_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer une commande et ses lignes associées"""
         try:
             commande = db.query(Commande).filter(Commande.id_commande == commande_id).first()
@@ -4172,20 +4510,13 @@ if CONSTRUCTION_ENABLED:
             for ligne in lignes:
                 db.delete(ligne)
             
-            # Supprimer le PDF de Backblaze si présent
-            if commande.pdf_commande:
-                try:
-                    from storage_service import get_storage_service
-                    storage_service = get_storage_service()
-                    # Le pdf_commande contient le nom du fichier, on doit construire le s3_key
-                    s3_key = f"commandes/{commande.pdf_commande}"
-                    storage_service.delete_pdf(s3_key)
-                except Exception as e:
-                    print(f"⚠️ Erreur lors de la suppression du PDF: {e}")
-            
             # Supprimer la commande
+            pdf_commande = commande.pdf_commande
             db.delete(commande)
             db.commit()
+            
+            # Supprimer le PDF du stockage si présent
+            _delete_pdfs([pdf_commande], folder="commandes")
             return {"success": True, "message": "Commande supprimée avec succès"}
         except HTTPException:
             raise
@@ -4198,16 +4529,31 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/lignes-commande")
-    async def get_lignes_commande(db: Session = Depends(get_construction_db)):
-        """Récupérer toutes les lignes de commande"""
+    def get_lignes_commande(
+        cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+        limit: Optional[int] = Query(None, ge=1, le=1000, description="Taille de page (sans limite : toutes les lignes)"),
+        fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules"),
+        db: Session = Depends(get_construction_db)
+    ):
+        """Récupérer les lignes de commande triées par commande (paginées si limit est fourni)"""
         try:
-            lignes = db.query(LigneCommande).order_by(LigneCommande.id_commande, LigneCommande.id_ligne).all()
-            return {"success": True, "data": [ligne.to_dict() for ligne in lignes]}
+            lignes, next_cursor = paginate(
+                db.query(LigneCommande).options(
+                    selectinload(LigneCommande.commande).selectinload(Commande.projet),
+                    selectinload(LigneCommande.commande).selectinload(Commande.fournisseur),
+                    selectinload(LigneCommande.matiere_premiere)
+                ),
+                [(LigneCommande.id_commande, False), (LigneCommande.id_ligne, False)],
+                cursor, limit
+            )
+            return page_response([ligne.to_dict() for ligne in lignes], next_cursor, limit, fields, success=True)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des lignes de commande: {e}")
     
     @app.get("/api/construction/lignes-commande/commande/{commande_id}")
-    async def get_lignes_by_commande(commande_id: int, db: Session = Depends(get_construction_db)):
+    def get_lignes_by_commande(commande_id: int, db: Session = Depends(get_construction_db)):
         """Récupérer toutes les lignes d'une commande"""
         try:
             lignes = db.query(LigneCommande).filter(LigneCommande.id_commande == commande_id).all()
@@ -4216,7 +4562,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des lignes de commande: {e}")
     
     @app.post("/api/construction/lignes-commande")
-    async def create_ligne_commande(ligne_data: LigneCommandeCreate, db: Session = Depends(get_construction_db)):
+    def create_ligne_commande(ligne_data: LigneCommandeCreate, db: Session = Depends(get_construction_db)):
         """Créer une nouvelle ligne de commande"""
         try:
             nouvelle_ligne = LigneCommande(**ligne_data.dict())
@@ -4241,7 +4587,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la ligne de commande: {e}")
     
     @app.put("/api/construction/lignes-commande/{ligne_id}")
-    async def update_ligne_commande(ligne_id: int, ligne_data: LigneCommandeUpdate, db: Session = Depends(get_construction_db)):
+    def update_ligne_commande(ligne_id: int, ligne_data: LigneCommandeUpdate, db: Session = Depends(get_construction_db)):
         """Mettre à jour une ligne de commande"""
         try:
             ligne = db.query(LigneCommande).filter(LigneCommande.id_ligne == ligne_id).first()
@@ -4281,7 +4627,7 @@ if CONSTRUCTION_ENABLED:
             raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour de la ligne de commande: {e}")
     
     @app.delete("/api/construction/lignes-commande/{ligne_id}")
-    async def delete_ligne_commande(ligne_id: int, db: Session = Depends(get_construction_db)):
+    def delete_ligne_commande(ligne_id: int, db: Session = Depends(get_construction_db)):
         """Supprimer une ligne de commande"""
         try:
             ligne = db.query(LigneCommande).filter(LigneCommande.id_ligne == ligne_id).first()
@@ -4314,7 +4660,7 @@ if CONSTRUCTION_ENABLED:
     # ==========================================
     
     @app.get("/api/construction/test")
-    async def test_construction_api():
+    def test_construction_api():
         """Test de l'API construction"""
         return {
             "success": True,
@@ -4328,7 +4674,7 @@ if CONSTRUCTION_ENABLED:
         }
 
 else:
-    print("⚠️ API Construction non disponible - modules non chargés")
+    logger.warning("⚠️ API Construction non disponible - modules non chargés")
 
 # ============================================================================
 
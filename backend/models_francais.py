@@ -263,3 +263,72 @@ class PaiementLoyer(Base):
             "date_modification": self.date_modification.isoformat() if self.date_modification else None
         }
 
+
+class CashflowMensuel(Base):
+    """Agrégat matérialisé des revenus/dépenses par immeuble, mois et catégorie
+
+    Maintenu de façon incrémentale par les opérations CRUD des paiements de
+    loyers et des transactions (DatabaseServiceFrancais), et reconstructible
+    avec rebuild_cashflow_mensuel().
+    """
+    __tablename__ = "cashflow_mensuel"
+    
+    id_cashflow = Column(Integer, primary_key=True, index=True)
+    id_immeuble = Column(Integer, ForeignKey("immeubles.id_immeuble", ondelete="CASCADE"), nullable=False, index=True)
+    annee = Column(Integer, nullable=False)
+    mois = Column(Integer, nullable=False)  # 1-12
+    source = Column(String(20), nullable=False)  # 'paiement' (loyers payés) ou 'transaction'
+    categorie = Column(String(100), nullable=False, default="")  # 'loyer' pour les paiements
+    revenus = Column(DECIMAL(14, 2), nullable=False, default=0)
+    depenses = Column(DECIMAL(14, 2), nullable=False, default=0)
+    nb_operations = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('id_immeuble', 'annee', 'mois', 'source', 'categorie', name='unique_cashflow_immeuble_mois'),
+    )
+    
+    def to_dict(self):
+        """Convertir en dictionnaire pour l'API"""
+        return {
+            "id_immeuble": self.id_immeuble,
+            "annee": self.annee,
+            "mois": self.mois,
+            "source": self.source,
+            "categorie": self.categorie,
+            "revenus": float(self.revenus) if self.revenus else 0.0,
+            "depenses": float(self.depenses) if self.depenses else 0.0,
+            "nb_operations": self.nb_operations
+        }
+
+
+class Document(Base):
+    """Index des documents stockés (nom de fichier → clé de stockage)
+
+    Alimenté par StorageService.upload_pdf : la lecture d'un document
+    est une requête indexée au lieu d'essais successifs dans chaque dossier.
+    """
+    __tablename__ = "documents"
+    
+    id_document = Column(Integer, primary_key=True, index=True)
+    nom_fichier = Column(String(255), nullable=False, unique=True, index=True)
+    s3_key = Column(String(500), nullable=False, index=True)
+    dossier = Column(String(50), nullable=True)
+    nom_original = Column(String(255), nullable=True)
+    taille = Column(Integer, nullable=True)  # Octets
+    sha256 = Column(String(64), nullable=True, index=True)  # Empreinte du contenu (ETag, déduplication des uploads)
+    type_contenu = Column(String(100), nullable=False, default="application/pdf")
+    date_creation = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convertir en dictionnaire pour l'API"""
+        return {
+            "id_document": self.id_document,
+            "nom_fichier": self.nom_fichier,
+            "s3_key": self.s3_key,
+            "dossier": self.dossier,
+            "nom_original": self.nom_original,
+            "taille": self.taille,
+            "sha256": self.sha256,
+            "type_contenu": self.type_contenu,
+            "date_creation": self.date_creation.isoformat() if self.date_creation else None
+        }
@@ -3,19 +3,30 @@
 Service de monitoring de la santé de la base de données pour Interface CAH
 """
 
+import asyncio
 import os
 import time
 import psutil
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import threading
 import json
 
 from database import db_manager, DATABASE_PATH
-from database_service_francais import db_service_francais as db_service
+from table_stats import table_stats
 from validation_service import data_validator, ValidationLevel
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Échantillonnage des métriques système en arrière-plan : intervalle (secondes),
+# nombre d'échantillons conservés et intervalle de la sonde de la boucle d'événements
+SYSTEM_METRICS_INTERVAL = float(os.environ.get("SYSTEM_METRICS_INTERVAL", "5"))
+SYSTEM_METRICS_HISTORY = int(os.environ.get("SYSTEM_METRICS_HISTORY", "720"))
+EVENT_LOOP_PROBE_INTERVAL = 0.5
 
 class HealthStatus(Enum):
     """Statuts de santé de la base de données"""
@@ -37,6 +48,8 @@ class DatabaseMetrics:
     disk_usage: float
     health_score: int
     status: HealthStatus
+    # Durée (ms) de la requête de comptage de chaque table
+    query_timings: Dict[str, float] = field(default_factory=dict)
 
 @dataclass
 class SystemMetrics:
@@ -47,13 +60,17 @@ class SystemMetrics:
     disk_percent: float
     available_memory: int
     available_disk: int
+    # Processus de l'application
+    process_rss: int = 0
+    open_fds: int = 0
+    # Retard maximal de la boucle d'événements depuis l'échantillon précédent (ms)
+    event_loop_lag_ms: float = 0.0
 
 class DatabaseMonitor:
     """Moniteur de santé de la base de données"""
     
     def __init__(self):
         self.metrics_history: List[DatabaseMetrics] = []
-        self.system_history: List[SystemMetrics] = []
         self.max_history = 1000  # Garder 1000 points de données
         self.monitoring_active = False
         self.monitor_thread = None
@@ -74,8 +91,9 @@ class DatabaseMonitor:
             if os.path.exists(DATABASE_PATH):
                 file_size = os.path.getsize(DATABASE_PATH)
             
-            # Compter les enregistrements
-            record_counts = self._get_record_counts()
+            # Compter les enregistrements (une requête COUNT chronométrée par table)
+            table_counts = self._get_record_counts()
+            record_counts = table_counts["counts"]
             
             # Temps de réponse
             response_time = time.time() - start_time
@@ -101,13 +119,14 @@ class DatabaseMonitor:
                 memory_usage=memory_usage,
                 disk_usage=disk_usage,
                 health_score=health_score,
-                status=status
+                status=status,
+                query_timings=table_counts["timings_ms"]
             )
             
             return metrics
             
         except Exception as e:
-            print(f"❌ Erreur lors de la collecte des métriques: {e}")
+            logger.error(f"❌ Erreur lors de la collecte des métriques: {e}")
             return DatabaseMetrics(
                 timestamp=datetime.now(),
                 file_size=0,
@@ -121,67 +140,21 @@ class DatabaseMonitor:
             )
     
     def get_system_metrics(self) -> SystemMetrics:
-        """Obtenir les métriques du système"""
-        try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            return SystemMetrics(
-                timestamp=datetime.now(),
-                cpu_percent=cpu_percent,
-                memory_percent=memory.percent,
-                disk_percent=disk.percent,
-                available_memory=memory.available,
-                available_disk=disk.free
-            )
-            
-        except Exception as e:
-            print(f"❌ Erreur lors de la collecte des métriques système: {e}")
-            return SystemMetrics(
-                timestamp=datetime.now(),
-                cpu_percent=100.0,
-                memory_percent=100.0,
-                disk_percent=100.0,
-                available_memory=0,
-                available_disk=0
-            )
+        """Dernières métriques du système (échantillon de system_sampler, sans attente)"""
+        return system_sampler.latest()
     
-    def _get_record_counts(self) -> Dict[str, int]:
-        """Compter les enregistrements dans chaque table"""
-        counts = {}
-        
+    @property
+    def system_history(self) -> List[SystemMetrics]:
+        """Historique des métriques système (tampon circulaire de system_sampler)"""
+        return system_sampler.history()
+    
+    def _get_record_counts(self) -> Dict[str, Any]:
+        """Compter les enregistrements de chaque table des modèles (COUNT ou estimation, voir table_stats.py)"""
         try:
-            # Tables principales
-            tables = ['immeubles', 'unites', 'locataires', 'factures', 'baux', 'rapports_immeuble']
-            
-            for table in tables:
-                try:
-                    if table == 'immeubles':
-                        records = db_service.get_buildings()
-                    elif table == 'locataires':
-                        records = db_service.get_tenants()
-                    elif table == 'unites':
-                        records = db_service.get_units()
-                    elif table == 'factures':
-                        records = db_service.get_transactions()
-                    elif table == 'baux':
-                        records = []  # Pas encore implémenté
-                    elif table == 'rapports_immeuble':
-                        records = db_service.get_building_reports()
-                    else:
-                        records = []
-                    
-                    counts[table] = len(records) if records else 0
-                    
-                except Exception as e:
-                    print(f"⚠️ Erreur comptage table {table}: {e}")
-                    counts[table] = 0
-            
+            return table_stats.collect()
         except Exception as e:
-            print(f"❌ Erreur lors du comptage des enregistrements: {e}")
-        
-        return counts
+            logger.error(f"❌ Erreur lors du comptage des enregistrements: {e}")
+            return {"counts": {}, "timings_ms": {}}
     
     def _calculate_health_score(self, record_counts: Dict[str, int], response_time: float, memory_usage: float, disk_usage: float) -> int:
         """Calculer un score de santé global (0-100)"""
@@ -205,8 +178,8 @@ class DatabaseMonitor:
             if total_records > 0:
                 score += min(10, total_records / 10)
             
-            # Validation des données
-            validation_results = data_validator.validate_all()
+            # Résultats de la dernière validation des données (relancée par get_health_summary)
+            validation_results = data_validator.results
             error_count = len([r for r in validation_results if r.level in [ValidationLevel.ERROR, ValidationLevel.CRITICAL]])
             if error_count > 0:
                 score -= min(20, error_count * 2)
@@ -214,7 +187,7 @@ class DatabaseMonitor:
             return max(0, min(100, int(score)))
             
         except Exception as e:
-            print(f"❌ Erreur calcul score de santé: {e}")
+            logger.error(f"❌ Erreur calcul score de santé: {e}")
             return 0
     
     def _determine_health_status(self, health_score: int, response_time: float, memory_usage: float, disk_usage: float) -> HealthStatus:
@@ -233,12 +206,12 @@ class DatabaseMonitor:
     def get_health_summary(self) -> Dict[str, Any]:
         """Obtenir un résumé de la santé de la base de données"""
         try:
+            # Validation des données (avant les métriques : le score de santé en tient compte)
+            validation_results = data_validator.validate_all()
+            
             # Métriques actuelles
             db_metrics = self.get_database_metrics()
             system_metrics = self.get_system_metrics()
-            
-            # Validation des données
-            validation_results = data_validator.validate_all()
             validation_counts = {
                 "info": len([r for r in validation_results if r.level == ValidationLevel.INFO]),
                 "warning": len([r for r in validation_results if r.level == ValidationLevel.WARNING]),
@@ -268,7 +241,10 @@ class DatabaseMonitor:
                     "memory_percent": round(system_metrics.memory_percent, 1),
                     "disk_percent": round(system_metrics.disk_percent, 1),
                     "available_memory_gb": round(system_metrics.available_memory / (1024**3), 2),
-                    "available_disk_gb": round(system_metrics.available_disk / (1024**3), 2)
+                    "available_disk_gb": round(system_metrics.available_disk / (1024**3), 2),
+                    "process_rss_mb": round(system_metrics.process_rss / (1024 * 1024), 1),
+                    "open_fds": system_metrics.open_fds,
+                    "event_loop_lag_ms": system_metrics.event_loop_lag_ms
                 },
                 "validation": {
                     "total_issues": sum(validation_counts.values()),
@@ -280,7 +256,7 @@ class DatabaseMonitor:
             }
             
         except Exception as e:
-            print(f"❌ Erreur lors de la génération du résumé: {e}")
+            logger.error(f"❌ Erreur lors de la génération du résumé: {e}")
             return {
                 "timestamp": datetime.now().isoformat(),
                 "error": str(e),
@@ -317,7 +293,7 @@ class DatabaseMonitor:
             return trends
             
         except Exception as e:
-            print(f"❌ Erreur calcul tendances: {e}")
+            logger.error(f"❌ Erreur calcul tendances: {e}")
             return {"status": "error", "message": str(e)}
     
     def _check_alerts(self, db_metrics: DatabaseMetrics, system_metrics: SystemMetrics) -> List[Dict[str, Any]]:
@@ -375,17 +351,17 @@ class DatabaseMonitor:
                 })
             
         except Exception as e:
-            print(f"❌ Erreur vérification alertes: {e}")
+            logger.error(f"❌ Erreur vérification alertes: {e}")
         
         return alerts
     
     def start_monitoring(self, interval: int = 60):
         """Démarrer le monitoring automatique"""
         if self.monitoring_active:
-            print("⚠️ Le monitoring est déjà actif")
+            logger.warning("⚠️ Le monitoring est déjà actif")
             return
         
-        print(f"🔄 Démarrage du monitoring (intervalle: {interval}s)")
+        logger.info(f"🔄 Démarrage du monitoring (intervalle: {interval}s)")
         self.monitoring_active = True
         self.monitor_thread = threading.Thread(target=self._monitoring_worker, args=(interval,), daemon=True)
         self.monitor_thread.start()
@@ -393,10 +369,10 @@ class DatabaseMonitor:
     def stop_monitoring(self):
         """Arrêter le monitoring automatique"""
         if not self.monitoring_active:
-            print("⚠️ Le monitoring n'est pas actif")
+            logger.warning("⚠️ Le monitoring n'est pas actif")
             return
         
-        print("🛑 Arrêt du monitoring")
+        logger.info("🛑 Arrêt du monitoring")
         self.monitoring_active = False
         
         if self.monitor_thread and self.monitor_thread.is_alive():
@@ -410,28 +386,25 @@ class DatabaseMonitor:
                 db_metrics = self.get_database_metrics()
                 system_metrics = self.get_system_metrics()
                 
-                # Ajouter à l'historique
+                # Ajouter à l'historique (l'historique système est tenu par system_sampler)
                 self.metrics_history.append(db_metrics)
-                self.system_history.append(system_metrics)
                 
                 # Limiter la taille de l'historique
                 if len(self.metrics_history) > self.max_history:
                     self.metrics_history = self.metrics_history[-self.max_history:]
-                if len(self.system_history) > self.max_history:
-                    self.system_history = self.system_history[-self.max_history:]
                 
                 # Vérifier les alertes
                 alerts = self._check_alerts(db_metrics, system_metrics)
                 if alerts:
-                    print(f"🚨 {len(alerts)} alerte(s) détectée(s)")
+                    logger.error(f"🚨 {len(alerts)} alerte(s) détectée(s)")
                     for alert in alerts:
-                        print(f"   {alert['level'].upper()}: {alert['message']}")
+                        logger.info(f"   {alert['level'].upper()}: {alert['message']}")
                 
                 # Attendre l'intervalle
                 time.sleep(interval)
                 
             except Exception as e:
-                print(f"❌ Erreur dans le worker de monitoring: {e}")
+                logger.error(f"❌ Erreur dans le worker de monitoring: {e}")
                 time.sleep(interval)
     
     def get_metrics_history(self, hours: int = 24) -> Dict[str, List[Dict]]:
@@ -457,9 +430,12 @@ class DatabaseMonitor:
                     "timestamp": m.timestamp.isoformat(),
                     "cpu_percent": m.cpu_percent,
                     "memory_percent": m.memory_percent,
-                    "disk_percent": m.disk_percent
+                    "disk_percent": m.disk_percent,
+                    "process_rss": m.process_rss,
+                    "open_fds": m.open_fds,
+                    "event_loop_lag_ms": m.event_loop_lag_ms
                 }
-                for m in self.system_history
+                for m in system_sampler.history()
                 if m.timestamp >= cutoff_time
             ]
             
@@ -470,9 +446,145 @@ class DatabaseMonitor:
             }
             
         except Exception as e:
-            print(f"❌ Erreur récupération historique: {e}")
+            logger.error(f"❌ Erreur récupération historique: {e}")
             return {"error": str(e)}
 
+class SystemMetricsSampler:
+    """
+    Métriques du système échantillonnées en arrière-plan
+
+    Un thread relève à intervalle fixe (SYSTEM_METRICS_INTERVAL) CPU, mémoire,
+    disque, mémoire résidente et descripteurs ouverts du processus dans un
+    tampon circulaire ; les endpoints ne font que lire le dernier échantillon
+    et l'historique. psutil.cpu_percent(interval=None) mesure l'utilisation
+    depuis l'appel précédent, sans bloquer.
+
+    Le retard de la boucle d'événements est mesuré par une tâche asyncio qui
+    dort EVENT_LOOP_PROBE_INTERVAL secondes et relève de combien son réveil
+    est en retard (boucle occupée par du code bloquant).
+    """
+
+    def __init__(self, interval: float = SYSTEM_METRICS_INTERVAL, history_size: int = SYSTEM_METRICS_HISTORY):
+        self.interval = interval
+        self.samples = deque(maxlen=history_size)
+        self._samples_lock = threading.Lock()
+        self.running = False
+        self.sampler_thread = None
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+        self._max_lag = 0.0
+        self._lag_lock = threading.Lock()
+        self._probe_task = None
+
+    def start(self):
+        """Démarrer l'échantillonnage (et la sonde si appelé depuis la boucle d'événements)"""
+        if self.running:
+            logger.warning("⚠️ L'échantillonnage des métriques système est déjà actif")
+            return
+
+        logger.info(f"📈 Démarrage de l'échantillonnage des métriques système (intervalle: {self.interval}s)")
+        self.running = True
+        self._stop.clear()
+        # Premier appel : référence pour les mesures de CPU suivantes
+        psutil.cpu_percent(interval=None)
+        self.sampler_thread = threading.Thread(target=self._sampler_worker, daemon=True)
+        self.sampler_thread.start()
+
+        try:
+            self._probe_task = asyncio.get_running_loop().create_task(self._event_loop_probe())
+        except RuntimeError:
+            # Pas de boucle d'événements (script) : pas de mesure du retard
+            self._probe_task = None
+
+    def stop(self):
+        """Arrêter l'échantillonnage"""
+        if not self.running:
+            return
+
+        logger.info("🛑 Arrêt de l'échantillonnage des métriques système")
+        self.running = False
+        self._stop.set()
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+
+        if self.sampler_thread and self.sampler_thread.is_alive():
+            self.sampler_thread.join(timeout=5)
+
+    async def _event_loop_probe(self):
+        """Tâche de la boucle d'événements : retard du réveil après chaque pause"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(EVENT_LOOP_PROBE_INTERVAL)
+            lag = max(0.0, loop.time() - start - EVENT_LOOP_PROBE_INTERVAL)
+            with self._lag_lock:
+                self._max_lag = max(self._max_lag, lag)
+
+    def sample(self) -> SystemMetrics:
+        """Relever un échantillon et l'ajouter à l'historique"""
+        with self._lag_lock:
+            lag, self._max_lag = self._max_lag, 0.0
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        try:
+            open_fds = self._process.num_fds() if os.name != 'nt' else self._process.num_handles()
+        except (psutil.Error, AttributeError):
+            open_fds = 0
+
+        metrics = SystemMetrics(
+            timestamp=datetime.now(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_percent=memory.percent,
+            disk_percent=disk.percent,
+            available_memory=memory.available,
+            available_disk=disk.free,
+            process_rss=self._process.memory_info().rss,
+            open_fds=open_fds,
+            event_loop_lag_ms=round(lag * 1000, 2)
+        )
+        with self._samples_lock:
+            self.samples.append(metrics)
+        return metrics
+
+    def _sampler_worker(self):
+        """Worker thread : un échantillon à chaque intervalle"""
+        while self.running:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la collecte des métriques système: {e}")
+            self._stop.wait(timeout=self.interval)
+
+    def latest(self) -> SystemMetrics:
+        """Dernier échantillon (relevé immédiatement si l'échantillonnage n'a pas commencé)"""
+        try:
+            return self.samples[-1]
+        except IndexError:
+            pass
+        try:
+            return self.sample()
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la collecte des métriques système: {e}")
+            return SystemMetrics(
+                timestamp=datetime.now(),
+                cpu_percent=100.0,
+                memory_percent=100.0,
+                disk_percent=100.0,
+                available_memory=0,
+                available_disk=0
+            )
+
+    def history(self) -> List[SystemMetrics]:
+        """Échantillons conservés, du plus ancien au plus récent"""
+        with self._samples_lock:
+            return list(self.samples)
+
+
+# Instance globale de l'échantillonneur des métriques système
+system_sampler = SystemMetricsSampler()
+
 # Instance globale du moniteur
 database_monitor = DatabaseMonitor()
 
@@ -12,6 +12,9 @@ from contextlib import contextmanager
 
 # Import des modèles
 from models_francais import Base, Immeuble, Unite, Locataire, Bail, Transaction, PaiementLoyer
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 # Configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -61,7 +64,7 @@ class MultiTenantService:
                 conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"'))
                 conn.commit()
                 
-                print(f"✅ Schéma '{schema_name}' créé")
+                logger.info(f"✅ Schéma '{schema_name}' créé")
                 
                 # Créer toutes les tables dans ce schéma
                 self._create_tables_in_schema(schema_name)
@@ -69,7 +72,7 @@ class MultiTenantService:
                 return True
                 
         except Exception as e:
-            print(f"❌ Erreur création schéma '{schema_name}': {e}")
+            logger.error(f"❌ Erreur création schéma '{schema_name}': {e}")
             return False
     
     def _create_tables_in_schema(self, schema_name: str):
@@ -200,10 +203,10 @@ class MultiTenantService:
                         conn.execute(text(statement))
                 
                 conn.commit()
-                print(f"✅ Tables créées dans le schéma '{schema_name}'")
+                logger.info(f"✅ Tables créées dans le schéma '{schema_name}'")
                 
         except Exception as e:
-            print(f"❌ Erreur création tables dans '{schema_name}': {e}")
+            logger.error(f"❌ Erreur création tables dans '{schema_name}': {e}")
             raise
     
     def schema_exists(self, schema_name: str) -> bool:
@@ -217,7 +220,7 @@ class MultiTenantService:
                 ), {"schema": schema_name})
                 return result.fetchone() is not None
         except Exception as e:
-            print(f"❌ Erreur vérification schéma: {e}")
+            logger.error(f"❌ Erreur vérification schéma: {e}")
             return False
     
     def delete_company_schema(self, schema_name: str) -> bool:
@@ -228,10 +231,10 @@ class MultiTenantService:
             with self.engine.connect() as conn:
                 conn.execute(text(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE'))
                 conn.commit()
-                print(f"✅ Schéma '{schema_name}' supprimé")
+                logger.info(f"✅ Schéma '{schema_name}' supprimé")
                 return True
         except Exception as e:
-            print(f"❌ Erreur suppression schéma '{schema_name}': {e}")
+            logger.error(f"❌ Erreur suppression schéma '{schema_name}': {e}")
             return False
     
     # ==========================================
@@ -257,7 +260,7 @@ class MultiTenantService:
             session.commit()
         except Exception as e:
             session.rollback()
-            print(f"❌ Erreur session tenant '{schema_name}': {e}")
+            logger.error(f"❌ Erreur session tenant '{schema_name}': {e}")
             raise
         finally:
             session.close()
@@ -287,10 +290,10 @@ class MultiTenantService:
                     SELECT * FROM "{source_schema}".{table_name}
                 """))
                 conn.commit()
-                print(f"✅ Données de {table_name} migrées de '{source_schema}' vers '{target_schema}'")
+                logger.info(f"✅ Données de {table_name} migrées de '{source_schema}' vers '{target_schema}'")
                 return True
         except Exception as e:
-            print(f"❌ Erreur migration {table_name}: {e}")
+            logger.error(f"❌ Erreur migration {table_name}: {e}")
             return False
 
 
@@ -303,29 +306,29 @@ multitenant_service = MultiTenantService()
 
 
 if __name__ == "__main__":
-    print("🧪 Test du service multi-tenant")
+    logger.info("🧪 Test du service multi-tenant")
     
     # Test de création de schéma
     test_schema = "company_test_abc123"
     
-    print(f"\n1. Vérification si le schéma '{test_schema}' existe...")
+    logger.info(f"\n1. Vérification si le schéma '{test_schema}' existe...")
     exists = multitenant_service.schema_exists(test_schema)
-    print(f"   Existe: {exists}")
+    logger.info(f"   Existe: {exists}")
     
     if not exists:
-        print(f"\n2. Création du schéma '{test_schema}'...")
+        logger.info(f"\n2. Création du schéma '{test_schema}'...")
         success = multitenant_service.create_company_schema(test_schema)
-        print(f"   Succès: {success}")
+        logger.info(f"   Succès: {success}")
     
-    print(f"\n3. Test de session pour le schéma '{test_schema}'...")
+    logger.info(f"\n3. Test de session pour le schéma '{test_schema}'...")
     try:
         with multitenant_service.get_tenant_session(test_schema) as session:
             # Test query
             result = session.execute(text("SELECT current_schema()"))
             current = result.fetchone()[0]
-            print(f"   ✅ Schéma actif: {current}")
+            logger.info(f"   ✅ Schéma actif: {current}")
     except Exception as e:
-        print(f"   ❌ Erreur: {e}")
+        logger.error(f"   ❌ Erreur: {e}")
     
-    print("\n✅ Tests terminés!")
+    logger.info("\n✅ Tests terminés!")
 
@@ -4,10 +4,16 @@ Service pour générer automatiquement les notifications
 """
 
 import json
+import os
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from models_auth import Notification, Utilisateur, DemandeAcces
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 def create_notification(
     db: Session,
@@ -39,185 +45,265 @@ def create_notification(
     
     return notification
 
-def generate_notifications_for_user(db: Session, user: Utilisateur):
+# Types de notifications recalculés par le worker
+NOTIFICATION_TYPES = ("loyer_non_paye", "facture_a_payer", "demande_acces", "bail_expire")
+
+# Intervalle entre deux recalculs complets (secondes)
+NOTIFICATION_INTERVAL = int(os.environ.get("NOTIFICATION_INTERVAL", "900"))
+
+# Délai de regroupement des recalculs déclenchés par des modifications (secondes)
+NOTIFICATION_DEBOUNCE = float(os.environ.get("NOTIFICATION_DEBOUNCE", "5"))
+
+
+def compute_portfolio_alerts() -> Dict[str, Dict[str, Any]]:
     """
-    Générer toutes les notifications pour un utilisateur
-    Appelé lors de la connexion ou périodiquement
+    Calculer les alertes communes à tous les admins, une seule fois par cycle
+    (chaque compteur est une requête agrégée, indépendante de la taille du parc)
+
+    Returns:
+        {type: {"count": ..., ...}} pour les types dont le calcul a réussi
     """
-    notifications_created = []
-    
-    # Seulement pour les admins
-    if user.role != 'admin':
-        return notifications_created
-    
-    # 1. Loyers non payés
+    alerts = {}
+
+    # 1. Loyers du mois dernier sans paiement (anti-jointure SQL)
     try:
-        from database_service_francais import DatabaseServiceFrancais
-        db_service = DatabaseServiceFrancais()
-        
-        # Récupérer tous les baux actifs
-        leases = db_service.get_leases()
-        
-        # Obtenir le mois dernier
+        from database_service_francais import db_service_francais
+
         today = datetime.now()
-        last_month = today - timedelta(days=30)
-        last_month_year = last_month.year
-        last_month_month = last_month.month
-        
-        unpaid_count = 0
-        for lease in leases:
-            if not lease.get('date_debut') or not lease.get('date_fin'):
-                continue
-            
-            lease_start = datetime.fromisoformat(lease['date_debut'].split('T')[0] if isinstance(lease['date_debut'], str) else lease['date_debut'].isoformat().split('T')[0])
-            lease_end = datetime.fromisoformat(lease['date_fin'].split('T')[0] if isinstance(lease['date_fin'], str) else lease['date_fin'].isoformat().split('T')[0])
-            check_date = datetime(last_month_year, last_month_month, 1)
-            
-            if check_date >= lease_start and check_date <= lease_end:
-                payments = db_service.get_paiements_by_bail(lease['id_bail'])
-                has_payment = any(p['annee'] == last_month_year and p['mois'] == last_month_month for p in payments)
-                
-                if not has_payment:
-                    unpaid_count += 1
-        
-        if unpaid_count > 0:
-            # Vérifier si une notification existe déjà pour ce mois
-            existing = db.query(Notification).filter(
-                Notification.id_utilisateur == user.id_utilisateur,
-                Notification.type == "loyer_non_paye",
-                Notification.lue == False
-            ).first()
-            
-            if not existing:
-                notification = create_notification(
-                    db=db,
-                    id_utilisateur=user.id_utilisateur,
-                    type="loyer_non_paye",
-                    titre=f"{unpaid_count} loyer(s) non payé(s)",
-                    message=f"{unpaid_count} loyer(s) du mois dernier n'ont pas été payés.",
-                    priorite="urgent",
-                    lien="/",
-                    donnees={"count": unpaid_count}
-                )
-                notifications_created.append(notification)
-    
+        last_month_year, last_month_month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+        arrears = db_service_francais.get_arrears(last_month_year, last_month_month, last_month_year, last_month_month)
+        alerts["loyer_non_paye"] = {"count": arrears["total"]["nb_mois"]}
+
     except Exception as e:
-        print(f"⚠️ Erreur génération notification loyers: {e}")
-    
-    # 2. Factures à payer
+        logger.warning(f"⚠️ Erreur calcul des loyers non payés: {e}")
+
+    # 2. Factures de sous-traitants à payer (COUNT/SUM au lieu de charger les factures)
     try:
         from main import CONSTRUCTION_ENABLED
         if CONSTRUCTION_ENABLED:
+            from sqlalchemy import func
             from database_construction import get_construction_db_context
             from models_construction import FactureST
-            
+
             with get_construction_db_context() as construction_db:
-                pending_invoices = construction_db.query(FactureST).filter(
-                    FactureST.date_de_paiement == None
-                ).all()
-                
-                if pending_invoices:
-                    invoice_count = len(pending_invoices)
-                    total_amount = sum(inv.montant for inv in pending_invoices)
-                    
-                    # Vérifier si une notification existe déjà
-                    existing = db.query(Notification).filter(
-                        Notification.id_utilisateur == user.id_utilisateur,
-                        Notification.type == "facture_a_payer",
-                        Notification.lue == False
-                    ).first()
-                    
-                    if not existing:
-                        notification = create_notification(
-                            db=db,
-                            id_utilisateur=user.id_utilisateur,
-                            type="facture_a_payer",
-                            titre=f"{invoice_count} facture(s) à payer",
-                            message=f"{invoice_count} facture(s) de sous-traitants en attente de paiement (Total: {total_amount:.2f}$).",
-                            priorite="important",
-                            lien="/invoices-st",
-                            donnees={"count": invoice_count, "total_amount": total_amount}
-                        )
-                        notifications_created.append(notification)
-    
+                invoice_count, total_amount = construction_db.query(
+                    func.count(FactureST.id_facture),
+                    func.coalesce(func.sum(FactureST.montant), 0)
+                ).filter(FactureST.date_de_paiement == None).one()
+            alerts["facture_a_payer"] = {"count": invoice_count, "total_amount": float(total_amount)}
+
     except Exception as e:
-        print(f"⚠️ Erreur génération notification factures: {e}")
-    
-    # 3. Demandes d'accès en attente (seulement pour admins principaux)
+        logger.warning(f"⚠️ Erreur calcul des factures à payer: {e}")
+
+    # 3. Baux qui expirent dans les 30 prochains jours
     try:
-        if user.est_admin_principal:
-            pending_requests = db.query(DemandeAcces).filter(
-                DemandeAcces.id_compagnie == user.id_compagnie,
-                DemandeAcces.statut == "en_attente"
+        from database_service_francais import db_service_francais
+        from models_francais import Bail
+
+        today = datetime.now().date()
+        with db_service_francais.get_session() as session:
+            expiring_count = session.query(Bail).filter(
+                Bail.date_fin >= today,
+                Bail.date_fin <= today + timedelta(days=30)
             ).count()
-            
-            if pending_requests > 0:
-                # Vérifier si une notification existe déjà
-                existing = db.query(Notification).filter(
-                    Notification.id_utilisateur == user.id_utilisateur,
-                    Notification.type == "demande_acces",
-                    Notification.lue == False
-                ).first()
-                
-                if not existing:
-                    notification = create_notification(
-                        db=db,
-                        id_utilisateur=user.id_utilisateur,
-                        type="demande_acces",
-                        titre=f"{pending_requests} demande(s) d'accès en attente",
-                        message=f"{pending_requests} demande(s) d'accès à votre compagnie sont en attente d'approbation.",
-                        priorite="important",
-                        lien="/pending-approval",
-                        donnees={"count": pending_requests}
-                    )
-                    notifications_created.append(notification)
-    
+        alerts["bail_expire"] = {"count": expiring_count}
+
     except Exception as e:
-        print(f"⚠️ Erreur génération notification demandes: {e}")
-    
-    # 4. Baux qui expirent bientôt (30 jours)
+        logger.warning(f"⚠️ Erreur calcul des baux qui expirent: {e}")
+
+    return alerts
+
+
+def _pending_requests_by_company(db: Session, company_ids) -> Dict[int, int]:
+    """Nombre de demandes d'accès en attente par compagnie (une requête groupée)"""
+    from sqlalchemy import func
+
+    if not company_ids:
+        return {}
+    rows = db.query(DemandeAcces.id_compagnie, func.count(DemandeAcces.id_demande)).filter(
+        DemandeAcces.id_compagnie.in_(company_ids),
+        DemandeAcces.statut == "en_attente"
+    ).group_by(DemandeAcces.id_compagnie).all()
+    return {company_id: count for company_id, count in rows}
+
+
+def _notification_content(type: str, alert: Dict[str, Any]) -> Dict[str, Any]:
+    """Titre, message, priorité et lien d'une notification selon son type"""
+    count = alert["count"]
+    if type == "loyer_non_paye":
+        return dict(titre=f"{count} loyer(s) non payé(s)",
+                    message=f"{count} loyer(s) du mois dernier n'ont pas été payés.",
+                    priorite="urgent", lien="/")
+    if type == "facture_a_payer":
+        return dict(titre=f"{count} facture(s) à payer",
+                    message=f"{count} facture(s) de sous-traitants en attente de paiement (Total: {alert['total_amount']:.2f}$).",
+                    priorite="important", lien="/invoices-st")
+    if type == "demande_acces":
+        return dict(titre=f"{count} demande(s) d'accès en attente",
+                    message=f"{count} demande(s) d'accès à votre compagnie sont en attente d'approbation.",
+                    priorite="important", lien="/pending-approval")
+    return dict(titre=f"{count} bail(s) expire(nt) bientôt",
+                message=f"{count} bail(s) expire(nt) dans les 30 prochains jours.",
+                priorite="important", lien="/leases")
+
+
+def refresh_notifications(db: Session, users: Optional[List[Utilisateur]] = None,
+                          alerts: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Notification]:
+    """
+    Recalculer et persister les notifications des admins
+
+    Les alertes communes sont calculées une fois pour tous les utilisateurs.
+    Pour chaque (utilisateur, type) :
+    - aucune notification non lue : une notification est créée si le compteur est positif
+    - une notification non lue existe : elle est mise à jour si ses données ont changé,
+      ou marquée comme lue si le compteur est retombé à zéro (ex. loyers payés depuis)
+
+    Args:
+        db: Session de la base d'authentification
+        users: Utilisateurs à traiter (par défaut : tous les admins actifs)
+        alerts: Alertes déjà calculées (par défaut : compute_portfolio_alerts())
+
+    Returns:
+        Notifications créées
+    """
+    if users is None:
+        users = db.query(Utilisateur).filter(
+            Utilisateur.role == "admin",
+            Utilisateur.statut == "actif"
+        ).all()
+    users = [user for user in users if user.role == "admin"]
+    if not users:
+        return []
+    if alerts is None:
+        alerts = compute_portfolio_alerts()
+
+    # Demandes d'accès : par compagnie, pour les admins principaux seulement
     try:
-        from database_service_francais import DatabaseServiceFrancais
-        db_service = DatabaseServiceFrancais()
-        
-        leases = db_service.get_leases()
-        today = datetime.now().date()
-        expiration_date = today + timedelta(days=30)
-        
-        expiring_count = 0
-        for lease in leases:
-            if not lease.get('date_fin'):
-                continue
-            
-            lease_end = datetime.fromisoformat(lease['date_fin'].split('T')[0] if isinstance(lease['date_fin'], str) else lease['date_fin'].isoformat().split('T')[0]).date()
-            
-            # Vérifier si le bail expire dans les 30 prochains jours
-            if today <= lease_end <= expiration_date:
-                expiring_count += 1
-        
-        if expiring_count > 0:
-            # Vérifier si une notification existe déjà
-            existing = db.query(Notification).filter(
-                Notification.id_utilisateur == user.id_utilisateur,
-                Notification.type == "bail_expire",
-                Notification.lue == False
-            ).first()
-            
-            if not existing:
-                notification = create_notification(
-                    db=db,
-                    id_utilisateur=user.id_utilisateur,
-                    type="bail_expire",
-                    titre=f"{expiring_count} bail(s) expire(nt) bientôt",
-                    message=f"{expiring_count} bail(s) expire(nt) dans les 30 prochains jours.",
-                    priorite="important",
-                    lien="/leases",
-                    donnees={"count": expiring_count}
-                )
-                notifications_created.append(notification)
-    
+        pending_requests = _pending_requests_by_company(
+            db, {user.id_compagnie for user in users if user.est_admin_principal}
+        )
     except Exception as e:
-        print(f"⚠️ Erreur génération notification baux: {e}")
-    
-    return notifications_created
+        logger.warning(f"⚠️ Erreur calcul des demandes d'accès: {e}")
+        pending_requests = None
+
+    # Notifications non lues existantes de tous ces utilisateurs (une requête)
+    existing = {}
+    for notification in db.query(Notification).filter(
+        Notification.id_utilisateur.in_([user.id_utilisateur for user in users]),
+        Notification.type.in_(NOTIFICATION_TYPES),
+        Notification.lue == False
+    ).order_by(Notification.id_notification):
+        existing.setdefault((notification.id_utilisateur, notification.type), notification)
+
+    created = []
+    for user in users:
+        user_alerts = dict(alerts)
+        if user.est_admin_principal and pending_requests is not None:
+            user_alerts["demande_acces"] = {"count": pending_requests.get(user.id_compagnie, 0)}
+
+        for type, alert in user_alerts.items():
+            notification = existing.get((user.id_utilisateur, type))
+            if not alert["count"]:
+                if notification is not None:
+                    notification.lue = True
+                continue
+            content = _notification_content(type, alert)
+            donnees = json.dumps(alert)
+            if notification is None:
+                notification = Notification(id_utilisateur=user.id_utilisateur, type=type, lue=False,
+                                            donnees=donnees, **content)
+                db.add(notification)
+                created.append(notification)
+            elif notification.donnees != donnees:
+                notification.titre = content["titre"]
+                notification.message = content["message"]
+                notification.donnees = donnees
+
+    db.commit()
+    if created:
+        logger.info(f"🔔 {len(created)} notification(s) créée(s)")
+    return created
+
+
+def generate_notifications_for_user(db: Session, user: Utilisateur):
+    """
+    Générer toutes les notifications pour un utilisateur
+    (le worker appelle refresh_notifications pour tous les admins à la fois)
+    """
+    return refresh_notifications(db, [user])
+
+
+class NotificationWorker:
+    """
+    Recalcul des notifications en arrière-plan : périodiquement
+    (NOTIFICATION_INTERVAL) et peu après chaque modification signalée
+    par request_refresh(), sans jamais bloquer une requête
+    """
+
+    def __init__(self, interval: int = NOTIFICATION_INTERVAL, debounce: float = NOTIFICATION_DEBOUNCE):
+        self.interval = interval
+        self.debounce = debounce
+        self.running = False
+        self.worker_thread = None
+        self.last_run = None
+        self._wake = threading.Event()
+
+    def start(self):
+        """Démarrer le worker"""
+        if self.running:
+            logger.warning("⚠️ Le worker de notifications est déjà actif")
+            return
+
+        logger.info(f"🔔 Démarrage du worker de notifications (intervalle: {self.interval}s)")
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._notification_worker, daemon=True)
+        self.worker_thread.start()
+
+    def stop(self):
+        """Arrêter le worker"""
+        if not self.running:
+            return
+
+        logger.info("🛑 Arrêt du worker de notifications")
+        self.running = False
+        self._wake.set()
+
+        if self.worker_thread and self.worker_thread.is_alive():
+            self.worker_thread.join(timeout=5)
+
+    def request_refresh(self):
+        """Signaler une modification des données : recalcul au prochain réveil (regroupé)"""
+        self._wake.set()
+
+    def run_once(self) -> List[Notification]:
+        """Recalculer immédiatement les notifications de tous les admins"""
+        from auth_database_service import SessionLocal
+
+        db = SessionLocal()
+        try:
+            created = refresh_notifications(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.last_run = datetime.now()
+        return created
+
+    def _notification_worker(self):
+        """Worker thread : un cycle au démarrage, puis à chaque intervalle ou modification"""
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"❌ Erreur dans le worker de notifications: {e}")
+
+            triggered = self._wake.wait(timeout=self.interval)
+            if triggered and self.running:
+                # Regrouper les modifications rapprochées en un seul recalcul
+                time.sleep(self.debounce)
+            self._wake.clear()
+
 
+# Instance globale du worker de notifications
+notification_worker = NotificationWorker()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Pagination par curseur (keyset) et projection de champs pour les listes de l'API
+
+Un curseur encode les valeurs des colonnes de tri de la dernière ligne d'une
+page ; la page suivante filtre « après » ces valeurs au lieu d'utiliser un
+OFFSET, de sorte que le coût d'une page ne dépend pas de sa position.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+# Taille maximale d'une page
+MAX_LIMIT = 1000
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encoder les valeurs de tri de la dernière ligne en curseur opaque"""
+    serializable = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(serializable, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Décoder un curseur ; lève ValueError s'il est invalide"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Curseur de pagination invalide")
+    if not isinstance(values, list):
+        raise ValueError("Curseur de pagination invalide")
+    return values
+
+
+def _coerce(column, value):
+    """Reconvertir une valeur de curseur (JSON) dans le type Python de la colonne"""
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def apply_keyset(query, order: Sequence[Tuple[Any, bool]], cursor: Optional[str] = None, limit: Optional[int] = None,
+                 offset: int = 0):
+    """
+    Appliquer le tri, le filtre keyset et la limite à une requête
+
+    Args:
+        query: Requête SQLAlchemy (ORM)
+        order: Colonnes de tri [(colonne, descendant)], la dernière doit être unique (clé primaire)
+        cursor: Curseur renvoyé par la page précédente
+        limit: Taille de page (une ligne de plus est lue pour savoir s'il y a une suite)
+        offset: Décalage (compatibilité avec la pagination par offset, ignoré avec un curseur)
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(order):
+            raise ValueError("Curseur de pagination invalide")
+        # (a, b, c) > (x, y, z) développé : a > x OR (a = x AND b > y) OR ...
+        conditions = []
+        for i, (column, descending) in enumerate(order):
+            value = _coerce(column, values[i])
+            equalities = [order[j][0] == _coerce(order[j][0], values[j]) for j in range(i)]
+            after = column < value if descending else column > value
+            conditions.append(and_(*equalities, after))
+        query = query.filter(or_(*conditions))
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+
+    if offset and not cursor:
+        query = query.offset(offset)
+    if limit:
+        query = query.limit(limit + 1)
+    return query
+
+
+def paginate(query, order: Sequence[Tuple[Any, bool]], cursor: Optional[str] = None, limit: Optional[int] = None,
+             offset: int = 0) -> Tuple[list, Optional[str]]:
+    """
+    Exécuter une requête paginée par keyset
+
+    Returns:
+        (lignes de la page, curseur de la page suivante ou None)
+    """
+    if limit is not None:
+        limit = max(1, min(limit, MAX_LIMIT))
+    rows = apply_keyset(query, order, cursor, limit, offset).all()
+    if not limit or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column, _ in order])
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Convertir le paramètre fields=a,b,c en liste (None = tous les champs)"""
+    if not fields:
+        return None
+    parsed = [field.strip() for field in fields.split(",") if field.strip()]
+    return parsed or None
+
+
+def project(items: Iterable[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Ne garder que les champs demandés de chaque élément"""
+    if not fields:
+        return list(items)
+    return [{field: item[field] for field in fields if field in item} for item in items]
+
+
+def page_response(items: List[Dict[str, Any]], next_cursor: Optional[str] = None, limit: Optional[int] = None,
+                  fields: Optional[str] = None, **extra) -> Dict[str, Any]:
+    """
+    Construire la réponse d'une liste : {"data": [...]} et, si paginée,
+    {"pagination": {"limit", "next_cursor", "has_more"}}
+    """
+    response = dict(extra)
+    response["data"] = project(items, parse_fields(fields))
+    if limit:
+        response["pagination"] = {
+            "limit": max(1, min(limit, MAX_LIMIT)),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+    return response
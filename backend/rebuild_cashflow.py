@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Reconstruire la table cashflow_mensuel
+
+Usage:
+    python rebuild_cashflow.py            # Base locale (via DatabaseServiceFrancais)
+    python rebuild_cashflow.py --render   # Base Render (via l'API)
+"""
+
+import sys
+
+# URL de l'API Render
+API_URL = "https://interface-cah-backend.onrender.com"
+
+
+def rebuild_local():
+    """Reconstruire le cashflow mensuel directement sur la base locale"""
+    from database import init_database
+    from database_service_francais import db_service_francais
+
+    init_database()
+    result = db_service_francais.rebuild_cashflow_mensuel()
+    print(f"✅ {result['lignes']} lignes de cashflow mensuel")
+
+
+def rebuild_render():
+    """Reconstruire le cashflow mensuel sur Render via l'API"""
+    import requests
+
+    url = f"{API_URL}/api/migrate/rebuild-cashflow"
+    print(f"📡 URL : {url}")
+    response = requests.post(url, timeout=300)
+    if response.status_code == 200:
+        print(f"✅ {response.json().get('message')}")
+    else:
+        print(f"❌ Erreur {response.status_code}: {response.text}")
+
+
+if __name__ == "__main__":
+    print("🔄 Reconstruction du cashflow mensuel...")
+    if "--render" in sys.argv:
+        rebuild_render()
+    else:
+        rebuild_local()
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 """
 Script de restauration des données construction
+
+Restaure la sauvegarde la plus récente du dépôt de sauvegardes incrémentales,
+ou à défaut la plus récente des anciennes copies construction_backup_*.db.
 """
 
 import os
 import shutil
 import glob
-from datetime import datetime
+
+from backup_repository import BackupRepository
 
 def restore_construction_database():
     """Restaurer la base de données construction"""
@@ -17,18 +21,25 @@ def restore_construction_database():
     backup_dir = os.path.join(data_dir, 'backups')
     
     # Trouver la sauvegarde la plus récente
+    repository = BackupRepository(os.path.join(backup_dir, 'repository'))
+    snapshots = repository.list_snapshots('construction')
     backup_pattern = os.path.join(backup_dir, 'construction_backup_*.db')
     backups = glob.glob(backup_pattern)
     
-    if not backups:
+    if not snapshots and not backups:
         print("❌ Aucune sauvegarde trouvée")
         return False
     
-    latest_backup = max(backups, key=os.path.getctime)
-    
     try:
-        # Restaurer la base de données
-        shutil.copy2(latest_backup, db_path)
+        # Reconstruire à côté de la base puis remplacer d'un coup
+        restored_path = db_path + '.restore'
+        if snapshots:
+            latest_backup = snapshots[0]['id']
+            repository.restore_to(latest_backup, restored_path)
+        else:
+            latest_backup = max(backups, key=os.path.getctime)
+            shutil.copy2(latest_backup, restored_path)
+        os.replace(restored_path, db_path)
         print(f"✅ Base restaurée depuis: {latest_backup}")
         return True
         
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Cache des capacités du schéma (colonnes existantes de chaque table)
+
+Les bases déployées n'ont pas toutes reçu les mêmes migrations : certaines
+lectures sélectionnent donc leurs colonnes selon ce qui existe réellement.
+Plutôt qu'un PRAGMA table_info (SQLite uniquement) à chaque requête, le
+schéma est lu une fois via l'inspecteur SQLAlchemy (SQLite et PostgreSQL),
+puis rechargé à la demande après une migration.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import inspect
+
+from app_logging import get_logger
+from database import engine
+
+logger = get_logger(__name__)
+
+
+class SchemaCache:
+    """Colonnes de chaque table, chargées une fois puis invalidées par les migrations"""
+
+    def __init__(self, bind):
+        self.engine = bind
+        self._columns: Optional[Dict[str, Set[str]]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Set[str]]:
+        """(Re)lire le schéma de toutes les tables"""
+        inspector = inspect(self.engine)
+        columns = {
+            table: {column["name"] for column in inspector.get_columns(table)}
+            for table in inspector.get_table_names()
+        }
+        with self._lock:
+            self._columns = columns
+        logger.info("🗂️ Schéma chargé : %d tables", len(columns))
+        return columns
+
+    def invalidate(self):
+        """Oublier le schéma connu ; il sera relu à la prochaine lecture"""
+        with self._lock:
+            self._columns = None
+
+    def columns(self, table: str) -> Set[str]:
+        """Colonnes existantes d'une table (ensemble vide si la table n'existe pas)"""
+        columns = self._columns
+        if columns is None:
+            columns = self.load()
+        return columns.get(table, set())
+
+    def has_column(self, table: str, column: str) -> bool:
+        """Indiquer si une colonne existe dans une table"""
+        return column in self.columns(table)
+
+    def supports(self, model) -> bool:
+        """Indiquer si la table d'un modèle ORM possède toutes ses colonnes (chargement d'entités possible)"""
+        existing = self.columns(model.__tablename__)
+        return all(column.name in existing for column in model.__table__.columns)
+
+    def select_columns(self, table: str, wanted: Iterable[str]) -> List[str]:
+        """Filtrer une liste de colonnes souhaitées sur celles qui existent (ordre conservé)"""
+        existing = self.columns(table)
+        return [column for column in wanted if column in existing]
+
+
+# Instance globale (même moteur pour la partie locative et la construction)
+schema_cache = SchemaCache(engine)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Backends de stockage des documents
+
+Le service de stockage (storage_service.py) gère l'index, la déduplication et
+le cache ; il délègue la lecture et l'écriture des objets à un backend :
+
+- B2StorageBackend : Backblaze B2 via l'API S3 (boto3), par défaut
+- LocalStorageBackend : répertoire local (développement, tests, déploiement sans B2)
+
+Le backend est choisi par STORAGE_BACKEND (b2 ou local). Les clés sont de la
+forme dossier/nom_de_fichier.pdf pour les deux backends.
+"""
+
+import hashlib
+import mimetypes
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "b2").lower()
+LOCAL_STORAGE_DIR = os.environ.get(
+    "LOCAL_STORAGE_DIR", os.path.join(os.environ.get("DATA_DIR", "./data"), "storage")
+)
+
+# Upload multipart au-delà de ce seuil (parties de la même taille)
+UPLOAD_MULTIPART_THRESHOLD = int(os.getenv("UPLOAD_MULTIPART_THRESHOLD_MB", "8")) * 1024 * 1024
+UPLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=UPLOAD_MULTIPART_THRESHOLD,
+    multipart_chunksize=UPLOAD_MULTIPART_THRESHOLD
+)
+
+# Nombre maximal de clés par appel de suppression en lot (limite de l'API S3)
+DELETE_BATCH_SIZE = 1000
+
+# Codes d'erreur S3 d'un objet absent
+NOT_FOUND_CODES = ('404', 'NoSuchKey', 'NotFound')
+
+
+class StorageBackend:
+    """
+    Interface d'un stockage d'objets
+
+    Les méthodes retournent None pour un objet absent et lèvent une exception
+    pour toute autre erreur (le service de stockage la journalise).
+    """
+
+    name = "abstract"
+
+    def put(self, key: str, fileobj: BinaryIO, content_type: str, metadata: Dict[str, str]):
+        """Écrire un objet lu en flux depuis un fichier"""
+        raise NotImplementedError
+
+    def get(self, key: str, byte_range: Optional[Tuple[int, int]] = None):
+        """Ouvrir un objet (entier ou intervalle d'octets inclusif) : corps avec iter_chunks, read et close"""
+        raise NotImplementedError
+
+    def head(self, key: str) -> Optional[Dict[str, Any]]:
+        """Métadonnées d'un objet : {"size", "etag", "content_type"}"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Supprimer un objet (sans erreur s'il est absent)"""
+        raise NotImplementedError
+
+    def delete_many(self, keys: List[str]) -> List[str]:
+        """Supprimer plusieurs objets ; retourne les clés dont la suppression a échoué"""
+        failed = []
+        for key in keys:
+            try:
+                self.delete(key)
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la suppression de {key}: {e}")
+                failed.append(key)
+        return failed
+
+    def list(self, prefix: str, max_keys: int = 1000,
+             continuation_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Une page d'objets sous un préfixe, par ordre de clé
+
+        Returns:
+            ([{"key", "size", "last_modified"}], jeton de la page suivante ou None)
+        """
+        raise NotImplementedError
+
+    def url(self, key: str) -> str:
+        """URL d'accès à un objet"""
+        raise NotImplementedError
+
+
+class B2StorageBackend(StorageBackend):
+    """Backblaze B2 (API compatible S3)"""
+
+    name = "b2"
+
+    def __init__(self, s3_client=None):
+        """
+        Args:
+            s3_client: Client S3 à utiliser (par défaut : client boto3 vers B2, selon l'environnement)
+        """
+        self.b2_application_key_id = os.getenv('B2_APPLICATION_KEY_ID')
+        self.b2_application_key = os.getenv('B2_APPLICATION_KEY')
+        self.b2_bucket_name = os.getenv('B2_BUCKET_NAME', 'interface-cah-pdfs')
+        # Endpoint Backblaze B2 - région ca-east-006 (Canada Est)
+        self.endpoint_url = 'https://s3.ca-east-006.backblazeb2.com'
+
+        if s3_client is not None:
+            self.s3_client = s3_client
+            return
+
+        if not self.b2_application_key_id or not self.b2_application_key:
+            raise ValueError("Variables d'environnement Backblaze B2 manquantes")
+
+        self.s3_client = boto3.client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=self.b2_application_key_id,
+            aws_secret_access_key=self.b2_application_key
+        )
+
+    def put(self, key: str, fileobj: BinaryIO, content_type: str, metadata: Dict[str, str]):
+        # put_object ou multipart selon la taille
+        self.s3_client.upload_fileobj(
+            fileobj,
+            self.b2_bucket_name,
+            key,
+            ExtraArgs={'ContentType': content_type, 'Metadata': metadata},
+            Config=UPLOAD_TRANSFER_CONFIG
+        )
+
+    def get(self, key: str, byte_range: Optional[Tuple[int, int]] = None):
+        params = {"Bucket": self.b2_bucket_name, "Key": key}
+        if byte_range is not None:
+            params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        try:
+            return self.s3_client.get_object(**params)['Body']
+        except ClientError as e:
+            if e.response['Error']['Code'] in NOT_FOUND_CODES:
+                return None
+            raise
+
+    def head(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = self.s3_client.head_object(Bucket=self.b2_bucket_name, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in NOT_FOUND_CODES:
+                return None
+            raise
+        return {
+            "size": response['ContentLength'],
+            "etag": response.get('ETag'),
+            "content_type": response.get('ContentType') or 'application/pdf'
+        }
+
+    def delete(self, key: str):
+        self.s3_client.delete_object(Bucket=self.b2_bucket_name, Key=key)
+
+    def delete_many(self, keys: List[str]) -> List[str]:
+        """Une requête DeleteObjects par lot de DELETE_BATCH_SIZE clés"""
+        failed = []
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start:start + DELETE_BATCH_SIZE]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.b2_bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la suppression en lot: {e}")
+                failed.extend(batch)
+                continue
+            for error in response.get('Errors', []):
+                logger.error(f"❌ Erreur lors de la suppression de {error.get('Key')}: {error.get('Message')}")
+                failed.append(error.get('Key'))
+        return failed
+
+    def list(self, prefix: str, max_keys: int = 1000,
+             continuation_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        params = {"Bucket": self.b2_bucket_name, "Prefix": prefix, "MaxKeys": max_keys}
+        if continuation_token:
+            params["ContinuationToken"] = continuation_token
+        response = self.s3_client.list_objects_v2(**params)
+        objects = [
+            {"key": obj['Key'], "size": obj['Size'], "last_modified": obj['LastModified']}
+            for obj in response.get('Contents', [])
+        ]
+        return objects, response.get('NextContinuationToken') if response.get('IsTruncated') else None
+
+    def url(self, key: str) -> str:
+        return f"{self.endpoint_url}/{self.b2_bucket_name}/{key}"
+
+
+class FileBody:
+    """Lecture d'un fichier local, même interface que le corps d'une réponse S3 (iter_chunks, read, close)"""
+
+    def __init__(self, path: str, byte_range: Optional[Tuple[int, int]] = None):
+        self.file = open(path, "rb")
+        if byte_range is not None:
+            self.file.seek(byte_range[0])
+            self.remaining = byte_range[1] - byte_range[0] + 1
+        else:
+            self.remaining = None
+
+    def iter_chunks(self, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        while self.remaining is None or self.remaining > 0:
+            chunk = self.file.read(chunk_size if self.remaining is None else min(chunk_size, self.remaining))
+            if not chunk:
+                break
+            if self.remaining is not None:
+                self.remaining -= len(chunk)
+            yield chunk
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def close(self):
+        self.file.close()
+
+
+class LocalStorageBackend(StorageBackend):
+    """Répertoire local : une clé dossier/nom.pdf est le fichier LOCAL_STORAGE_DIR/dossier/nom.pdf"""
+
+    name = "local"
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Clé de stockage invalide: {key}")
+        return path
+
+    def put(self, key: str, fileobj: BinaryIO, content_type: str, metadata: Dict[str, str]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture dans un fichier temporaire puis renommage : un lecteur ne voit jamais un fichier partiel
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload_")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                while True:
+                    chunk = fileobj.read(64 * 1024)
+                    if not chunk:
+                        break
+                    temp.write(chunk)
+            os.replace(temp_path, path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def get(self, key: str, byte_range: Optional[Tuple[int, int]] = None):
+        try:
+            return FileBody(self._path(key), byte_range)
+        except FileNotFoundError:
+            return None
+
+    def head(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            stat = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        etag = hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+        return {
+            "size": stat.st_size,
+            "etag": f'"{etag}"',
+            "content_type": mimetypes.guess_type(key)[0] or 'application/pdf'
+        }
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix: str, max_keys: int = 1000,
+             continuation_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Le jeton est la dernière clé de la page précédente (équivalent de StartAfter)
+        keys = []
+        start = self._path(prefix.rsplit("/", 1)[0]) if "/" in prefix else self.root
+        for directory, _, files in os.walk(start):
+            for name in files:
+                if name.startswith(".upload_"):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and (continuation_token is None or key > continuation_token):
+                    keys.append(key)
+        keys.sort()
+
+        objects = []
+        for key in keys[:max_keys]:
+            stat = os.stat(self._path(key))
+            objects.append({
+                "key": key,
+                "size": stat.st_size,
+                "last_modified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+            })
+        return objects, objects[-1]["key"] if len(keys) > max_keys else None
+
+    def url(self, key: str) -> str:
+        # Servi par l'application elle-même
+        return f"/api/documents/{os.path.basename(key)}"
+
+
+def get_storage_backend() -> StorageBackend:
+    """Backend configuré par STORAGE_BACKEND (b2 par défaut)"""
+    if STORAGE_BACKEND == "local":
+        logger.info(f"📁 Stockage des documents en local: {LOCAL_STORAGE_DIR}")
+        return LocalStorageBackend()
+    if STORAGE_BACKEND != "b2":
+        raise ValueError(f"STORAGE_BACKEND inconnu: {STORAGE_BACKEND} (b2 ou local)")
+    return B2StorageBackend()
@@ -1,39 +1,90 @@
 #!/usr/bin/env python3
 """
-Service de stockage pour Backblaze B2
+Service de stockage des documents PDF
+
+Index des documents, déduplication par contenu et cache disque, au-dessus
+d'un backend de stockage (Backblaze B2 ou répertoire local, voir
+storage_backends.py). Chaque opération existe en version asynchrone
+(suffixe _async), exécutée dans un pool de threads borné (STORAGE_IO_WORKERS).
 """
 
+import asyncio
+import functools
+import io
 import os
-import boto3
-from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import uuid
 import base64
-from typing import Optional, Dict, Any
-
-class BackblazeStorageService:
-    """Service de stockage Backblaze B2 pour les PDFs"""
-    
-    def __init__(self):
-        self.b2_application_key_id = os.getenv('B2_APPLICATION_KEY_ID')
-        self.b2_application_key = os.getenv('B2_APPLICATION_KEY')
-        self.b2_bucket_name = os.getenv('B2_BUCKET_NAME', 'interface-cah-pdfs')
-        # Endpoint Backblaze B2 - région ca-east-006 (Canada Est)
-        self.endpoint_url = 'https://s3.ca-east-006.backblazeb2.com'
-        
-        if not self.b2_application_key_id or not self.b2_application_key:
-            raise ValueError("Variables d'environnement Backblaze B2 manquantes")
-        
-        self.s3_client = boto3.client(
-            's3',
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=self.b2_application_key_id,
-            aws_secret_access_key=self.b2_application_key
-        )
+import hashlib
+from typing import Optional, Dict, Any, Iterator, List, Tuple, BinaryIO
+from app_logging import get_logger
+from document_cache import DocumentCache, DOCUMENT_CACHE_MAX_MB
+from storage_backends import StorageBackend, get_storage_backend
+
+logger = get_logger(__name__)
+
+# Dossiers dans lesquels un document peut se trouver (ordre de recherche)
+DOCUMENT_FOLDERS = ['documents', 'bails', 'transactions', 'factures', 'commandes']
+
+# Taille des morceaux envoyés lors de la lecture en flux d'un document
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Dossier de stockage selon le contexte d'un document
+CONTEXT_FOLDERS = {
+    "bail": "bails",
+    "transaction": "transactions",
+    "facture": "factures",
+    "commande": "commandes",
+    "document": "documents"
+}
+
+# Nombre d'opérations de stockage exécutées en parallèle pour les routes async
+STORAGE_IO_WORKERS = int(os.environ.get("STORAGE_IO_WORKERS", "8"))
+
+# Les appels au stockage sont bloquants (réseau, disque) : un pool borné évite
+# de bloquer la boucle d'événements sans saturer le pool de threads de FastAPI
+_storage_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix="storage")
+
+
+def _hash_stream(fileobj: BinaryIO) -> Tuple[str, int]:
+    """Empreinte SHA-256 et taille d'un fichier lu par morceaux, puis retour au début"""
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+class StorageService:
+    """Service de stockage des PDFs (index, déduplication, cache) au-dessus d'un backend"""
+    
+    def __init__(self, backend: Optional[StorageBackend] = None, document_cache: Optional[DocumentCache] = None):
+        """
+        Args:
+            backend: Backend de stockage (par défaut : selon STORAGE_BACKEND)
+            document_cache: Cache disque des documents (par défaut : DOCUMENT_CACHE_DIR, désactivé si DOCUMENT_CACHE_MAX_MB=0)
+        """
+        self.backend = backend if backend is not None else get_storage_backend()
+        
+        if document_cache is None and DOCUMENT_CACHE_MAX_MB > 0:
+            document_cache = DocumentCache()
+        self.cache = document_cache
+    
+    async def _run(self, method, *args, **kwargs):
+        """Exécuter une opération bloquante dans le pool de stockage"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_storage_executor, functools.partial(method, *args, **kwargs))
     
     def upload_pdf(self, file_content: bytes, original_filename: str, folder: str = "documents", context: str = "document") -> Dict[str, Any]:
         """
-        Uploader un PDF vers Backblaze B2
+        Uploader un PDF (contenu en mémoire, voir upload_pdf_stream)
         
         Args:
             file_content: Contenu du fichier en bytes
@@ -43,6 +94,27 @@ class BackblazeStorageService:
         Returns:
             Dict avec les informations du fichier uploadé
         """
+        return self.upload_pdf_stream(io.BytesIO(file_content), original_filename, folder, context)
+    
+    def upload_pdf_stream(self, fileobj: BinaryIO, original_filename: str, folder: str = "documents",
+                          context: str = "document") -> Dict[str, Any]:
+        """
+        Uploader un PDF depuis un fichier (mémoire constante)
+        
+        Le contenu est lu une première fois par morceaux pour calculer son
+        empreinte SHA-256 : si un contenu identique est déjà stocké, le nouveau
+        document y fait référence au lieu d'être envoyé à nouveau. Sinon il est
+        envoyé en flux (sur B2 : upload multipart au-delà de UPLOAD_MULTIPART_THRESHOLD).
+        
+        Args:
+            fileobj: Fichier ouvert en lecture binaire, positionnable (ex. UploadFile.file)
+            original_filename: Nom original du fichier
+            folder: Dossier de destination (documents, bails, transactions)
+            context: Contexte du document (préfixe du nom de fichier)
+        
+        Returns:
+            Dict avec les informations du fichier uploadé ("deduplicated" si le contenu existait déjà)
+        """
         try:
             # Générer un nom de fichier unique : nom_original_timestamp.pdf
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -68,30 +140,49 @@ class BackblazeStorageService:
             }.get(context, "document")
             
             new_filename = f"{context_prefix}_{clean_base_name}_{timestamp}{file_extension}"
+            # Même nom dans la même seconde (uploads en parallèle) : suffixe aléatoire
+            if self._find_document(new_filename) is not None:
+                new_filename = f"{context_prefix}_{clean_base_name}_{timestamp}_{uuid.uuid4().hex[:6]}{file_extension}"
             
-            # Chemin complet dans le bucket
-            s3_key = f"{folder}/{new_filename}"
+            # Empreinte et taille du contenu, lus par morceaux
+            sha256, size = _hash_stream(fileobj)
             
-            # Encoder le nom de fichier original en base64 pour éviter les caractères non-ASCII dans les métadonnées S3
-            original_filename_encoded = base64.b64encode(original_filename.encode('utf-8')).decode('ascii')
-            
-            # Upload vers Backblaze B2
-            self.s3_client.put_object(
-                Bucket=self.b2_bucket_name,
-                Key=s3_key,
-                Body=file_content,
-                ContentType='application/pdf',
-                Metadata={
-                    'original_filename': original_filename_encoded,  # Encodé en base64 pour éviter les caractères non-ASCII
-                    'upload_date': datetime.now().isoformat(),
-                    'folder': folder
-                }
-            )
+            # Contenu déjà stocké : référencer l'objet existant
+            existing = self._find_document_by_sha256(sha256)
+            if existing is not None and self.head_pdf(existing["s3_key"]) is not None:
+                s3_key = existing["s3_key"]
+                deduplicated = True
+                logger.info(f"♻️ PDF identique déjà stocké, référencé: {s3_key}")
+            else:
+                # Chemin complet dans le bucket
+                s3_key = f"{folder}/{new_filename}"
+                deduplicated = False
+                
+                # Encoder le nom de fichier original en base64 pour éviter les caractères non-ASCII dans les métadonnées S3
+                original_filename_encoded = base64.b64encode(original_filename.encode('utf-8')).decode('ascii')
+                
+                self.backend.put(
+                    s3_key,
+                    fileobj,
+                    'application/pdf',
+                    {
+                        'original_filename': original_filename_encoded,  # Encodé en base64 pour éviter les caractères non-ASCII
+                        'upload_date': datetime.now().isoformat(),
+                        'folder': folder,
+                        'sha256': sha256
+                    }
+                )
+                logger.info(f"✅ PDF uploadé ({self.backend.name}): {s3_key}")
+                
+                # Préchauffer le cache : un document vient souvent d'être uploadé pour être consulté
+                if self.cache is not None:
+                    fileobj.seek(0)
+                    self.cache.put_stream(fileobj, sha256)
             
             # URL publique du fichier
-            file_url = f"{self.endpoint_url}/{self.b2_bucket_name}/{s3_key}"
+            file_url = self.backend.url(s3_key)
             
-            print(f"✅ PDF uploadé vers Backblaze B2: {s3_key}")
+            self._index_document(new_filename, s3_key, folder, original_filename, size, sha256)
             
             return {
                 "success": True,
@@ -99,12 +190,14 @@ class BackblazeStorageService:
                 "original_filename": original_filename,
                 "s3_key": s3_key,
                 "file_url": file_url,
-                "size": len(file_content),
+                "size": size,
+                "sha256": sha256,
+                "deduplicated": deduplicated,
                 "folder": folder
             }
             
         except Exception as e:
-            print(f"❌ Erreur lors de l'upload: {e}")
+            logger.error(f"❌ Erreur lors de l'upload: {e}")
             return {
                 "success": False,
                 "error": str(e)
@@ -112,7 +205,7 @@ class BackblazeStorageService:
     
     def download_pdf(self, s3_key: str) -> Optional[bytes]:
         """
-        Télécharger un PDF depuis Backblaze B2
+        Télécharger un PDF (depuis le cache disque si possible, sinon depuis le stockage)
         
         Args:
             s3_key: Clé S3 du fichier
@@ -120,78 +213,270 @@ class BackblazeStorageService:
         Returns:
             Contenu du fichier en bytes ou None si erreur
         """
+        sha256 = self._indexed_sha256(s3_key)
+        if self.cache is not None:
+            cached = self.cache.open(sha256)
+            if cached is not None:
+                try:
+                    content = cached.read()
+                finally:
+                    cached.close()
+                if hashlib.sha256(content).hexdigest() == sha256:
+                    return content
+        
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.b2_bucket_name,
-                Key=s3_key
-            )
-            return response['Body'].read()
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchKey':
-                print(f"❌ Fichier non trouvé: {s3_key}")
-            else:
-                print(f"❌ Erreur lors du téléchargement: {e}")
-            return None
+            body = self.backend.get(s3_key)
+            if body is None:
+                logger.error(f"❌ Fichier non trouvé: {s3_key}")
+                return None
+            body = self._cache_fill(body, s3_key, sha256)
+            try:
+                return body.read()
+            finally:
+                body.close()
         except Exception as e:
-            print(f"❌ Erreur lors du téléchargement: {e}")
+            logger.error(f"❌ Erreur lors du téléchargement: {e}")
             return None
     
     def delete_pdf(self, s3_key: str) -> bool:
         """
-        Supprimer un PDF depuis Backblaze B2
+        Supprimer un PDF (voir delete_pdfs)
         
         Args:
-            s3_key: Clé S3 du fichier
+            s3_key: Clé S3 du fichier (ou dossier/nom de fichier du document)
         
         Returns:
             True si succès, False sinon
         """
+        return not self.delete_pdfs([s3_key])["failed"]
+    
+    def delete_pdfs(self, s3_keys: List[str]) -> Dict[str, List[str]]:
+        """
+        Supprimer plusieurs PDFs en une requête de suppression en lot
+        
+        Un contenu dédupliqué peut être référencé par plusieurs documents : seule
+        la référence est retirée tant que d'autres documents l'utilisent. Seules
+        les références demandées sont retirées de l'index, avant l'objet ; un
+        objet dont la suppression échoue n'est plus indexé et sera retrouvé par
+        locate_pdf.
+        
+        Args:
+            s3_keys: Clés S3 (ou dossier/nom de fichier, ou nom de fichier) des documents
+        
+        Returns:
+            {"deleted": objets supprimés, "released": références retirées (objet conservé), "failed": échecs}
+        """
+        # Les entités conservent le nom de fichier : la clé réelle vient de l'index
+        references: Dict[str, Dict[str, Any]] = {}  # s3_key -> {"names": noms de fichier, "sha256"}
+        for s3_key in dict.fromkeys(s3_keys):
+            filename = os.path.basename(s3_key)
+            reference = self._find_document(filename)
+            if reference is None:
+                # Fichier antérieur à l'index : le chercher dans les dossiers
+                located = self.locate_pdf(filename)
+                reference = self._find_document(filename) if located else None
+            if reference is None:
+                references.setdefault(s3_key, {"names": set(), "sha256": None})
+                continue
+            entry = references.setdefault(reference["s3_key"], {"names": set(), "sha256": reference["sha256"]})
+            entry["names"].add(reference["nom_fichier"])
+        
+        result = {"deleted": [], "released": [], "failed": []}
+        to_delete = []
+        for s3_key, entry in references.items():
+            # Références retirées et restantes comptées en une transaction (voir release_document_references)
+            remaining = self._document_index("release_document_references", s3_key, sorted(entry["names"])) or 0
+            if remaining > 0:
+                logger.info(f"♻️ Référence supprimée, PDF conservé (utilisé par d'autres documents): {s3_key}")
+                result["released"].append(s3_key)
+            else:
+                to_delete.append(s3_key)
+        
+        if to_delete:
+            try:
+                failed = set(self.backend.delete_many(to_delete))
+            except Exception as e:
+                logger.error(f"❌ Erreur lors de la suppression: {e}")
+                failed = set(to_delete)
+            for s3_key in to_delete:
+                if s3_key in failed:
+                    result["failed"].append(s3_key)
+                    continue
+                logger.info(f"✅ PDF supprimé ({self.backend.name}): {s3_key}")
+                if self.cache is not None:
+                    self.cache.invalidate(references[s3_key]["sha256"])
+                result["deleted"].append(s3_key)
+        return result
+    
+    def head_pdf(self, s3_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Lire les métadonnées d'un PDF sans le télécharger
+        
+        Returns:
+            {"size", "etag", "content_type"} ou None si le fichier n'existe pas
+        """
+        try:
+            return self.backend.head(s3_key)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de la lecture des métadonnées: {e}")
+            return None
+    
+    def locate_pdf(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Trouver un document par nom de fichier ou par clé S3
+        
+        L'index des documents répond en une requête ; les fichiers antérieurs à
+        l'index sont cherchés par HEAD dans chaque dossier puis ajoutés à l'index.
+        
+        Returns:
+            {"s3_key", "size", "etag", "sha256", "content_type"} ou None si introuvable
+        """
+        document = self._find_document(filename)
+        
+        if document and document["taille"] is not None:
+            return {
+                "s3_key": document["s3_key"],
+                "size": document["taille"],
+                "etag": f'"{document["sha256"]}"' if document["sha256"] else None,
+                "sha256": document["sha256"],
+                "content_type": document["type_contenu"]
+            }
+        
+        candidates = [document["s3_key"]] if document else (
+            [filename] if '/' in filename else [f"{folder}/{filename}" for folder in DOCUMENT_FOLDERS]
+        )
+        for s3_key in candidates:
+            metadata = self.head_pdf(s3_key)
+            if metadata is not None:
+                logger.info(f"✅ PDF trouvé dans: {s3_key}")
+                self._index_document(os.path.basename(s3_key), s3_key, s3_key.split('/')[0], None, metadata["size"], None)
+                return {"s3_key": s3_key, "sha256": None, **metadata}
+        return None
+    
+    def open_pdf(self, s3_key: str, byte_range: Optional[Tuple[int, int]] = None, sha256: Optional[str] = None):
+        """
+        Ouvrir un PDF en lecture (flux), entier ou sur un intervalle d'octets inclusif
+        
+        Le cache disque répond si l'empreinte du contenu est connue ; sinon une
+        lecture complète depuis le stockage alimente le cache.
+        
+        Returns:
+            Corps à lire avec iter_pdf ou None si le fichier n'existe pas
+        """
+        if self.cache is not None:
+            cached = self.cache.open(sha256, byte_range)
+            if cached is not None:
+                return cached
+        
         try:
-            self.s3_client.delete_object(
-                Bucket=self.b2_bucket_name,
-                Key=s3_key
-            )
-            print(f"✅ PDF supprimé de Backblaze B2: {s3_key}")
-            return True
+            body = self.backend.get(s3_key, byte_range)
         except Exception as e:
-            print(f"❌ Erreur lors de la suppression: {e}")
-            return False
+            logger.error(f"❌ Erreur lors du téléchargement: {e}")
+            return None
+        if body is None:
+            logger.error(f"❌ Fichier non trouvé: {s3_key}")
+            return None
+        return body if byte_range is not None else self._cache_fill(body, s3_key, sha256)
+    
+    @staticmethod
+    def iter_pdf(body, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """Lire un flux ouvert par open_pdf par morceaux (mémoire constante), puis le fermer"""
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+    
+    def _cache_fill(self, body, s3_key: str, sha256: Optional[str]):
+        """Recopier un corps lu en entier dans le cache (et compléter l'index si l'empreinte était inconnue)"""
+        if self.cache is None:
+            return body
+        on_cached = None if sha256 else (lambda computed: self._set_document_sha256(s3_key, computed))
+        return self.cache.fill(body, sha256, on_cached)
     
-    def list_pdfs(self, folder: str = "documents", limit: int = 100) -> list:
+    def _document_index(self, operation: str, *args, **kwargs):
         """
-        Lister les PDFs dans un dossier
+        Appeler une opération de l'index des documents (DatabaseServiceFrancais)
+        
+        L'index accélère et déduplique le stockage sans en être une condition :
+        une erreur d'index est journalisée et l'opération retourne None.
+        """
+        try:
+            from database_service_francais import db_service_francais
+            return getattr(db_service_francais, operation)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"⚠️ Index des documents indisponible ({operation}): {e}")
+            return None
+    
+    def _find_document(self, filename_or_key: str) -> Optional[Dict[str, Any]]:
+        """Entrée de l'index par nom de fichier ou par clé S3"""
+        return self._document_index("get_document_index", filename_or_key)
+    
+    def _find_document_by_sha256(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Document déjà stocké avec ce contenu"""
+        return self._document_index("get_document_by_sha256", sha256)
+    
+    def _indexed_sha256(self, s3_key: str) -> Optional[str]:
+        """Empreinte d'un document connue de l'index (None si non indexé)"""
+        document = self._find_document(s3_key)
+        return document["sha256"] if document else None
+    
+    def _set_document_sha256(self, s3_key: str, sha256: str):
+        """Compléter l'empreinte d'un document indexé sans empreinte"""
+        self._document_index("set_document_sha256", s3_key, sha256)
+    
+    def _index_document(self, filename: str, s3_key: str, folder: Optional[str], original_filename: Optional[str],
+                        size: Optional[int], sha256: Optional[str]):
+        """Enregistrer un document dans l'index (une erreur d'index ne fait pas échouer le stockage)"""
+        self._document_index("index_document", filename, s3_key, dossier=folder, nom_original=original_filename,
+                             taille=size, sha256=sha256)
+    
+    def list_pdfs(self, folder: str = "documents") -> list:
+        """
+        Lister tous les PDFs d'un dossier (toutes les pages, voir list_pdfs_page)
         
         Args:
             folder: Dossier à lister
-            limit: Nombre maximum de fichiers à retourner
         
         Returns:
             Liste des fichiers
         """
+        files, token = self.list_pdfs_page(folder)
+        while token is not None:
+            page, token = self.list_pdfs_page(folder, continuation_token=token)
+            files.extend(page)
+        return files
+    
+    def list_pdfs_page(self, folder: str = "documents", limit: int = 1000,
+                       continuation_token: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        """
+        Lister une page de PDFs d'un dossier
+        
+        Args:
+            folder: Dossier à lister
+            limit: Nombre maximum d'objets lus (les fichiers autres que PDF sont ignorés)
+            continuation_token: Jeton retourné par la page précédente
+        
+        Returns:
+            (fichiers, jeton de la page suivante ou None)
+        """
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.b2_bucket_name,
-                Prefix=f"{folder}/",
-                MaxKeys=limit
-            )
-            
-            files = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    if obj['Key'].lower().endswith('.pdf'):
-                        files.append({
-                            "key": obj['Key'],
-                            "filename": os.path.basename(obj['Key']),
-                            "size": obj['Size'],
-                            "last_modified": obj['LastModified'].isoformat(),
-                            "url": f"{self.endpoint_url}/{self.b2_bucket_name}/{obj['Key']}"
-                        })
-            
-            return files
-            
+            objects, next_token = self.backend.list(f"{folder}/", limit, continuation_token)
         except Exception as e:
-            print(f"❌ Erreur lors de la liste: {e}")
-            return []
+            logger.error(f"❌ Erreur lors de la liste: {e}")
+            return [], None
+        
+        files = [
+            {
+                "key": obj['key'],
+                "filename": os.path.basename(obj['key']),
+                "size": obj['size'],
+                "last_modified": obj['last_modified'].isoformat(),
+                "url": self.backend.url(obj['key'])
+            }
+            for obj in objects if obj['key'].lower().endswith('.pdf')
+        ]
+        return files, next_token
     
     def get_file_url(self, s3_key: str) -> str:
         """
@@ -203,14 +488,44 @@ class BackblazeStorageService:
         Returns:
             URL publique du fichier
         """
-        return f"{self.endpoint_url}/{self.b2_bucket_name}/{s3_key}"
+        return self.backend.url(s3_key)
+    
+    # Versions asynchrones (pool de stockage), pour les routes async
+    
+    async def upload_pdf_stream_async(self, *args, **kwargs) -> Dict[str, Any]:
+        """upload_pdf_stream exécuté dans le pool de stockage"""
+        return await self._run(self.upload_pdf_stream, *args, **kwargs)
+    
+    async def download_pdf_async(self, s3_key: str) -> Optional[bytes]:
+        """download_pdf exécuté dans le pool de stockage"""
+        return await self._run(self.download_pdf, s3_key)
+    
+    async def delete_pdfs_async(self, s3_keys: List[str]) -> Dict[str, List[str]]:
+        """delete_pdfs exécuté dans le pool de stockage"""
+        return await self._run(self.delete_pdfs, s3_keys)
+    
+    async def locate_pdf_async(self, filename: str) -> Optional[Dict[str, Any]]:
+        """locate_pdf exécuté dans le pool de stockage"""
+        return await self._run(self.locate_pdf, filename)
+    
+    async def list_pdfs_async(self, folder: str = "documents") -> list:
+        """list_pdfs exécuté dans le pool de stockage"""
+        return await self._run(self.list_pdfs, folder)
+    
+    async def list_pdfs_page_async(self, *args, **kwargs) -> Tuple[list, Optional[str]]:
+        """list_pdfs_page exécuté dans le pool de stockage"""
+        return await self._run(self.list_pdfs_page, *args, **kwargs)
+
+
+# Ancien nom, avant l'ajout des backends de stockage
+BackblazeStorageService = StorageService
 
 # Instance globale du service
 storage_service = None
 
-def get_storage_service() -> BackblazeStorageService:
+def get_storage_service() -> StorageService:
     """Obtenir l'instance du service de stockage"""
     global storage_service
     if storage_service is None:
-        storage_service = BackblazeStorageService()
+        storage_service = StorageService()
     return storage_service
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Nombre de lignes de chaque table, pour le monitoring
+
+Le moniteur comptait les lignes en chargeant les tables entières par le
+service de données (get_buildings(), get_tenants()...) : chaque contrôle de
+santé lisait toute la base. Ici chaque table des modèles (partie locative et
+construction, même fichier) est comptée par une requête chronométrée :
+
+- mode "exact" : SELECT COUNT(*) ;
+- mode "estimate" : statistiques de l'optimiseur, sans parcourir les tables
+  (sqlite_stat1 après ANALYZE, pg_class.reltuples sous PostgreSQL) ; une table
+  sans statistiques est comptée exactement.
+
+Les tables des modèles absentes de la base (migration non appliquée) sont
+ignorées.
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+from database import engine
+from schema_cache import schema_cache
+from app_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configuration
+TABLE_COUNT_MODE = os.environ.get("TABLE_COUNT_MODE", "exact").lower()
+
+
+def _model_tables() -> List[str]:
+    """Tables déclarées par les modèles (partie locative et construction)"""
+    from models_francais import Base
+    from models_construction import ConstructionBase
+    return sorted(set(Base.metadata.tables) | set(ConstructionBase.metadata.tables))
+
+
+class TableStatsCollector:
+    """Compte les lignes des tables des modèles, une requête chronométrée par table"""
+
+    def __init__(self, bind):
+        self.engine = bind
+
+    def tables(self) -> List[str]:
+        """Tables des modèles présentes dans la base"""
+        return [table for table in _model_tables() if schema_cache.columns(table)]
+
+    def _estimates(self, connection, tables: List[str]) -> Dict[str, int]:
+        """Nombre de lignes estimé par l'optimiseur (tables analysées seulement)"""
+        if self.engine.dialect.name == "sqlite":
+            has_stats = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            ).first()
+            if not has_stats:
+                return {}
+            # Première valeur de stat : nombre de lignes de la table au dernier ANALYZE
+            rows = connection.execute(text("SELECT tbl, stat FROM sqlite_stat1")).fetchall()
+            return {tbl: int(stat.split()[0]) for tbl, stat in rows if tbl in tables}
+        if self.engine.dialect.name == "postgresql":
+            rows = connection.execute(
+                text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relname = ANY(:tables)"),
+                {"tables": tables}
+            ).fetchall()
+            # reltuples vaut -1 (ou 0 selon la version) pour une table jamais analysée
+            return {relname: int(reltuples) for relname, reltuples in rows if reltuples > 0}
+        return {}
+
+    def collect(self, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Compter les lignes de chaque table
+
+        Returns:
+            {"counts": {table: lignes}, "timings_ms": {table: durée}, "estimated": [tables estimées],
+             "mode", "statistics_ms" (lecture des statistiques en mode estimate), "duration_ms"}
+        """
+        mode = mode or TABLE_COUNT_MODE
+        start = time.perf_counter()
+        tables = self.tables()
+        counts, timings, estimated = {}, {}, []
+        statistics_ms = None
+
+        with self.engine.connect() as connection:
+            if mode == "estimate":
+                step = time.perf_counter()
+                estimates = self._estimates(connection, tables)
+                for table in estimates:
+                    counts[table] = estimates[table]
+                    estimated.append(table)
+                    timings[table] = 0.0
+                statistics_ms = round((time.perf_counter() - step) * 1000, 3)
+
+            for table in tables:
+                if table in counts:
+                    continue
+                step = time.perf_counter()
+                try:
+                    counts[table] = connection.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+                except Exception as e:
+                    logger.warning(f"⚠️ Erreur comptage table {table}: {e}")
+                    counts[table] = 0
+                timings[table] = round((time.perf_counter() - step) * 1000, 3)
+
+        return {
+            "counts": {table: counts[table] for table in tables},
+            "timings_ms": {table: timings[table] for table in tables},
+            "estimated": sorted(estimated),
+            "mode": mode,
+            "statistics_ms": statistics_ms,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+
+# Instance globale (même moteur pour la partie locative et la construction)
+table_stats = TableStatsCollector(engine)
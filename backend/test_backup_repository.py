@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test du dépôt de sauvegardes incrémentales (BackupRepository)
+
+Utilise une base SQLite et un dépôt créés dans le répertoire temporaire du test.
+
+Usage:
+    python -m pytest test_backup_repository.py
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from backup_repository import BackupRepository
+from backup_service import snapshot_database
+
+
+def sauvegarder(repository, base, backup_type, created_at=None):
+    """Copie en ligne de la base ajoutée au dépôt"""
+    copie = os.path.join(os.path.dirname(base), "copie.db")
+    snapshot_database(copie, base)
+    try:
+        return repository.add_snapshot(copie, backup_type, created_at=created_at)
+    finally:
+        os.remove(copie)
+
+
+def lignes(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_backup_repository(tmp_path, monkeypatch):
+    """Vérifier déduplication, restauration à un instant, rétention et nettoyage des blocs"""
+    base = str(tmp_path / "test.db")
+    connection = sqlite3.connect(base)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, contenu BLOB)")
+    connection.executemany("INSERT INTO documents (contenu) VALUES (randomblob(4000))", [()] * 2000)
+    connection.commit()
+
+    repository = BackupRepository(str(tmp_path / "repository"), chunk_kb=64)
+
+    # 1. Une seconde sauvegarde après une petite modification n'écrit que quelques blocs
+    debut = datetime(2024, 1, 1, 8, 0)
+    premiere = sauvegarder(repository, base, "manual", debut)
+    connection.execute("UPDATE documents SET contenu = randomblob(4000) WHERE id = 10")
+    connection.commit()
+    seconde = sauvegarder(repository, base, "manual", debut + timedelta(hours=1))
+    assert premiere["new_chunks"] == premiere["chunks"]
+    assert 0 < seconde["new_chunks"] <= 3, f"{seconde['new_chunks']} bloc(s) nouveau(x) sur {seconde['chunks']}"
+
+    # 2. Restauration de n'importe quelle sauvegarde, et à un instant donné
+    connection.execute("DELETE FROM documents WHERE id > 1000")
+    connection.commit()
+    sauvegarder(repository, base, "manual", debut + timedelta(hours=2))
+    restauree = str(tmp_path / "restauree.db")
+    repository.restore_to(premiere["id"], restauree)
+    assert lignes(restauree) == 2000
+    instant = repository.find_snapshot(debut + timedelta(hours=2, minutes=30))
+    repository.restore_to(instant["id"], restauree)
+    assert lignes(restauree) == 1000, "Sauvegarde la plus récente à cette date"
+    assert [s["id"] for s in repository.list_snapshots()][-1] == premiere["id"]
+
+    # 3. Bloc corrompu : la restauration échoue au lieu de produire une base invalide
+    manifeste = repository.get_manifest(premiere["id"])
+    bloc = repository._chunk_path(manifeste["chunk_list"][-1])
+    contenu_bloc = bloc.read_bytes()
+    bloc.write_bytes(contenu_bloc[:-10])
+    with pytest.raises(Exception):
+        repository.restore_to(premiere["id"], restauree)
+    bloc.write_bytes(contenu_bloc)
+
+    # 4. Rétention : une sauvegarde par heure sur 3 jours, règles 6 horaires + 2 quotidiennes,
+    #    et la plus récente des 3 sauvegardes manuelles
+    for heure in range(3, 72):
+        connection.execute("UPDATE documents SET contenu = randomblob(4000) WHERE id = ?", (heure,))
+        connection.commit()
+        sauvegarder(repository, base, "hourly", debut + timedelta(hours=heure))
+    supprimees = repository.apply_retention({"hourly": 6, "daily": 2, "weekly": 0, "monthly": 0, "manual": 1})
+    restantes = repository.list_snapshots()
+    assert len(restantes) == 8 and len(supprimees) == 64, (len(restantes), len(supprimees))
+    assert [s["backup_type"] for s in restantes].count("manual") == 1
+    references = {sha256 for s in restantes for sha256 in repository.get_manifest(s["id"])["chunk_list"]}
+    fichiers = list(repository.chunks_dir.glob("*/*"))
+    assert {path.name for path in fichiers} == references, "Blocs orphelins supprimés"
+    assert all(repository.restore_to(s["id"], restauree) for s in restantes)
+
+    # 5. Statistiques lues dans l'index (totaux tenus à jour), sans parcourir les blocs
+    stockes = sum(path.stat().st_size for path in fichiers)
+    with monkeypatch.context() as patch:
+        patch.setattr(type(repository.chunks_dir), "glob", lambda *args: pytest.fail("Blocs parcourus"))
+        stats = repository.stats()
+    assert stats["stored_chunks"] == len(fichiers) and stats["stored_bytes"] == stockes, stats
+    assert stats["deduplication_ratio"] > 1
+
+    # Index sans totaux (version 1) : blocs comptés une fois, puis index mis à jour
+    with open(repository.index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    with open(repository.index_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "snapshots": index["snapshots"]}, f)
+    assert BackupRepository(str(repository.root)).stats() == stats
+    with open(repository.index_path, "r", encoding="utf-8") as f:
+        assert json.load(f)["stored_bytes"] == stockes
+
+    connection.close()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test du cashflow mensuel tenu à jour incrémentalement
+
+Déplace un bail puis une unité vers un autre immeuble, ou enregistre des
+paiements en parallèle sur le même mois, et vérifie que le cashflow mensuel
+tenu à jour est identique à une reconstruction complète
+(rebuild_cashflow_mensuel). Utilise la base de test (conftest.py).
+
+Usage:
+    python -m pytest test_cashflow_mensuel.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from database_service_francais import db_service_francais as db
+from models_francais import CashflowMensuel
+
+
+def cashflow():
+    """Lignes du cashflow mensuel : {(immeuble, annee, mois, source, categorie): (revenus, dépenses, opérations)}"""
+    with db.get_session() as session:
+        return {
+            (l.id_immeuble, l.annee, l.mois, l.source, l.categorie): (
+                Decimal(str(l.revenus)).quantize(Decimal('0.01')),
+                Decimal(str(l.depenses)).quantize(Decimal('0.01')),
+                l.nb_operations
+            )
+            for l in session.query(CashflowMensuel).all()
+        }
+
+
+def verifier_contre_reconstruction(nom):
+    """Le cashflow tenu à jour doit être identique à une reconstruction complète"""
+    incremental = cashflow()
+    db.rebuild_cashflow_mensuel()
+    reconstruit = cashflow()
+    assert incremental == reconstruit, f"{nom} : {incremental} != {reconstruit}"
+    return incremental
+
+
+def test_cashflow_mensuel_deplacements(base):
+    """Déplacer un bail puis une unité vers un autre immeuble déplace aussi leurs loyers"""
+    immeuble_1 = db.create_building({"nom_immeuble": "Immeuble 1"})["id_immeuble"]
+    immeuble_2 = db.create_building({"nom_immeuble": "Immeuble 2"})["id_immeuble"]
+    unite_1 = db.create_unit({"id_immeuble": immeuble_1, "adresse_unite": "1-101"})["id_unite"]
+    unite_2 = db.create_unit({"id_immeuble": immeuble_2, "adresse_unite": "2-201"})["id_unite"]
+    locataire = db.create_tenant({"nom": "Test"})["id_locataire"]
+    bail = db.create_lease({
+        "id_locataire": locataire, "id_unite": unite_1,
+        "date_debut": "2024-01-01", "date_fin": "2024-12-31", "prix_loyer": 1234.56
+    })["id_bail"]
+    for mois in (1, 2, 3):
+        db.create_paiement_loyer({"id_bail": bail, "annee": 2024, "mois": mois})
+    db.create_paiement_loyer({"id_bail": bail, "annee": 2024, "mois": 4, "montant_paye": 600.10})
+
+    avant = verifier_contre_reconstruction("Loyers sous l'immeuble 1")
+    assert avant[(immeuble_1, 2024, 1, 'paiement', 'loyer')] == (Decimal('1234.56'), Decimal('0.00'), 1)
+
+    # 1. Bail déplacé vers une unité de l'immeuble 2
+    db.update_lease(bail, {"id_unite": unite_2})
+    apres_bail = verifier_contre_reconstruction("Bail déplacé : loyers sous l'immeuble 2")
+    assert not any(cle[0] == immeuble_1 and cle[3] == 'paiement' for cle in apres_bail)
+    assert apres_bail[(immeuble_2, 2024, 4, 'paiement', 'loyer')] == (Decimal('600.10'), Decimal('0.00'), 1)
+
+    # 2. Unité (avec son bail) déplacée vers l'immeuble 1
+    db.update_unit(unite_2, {"id_immeuble": immeuble_1})
+    apres_unite = verifier_contre_reconstruction("Unité déplacée : loyers de retour sous l'immeuble 1")
+    assert not any(cle[0] == immeuble_2 and cle[3] == 'paiement' for cle in apres_unite)
+    assert apres_unite[(immeuble_1, 2024, 2, 'paiement', 'loyer')] == (Decimal('1234.56'), Decimal('0.00'), 1)
+
+    # 3. Unité modifiée sans changement d'immeuble : cashflow inchangé
+    db.update_unit(unite_2, {"id_immeuble": immeuble_1, "type": "5 1/2"})
+    assert verifier_contre_reconstruction("Unité modifiée sur place") == apres_unite
+
+
+def test_cashflow_mensuel_paiements_concurrents(base):
+    """Des paiements enregistrés en parallèle sur le même mois s'additionnent tous dans la même ligne"""
+    nb_baux = 20
+    immeuble = db.create_building({"nom_immeuble": "Immeuble"})["id_immeuble"]
+    baux = []
+    for i in range(nb_baux):
+        unite = db.create_unit({"id_immeuble": immeuble, "adresse_unite": f"{i}"})["id_unite"]
+        locataire = db.create_tenant({"nom": f"Locataire {i}"})["id_locataire"]
+        baux.append(db.create_lease({
+            "id_locataire": locataire, "id_unite": unite,
+            "date_debut": "2024-01-01", "date_fin": "2024-12-31", "prix_loyer": 1000 + i
+        })["id_bail"])
+
+    def payer(bail, mois):
+        return db.create_paiement_loyer({"id_bail": bail, "annee": 2024, "mois": mois})
+
+    def payer_en_parallele(baux, mois):
+        with ThreadPoolExecutor(max_workers=len(baux)) as executor:
+            return list(executor.map(lambda bail: payer(bail, mois), baux))
+
+    # 1. Ligne absente : insertions concurrentes de la même clé
+    assert all(payer_en_parallele(baux, 1)), "Chaque paiement concurrent doit être enregistré"
+
+    # 2. Ligne existante : mises à jour concurrentes de la même clé
+    assert payer(baux[0], 2)
+    assert all(payer_en_parallele(baux[1:], 2)), "Chaque paiement concurrent doit être enregistré"
+
+    lignes = verifier_contre_reconstruction("Paiements concurrents")
+    total = Decimal(sum(1000 + i for i in range(nb_baux))).quantize(Decimal('0.01'))
+    for mois in (1, 2):
+        assert lignes[(immeuble, 2024, mois, 'paiement', 'loyer')] == (total, Decimal('0.00'), nb_baux)
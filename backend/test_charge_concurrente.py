@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test de charge : les routes SQLAlchemy ne bloquent pas la boucle d'événements
+
+Les routes sont des fonctions synchrones exécutées dans le pool de threads
+(THREADPOOL_SIZE). Le test démarre l'API dans un thread, sur la base de test
+(conftest.py), et tient le verrou d'écriture de SQLite : des créations
+d'immeubles concurrentes attendent ce verrou, chacune dans son thread. Une
+lecture lancée pendant l'attente doit répondre aussitôt ; si une route
+bloquait la boucle d'événements, la lecture attendrait la libération du
+verrou. L'attente est une attente d'I/O : le résultat ne dépend pas du
+nombre de cœurs.
+
+Usage:
+    python -m pytest test_charge_concurrente.py
+"""
+
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+import uvicorn
+
+from database import DATABASE_PATH
+from database_service_francais import db_service_francais
+
+NB_REQUETES = 10
+DUREE_VERROU = 2.0  # Secondes pendant lesquelles les écritures attendent
+
+
+@pytest.fixture
+def api(base):
+    """API démarrée dans un thread, sur un port libre -> URL de base"""
+    from main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    serveur = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=serveur.run, daemon=True)
+    thread.start()
+    debut = time.monotonic()
+    while not serveur.started:
+        if not thread.is_alive() or time.monotonic() - debut > 30:
+            pytest.fail("L'API n'a pas démarré")
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    serveur.should_exit = True
+    thread.join(timeout=10)
+
+
+def test_charge_concurrente(api):
+    """Une lecture répond pendant que des écritures concurrentes attendent le verrou de la base"""
+    requests.get(f"{api}/api/buildings", timeout=10).raise_for_status()
+
+    def creer(i):
+        debut = time.perf_counter()
+        response = requests.post(f"{api}/api/buildings", json={
+            "nom_immeuble": f"Immeuble {i}", "adresse": f"{i} rue Test", "ville": "Trois-Rivières",
+            "province": "QC", "code_postal": "G9A 1A1", "nbr_unite": 1, "annee_construction": 2000
+        }, timeout=60)
+        return response.status_code, time.perf_counter() - debut
+
+    # Verrou d'écriture tenu par une autre connexion, libéré après DUREE_VERROU
+    verrou = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+    verrou.execute("BEGIN IMMEDIATE")
+    liberation = threading.Timer(DUREE_VERROU, verrou.commit)
+    liberation.start()
+    try:
+        with ThreadPoolExecutor(max_workers=NB_REQUETES) as executor:
+            creations = [executor.submit(creer, i) for i in range(NB_REQUETES)]
+            time.sleep(0.2)
+            debut = time.perf_counter()
+            lecture = requests.get(f"{api}/api/buildings", timeout=60)
+            duree_lecture = time.perf_counter() - debut
+            resultats = [creation.result() for creation in creations]
+    finally:
+        liberation.join()
+        verrou.close()
+
+    assert lecture.status_code == 200
+    assert all(status == 200 for status, _ in resultats), [status for status, _ in resultats]
+    assert len(db_service_francais.get_buildings()) == NB_REQUETES
+    # Les écritures ont bien attendu le verrou...
+    assert min(duree for _, duree in resultats) > DUREE_VERROU / 2
+    # ... sans retenir la lecture lancée pendant l'attente
+    assert duree_lecture < DUREE_VERROU / 4, f"Lecture servie en {duree_lecture:.2f} s pendant les écritures"
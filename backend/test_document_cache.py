@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test du cache disque des documents (DocumentCache devant StorageService)
+
+Utilise la base de test (conftest.py), un répertoire de cache temporaire et un
+client S3 en mémoire à la place de Backblaze B2 : aucun accès réseau.
+
+Usage:
+    python -m pytest test_document_cache.py
+"""
+
+import io
+import os
+import hashlib
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+from document_cache import DocumentCache
+from storage_backends import B2StorageBackend
+from storage_service import StorageService
+
+
+class MemoryS3Client:
+    """Client S3 minimal en mémoire (put/upload/get/head/delete), qui compte les lectures et les envois"""
+
+    def __init__(self):
+        self.objects = {}
+        self.gets = 0
+        self.uploads = 0
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, Metadata=None, **kwargs):
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.read()
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        self.uploads += 1
+        self.objects[Key] = Fileobj.read()
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.gets += 1
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        data = self.objects[Key]
+        if Range:
+            start, end = Range[len("bytes="):].split("-")
+            data = data[int(start):int(end) + 1]
+        return {"Body": StreamingBody(io.BytesIO(data), len(data))}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": Key}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key]), "ETag": '"etag"', "ContentType": "application/pdf",
+                "LastModified": datetime.now(timezone.utc)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+        return {}
+
+
+def lire(storage, s3_key, byte_range=None, sha256=None):
+    """Lire un document en flux comme le fait l'endpoint /api/documents/{filename}"""
+    return b"".join(storage.iter_pdf(storage.open_pdf(s3_key, byte_range, sha256)))
+
+
+def test_document_cache(base, tmp_path):
+    """Vérifier succès, préchauffage, remplissage, corruption, éviction et déduplication"""
+    s3 = MemoryS3Client()
+    cache = DocumentCache(str(tmp_path / "cache"), max_bytes=250_000)
+    storage = StorageService(B2StorageBackend(s3_client=s3), document_cache=cache)
+
+    # 1. Préchauffage à l'upload : aucune lecture B2 ensuite
+    contenu = os.urandom(100_000)
+    upload = storage.upload_pdf(contenu, "bail.pdf", folder="bails", context="bail")
+    document = storage.locate_pdf(upload["filename"])
+    assert lire(storage, document["s3_key"], sha256=document["sha256"]) == contenu
+    assert lire(storage, document["s3_key"], (10, 99), document["sha256"]) == contenu[10:100]
+    assert storage.download_pdf(document["s3_key"]) == contenu
+    assert s3.gets == 0, "Lectures servies par le cache après l'upload"
+
+    # 2. Fichier antérieur à l'index : rempli par une lecture complète, empreinte ajoutée à l'index
+    ancien = os.urandom(50_000)
+    s3.objects["factures/ancien.pdf"] = ancien
+    document = storage.locate_pdf("ancien.pdf")
+    assert lire(storage, document["s3_key"], sha256=document["sha256"]) == ancien
+    document = storage.locate_pdf("ancien.pdf")
+    assert document["sha256"] == hashlib.sha256(ancien).hexdigest(), "Empreinte ajoutée à l'index"
+    gets = s3.gets
+    assert lire(storage, document["s3_key"], sha256=document["sha256"]) == ancien
+    assert s3.gets == gets, "Fichier non indexé servi par le cache après la première lecture"
+
+    # 3. Corruption : l'entrée est retirée et la lecture suivante revient à B2
+    sha256 = document["sha256"]
+    with open(cache._path(sha256), "r+b") as fichier:
+        fichier.write(b"corrompu")
+    assert storage.download_pdf(document["s3_key"]) == ancien
+    assert s3.gets == gets + 1 and cache.corrupt == 1, "Corruption détectée, B2 relu"
+    assert lire(storage, document["s3_key"], sha256=sha256) == ancien
+    assert s3.gets == gets + 1, "Entrée corrompue remplacée par le contenu valide"
+
+    # 4. Éviction LRU : 3 x 100 ko dans 250 ko
+    for i in range(2):
+        storage.upload_pdf(os.urandom(100_000), f"facture{i}.pdf", folder="factures", context="facture")
+    stats = cache.stats()
+    assert stats["size_bytes"] <= stats["max_bytes"] and stats["evictions"] >= 1, stats
+
+    # 5. Redémarrage : les entrées sur disque sont retrouvées
+    recharge = DocumentCache(cache.directory, max_bytes=cache.max_bytes)
+    assert recharge.stats()["entries"] == stats["entries"]
+
+    # 6. Déduplication : un contenu déjà stocké n'est pas renvoyé vers B2
+    contenu = os.urandom(20_000)
+    premier = storage.upload_pdf(contenu, "doublon.pdf", folder="documents", context="document")
+    uploads = s3.uploads
+    second = storage.upload_pdf_stream(io.BytesIO(contenu), "doublon.pdf", folder="documents", context="document")
+    assert second["deduplicated"] and not premier["deduplicated"]
+    assert s3.uploads == uploads, "Contenu identique non renvoyé vers B2"
+    assert second["s3_key"] == premier["s3_key"] and second["filename"] != premier["filename"]
+    assert storage.locate_pdf(second["filename"])["s3_key"] == premier["s3_key"]
+
+    storage.delete_pdf(premier["s3_key"])
+    assert premier["s3_key"] in s3.objects, "Objet B2 conservé tant qu'une référence reste"
+    assert storage.locate_pdf(second["filename"]) is not None
+    storage.delete_pdf(f"documents/{second['filename']}")
+    assert premier["s3_key"] not in s3.objects, "Objet B2 supprimé avec la dernière référence"
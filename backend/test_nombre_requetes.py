@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test de régression N+1 : nombre de requêtes SQL de get_units et get_tenants
+
+Insère dans la base de test (conftest.py) des jeux de données de tailles
+différentes et vérifie que le nombre de requêtes émises par appel reste
+constant quel que soit le nombre de lignes.
+
+Usage:
+    python -m pytest test_nombre_requetes.py
+"""
+
+from datetime import date
+
+from sqlalchemy import event
+
+from database import engine, SessionLocal
+from database_service_francais import db_service_francais
+from models_francais import Immeuble, Unite, Locataire, Bail
+
+
+def inserer_donnees(nb_unites):
+    """Ajouter un immeuble avec nb_unites unités, chacune avec un locataire et un bail actif"""
+    session = SessionLocal()
+    try:
+        immeuble = Immeuble(nom_immeuble=f"Test {nb_unites}", adresse="1 rue Test", ville="Trois-Rivières",
+                            province="QC", code_postal="G9A 1A1", nbr_unite=nb_unites)
+        session.add(immeuble)
+        session.flush()
+        for i in range(nb_unites):
+            unite = Unite(id_immeuble=immeuble.id_immeuble, adresse_unite=f"{i} rue Test")
+            locataire = Locataire(nom=f"Locataire {i}")
+            session.add_all([unite, locataire])
+            session.flush()
+            session.add(Bail(id_locataire=locataire.id_locataire, id_unite=unite.id_unite,
+                             date_debut=date(2020, 1, 1), date_fin=None, prix_loyer=1000))
+        session.commit()
+    finally:
+        session.close()
+
+
+def compter_requetes(fonction):
+    """Exécuter une fonction et retourner (résultat, nombre de requêtes SQL)"""
+    compteur = {"n": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        compteur["n"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        resultat = fonction()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return resultat, compteur["n"]
+
+
+def test_nombre_requetes(base):
+    """Vérifier que get_units et get_tenants émettent un nombre constant de requêtes"""
+    mesures = {"get_units": [], "get_tenants": []}
+
+    for nb_unites in (5, 50, 200):
+        inserer_donnees(nb_unites)
+
+        units, n_units = compter_requetes(lambda: db_service_francais.get_units(limit=1000))
+        tenants, n_tenants = compter_requetes(db_service_francais.get_tenants)
+
+        assert all(unit["locataires"] for unit in units), "Chaque unité doit avoir son locataire actif"
+        assert all("unit" in tenant for tenant in tenants), "Chaque locataire doit avoir son unité"
+
+        mesures["get_units"].append(n_units)
+        mesures["get_tenants"].append(n_tenants)
+
+    for nom, valeurs in mesures.items():
+        assert len(set(valeurs)) == 1, f"{nom} : nombre de requêtes variable selon le nombre d'unités {valeurs}"
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test du recalcul des notifications (refresh_notifications)
+
+Une notification non lue suit son compteur : elle est créée quand le compteur
+devient positif, mise à jour quand il change, et marquée comme lue quand il
+retombe à zéro (ex. « 3 loyer(s) non payé(s) » après le paiement).
+
+Usage:
+    python -m pytest test_notifications.py
+"""
+
+import pytest
+
+from auth_database_service import SessionLocal, engine
+from models_auth import Base, Compagnie, Notification, Utilisateur
+from notification_service import refresh_notifications
+
+
+@pytest.fixture
+def admin():
+    """Base d'authentification vide avec un admin actif -> (session, admin)"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    compagnie = Compagnie(nom_compagnie="Test", email_compagnie="test@example.com", schema_name="test")
+    db.add(compagnie)
+    db.flush()
+    user = Utilisateur(id_compagnie=compagnie.id_compagnie, email="admin@example.com", mot_de_passe_hash="x",
+                       nom="Admin", prenom="Test", role="admin", statut="actif")
+    db.add(user)
+    db.commit()
+    yield db, user
+    db.close()
+
+
+def non_lues(db, user):
+    return db.query(Notification).filter(Notification.id_utilisateur == user.id_utilisateur,
+                                         Notification.lue == False).all()
+
+
+def test_notification_suit_son_compteur(admin):
+    """Création, mise à jour puis lecture automatique quand le compteur retombe à zéro"""
+    db, user = admin
+
+    created = refresh_notifications(db, [user], {"loyer_non_paye": {"count": 3}, "bail_expire": {"count": 0}})
+    assert [n.type for n in created] == ["loyer_non_paye"]
+    [notification] = non_lues(db, user)
+    assert notification.titre == "3 loyer(s) non payé(s)"
+
+    assert refresh_notifications(db, [user], {"loyer_non_paye": {"count": 1}}) == []
+    [notification] = non_lues(db, user)
+    assert notification.titre == "1 loyer(s) non payé(s)"
+
+    # Tous les loyers payés : la notification ne reste pas affichée, périmée
+    assert refresh_notifications(db, [user], {"loyer_non_paye": {"count": 0}}) == []
+    assert non_lues(db, user) == []
+    assert db.query(Notification).count() == 1
+
+    # Un nouvel impayé crée une nouvelle notification
+    created = refresh_notifications(db, [user], {"loyer_non_paye": {"count": 2}})
+    assert [n.titre for n in created] == ["2 loyer(s) non payé(s)"]
+    assert len(non_lues(db, user)) == 1
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test de l'enregistrement groupé des paiements de loyers (upsert_paiements_loyers)
+
+Utilise la base de test (conftest.py).
+
+Usage:
+    python -m pytest test_paiements_loyers_bulk.py
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from database_service_francais import db_service_francais as db
+from models_francais import PaiementLoyer
+
+
+def statuts(resultat):
+    return [ligne["statut"] for ligne in resultat["resultats"]]
+
+
+def montants(bail):
+    """Montant payé de chaque mois du bail"""
+    with db.get_session() as session:
+        return {
+            p.mois: Decimal(str(p.montant_paye)).quantize(Decimal('0.01'))
+            for p in session.query(PaiementLoyer).filter(PaiementLoyer.id_bail == bail)
+        }
+
+
+def test_upsert_paiements_loyers(base):
+    """Un lot renvoyé à l'identique est inchangé ; une ligne modifiée est mise à jour"""
+    immeuble = db.create_building({"nom_immeuble": "Immeuble"})["id_immeuble"]
+    unite = db.create_unit({"id_immeuble": immeuble, "adresse_unite": "101"})["id_unite"]
+    locataire = db.create_tenant({"nom": "Test"})["id_locataire"]
+    bail = db.create_lease({
+        "id_locataire": locataire, "id_unite": unite,
+        "date_debut": "2024-01-01", "date_fin": "2024-12-31", "prix_loyer": 1234.56
+    })["id_bail"]
+
+    lot = [
+        {"id_bail": bail, "annee": 2024, "mois": 1, "montant_paye": 1234.56},
+        {"id_bail": bail, "annee": 2024, "mois": 2, "montant_paye": 1234.56,
+         "date_paiement_reelle": date(2024, 2, 3)},
+        {"id_bail": bail, "annee": 2024, "mois": 3, "montant_paye": 999.99, "notes": "Partiel"},
+        {"id_bail": bail, "annee": 2024, "mois": 4},
+    ]
+
+    # 1. Premier envoi : toutes les lignes sont créées
+    premier = db.upsert_paiements_loyers(lot)
+    assert statuts(premier) == ["cree"] * 4, statuts(premier)
+    assert montants(bail) == {1: Decimal('1234.56'), 2: Decimal('1234.56'), 3: Decimal('999.99'), 4: Decimal('1234.56')}
+
+    # 2. Même lot renvoyé : rien n'est modifié (montants DECIMAL comparés aux floats reçus)
+    second = db.upsert_paiements_loyers(lot)
+    assert statuts(second) == ["inchange"] * 4, statuts(second)
+    assert second["mis_a_jour"] == 0 and second["inchanges"] == 4
+
+    # 3. Date reçue en chaîne ISO : comparée comme une date
+    troisieme = db.upsert_paiements_loyers([
+        {"id_bail": bail, "annee": 2024, "mois": 2, "date_paiement_reelle": "2024-02-03"}
+    ])
+    assert statuts(troisieme) == ["inchange"], statuts(troisieme)
+
+    # 4. Montant réellement modifié : mis à jour, les autres lignes inchangées
+    modifie = [dict(entree) for entree in lot]
+    modifie[2]["montant_paye"] = 1234.56
+    quatrieme = db.upsert_paiements_loyers(modifie)
+    assert statuts(quatrieme) == ["inchange", "inchange", "mis_a_jour", "inchange"], statuts(quatrieme)
+    assert montants(bail)[3] == Decimal('1234.56')
+
+    # 5. Montant explicite nul : conservé (pas remplacé par le prix du bail), hors cashflow
+    cinquieme = db.upsert_paiements_loyers([{"id_bail": bail, "annee": 2024, "mois": 5, "montant_paye": 0}])
+    assert statuts(cinquieme) == ["cree"], statuts(cinquieme)
+    assert montants(bail)[5] == Decimal('0.00')
+    assert db.get_cashflow_mensuel(None, 2024, 5, 2024, 5) == []
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test de la restauration d'une sauvegarde pendant que l'application lit la base
+
+Utilise la base de test (conftest.py) ; sauvegardes et fichiers invalides sont
+créés dans le répertoire temporaire du test.
+
+Usage:
+    python -m pytest test_restauration.py
+"""
+
+import os
+import sqlite3
+import threading
+
+from sqlalchemy import text
+
+import backup_service
+from backup_service import BackupService, snapshot_database
+from database import DATABASE_PATH, SessionLocal
+
+
+def locataires():
+    session = SessionLocal()
+    try:
+        return session.execute(text("SELECT COUNT(*) FROM locataires")).scalar()
+    finally:
+        session.close()
+
+
+def ajouter_locataire(nom):
+    session = SessionLocal()
+    try:
+        session.execute(text("INSERT INTO locataires (nom) VALUES (:nom)"), {"nom": nom})
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_restauration(base, tmp_path, monkeypatch):
+    """Vérifier validation, remplacement sans erreur de lecture et journal WAL non rejoué"""
+    service = BackupService(str(tmp_path / "backups"))
+
+    ajouter_locataire("Avant")
+    initial = locataires()
+    sauvegarde = service.create_backup("manual")
+
+    # Écritures après la sauvegarde, encore dans le journal WAL
+    for i in range(20):
+        ajouter_locataire(f"Après {i}")
+    assert locataires() == initial + 20
+    assert os.path.getsize(DATABASE_PATH + "-wal") > 0, "Écritures récentes dans le journal WAL"
+
+    # 1. Restauration pendant des lectures continues
+    erreurs, arret = [], threading.Event()
+
+    def lecteur():
+        while not arret.is_set():
+            try:
+                locataires()
+            except Exception as e:
+                erreurs.append(e)
+
+    threads = [threading.Thread(target=lecteur) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    restauration = service.restore_backup(sauvegarde)
+    arret.set()
+    for thread in threads:
+        thread.join()
+    assert restauration is not None
+    assert not erreurs, f"Erreurs de lecture pendant le remplacement : {erreurs[:3]}"
+    assert locataires() == initial, "Base restaurée (ancien journal WAL non rejoué)"
+
+    # Aucune connexion des lecteurs ne reste ouverte : une seconde restauration passe
+    ajouter_locataire("Entre deux restaurations")
+    assert service.restore_backup(sauvegarde) is not None
+    assert locataires() == initial
+    ajouter_locataire("Après restauration")
+    assert locataires() == initial + 1, "Écriture sur la base restaurée"
+
+    # 2. Fichiers invalides : refusés avant de toucher à la base
+    invalide = str(tmp_path / "invalide.db")
+    connection = sqlite3.connect(invalide)
+    connection.execute("CREATE TABLE autre (id INTEGER)")
+    connection.close()
+    assert service.restore_backup(invalide) is None, "Sauvegarde sans les tables des modèles refusée"
+
+    sans_construction = str(tmp_path / "sans_construction.db")
+    snapshot_database(sans_construction, DATABASE_PATH)
+    connection = sqlite3.connect(sans_construction)
+    connection.execute("DROP TABLE projets")
+    connection.close()
+    assert service.restore_backup(sans_construction) is None, "Sauvegarde sans les tables de construction refusée"
+    assert locataires() == initial + 1
+
+    # 3. Connexion étrangère ouverte : restauration annulée, base intacte
+    monkeypatch.setattr(backup_service, "RESTORE_LOCK_TIMEOUT", 0.5)
+    autre = sqlite3.connect(DATABASE_PATH)
+    autre.execute("SELECT COUNT(*) FROM locataires").fetchone()
+    try:
+        assert service.restore_backup(sauvegarde) is None, "Restauration annulée si une autre connexion reste ouverte"
+    finally:
+        autre.close()
+    assert locataires() == initial + 1
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test des backends de stockage (LocalStorageBackend) et du service de stockage au-dessus
+
+Utilise la base de test (conftest.py) et un répertoire de stockage temporaire :
+aucun accès réseau ni identifiants Backblaze B2.
+
+Usage:
+    python -m pytest test_storage_backends.py
+"""
+
+import asyncio
+import io
+import os
+
+import pytest
+
+from database_service_francais import db_service_francais
+from storage_backends import LocalStorageBackend
+from storage_service import StorageService
+
+
+def test_storage_backends(base, tmp_path, monkeypatch):
+    """Vérifier lecture, liste paginée, suppression en lot et versions async sur le backend local"""
+    backend = LocalStorageBackend(str(tmp_path / "storage"))
+    storage = StorageService(backend, document_cache=None)
+
+    # 1. Backend seul : écriture, métadonnées, intervalle d'octets, clé hors du répertoire
+    contenu = os.urandom(10_000)
+    backend.put("documents/a.pdf", io.BytesIO(contenu), "application/pdf", {})
+    body = backend.get("documents/a.pdf", (100, 199))
+    assert body.read() == contenu[100:200]
+    body.close()
+    assert backend.head("documents/a.pdf")["size"] == 10_000
+    assert backend.get("documents/absent.pdf") is None
+    with pytest.raises(ValueError):
+        backend.head("../hors.pdf")
+
+    # 2. Liste paginée par jeton de continuation
+    noms = [storage.upload_pdf(os.urandom(1_000 + i), f"doc{i}.pdf")["filename"] for i in range(5)]
+    pages, jeton = [], None
+    while True:
+        fichiers, jeton = storage.list_pdfs_page("documents", limit=2, continuation_token=jeton)
+        pages.append([fichier["filename"] for fichier in fichiers])
+        if jeton is None:
+            break
+    tous = [nom for page in pages for nom in page]
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert len(set(tous)) == 6 and tous == [f["filename"] for f in storage.list_pdfs()]
+
+    # 3. Suppression en lot : une référence dédupliquée garde l'objet partagé
+    with open(backend._path(f"documents/{noms[0]}"), "rb") as copie:
+        doublon = storage.upload_pdf_stream(copie, "copie.pdf")
+    resultat = storage.delete_pdfs([noms[0], f"documents/{noms[1]}", noms[2]])
+    assert doublon["deduplicated"]
+    assert len(resultat["deleted"]) == 2 and len(resultat["released"]) == 1, resultat
+    assert storage.locate_pdf(doublon["filename"]) is not None
+    assert backend.head(f"documents/{noms[1]}") is None
+
+    # Upload dédupliqué arrivé pendant la suppression de l'objet : sa référence n'est pas retirée
+    seul = storage.upload_pdf(os.urandom(2_000), "seul.pdf")
+    supprimer = backend.delete_many
+
+    def delete_many_avec_upload(keys):
+        db_service_francais.index_document("tardif.pdf", seul["s3_key"], dossier="documents")
+        return supprimer(keys)
+
+    monkeypatch.setattr(backend, "delete_many", delete_many_avec_upload)
+    assert storage.delete_pdfs([seul["filename"]])["deleted"] == [seul["s3_key"]]
+    assert db_service_francais.get_document_index("tardif.pdf") is not None
+    monkeypatch.undo()
+
+    # 4. Versions async : exécutées dans le pool de stockage
+    async def operations_async():
+        upload = await storage.upload_pdf_stream_async(io.BytesIO(b"%PDF async"), "async.pdf")
+        contenu_lu = await storage.download_pdf_async(upload["s3_key"])
+        suppression = await storage.delete_pdfs_async([upload["filename"]])
+        return contenu_lu, suppression
+
+    contenu_lu, suppression = asyncio.run(operations_async())
+    assert contenu_lu == b"%PDF async"
+    assert len(suppression["deleted"]) == 1
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Cache des utilisateurs authentifiés (get_current_user)
+
+Chaque requête authentifiée résout l'utilisateur du token JWT. Plutôt qu'une
+requête sur la base d'authentification à chaque appel, les colonnes de
+l'utilisateur sont gardées en mémoire (LRU, durée de vie USER_CACHE_TTL) et
+rattachées à la session de la requête sans aller-retour SQL.
+
+Les endpoints qui modifient un utilisateur (email, mot de passe, statut,
+approbation, suppression) invalident explicitement son entrée. Le cache est
+propre à chaque processus : la durée de vie borne le délai de prise en compte
+d'une modification faite par un autre processus.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models_auth import Utilisateur
+
+# Configuration
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "1024"))
+
+
+class UserCache:
+    """Colonnes des utilisateurs résolus, par id_utilisateur (LRU + durée de vie)"""
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, db: Session) -> Optional[Utilisateur]:
+        """
+        Utilisateur en cache, rattaché à la session de la requête (None si absent ou expiré)
+
+        L'instance est persistante dans db : les endpoints peuvent la modifier
+        puis valider la session comme un utilisateur chargé par requête.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            columns = entry[1]
+
+        user = Utilisateur(**columns)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def put(self, user: Utilisateur):
+        """Mémoriser les colonnes d'un utilisateur tout juste chargé"""
+        columns = {column.key: getattr(user, column.key) for column in Utilisateur.__table__.columns}
+        with self._lock:
+            self._entries[user.id_utilisateur] = (time.monotonic() + self.ttl, columns)
+            self._entries.move_to_end(user.id_utilisateur)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int]):
+        """Oublier un utilisateur (après une modification ou une suppression)"""
+        if user_id is None:
+            return
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Oublier tous les utilisateurs (suppressions en lot)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs du cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else None
+            }
+
+
+# Instance globale
+user_cache = UserCache()
@@ -11,6 +11,9 @@ from enum import Enum
 
 from database import db_manager
 from database_service_francais import db_service_francais as db_service
+from app_logging import get_logger
+
+logger = get_logger(__name__)
 
 class ValidationLevel(Enum):
     """Niveaux de validation"""
@@ -39,7 +42,7 @@ class DataValidator:
         """Valider toutes les données de la base"""
         self.results = []
         
-        print("🔍 Début de la validation complète des données...")
+        logger.debug("🔍 Début de la validation complète des données...")
         
         # Valider chaque table
         self._validate_buildings()
@@ -55,12 +58,12 @@ class DataValidator:
         # Valider l'intégrité globale
         self._validate_global_integrity()
         
-        print(f"✅ Validation terminée : {len(self.results)} problèmes trouvés")
+        logger.info(f"✅ Validation terminée : {len(self.results)} problèmes trouvés")
         return self.results
     
     def _validate_buildings(self):
         """Valider les immeubles"""
-        print("  🏢 Validation des immeubles...")
+        logger.info("  🏢 Validation des immeubles...")
         
         try:
             buildings = db_service.get_buildings()
@@ -104,7 +107,7 @@ class DataValidator:
     
     def _validate_tenants(self):
         """Valider les locataires"""
-        print("  👥 Validation des locataires...")
+        logger.info("  👥 Validation des locataires...")
         
         try:
             tenants = db_service.get_tenants()
@@ -146,7 +149,7 @@ class DataValidator:
     
     def _validate_assignments(self):
         """Valider les assignations locataire-unité"""
-        print("  🔗 Validation des assignations...")
+        logger.info("  🔗 Validation des assignations...")
         
         try:
             assignments = db_service.get_assignments()
@@ -190,7 +193,7 @@ class DataValidator:
     
     def _validate_building_reports(self):
         """Valider les rapports d'immeubles"""
-        print("  📊 Validation des rapports d'immeubles...")
+        logger.info("  📊 Validation des rapports d'immeubles...")
         
         try:
             reports = db_service.get_building_reports()
@@ -221,7 +224,7 @@ class DataValidator:
     
     def _validate_unit_reports(self):
         """Valider les rapports d'unités"""
-        print("  🏠 Validation des rapports d'unités...")
+        logger.info("  🏠 Validation des rapports d'unités...")
         
         try:
             reports = db_service.get_unit_reports()
@@ -252,7 +255,7 @@ class DataValidator:
     
     def _validate_invoices(self):
         """Valider les factures"""
-        print("  💰 Validation des factures...")
+        logger.info("  💰 Validation des factures...")
         
         try:
             invoices = db_service.get_invoices()
@@ -291,7 +294,7 @@ class DataValidator:
     
     def _validate_relationships(self):
         """Valider les relations entre tables"""
-        print("  🔗 Validation des relations...")
+        logger.info("  🔗 Validation des relations...")
         
         try:
             # Vérifier les assignations orphelines
@@ -332,7 +335,7 @@ class DataValidator:
     
     def _validate_global_integrity(self):
         """Valider l'intégrité globale de la base de données"""
-        print("  🌐 Validation de l'intégrité globale...")
+        logger.info("  🌐 Validation de l'intégrité globale...")
         
         try:
             # Vérifier les contraintes de clés étrangères
@@ -421,7 +424,7 @@ class DataValidator:
         
         # Afficher le résultat
         icon = {"info": "ℹ️", "warning": "⚠️", "error": "❌", "critical": "🚨"}[level.value]
-        print(f"    {icon} {message}")
+        logger.info(f"    {icon} {message}")
 
 class DataConsistencyChecker:
     """Vérificateur de cohérence des données"""
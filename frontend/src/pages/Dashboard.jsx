@@ -105,58 +105,17 @@ export default function Dashboard() {
 
   const loadUnpaidRents = async () => {
     try {
-      // Récupérer tous les baux et tous les paiements en parallèle
-      const [leasesResponse, allPaymentsResponse] = await Promise.all([
-        api.get('/api/leases'),
-        api.get('/api/paiements-loyers')
-      ])
-      
-      const leases = Array.isArray(leasesResponse.data) ? leasesResponse.data : (leasesResponse.data.data || [])
-      const allPayments = Array.isArray(allPaymentsResponse.data) ? allPaymentsResponse.data : (allPaymentsResponse.data.data || [])
-      
-      // Créer un map des paiements par bail pour recherche rapide
-      const paymentsByBail = {}
-      allPayments.forEach(payment => {
-        const bailId = payment.id_bail
-        if (!paymentsByBail[bailId]) {
-          paymentsByBail[bailId] = []
-        }
-        paymentsByBail[bailId].push(payment)
-      })
+      // Loyers du mois dernier sans paiement, calculés par le serveur
+      const response = await api.get('/api/analysis/arrears')
       
-      // Obtenir le mois dernier
-      const today = new Date()
-      const lastMonth = new Date(today.getFullYear(), today.getMonth() - 1, 1)
-      const lastMonthYear = lastMonth.getFullYear()
-      const lastMonthMonth = lastMonth.getMonth() + 1
-      
-      const unpaid = []
-      
-      // Pour chaque bail actif, vérifier s'il y a un paiement pour le mois dernier
-      for (const lease of leases) {
-        if (!lease.date_debut || !lease.date_fin) continue
-        
-        const leaseStart = new Date(lease.date_debut)
-        const leaseEnd = new Date(lease.date_fin)
-        const checkDate = new Date(lastMonthYear, lastMonthMonth - 1, 1)
-        
-        // Si le bail était actif le mois dernier
-        if (checkDate >= leaseStart && checkDate <= leaseEnd) {
-          const bailPayments = paymentsByBail[lease.id_bail] || []
-          const hasPayment = bailPayments.some(p => p.annee === lastMonthYear && p.mois === lastMonthMonth)
-          
-          if (!hasPayment) {
-            unpaid.push({
-              lease,
-              year: lastMonthYear,
-              month: lastMonthMonth,
-              amount: lease.prix_loyer || 0,
-              tenant: lease.locataire,
-              unit: lease.locataire?.unite
-            })
-          }
-        }
-      }
+      const unpaid = (response.data.impayes || []).map(item => ({
+        lease: { id_bail: item.id_bail },
+        year: item.annee,
+        month: item.mois,
+        amount: item.montant || 0,
+        tenant: item.locataire,
+        unit: { adresse_unite: item.adresse_unite, id_immeuble: item.id_immeuble }
+      }))
       
       setUnpaidRents(unpaid)
     } catch (error) {
@@ -6,7 +6,8 @@ const RentPayments = () => {
   const [buildings, setBuildings] = useState([])
   const [selectedBuilding, setSelectedBuilding] = useState(null)
   const [leases, setLeases] = useState([])
-  const [payments, setPayments] = useState({})
+  // Matrice bail × mois renvoyée par /api/paiements-loyers/rent-roll (format colonnaire)
+  const [rentRoll, setRentRoll] = useState(null)
   // Initialiser avec 12 mois AVANT aujourd'hui
   const today = new Date()
   const twelveMonthsAgo = new Date(today.getFullYear(), today.getMonth() - 11, 1)
@@ -32,26 +33,13 @@ const RentPayments = () => {
     }
   }
 
-  // Charger les baux pour l'immeuble sélectionné
+  // Charger les baux et leurs paiements pour l'immeuble sélectionné (une seule requête)
   const loadLeases = async () => {
     if (!selectedBuilding) return
     
     try {
       setLoading(true)
-      const response = await api.get('/api/leases')
-      const leasesList = Array.isArray(response.data) ? response.data : (response.data.data || [])
-      
-      // Filtrer les baux pour l'immeuble sélectionné
-      const buildingLeases = leasesList.filter(lease => 
-        lease.locataire && 
-        lease.locataire.unite && 
-        lease.locataire.unite.id_immeuble === selectedBuilding.id_immeuble
-      )
-      
-      setLeases(buildingLeases)
-      
-      // Charger les paiements pour chaque bail
-      await loadPaymentsForLeases(buildingLeases)
+      await loadRentRoll()
     } catch (error) {
       console.error('Erreur lors du chargement des baux:', error)
     } finally {
@@ -59,21 +47,24 @@ const RentPayments = () => {
     }
   }
 
-  // Charger les paiements pour les baux
-  const loadPaymentsForLeases = async (leasesList) => {
-    const paymentsData = {}
-    
-    for (const lease of leasesList) {
-      try {
-        const response = await api.get(`/api/paiements-loyers/bail/${lease.id_bail}`)
-        paymentsData[lease.id_bail] = response.data.data || []
-      } catch (error) {
-        console.error(`Erreur lors du chargement des paiements pour le bail ${lease.id_bail}:`, error)
-        paymentsData[lease.id_bail] = []
+  // Charger la matrice des paiements (baux × 12 mois affichés)
+  const loadRentRoll = async () => {
+    const response = await api.get('/api/paiements-loyers/rent-roll', {
+      params: {
+        building_ids: selectedBuilding.id_immeuble,
+        annee: displayYear,
+        mois_debut: displayMonth,
+        nb_mois: 12
       }
-    }
+    })
+    const roll = response.data.data
     
-    setPayments(paymentsData)
+    setRentRoll(roll)
+    setLeases(roll.baux.id_bail.map((id_bail, index) => ({
+      id_bail,
+      adresse_unite: roll.baux.adresse_unite[index],
+      locataire: roll.baux.locataire[index]
+    })))
   }
 
   // Charger les données au montage
@@ -85,7 +76,7 @@ const RentPayments = () => {
     if (selectedBuilding) {
       loadLeases()
     }
-  }, [selectedBuilding])
+  }, [selectedBuilding, displayYear, displayMonth])
 
   // Générer les mois à afficher (12 mois à partir du mois sélectionné)
   const generateMonths = () => {
@@ -106,21 +97,33 @@ const RentPayments = () => {
     return months
   }
 
+  // Position d'un bail et d'un mois dans la matrice
+  const rollCell = (leaseId, year, month) => {
+    if (!rentRoll) return null
+    const row = rentRoll.baux.id_bail.indexOf(leaseId)
+    const col = rentRoll.mois.indexOf(`${year}-${String(month).padStart(2, '0')}`)
+    return row === -1 || col === -1 ? null : { row, col }
+  }
+
   // Obtenir le paiement pour un bail et un mois donné
   const getPayment = (leaseId, year, month) => {
-    const leasePayments = payments[leaseId] || []
-    return leasePayments.find(p => p.annee === year && p.mois === month)
+    const cell = rollCell(leaseId, year, month)
+    if (!cell || rentRoll.id_paiement[cell.row][cell.col] === null) return undefined
+    return {
+      id_paiement: rentRoll.id_paiement[cell.row][cell.col],
+      id_bail: leaseId,
+      annee: year,
+      mois: month,
+      montant_paye: rentRoll.montant_paye[cell.row][cell.col],
+      date_paiement_reelle: rentRoll.date_paiement[cell.row][cell.col],
+      notes: rentRoll.notes[cell.row][cell.col]
+    }
   }
 
-  // Vérifier si le bail est actif pour un mois donné
+  // Vérifier si le bail est actif pour un mois donné (loyer attendu calculé par le serveur)
   const isLeaseActiveForMonth = (lease, year, month) => {
-    if (!lease.date_debut || !lease.date_fin) return false
-    
-    const leaseStart = new Date(lease.date_debut)
-    const leaseEnd = new Date(lease.date_fin)
-    const checkDate = new Date(year, month - 1, 1) // Premier jour du mois
-    
-    return checkDate >= leaseStart && checkDate <= leaseEnd
+    const cell = rollCell(lease.id_bail, year, month)
+    return !!cell && rentRoll.attendu[cell.row][cell.col] !== null
   }
 
   // Créer ou supprimer un paiement
@@ -145,7 +148,7 @@ const RentPayments = () => {
       }
       
       // Recharger les paiements
-      await loadPaymentsForLeases(leases)
+      await loadRentRoll()
     } catch (error) {
       console.error('Erreur lors de la mise à jour du paiement:', error)
     }
@@ -186,7 +189,7 @@ const RentPayments = () => {
       
       await api.put(`/api/paiements-loyers/${updatedPayment.id_paiement}`, updateData)
       setShowDetails(null)
-      await loadPaymentsForLeases(leases)
+      await loadRentRoll()
     } catch (error) {
       console.error('Erreur lors de la mise à jour des détails:', error)
       alert('Erreur lors de la mise à jour du paiement')
@@ -347,7 +350,7 @@ const RentPayments = () => {
                       <tr key={lease.id_bail}>
                         <td className="px-6 py-4 whitespace-nowrap">
                           <div className="text-sm font-medium text-gray-900 dark:text-white">
-                            {lease.locataire?.unite?.adresse_unite || 'N/A'}
+                            {lease.adresse_unite || 'N/A'}
                           </div>
                         </td>
                         {months.map(({ year, month }) => {